@@ -1,7 +1,16 @@
 #!/usr/bin/env fish
 
 # ai_cleanup_ollama.fish - AI-powered final cleanup using Ollama
-# Usage: ./ai_cleanup_ollama.fish input.md output.md [model]
+# Usage: ./ai_cleanup_ollama.fish input.md output.md [model] [--targeted lowconf_dir] [--jobs N]
+#
+# The chapter is cleaned by ollama_client.py through the local Ollama API: one
+# request per page/column chunk, a few in flight at once, with responses cached
+# so re-runs only send chunks that changed or failed.
+
+set CLIENT (dirname (status filename))/ollama_client.py
+
+argparse 'targeted=' 'jobs=' -- $argv
+or exit 1
 
 set INPUT $argv[1]
 set OUTPUT $argv[2]
@@ -12,7 +21,7 @@ if test (count $argv) -ge 3
 end
 
 if test (count $argv) -lt 2
-    echo (set_color red)"[ERROR]"(set_color normal) " Usage: ./ai_cleanup_ollama.fish input.md output.md [model]"
+    echo (set_color red)"[ERROR]"(set_color normal) " Usage: ./ai_cleanup_ollama.fish input.md output.md [model] [--targeted lowconf_dir] [--jobs N]"
     exit 1
 end
 
@@ -26,12 +35,8 @@ echo (set_color cyan)"║"(set_color normal)(set_color yellow)"       AI CLEANUP
 echo (set_color cyan)"╚════════════════════════════════════════════════════════════╝"(set_color normal)
 echo ""
 
-# Check if Ollama is available
-if not command -v ollama &>/dev/null
-    echo (set_color red)"[ERROR]"(set_color normal) " Ollama not found in PATH"
-    echo ""
-    echo "Install Ollama from: https://ollama.ai"
-    echo "Then run: ollama pull $MODEL"
+if not command -v python3 &>/dev/null; or not test -f $CLIENT
+    echo (set_color red)"[ERROR]"(set_color normal) " python3 and ollama_client.py are required"
     exit 1
 end
 
@@ -48,40 +53,22 @@ if test $file_size -eq 0
     exit 0
 end
 
-echo (set_color yellow)"[1/2]"(set_color normal) " Processing with Ollama AI..."
-
-# Create temporary file for output
-set TEMP_OUTPUT (mktemp)
-set TEMP_INPUT (mktemp)
-
-# Write content to temp file
-cat $INPUT > $TEMP_INPUT
-
-# Call Ollama with a simpler, more direct prompt
-ollama run $MODEL "Fix OCR errors and merge split headers in this D&D book markdown. Keep ALL game terms (THAC0, factol, dabus, tanar'ri, etc). Fix: 'bro-ken'→'broken', '## THE TALE OF\n## HARBINGER HOUSE'→'## THE TALE OF HARBINGER HOUSE'. Remove artifacts like '+2+'. Output ONLY the cleaned markdown, no commentary:
-
-"(cat $TEMP_INPUT) > $TEMP_OUTPUT 2>/dev/null
+echo (set_color yellow)"[1/1]"(set_color normal) " Processing with Ollama AI..."
 
-rm -f $TEMP_INPUT
-
-if test $status -eq 0
-    echo (set_color yellow)"[2/2]"(set_color normal) " Saving cleaned output..."
-
-    # Remove any AI preamble/commentary that might have slipped through
-    cat $TEMP_OUTPUT | \
-        sed -e '/^Here is the cleaned/d' \
-            -e '/^Here'\''s the cleaned/d' \
-            -e '/^I'\''ve cleaned/d' \
-            -e '/^The cleaned/d' \
-            -e '/^# Cleaned/d' \
-            -e '1{/^[[:space:]]*$/d}' > $OUTPUT
+set client_args $INPUT $OUTPUT --model $MODEL
+if set -q _flag_targeted
+    set client_args $client_args --targeted $_flag_targeted
+end
+if set -q _flag_jobs
+    set client_args $client_args --jobs $_flag_jobs
+end
 
-    rm -f $TEMP_OUTPUT
-else
-    echo (set_color red)"[ERROR]"(set_color normal) " Ollama processing failed"
-    rm -f $TEMP_OUTPUT
-    # Fallback: copy input to output
-    cp $INPUT $OUTPUT
+# Failed chunks keep their original text in the output, so it is always usable
+if not python3 $CLIENT $client_args
+    echo (set_color red)"[ERROR]"(set_color normal) " Ollama processing failed (re-run to retry; finished chunks are cached)"
+    if not test -f $OUTPUT
+        cp $INPUT $OUTPUT
+    end
     exit 1
 end
 
@@ -2,12 +2,14 @@
 
 # apply_corrections.fish - Apply learned corrections from corrections.json to markdown files
 # Reads corrections.json and applies pattern replacements to OCR'd text
+# Replacements run through apply_corrections.py (single pass per file, chapters in parallel)
 #
 # Usage: ./apply_corrections.fish [converted_dir] [options]
 #   --corrections FILE   Use specific corrections file (default: corrections.json)
 #   --dry-run           Show what would be changed without modifying files
 #   --verbose           Show each correction applied
 #   --input FILE        Apply to a single file instead of all chapters
+#   --jobs N            Parallel chapter workers (default: CPU count)
 
 # Source progress utilities
 source (dirname (status filename))/progress_utils.fish
@@ -17,6 +19,8 @@ set -g CORRECTIONS_FILE "corrections.json"
 set -g DRY_RUN false
 set -g VERBOSE false
 set -g SINGLE_FILE ""
+set -g JOBS ""
+set -g CORRECTION_ENGINE (dirname (status filename))"/apply_corrections.py"
 
 # ============================================================================
 # LOGGING
@@ -58,6 +62,9 @@ function parse_args
             case "--input"
                 set i (math $i + 1)
                 set -g SINGLE_FILE $argv[$i]
+            case "--jobs" "-j"
+                set i (math $i + 1)
+                set -g JOBS $argv[$i]
             case "--help" "-h"
                 echo "Usage: ./apply_corrections.fish [converted_dir] [options]"
                 echo ""
@@ -66,6 +73,7 @@ function parse_args
                 echo "  --dry-run           Show what would be changed without modifying files"
                 echo "  --verbose           Show each correction applied"
                 echo "  --input FILE        Apply to a single file instead of all chapters"
+                echo "  --jobs N            Parallel chapter workers (default: CPU count)"
                 echo ""
                 exit 0
             case "*"
@@ -95,6 +103,11 @@ function load_corrections
         return 1
     end
     
+    if not command -v python3 &>/dev/null; or not test -f "$CORRECTION_ENGINE"
+        log_error "python3 and apply_corrections.py are required to apply corrections"
+        return 1
+    end
+    
     # Extract simple corrections
     set -g CORRECTION_FROM
     set -g CORRECTION_TO
@@ -127,43 +140,6 @@ function load_corrections
     return 0
 end
 
-function build_sed_script
-    # Build a sed script from the corrections
-    # This is more efficient than running sed multiple times
-    
-    set sed_script ""
-    
-    for i in (seq 1 (count $CORRECTION_FROM))
-        set from $CORRECTION_FROM[$i]
-        set to $CORRECTION_TO[$i]
-        
-        # Skip empty from patterns
-        if test -z "$from"
-            continue
-        end
-        
-        # Escape special regex characters in the 'from' pattern
-        set escaped_from (string escape --style=regex $from)
-        
-        # Build word-boundary aware replacement
-        # Use \b for word boundaries where appropriate
-        if test -n "$to"
-            set sed_script "$sed_script""-e 's/\\b$escaped_from\\b/$to/g' "
-        else
-            # Empty replacement = delete the word
-            set sed_script "$sed_script""-e 's/\\b$escaped_from\\b//g' "
-        end
-    end
-    
-    # Add garbage pattern removals
-    for pattern in $GARBAGE_PATTERNS
-        # For garbage at start of lines (headers)
-        set sed_script "$sed_script""-e 's/$pattern//g' "
-    end
-    
-    echo $sed_script
-end
-
 function apply_to_file
     set input_file $argv[1]
     set output_file $argv[2]
@@ -173,24 +149,18 @@ function apply_to_file
         return 1
     end
     
-    # Build sed command
-    set sed_script (build_sed_script)
-    
-    if test -z "$sed_script"
+    if test (count $CORRECTION_FROM) -eq 0; and test (count $GARBAGE_PATTERNS) -eq 0
         log_warn "No corrections to apply"
         cp $input_file $output_file
         return 0
     end
     
-    # Count lines before
-    set lines_before (wc -l < $input_file)
-    
     if test $DRY_RUN = "true"
         log_info "[DRY-RUN] Would apply corrections to: $input_file"
         
         # Show sample of what would change
         set temp_out (mktemp)
-        eval "sed $sed_script $input_file" > $temp_out
+        python3 $CORRECTION_ENGINE $input_file --corrections $CORRECTIONS_FILE > $temp_out
         
         set diff_output (diff $input_file $temp_out 2>/dev/null | head -20)
         if test -n "$diff_output"
@@ -204,7 +174,7 @@ function apply_to_file
     else
         # Apply corrections
         set temp_out (mktemp)
-        eval "sed $sed_script $input_file" > $temp_out
+        python3 $CORRECTION_ENGINE $input_file --corrections $CORRECTIONS_FILE > $temp_out
         
         # Count changes by comparing
         set changes (diff $input_file $temp_out 2>/dev/null | grep -c "^<" || echo "0")
@@ -243,36 +213,27 @@ function apply_to_chapter
 end
 
 function process_all_chapters
-    set -l processed 0
-    set -l failed 0
-    
-    # Collect chapter directories first for progress tracking
-    set chapter_dirs
-    for chapter_dir in $OUTPUT_ROOT/*/
-        set chapter_name (basename $chapter_dir)
-        if test "$chapter_name" != "final" -a "$chapter_name" != "statblocks" -a "$chapter_name" != "diagnostics"
-            set chapter_dirs $chapter_dirs $chapter_dir
+    if test $DRY_RUN = "true"
+        # Dry runs show per-chapter samples, so walk chapters one at a time
+        for chapter_dir in $OUTPUT_ROOT/*/
+            set chapter_name (basename $chapter_dir)
+            if test "$chapter_name" != "final" -a "$chapter_name" != "statblocks" -a "$chapter_name" != "diagnostics"
+                apply_to_chapter $chapter_dir
+            end
         end
+        return 0
     end
     
-    set total_chapters (count $chapter_dirs)
-    set current_chapter 0
-    progress_start $total_chapters "Applying corrections"
-    
-    for chapter_dir in $chapter_dirs
-        set current_chapter (math $current_chapter + 1)
-        
-        if apply_to_chapter $chapter_dir
-            set processed (math $processed + 1)
-        else
-            set failed (math $failed + 1)
-        end
-        
-        progress_update $current_chapter
+    # One engine invocation handles every chapter in parallel
+    set engine_args $OUTPUT_ROOT --corrections $CORRECTIONS_FILE
+    if test -n "$JOBS"
+        set engine_args $engine_args --jobs $JOBS
+    end
+    if test $VERBOSE != "true"
+        set engine_args $engine_args --quiet
     end
     
-    progress_finish
-    log_info "Processed $processed chapters, $failed failed"
+    python3 $CORRECTION_ENGINE $engine_args
 end
 
 # ============================================================================
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+apply_corrections.py - Single-pass correction engine for learned OCR corrections
+Loads corrections.json once, compiles corrections and garbage patterns into a
+small number of matchers, and streams each file through them in one pass.
+Chapters are processed in parallel.
+
+Output is byte-identical to the old per-rule sed chain in apply_corrections.fish:
+keys are escaped the way `string escape --style=regex` escaped them, patterns are
+read as GNU sed BREs, and rules are applied in the same order.
+
+Usage: python3 apply_corrections.py [converted_dir | input.md] [--corrections FILE]
+                                    [--output FILE] [--jobs N] [--quiet]
+"""
+
+import os
+import re
+import sys
+import json
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+DEFAULT_CORRECTIONS = "corrections.json"
+DEFAULT_OUTPUT_NAME = "corrected.md"
+
+# Chapter source preference (best first) and directories that are not chapters
+SOURCE_CANDIDATES = ("dict_cleaned.md", "cleaned.md", "converted.md")
+SKIP_DIRS = ("final", "statblocks", "diagnostics")
+
+# Characters escaped by fish's `string escape --style=regex`
+FISH_REGEX_SPECIALS = set('.^$*+()?[{}\\|-]')
+
+# POSIX bracket classes mapped to Python class contents
+POSIX_CLASSES = {
+    'alpha': 'a-zA-Z',
+    'digit': '0-9',
+    'alnum': 'a-zA-Z0-9',
+    'upper': 'A-Z',
+    'lower': 'a-z',
+    'space': r' \t\n\r\f\v',
+    'blank': r' \t',
+    'punct': re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'),
+    'xdigit': '0-9A-Fa-f',
+}
+
+WORD_RE = re.compile(r'\w+')
+PURE_WORD_RE = re.compile(r'^\w+$')
+
+
+def fish_regex_escape(text: str) -> str:
+    """Escape text the way fish's `string escape --style=regex` does"""
+    return ''.join('\\' + c if c in FISH_REGEX_SPECIALS else c for c in text)
+
+
+def fish_unquote(text: str) -> str:
+    """Undo the backslash handling fish applies inside single quotes on eval"""
+    return re.sub(r"\\([\\'])", r'\1', text)
+
+
+def parse_bracket(pattern: str, i: int) -> tuple[str | None, int]:
+    """Translate a BRE bracket expression starting after '[' into a Python class"""
+    out = ['[']
+    n = len(pattern)
+    if i < n and pattern[i] == '^':
+        out.append('^')
+        i += 1
+    first = True
+    while i < n:
+        c = pattern[i]
+        if c == ']' and not first:
+            out.append(']')
+            return ''.join(out), i + 1
+        if c == '[' and i + 1 < n and pattern[i + 1] in ':.=':
+            kind = pattern[i + 1]
+            end = pattern.find(kind + ']', i + 2)
+            if end != -1:
+                name = pattern[i + 2:end]
+                if kind == ':':
+                    out.append(POSIX_CLASSES.get(name, ''))
+                else:
+                    out.append(re.escape(name))
+                i = end + 2
+                first = False
+                continue
+        # Backslash is literal inside POSIX brackets
+        out.append('\\' + c if c in '\\[]^' else c)
+        i += 1
+        first = False
+    # Unterminated bracket: sed would reject it, treat '[' literally
+    return None, -1
+
+
+def bre_to_python(pattern: str) -> str:
+    """Translate a GNU sed basic regular expression into Python re syntax"""
+    out = []
+    i = 0
+    n = len(pattern)
+    # literal_quantifier: '*', '\+' and '\?' are literal here (start, after an anchor or group open)
+    # anchor_ok: '^' is an anchor here (start, after '\(' or '\|')
+    literal_quantifier = True
+    anchor_ok = True
+
+    while i < n:
+        c = pattern[i]
+
+        if c == '\\' and i + 1 < n:
+            nxt = pattern[i + 1]
+            i += 2
+            if nxt == '(':
+                out.append('(')
+                literal_quantifier = anchor_ok = True
+            elif nxt == ')':
+                out.append(')')
+                literal_quantifier = anchor_ok = False
+            elif nxt == '|':
+                out.append('|')
+                literal_quantifier = anchor_ok = True
+            elif nxt in '+?':
+                out.append('\\' + nxt if literal_quantifier else nxt)
+                literal_quantifier = anchor_ok = False
+            elif nxt == '{':
+                end = pattern.find('\\}', i)
+                if literal_quantifier or end == -1:
+                    out.append('\\{')
+                else:
+                    out.append('{' + pattern[i:end] + '}')
+                    i = end + 2
+                literal_quantifier = anchor_ok = False
+            elif nxt in 'bB':
+                out.append('\\' + nxt)
+                literal_quantifier = True
+                anchor_ok = False
+            elif nxt == '<':
+                out.append(r'\b(?=\w)')
+                literal_quantifier = True
+                anchor_ok = False
+            elif nxt == '>':
+                out.append(r'\b(?<=\w)')
+                literal_quantifier = True
+                anchor_ok = False
+            elif nxt == '`':
+                out.append(r'\A')
+                literal_quantifier = True
+                anchor_ok = False
+            elif nxt == "'":
+                out.append(r'\Z')
+                literal_quantifier = True
+                anchor_ok = False
+            elif nxt in 'wWsS':
+                out.append('\\' + nxt)
+                literal_quantifier = anchor_ok = False
+            elif nxt.isdigit() and nxt != '0':
+                out.append('\\' + nxt)
+                literal_quantifier = anchor_ok = False
+            elif nxt == 'n':
+                out.append(r'\n')
+                literal_quantifier = anchor_ok = False
+            elif nxt == 't':
+                out.append(r'\t')
+                literal_quantifier = anchor_ok = False
+            else:
+                out.append(re.escape(nxt))
+                literal_quantifier = anchor_ok = False
+            continue
+
+        if c == '*':
+            out.append(r'\*' if literal_quantifier else '*')
+            literal_quantifier = anchor_ok = False
+        elif c == '^':
+            if anchor_ok:
+                out.append('^')
+                literal_quantifier = True
+            else:
+                out.append(r'\^')
+                literal_quantifier = False
+            anchor_ok = False
+        elif c == '$':
+            rest = pattern[i + 1:]
+            if not rest or rest.startswith('\\)') or rest.startswith('\\|'):
+                out.append('$')
+            else:
+                out.append(r'\$')
+            literal_quantifier = anchor_ok = False
+        elif c == '[':
+            cls, end = parse_bracket(pattern, i + 1)
+            if cls is None:
+                out.append(r'\[')
+            else:
+                out.append(cls)
+                i = end
+                literal_quantifier = anchor_ok = False
+                continue
+            literal_quantifier = anchor_ok = False
+        else:
+            # '+', '?', '(', ')', '{', '}', '|' are all literal in a BRE
+            out.append(re.escape(c))
+            literal_quantifier = anchor_ok = False
+        i += 1
+
+    return ''.join(out)
+
+
+def parse_replacement(to: str) -> list:
+    """Split a sed replacement into literal strings and group numbers (0 = '&')"""
+    parts = []
+    literal = []
+    i = 0
+    while i < len(to):
+        c = to[i]
+        if c == '&':
+            parts.append(''.join(literal))
+            literal = []
+            parts.append(0)
+        elif c == '\\' and i + 1 < len(to):
+            nxt = to[i + 1]
+            i += 1
+            if nxt.isdigit():
+                parts.append(''.join(literal))
+                literal = []
+                parts.append(int(nxt))
+            elif nxt == 'n':
+                literal.append('\n')
+            elif nxt == 't':
+                literal.append('\t')
+            else:
+                literal.append(nxt)
+        else:
+            literal.append(c)
+        i += 1
+    parts.append(''.join(literal))
+    return [p for p in parts if p != '']
+
+
+def expand_replacement(parts: list, match: re.Match) -> str:
+    """Expand parsed replacement parts against a match"""
+    return ''.join(p if isinstance(p, str) else (match.group(p) or '') for p in parts)
+
+
+def load_rules(corrections_data: dict) -> list[tuple[str, str]]:
+    """Return (from, to) pairs in the order the fish loader produced them"""
+    rules = []
+    for key, value in corrections_data.get('corrections', {}).items():
+        # Mirrors `string split ":"` on the jq "key:value" output
+        parts = f"{key}:{value}".split(':')
+        if parts[0]:
+            rules.append((parts[0], parts[1] if len(parts) > 1 else ''))
+    return rules
+
+
+class WordStage:
+    """Whole-word corrections applied with one tokenizing pass and a hash lookup"""
+
+    def __init__(self):
+        self.table = {}
+        self.produced = set()
+
+    def accepts(self, word: str) -> bool:
+        """A word can join this stage if no earlier rule here could produce or shadow it"""
+        return word not in self.table and word not in self.produced
+
+    def add(self, word: str, replacement: str):
+        self.table[word] = replacement
+        self.produced.update(WORD_RE.findall(replacement))
+
+    def apply(self, line: str) -> str:
+        get = self.table.get
+        return WORD_RE.sub(lambda m: get(m.group(), m.group()), line)
+
+
+class RegexStage:
+    """A compiled pattern with a sed-style replacement"""
+
+    def __init__(self, pattern: str, parts: list):
+        self.regex = re.compile(pattern)
+        self.parts = parts
+
+    def apply(self, line: str) -> str:
+        if len(self.parts) == 0:
+            return self.regex.sub('', line)
+        if all(isinstance(p, str) for p in self.parts):
+            return self.regex.sub(lambda m: self.parts[0], line)
+        return self.regex.sub(lambda m: expand_replacement(self.parts, m), line)
+
+
+class CorrectionEngine:
+    """Compiled corrections, garbage patterns and preserve terms from corrections.json"""
+
+    def __init__(self, corrections_data: dict):
+        self.rules = load_rules(corrections_data)
+        self.garbage_patterns = list(corrections_data.get('garbage_patterns', []))
+        self.preserve_terms = {t.lower() for t in corrections_data.get('preserve_terms', [])}
+        self.stages = []
+        self._compile()
+
+    def _compile(self):
+        word_stage = None
+
+        for source, target in self.rules:
+            escaped = fish_unquote(fish_regex_escape(source))
+            parts = parse_replacement(fish_unquote(target))
+
+            if PURE_WORD_RE.match(source):
+                # Whole-word rule: a constant replacement looked up per token
+                replacement = ''.join(source if p == 0 else p for p in parts if isinstance(p, str) or p == 0)
+                if word_stage is None or not word_stage.accepts(source):
+                    word_stage = WordStage()
+                    self.stages.append(word_stage)
+                word_stage.add(source, replacement)
+            else:
+                self.stages.append(RegexStage(bre_to_python('\\b' + escaped + '\\b'), parts))
+                word_stage = None
+
+        # Consecutive full-line garbage patterns collapse into one alternation:
+        # once one matches the line is empty and none of the others can match
+        anchored = []
+        for pattern in self.garbage_patterns:
+            translated = bre_to_python(fish_unquote(pattern))
+            if (pattern.startswith('^') and pattern.endswith('$') and not pattern.endswith('\\$')
+                    and '\\|' not in pattern and not re.fullmatch(translated, '')):
+                anchored.append(translated)
+                continue
+            self._flush_garbage(anchored)
+            anchored = []
+            self.stages.append(RegexStage(translated, []))
+        self._flush_garbage(anchored)
+
+    def _flush_garbage(self, patterns: list[str]):
+        if patterns:
+            self.stages.append(RegexStage('|'.join(f'(?:{p})' for p in patterns), []))
+
+    def preserved_conflicts(self) -> list[str]:
+        """Correction keys that would rewrite a preserved Planescape term"""
+        return [source for source, _ in self.rules if source.lower() in self.preserve_terms]
+
+    def apply_line(self, line: str) -> str:
+        for stage in self.stages:
+            line = stage.apply(line)
+        return line
+
+    def apply_text(self, text: str) -> tuple[str, int]:
+        """Apply all stages line by line, returning (text, changed line count)"""
+        lines = text.split('\n')
+        changed = 0
+        for i, line in enumerate(lines):
+            fixed = self.apply_line(line)
+            if fixed != line:
+                lines[i] = fixed
+                changed += 1
+        return '\n'.join(lines), changed
+
+    def apply_file(self, input_path: Path, output_path: Path | None) -> int:
+        """Stream one file through the engine; output None or '-' writes to stdout"""
+        changed = 0
+        with open(input_path, 'r', encoding='utf-8', errors='surrogateescape', newline='\n') as src:
+            if output_path is None or str(output_path) == '-':
+                out = sys.stdout.buffer
+                for line in src:
+                    fixed, n = self.apply_text(line)
+                    changed += n
+                    out.write(fixed.encode('utf-8', errors='surrogateescape'))
+                out.flush()
+                return changed
+
+            output_path = Path(output_path)
+            fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix='.corrected-')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8', errors='surrogateescape', newline='\n') as dst:
+                    for line in src:
+                        fixed, n = self.apply_text(line)
+                        changed += n
+                        dst.write(fixed)
+                os.replace(tmp_name, output_path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        return changed
+
+
+def load_engine(corrections_file: Path) -> CorrectionEngine:
+    """Load corrections.json and compile it"""
+    with open(corrections_file, 'r', encoding='utf-8') as f:
+        return CorrectionEngine(json.load(f))
+
+
+def find_chapter_source(chapter_dir: Path) -> Path | None:
+    """Pick the best source file in a chapter (same preference as the fish script)"""
+    for candidate in SOURCE_CANDIDATES:
+        path = chapter_dir / candidate
+        if path.is_file():
+            return path
+    return None
+
+
+def find_chapter_dirs(output_root: Path) -> list[Path]:
+    """List chapter directories under the converted root"""
+    return sorted(d for d in output_root.iterdir() if d.is_dir() and d.name not in SKIP_DIRS)
+
+
+# Per-process engine, compiled once by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(corrections_file: str):
+    global _worker_engine
+    _worker_engine = load_engine(Path(corrections_file))
+
+
+def _apply_chapter(chapter_dir: str) -> tuple[str, str | None, int]:
+    chapter = Path(chapter_dir)
+    source = find_chapter_source(chapter)
+    if source is None:
+        return chapter.name, None, 0
+    with span('apply corrections', 'chapter', chapter=chapter.name):
+        changed = _worker_engine.apply_file(source, chapter / DEFAULT_OUTPUT_NAME)
+    return chapter.name, source.name, changed
+
+
+def apply_to_chapters(output_root: Path, corrections_file: Path, jobs: int | None = None,
+                      quiet: bool = False) -> tuple[int, int]:
+    """Apply corrections to every chapter in parallel, returning (processed, failed)"""
+    chapter_dirs = find_chapter_dirs(output_root)
+    processed = failed = 0
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(str(corrections_file),)) as pool:
+        futures = [pool.submit(_apply_chapter, str(d)) for d in chapter_dirs]
+        for future in tqdm(as_completed(futures), total=len(futures),
+                           desc="Applying corrections", unit="chapter"):
+            name, source, changed = future.result()
+            if source is None:
+                print(f"Warning: No source file found in {name}", file=sys.stderr)
+                failed += 1
+                continue
+            processed += 1
+            if not quiet:
+                print(f"  {name:40} {changed} lines corrected ({source})", file=sys.stderr)
+
+    return processed, failed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Apply learned OCR corrections in a single pass')
+    parser.add_argument('target', nargs='?', default='converted_harbinger_house',
+                        help='Converted directory (all chapters) or a single markdown file')
+    parser.add_argument('--corrections', default=DEFAULT_CORRECTIONS,
+                        help=f'Corrections file (default: {DEFAULT_CORRECTIONS})')
+    parser.add_argument('--output', default='-',
+                        help='Output file in single-file mode (default: stdout)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Parallel chapter workers (default: CPU count)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Suppress per-chapter output')
+
+    args = parser.parse_args()
+
+    corrections_file = Path(args.corrections)
+    if not corrections_file.exists():
+        print(f"Error: Corrections file not found: {corrections_file}", file=sys.stderr)
+        sys.exit(1)
+
+    target = Path(args.target)
+    if not target.exists():
+        print(f"Error: Not found: {target}", file=sys.stderr)
+        sys.exit(1)
+
+    engine = load_engine(corrections_file)
+    for source in engine.preserved_conflicts():
+        print(f"Warning: correction for '{source}' rewrites a preserved term", file=sys.stderr)
+
+    if target.is_file():
+        engine.apply_file(target, None if args.output == '-' else Path(args.output))
+        return
+
+    processed, failed = apply_to_chapters(target, corrections_file, args.jobs, args.quiet)
+    print(f"Processed {processed} chapters, {failed} failed", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
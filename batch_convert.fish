@@ -14,6 +14,8 @@ set -g DPI 300
 set -g AUTO_DETECT false
 set -g PARALLEL_JOBS 4
 set -g STAGE "all"  # Can be: extract, preprocess, ocr, combine, all
+set -g SCHEDULER (dirname (status filename))/pipeline_scheduler.py
+set -g STATE_TOOL (dirname (status filename))/pipeline_state.py
 
 # ============================================================================
 # LOGGING
@@ -161,12 +163,12 @@ end
 
 function chapter_checkpoint_exists
     set chapter_name $argv[1]
-    test -f "$OUTPUT_ROOT/$chapter_name/.checkpoint_complete"
+    python3 $STATE_TOOL "$OUTPUT_ROOT/$chapter_name" has-step complete 2>/dev/null
 end
 
 function chapter_checkpoint_mark
     set chapter_name $argv[1]
-    echo (date) > "$OUTPUT_ROOT/$chapter_name/.checkpoint_complete"
+    python3 $STATE_TOOL "$OUTPUT_ROOT/$chapter_name" mark-step complete
 end
 
 # ============================================================================
@@ -175,79 +177,68 @@ end
 
 function convert_chapters
     set chapters $argv
-    
+
     set total_chapters (count $chapters)
-    set current 0
     set skipped 0
     set failed 0
-    
-    # Initialize chapter progress tracking
     set conversion_start (date +%s)
-    set chapter_times
-    
+
+    if not command -v python3 &>/dev/null; or not test -f $SCHEDULER
+        log_error "python3 and pipeline_scheduler.py are required"
+        return 1
+    end
+
+    # Every page of every chapter goes through one scheduler: pages flow from
+    # rendering to OCR as they finish, and chapters overlap instead of queueing
+    set scheduler_args $PDF_FILE --stage $STAGE --dpi $DPI --jobs $PARALLEL_JOBS --store $OUTPUT_ROOT/.pages
+    set scheduled
+
     for chapter_spec in $chapters
-        set current (math $current + 1)
-        set chapter_start (date +%s)
-        
         set parts (string split ":" $chapter_spec)
         set chapter_name $parts[1]
         set page_range $parts[2]
-        set range_parts (string split "-" $page_range)
-        set start_page $range_parts[1]
-        set end_page $range_parts[2]
-        
-        # Calculate ETA based on previous chapter times
-        set eta_str ""
-        if test (count $chapter_times) -gt 0
-            set avg_time 0
-            for t in $chapter_times
-                set avg_time (math "$avg_time + $t")
-            end
-            set avg_time (math --scale=0 "$avg_time / "(count $chapter_times))
-            set remaining_chapters (math "$total_chapters - $current + 1")
-            set eta_seconds (math "$avg_time * $remaining_chapters")
-            set eta_str (format_eta $eta_seconds)
-        end
-        
-        echo ""
-        echo (set_color cyan)"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"(set_color normal)
-        echo (set_color yellow)"[$current/$total_chapters] $chapter_name "(set_color normal)"(pages $start_page-$end_page)  "(set_color yellow)"$eta_str"(set_color normal)
-        echo (set_color cyan)"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"(set_color normal)
-        
-        # Check if already complete
+
         if chapter_checkpoint_exists $chapter_name
-            echo (set_color blue)"  [SKIP]"(set_color normal) " Already converted (use --clean to reconvert)"
+            echo (set_color blue)"  [SKIP]"(set_color normal) " $chapter_name already converted (use --clean to reconvert)"
             set skipped (math $skipped + 1)
             continue
         end
-        
-        # Create chapter output directory
-        set chapter_output $OUTPUT_ROOT/$chapter_name
-        mkdir -p $chapter_output
-        
-        # Extract chapter pages to temp PDF
-        set chapter_pdf $OUTPUT_ROOT/.temp_$chapter_name.pdf
-        
-        if not pdftk $PDF_FILE cat $start_page-$end_page output $chapter_pdf 2>/dev/null
-            log_error "Failed to extract pages $start_page-$end_page"
-            set failed (math $failed + 1)
-            continue
-        end
-        
-        # Convert chapter using the improved converter
-        set convert_args $chapter_pdf $chapter_output --dpi $DPI --jobs $PARALLEL_JOBS --stage $STAGE
 
-        if test -n "$CONFIG_FILE"
-            set convert_args $convert_args --config $CONFIG_FILE
-        end
+        echo (set_color yellow)"  • $chapter_name "(set_color normal)"(pages $page_range)"
+        mkdir -p $OUTPUT_ROOT/$chapter_name
+        set scheduler_args $scheduler_args --chapter "$page_range:$OUTPUT_ROOT/$chapter_name"
+        set scheduled $scheduled $chapter_name
 
+        # In demo mode, only process first chapter
         if set -q DEMO_MODE
-            set convert_args $convert_args --demo
+            log_info "DEMO MODE: Only the first chapter"
+            break
         end
+    end
+
+    if test -n "$CONFIG_FILE"
+        set scheduler_args $scheduler_args --config $CONFIG_FILE
+    end
 
-        if ./harbinger_convert.fish $convert_args
+    if set -q DEMO_MODE
+        set scheduler_args $scheduler_args --demo
+    end
+
+    if test (count $scheduled) -gt 0
+        echo ""
+        python3 $SCHEDULER $scheduler_args
+        or log_warn "Some pages failed (stage: $STAGE)"
+    end
+
+    # A chapter is done when the state store records its stage
+    set last_step $STAGE
+    if test "$STAGE" = "all"
+        set last_step combine
+    end
+    for chapter_name in $scheduled
+        if python3 $STATE_TOOL $OUTPUT_ROOT/$chapter_name has-step $last_step
             # Only mark complete if running all stages or final stage (combine)
-            if test "$STAGE" = "all"; or test "$STAGE" = "combine"
+            if test "$last_step" = "combine"
                 chapter_checkpoint_mark $chapter_name
             end
             log_info "Chapter $chapter_name complete (stage: $STAGE)"
@@ -255,36 +246,23 @@ function convert_chapters
             log_error "Chapter $chapter_name failed (stage: $STAGE)"
             set failed (math $failed + 1)
         end
-        
-        # Clean up temp PDF
-        rm -f $chapter_pdf
-        
-        # Record chapter processing time for ETA calculation
-        set chapter_elapsed (math (date +%s) - $chapter_start)
-        set chapter_times $chapter_times $chapter_elapsed
-
-        # In demo mode, only process first chapter
-        if set -q DEMO_MODE
-            log_info "DEMO MODE: Stopping after first chapter"
-            break
-        end
     end
-    
+
     # Calculate total time
     set total_elapsed (math (date +%s) - $conversion_start)
     set total_time_str (format_duration $total_elapsed)
-    
+
     # Summary
     echo ""
     echo (set_color cyan)"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"(set_color normal)
     echo (set_color green)"Batch Conversion Summary"(set_color normal)
     echo (set_color cyan)"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"(set_color normal)
     echo "  Total:     $total_chapters chapters"
-    echo "  Converted: "(math $total_chapters - $skipped - $failed)
+    echo "  Converted: "(math (count $scheduled) - $failed)
     echo "  Skipped:   $skipped (already done)"
     echo "  Failed:    $failed"
     echo "  Time:      $total_time_str"
-    
+
     return (test $failed -eq 0)
 end
 
@@ -473,11 +451,8 @@ end
 # Clean mode
 if set -q CLEAN_MODE
     log_info "Cleaning chapter checkpoints..."
-    for checkpoint in $OUTPUT_ROOT/*/.checkpoint_complete
-        if test -f $checkpoint
-            rm -f $checkpoint
-        end
-    end
+    python3 $STATE_TOOL $OUTPUT_ROOT --root clear --all --step complete 2>/dev/null
+    rm -f $OUTPUT_ROOT/*/.checkpoint_complete 2>/dev/null
 end
 
 # Record start time
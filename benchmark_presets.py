@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+benchmark_presets.py - Parallel preprocessing preset benchmark
+Evaluates every preset in presets.json on a sample of pages, one preset × page
+cell per task, in a process pool. Each cell preprocesses the page in memory
+(preprocess_pages.py) and OCRs it once with the pipeline's OCR settings, and
+records wall time, peak memory, low-confidence word count and mean confidence.
+OCR goes through the shared OCR cache (ocr_cache.py): presets that produce the
+same pixels, and re-runs, reuse the result. A cached cell reports the
+recognition time recorded when the result was first computed.
+
+Pages come from the pipeline's shared page store (OUTPUT_ROOT/.pages, see
+rasterize_pages.py), or from existing page images with --images.
+Per-cell results go to a CSV table; the summary aggregates each preset and picks
+the Pareto-best one for speed versus accuracy.
+
+Usage: python3 benchmark_presets.py --config pipeline_config.json [--presets presets.json]
+                                    [--pages 1-3 | --images GLOB ...] [--jobs N] [--output FILE]
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import glob
+import resource
+from pathlib import Path
+from dataclasses import replace, fields
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from preprocess_pages import load_settings, preprocess_page, PreprocessSettings
+from ocr_pool import make_engine, load_ocr_settings, TSV_CONF, TSV_TEXT
+from ocr_cache import CachedEngine
+from rasterize_pages import check_source, rasterize, store_dir, store_page
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+DEFAULT_CONFIG = SCRIPT_DIR / "pipeline_config.json"
+DEFAULT_PRESETS = SCRIPT_DIR / "presets.json"
+DEFAULT_PAGES = "1-3"
+DEFAULT_OUTPUT = "preset_benchmark.csv"
+
+CSV_COLUMNS = ['preset', 'page', 'seconds', 'peak_mb', 'words', 'lowconf_words',
+               'lowconf_mean', 'mean_conf', 'ocr_cached', 'error']
+
+
+def parse_pages(spec: str) -> list[int]:
+    """'1-3,7' → [1, 2, 3, 7]"""
+    pages = []
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            pages.extend(range(int(first), int(last) + 1))
+        elif part:
+            pages.append(int(part))
+    return sorted(set(pages))
+
+
+def sample_pages(pdf: Path, pages: list[int], dpi: int, store: Path, jobs: int) -> list[Path]:
+    """Sample pages from the pipeline's shared page store, rendering only missing ones"""
+    if not check_source(pdf, store_dir(store, dpi)):
+        print(f"Error: {store_dir(store, dpi)} holds pages from a different PDF", file=sys.stderr)
+        sys.exit(1)
+    rasterize(pdf, store, dpi, set(pages), jobs, quiet=True)
+    return [store_page(store, dpi, page) for page in pages if store_page(store, dpi, page).exists()]
+
+
+def preset_settings(preset: dict, base: PreprocessSettings) -> PreprocessSettings:
+    """The config's preprocessing settings with the preset's keys applied"""
+    if preset.get('from_config'):
+        return base
+    known = {f.name for f in fields(PreprocessSettings)}
+    return replace(base, **{k: v for k, v in preset.items() if k in known})
+
+
+def tsv_confidences(tsv: str) -> list[float]:
+    """Confidence of every recognized word"""
+    confs = []
+    for row in tsv.splitlines()[1:]:
+        cells = row.split('\t')
+        if len(cells) > TSV_TEXT and cells[TSV_TEXT].strip():
+            try:
+                conf = float(cells[TSV_CONF])
+            except ValueError:
+                continue
+            if conf >= 0:
+                confs.append(conf)
+    return confs
+
+
+def _run_cell(preset_name: str, settings: PreprocessSettings, image: str, ocr: dict) -> dict:
+    """One preset × page cell, in a fresh worker so peak RSS belongs to this cell"""
+    from PIL import Image
+
+    row = {'preset': preset_name, 'page': Path(image).stem, 'ocr_cached': False, 'error': ''}
+    try:
+        engine = make_engine(ocr['language'], ocr['psm'], ocr['oem'], ocr['user_words'],
+                             cache_dir=ocr['cache_dir'], cache_max_mb=ocr['cache_max_mb'])
+        start = time.perf_counter()
+        page = Image.fromarray(preprocess_page(Path(image), settings))
+        ocr_start = time.perf_counter()
+        tsv, _ = engine.recognize_image(page)
+        if isinstance(engine, CachedEngine):
+            row['ocr_cached'] = bool(engine.hits)
+            row['seconds'] = round(ocr_start - start + engine.last_seconds, 3)
+        else:
+            row['seconds'] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        row['error'] = str(e)
+        return row
+
+    confs = tsv_confidences(tsv)
+    low = [c for c in confs if c < ocr['threshold']]
+    row['peak_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    row['words'] = len(confs)
+    row['lowconf_words'] = len(low)
+    row['lowconf_mean'] = round(sum(low) / len(low), 1) if low else 0.0
+    row['mean_conf'] = round(sum(confs) / len(confs), 1) if confs else 0.0
+    return row
+
+
+def summarize(rows: list[dict], presets: list[str]) -> list[dict]:
+    """Aggregate cells per preset: total seconds, max peak, low-conf words and mean confidence"""
+    summary = []
+    for name in presets:
+        cells = [r for r in rows if r['preset'] == name and not r['error']]
+        if not cells:
+            continue
+        words = sum(r['words'] for r in cells)
+        low = sum(r['lowconf_words'] for r in cells)
+        summary.append({
+            'preset': name,
+            'pages': len(cells),
+            'seconds': round(sum(r['seconds'] for r in cells), 2),
+            'peak_mb': max(r['peak_mb'] for r in cells),
+            'lowconf_words': low,
+            'lowconf_mean': round(sum(r['lowconf_mean'] * r['lowconf_words'] for r in cells) / low, 1) if low else 0.0,
+            'mean_conf': round(sum(r['mean_conf'] * r['words'] for r in cells) / words, 1) if words else 0.0,
+        })
+    return summary
+
+
+def pareto_front(summary: list[dict]) -> list[dict]:
+    """Presets no other preset beats on both time and low-confidence words"""
+    def dominates(a, b):
+        return (a['seconds'] <= b['seconds'] and a['lowconf_words'] <= b['lowconf_words']
+                and (a['seconds'] < b['seconds'] or a['lowconf_words'] < b['lowconf_words']))
+    return [s for s in summary if not any(dominates(o, s) for o in summary if o is not s)]
+
+
+def pick_best(front: list[dict]) -> dict:
+    """The front's knee: smallest sum of time and low-conf words, each scaled to the front's range"""
+    def scaled(key, value):
+        low, high = min(s[key] for s in front), max(s[key] for s in front)
+        return (value - low) / (high - low) if high > low else 0.0
+    return min(front, key=lambda s: (scaled('seconds', s['seconds']) + scaled('lowconf_words', s['lowconf_words']),
+                                     s['lowconf_words'], s['seconds']))
+
+
+def print_summary(summary: list[dict], front: list[dict], best: dict | None):
+    print(f"{'Preset':15} {'Pages':>5} {'Seconds':>8} {'Peak MB':>8} {'Low Conf':>9} {'Low Avg':>8} {'Avg Conf':>9}")
+    print(f"{'=' * 15} {'=' * 5} {'=' * 8} {'=' * 8} {'=' * 9} {'=' * 8} {'=' * 9}")
+    front_names = {s['preset'] for s in front}
+    for s in summary:
+        mark = ' *' if s['preset'] in front_names else ''
+        print(f"{s['preset']:15} {s['pages']:>5} {s['seconds']:>8.2f} {s['peak_mb']:>8.1f} "
+              f"{s['lowconf_words']:>9} {s['lowconf_mean']:>8.1f} {s['mean_conf']:>9.1f}{mark}")
+    print()
+    print("* Pareto front (no other preset is both faster and has fewer low-confidence words)")
+    if best:
+        print(f"Recommended: {best['preset']} ({best['seconds']:.2f}s, {best['lowconf_words']} low-conf words, "
+              f"{best['mean_conf']:.1f}% avg confidence)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark preprocessing presets on sample pages in parallel')
+    parser.add_argument('--config', '-c', default=str(DEFAULT_CONFIG),
+                        help=f'Pipeline config (default: {DEFAULT_CONFIG.name})')
+    parser.add_argument('--presets', default=str(DEFAULT_PRESETS),
+                        help=f'Presets file (default: {DEFAULT_PRESETS.name})')
+    parser.add_argument('--pages', default=DEFAULT_PAGES,
+                        help=f'PDF pages to sample, e.g. 1-3,12 (default: {DEFAULT_PAGES})')
+    parser.add_argument('--images', nargs='+', default=None,
+                        help='Use existing page images (files or globs) instead of rasterizing')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Parallel cells (default: one per core)')
+    parser.add_argument('--output', '-o', default=None,
+                        help=f'Per-cell CSV (default: OUTPUT_ROOT/demo_tests/{DEFAULT_OUTPUT})')
+    parser.add_argument('--summary-json', default=None,
+                        help='Also write the per-preset summary and recommendation as JSON')
+    args = parser.parse_args()
+
+    try:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        with open(args.presets, 'r', encoding='utf-8') as f:
+            presets = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    demo_root = Path(config.get('output_root') or 'converted') / 'demo_tests'
+    jobs = max(1, args.jobs)
+
+    if args.images:
+        images = sorted({Path(p) for pattern in args.images for p in (glob.glob(pattern) or [pattern])
+                         if Path(p).is_file()})
+    else:
+        pdf = Path(config.get('input', ''))
+        if not pdf.is_file():
+            print(f"Error: PDF not found: {pdf} (set 'input' in the config or use --images)", file=sys.stderr)
+            sys.exit(1)
+        images = sample_pages(pdf, parse_pages(args.pages), int(config.get('dpi', 300)),
+                              demo_root.parent / '.pages', jobs)
+    if not images:
+        print("Error: No sample pages", file=sys.stderr)
+        sys.exit(1)
+
+    base = load_settings(Path(args.config))
+    ocr = load_ocr_settings(config)
+    cells = [(preset['name'], preset_settings(preset, base), str(image)) for preset in presets for image in images]
+
+    print(f"Benchmarking {len(presets)} presets × {len(images)} pages with {jobs} workers", file=sys.stderr)
+    wall_start = time.perf_counter()
+    rows = []
+    # One cell per worker process, so each cell's peak RSS is its own
+    with ProcessPoolExecutor(max_workers=min(jobs, len(cells)), max_tasks_per_child=1) as pool:
+        futures = [pool.submit(_run_cell, name, settings, image, ocr) for name, settings, image in cells]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Preset cells"):
+            rows.append(future.result())
+    wall = time.perf_counter() - wall_start
+
+    rows.sort(key=lambda r: ([p['name'] for p in presets].index(r['preset']), r['page']))
+    output = Path(args.output) if args.output else demo_root / DEFAULT_OUTPUT
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    for row in rows:
+        if row['error']:
+            print(f"Warning: {row['preset']} / {row['page']} failed: {row['error']}", file=sys.stderr)
+
+    summary = summarize(rows, [p['name'] for p in presets])
+    front = pareto_front(summary)
+    best = pick_best(front) if front else None
+
+    print()
+    print_summary(summary, front, best)
+
+    if args.summary_json:
+        with open(args.summary_json, 'w', encoding='utf-8') as f:
+            json.dump({'presets': summary, 'pareto_front': [s['preset'] for s in front],
+                       'recommended': best['preset'] if best else None}, f, indent=2)
+
+    print(f"\n✨ Benchmark table saved to {output}", file=sys.stderr)
+    print(f"   {len(rows)} cells in {wall:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+benchmark_statblocks.py - Micro-benchmark for the stat block extractor
+Times field extraction over every stat block region of a document with the
+original per-field re.search scans and with the compiled single-pass lexer,
+and checks both produce identical values. With --serialization it also compares
+the memory held by StatBlock against the original dataclass (copied raw_text,
+list fields) and the load time of JSONL and binary files against re-extraction.
+
+Usage: python3 benchmark_statblocks.py [_all_statblocks.md ...] [--repeat N] [--serialization]
+"""
+
+import os
+import re
+import sys
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+from dataclasses import make_dataclass, field
+
+from extract_statblocks import (
+    STAT_PATTERNS, ABILITY_PATTERNS, STAT_LEXER, STAT_FIELDS, find_stat_blocks, parse_stat_value,
+    extract_file, write_jsonl, read_jsonl, write_binary, read_binary,
+)
+
+# Configuration defaults
+DEFAULT_REPEAT = 5
+
+# The original StatBlock: a plain dataclass holding a copy of the region text
+LegacyStatBlock = make_dataclass('LegacyStatBlock', [
+    *((name, str, "") for name in ('name',) + STAT_FIELDS),
+    ('equipment', list, field(default_factory=list)),
+    ('spells', list, field(default_factory=list)),
+    ('raw_text', str, ""),
+    ('source_location', str, ""),
+])
+
+
+def legacy_extract(text: str) -> dict:
+    """Per-field re.search scans, rebuilding the pattern lists on every call"""
+    patterns = {name: [p for _, p in pats] for name, pats in STAT_PATTERNS.items()}
+    patterns.update({name: [p for _, p in pats] for name, pats in ABILITY_PATTERNS.items()})
+    return {name: parse_stat_value(text, pats) for name, pats in patterns.items()}
+
+
+def time_extractor(extract, blocks: list[str], repeat: int) -> float:
+    """Best-of-repeat seconds to run extract over every block"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in blocks:
+            extract(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def traced_size(build) -> tuple[int, list]:
+    """Bytes allocated by build() and still held by its result"""
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def best_time(run, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_serialization(inputs: list[str], repeat: int):
+    """Memory per block and load time for each representation"""
+    blocks = [block for path in inputs for block in extract_file(path)[0]]
+    if not blocks:
+        print("No stat blocks found", file=sys.stderr)
+        sys.exit(1)
+
+    def legacy_blocks():
+        return [LegacyStatBlock(**{name: getattr(b, name) for name in ('name',) + STAT_FIELDS},
+                                raw_text=b.raw_text, source_location=b.source_location) for b in blocks]
+
+    def slotted_blocks():
+        return [type(b)(**{name: getattr(b, name) for name in ('name',) + STAT_FIELDS},
+                        source_file=b.source_file, start=b.start, end=b.end) for b in blocks]
+
+    legacy_size, _ = traced_size(legacy_blocks)
+    slotted_size, _ = traced_size(slotted_blocks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, 'blocks.jsonl')
+        binary_path = os.path.join(tmp, 'blocks.stb')
+        write_jsonl(blocks, jsonl_path)
+        write_binary(blocks, binary_path)
+
+        if read_jsonl(jsonl_path) != blocks or read_binary(binary_path) != blocks:
+            print("Error: Serialization round trip changed the blocks", file=sys.stderr)
+            sys.exit(1)
+
+        reparse = best_time(lambda: [extract_file(path) for path in inputs], repeat)
+        jsonl = best_time(lambda: read_jsonl(jsonl_path), repeat)
+        binary = best_time(lambda: read_binary(binary_path), repeat)
+        jsonl_bytes = os.path.getsize(jsonl_path)
+        binary_bytes = os.path.getsize(binary_path)
+
+    n = len(blocks)
+    print(f"Blocks:       {n}")
+    print(f"Memory:       legacy {legacy_size / n:7.0f} B/block, slotted {slotted_size / n:7.0f} B/block "
+          f"({legacy_size / slotted_size:.2f}x smaller)")
+    print(f"Re-extract:   {reparse * 1000:8.2f} ms")
+    print(f"JSONL load:   {jsonl * 1000:8.2f} ms  ({jsonl_bytes:,} bytes)")
+    print(f"Binary load:  {binary * 1000:8.2f} ms  ({binary_bytes:,} bytes)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark stat block field extraction')
+    parser.add_argument('inputs', nargs='*', default=['_all_statblocks.md'],
+                        help='Markdown files to scan (default: _all_statblocks.md)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Timing runs, best is reported (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--serialization', action='store_true',
+                        help='Benchmark StatBlock memory and JSONL/binary load time instead')
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not Path(path).exists():
+            print(f"Error: Input file not found: {path}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.serialization:
+        benchmark_serialization(args.inputs, args.repeat)
+        return
+
+    blocks = []
+    for path in args.inputs:
+        content = Path(path).read_text(encoding='utf-8', errors='replace')
+        blocks.extend(region[3] for region in find_stat_blocks(content))
+
+    if not blocks:
+        print("No stat block regions found", file=sys.stderr)
+        sys.exit(1)
+
+    mismatches = sum(1 for text in blocks if legacy_extract(text) != STAT_LEXER.scan(text))
+    total_chars = sum(len(text) for text in blocks)
+
+    # The legacy path relies on the re module cache; clear it so the first run pays for compiling
+    re.purge()
+    legacy = time_extractor(legacy_extract, blocks, args.repeat)
+    lexer = time_extractor(STAT_LEXER.scan, blocks, args.repeat)
+
+    print(f"Regions:      {len(blocks)} ({total_chars:,} chars)")
+    print(f"re.search:    {legacy * 1000:8.2f} ms  ({legacy / len(blocks) * 1e6:7.1f} µs/block)")
+    print(f"StatLexer:    {lexer * 1000:8.2f} ms  ({lexer / len(blocks) * 1e6:7.1f} µs/block)")
+    print(f"Speedup:      {legacy / lexer:.2f}x")
+    print(f"Mismatches:   {mismatches}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+context_corrections.py - Resolve ambiguous low-confidence words in context
+suggest_correction only accepts an unambiguous candidate, judged on the word
+alone. This pass takes every low-confidence word still unknown to the lexicon in
+a chapter, ranks its OCR-confusion candidates (and the word as read) with the
+n-gram model against the words around each occurrence, and rewrites the
+occurrence when one reading clearly wins.
+
+The model learns from finished text only (see ngram_model.py): by default the
+book's own final/ chapters and those of the finished books next to it, or the
+books and clean text given with --train. A chapter is scored with its own
+final text held out, so it cannot vouch for its own misreadings.
+
+Whatever stays uncertain is written to <chapter>/.uncertain/context-lowconf.txt
+in the lowconf format, so the AI cleanup step only reviews that residue
+(ai_cleanup_claude.fish --targeted <chapter>/.uncertain).
+
+Usage: python3 context_corrections.py [converted_dir] [--model FILE] [--train DIR ...]
+                                      [--threshold N] [--jobs N] [--dry-run]
+"""
+
+import os
+import re
+import sys
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ngram_model import NgramModel, ensure_model, training_files, START
+from generate_corrections import (
+    DEFAULT_THRESHOLD, candidate_index, chapter_ocr_files, find_chapter_dirs, parse_ocr_file,
+    is_valid_word, is_preserved_term, is_likely_number_or_stat, is_garbage,
+)
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+MAX_CANDIDATES = 8
+MAX_EDIT_COST = 2.0     # OCR-weighted distance of the furthest candidate considered
+EDIT_PENALTY = 1.5      # log10 score lost per unit of edit cost
+MIN_MARGIN = 1.0        # log10 lead the winner needs (10× likelier) to be accepted
+MODEL_NAME = "ngram.bin"     # Per book, in the converted directory
+OUTPUT_NAME = "corrected.md"
+SOURCE_CANDIDATES = ("corrected.md", "dict_cleaned.md", "cleaned.md", "converted.md")
+RESIDUE_DIR = ".uncertain"
+RESIDUE_FILE = "context-lowconf.txt"
+
+WORD_RE = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)*")
+
+
+def is_ambiguous(word: str) -> bool:
+    """Low-confidence words worth resolving: unknown words that aren't stats, terms or garbage"""
+    return (len(word) > 2 and not is_valid_word(word) and not is_preserved_term(word)
+            and not is_likely_number_or_stat(word) and not is_garbage(word))
+
+
+def chapter_lowconf_words(chapter_dir: Path, threshold: float) -> dict[str, float]:
+    """Ambiguous low-confidence words of a chapter with their average confidence"""
+    words = {}
+    for filepath in chapter_ocr_files(chapter_dir):
+        for word, (count, total, *_) in parse_ocr_file(filepath, threshold)['words'].items():
+            core = word.strip('.,;:!?()[]"“”')
+            if is_ambiguous(core):
+                previous = words.get(core, (0, 0.0))
+                words[core] = (previous[0] + count, previous[1] + total)
+    return {word: total / count for word, (count, total) in words.items()}
+
+
+class ContextResolver:
+    """Ranks candidate readings of a word by n-gram fit minus OCR edit cost"""
+
+    def __init__(self, model: NgramModel):
+        self.model = model
+        self._candidates = {}
+
+    def held_out(self, files: list[Path]) -> 'ContextResolver':
+        """A resolver scoring against the model without these files, sharing the candidate memo"""
+        resolver = ContextResolver(self.model.held_out(files))
+        resolver._candidates = self._candidates
+        return resolver
+
+    def candidates(self, word: str) -> list[tuple[str, float]]:
+        """The word as read (cost 0) plus its OCR-confusion candidates, memoized per word"""
+        found = self._candidates.get(word)
+        if found is None:
+            found = [(word, 0.0)] + [(c, cost) for c, cost in candidate_index.candidates(
+                word, top=MAX_CANDIDATES, max_cost=MAX_EDIT_COST) if c != word]
+            self._candidates[word] = found
+        return found
+
+    def resolve(self, word: str, left: list[str], right: list[str]) -> tuple[str | None, list]:
+        """Return (winner or None if uncertain, ranked [(score, candidate)])"""
+        ranked = sorted(((self.model.window_score(left, candidate.lower(), right) - EDIT_PENALTY * cost,
+                          candidate) for candidate, cost in self.candidates(word)), reverse=True)
+        if len(ranked) < 2:
+            return None, ranked
+        if ranked[0][0] - ranked[1][0] < MIN_MARGIN:
+            return None, ranked
+        if ranked[0][1] == word and not self.model.count(word.lower()):
+            return None, ranked  # Only "cheapest" because it needs no edit; the model never saw it
+        return ranked[0][1], ranked
+
+    def correct_line(self, line: str, targets: set[str]) -> tuple[str, list, list]:
+        """Rewrite the targets in one line; returns (line, [(old, new)], [uncertain words])"""
+        matches = list(WORD_RE.finditer(line))
+        if not any(m.group() in targets for m in matches):
+            return line, [], []
+        tokens = [START] + [m.group().lower() for m in matches]
+        pieces, changes, uncertain = [], [], []
+        last = 0
+        for i, match in enumerate(matches, start=1):
+            word = match.group()
+            if word not in targets:
+                continue
+            winner, _ = self.resolve(word, tokens[max(0, i - 2):i], tokens[i + 1:i + 3])
+            if winner is None:
+                uncertain.append(word)
+            elif winner != word:
+                pieces.append(line[last:match.start()])
+                pieces.append(winner)
+                last = match.end()
+                tokens[i] = winner.lower()  # Later words see the corrected context
+                changes.append((word, winner))
+        pieces.append(line[last:])
+        return ''.join(pieces), changes, uncertain
+
+
+def find_chapter_source(chapter_dir: Path) -> Path | None:
+    for candidate in SOURCE_CANDIDATES:
+        path = chapter_dir / candidate
+        if path.is_file():
+            return path
+    return None
+
+
+def write_residue(chapter_dir: Path, residue: dict[str, float]):
+    """Write (or clear) the chapter's uncertain words in the lowconf format"""
+    residue_dir = chapter_dir / RESIDUE_DIR
+    residue_file = residue_dir / RESIDUE_FILE
+    if not residue:
+        residue_file.unlink(missing_ok=True)
+        return
+    residue_dir.mkdir(exist_ok=True)
+    tmp_path = residue_file.with_name(residue_file.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for word in sorted(residue):
+            f.write(f"{word} (conf: {residue[word]:.3f})\n")
+    os.replace(tmp_path, residue_file)
+
+
+def finished_books(output_root: Path) -> list[Path]:
+    """Other converted books next to this one that have final/ chapters"""
+    root = output_root.resolve()
+    return sorted(d for d in root.parent.iterdir()
+                  if d.is_dir() and d != root and any((d / 'final').glob('*.md')))
+
+
+def own_final_text(chapter: Path) -> Path:
+    """Where a chapter's finished text lands (merge_chapters.fish reads final/<chapter>.md)"""
+    return chapter.parent / 'final' / f"{chapter.name}.md"
+
+
+# Per-process resolver, opened once by the pool initializer (the model is mmap'd, so it is shared)
+_worker_resolver = None
+_training = frozenset()
+
+
+def _init_worker(model_path: str, training: frozenset = frozenset()):
+    global _worker_resolver, _training
+    _worker_resolver = ContextResolver(NgramModel(Path(model_path)))
+    _training = training
+
+
+def _resolve_chapter(chapter_dir: str, threshold: float, dry_run: bool) -> tuple[str, int, int, dict]:
+    chapter = Path(chapter_dir)
+    with span('context corrections', 'chapter', chapter=chapter.name):
+        return _resolve_chapter_file(chapter, threshold, dry_run)
+
+
+def _resolve_chapter_file(chapter: Path, threshold: float, dry_run: bool) -> tuple[str, int, int, dict]:
+    source = find_chapter_source(chapter)
+    lowconf = chapter_lowconf_words(chapter, threshold)
+    if source is None or not lowconf:
+        if not dry_run:
+            write_residue(chapter, {})
+        return chapter.name, 0, 0, {}
+
+    own = own_final_text(chapter)
+    resolver = _worker_resolver.held_out([own] if str(own.resolve()) in _training else [])
+    targets = set(lowconf)
+    changes = []
+    uncertain = set()
+    output = chapter / OUTPUT_NAME
+    tmp_path = output.with_name(output.name + '.tmp')
+    with open(source, 'r', encoding='utf-8', errors='replace') as src, \
+         open(os.devnull if dry_run else tmp_path, 'w', encoding='utf-8') as out:
+        for line in src:
+            line, line_changes, line_uncertain = resolver.correct_line(line, targets)
+            out.write(line)
+            changes.extend(line_changes)
+            uncertain.update(line_uncertain)
+    if not dry_run:
+        os.replace(tmp_path, output)
+        write_residue(chapter, {word: lowconf[word] for word in uncertain})
+
+    examples = {}
+    for old, new in changes:
+        examples.setdefault(old, new)
+    return chapter.name, len(changes), len(uncertain), examples
+
+
+def resolve_chapters(output_root: Path, model_path: Path, threshold: float, jobs: int | None = None,
+                     dry_run: bool = False, training: list[Path] = ()) -> tuple[int, int, dict]:
+    """Resolve every chapter in parallel; returns (corrected, uncertain, {old: new})
+
+    training lists the model's training files, so each chapter's own is held out.
+    """
+    chapter_dirs = find_chapter_dirs(output_root)
+    corrected = uncertain = 0
+    examples = {}
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(str(model_path), frozenset(str(f.resolve()) for f in training))) as pool:
+        futures = [pool.submit(_resolve_chapter, str(d), threshold, dry_run) for d in chapter_dirs]
+        for future in tqdm(as_completed(futures), total=len(futures),
+                           desc="Resolving in context", unit="chapter"):
+            name, changed, unresolved, chapter_examples = future.result()
+            corrected += changed
+            uncertain += unresolved
+            for old, new in chapter_examples.items():
+                examples.setdefault(old, new)
+            print(f"  {name:40} {changed} corrected, {unresolved} uncertain", file=sys.stderr)
+
+    return corrected, uncertain, examples
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Resolve ambiguous low-confidence words with an n-gram model')
+    parser.add_argument('output_root', nargs='?', default='converted_harbinger_house',
+                        help='Converted directory (all chapters)')
+    parser.add_argument('--model', default=None,
+                        help=f'N-gram model, rebuilt when older than its training text (default: DIR/{MODEL_NAME})')
+    parser.add_argument('--train', nargs='+', default=None, metavar='DIR',
+                        help='Finished books, directories of clean text or files to train on '
+                             '(default: the final/ chapters of this and the finished books next to it)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Confidence threshold for low-confidence words (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Parallel chapter workers (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would change without writing files')
+
+    args = parser.parse_args()
+
+    output_root = Path(args.output_root)
+    if not output_root.is_dir():
+        print(f"Error: Directory not found: {output_root}", file=sys.stderr)
+        sys.exit(1)
+    train = [Path(t) for t in args.train] if args.train else [output_root, *finished_books(output_root)]
+    missing = [str(t) for t in train if not t.exists()]
+    if missing:
+        print(f"Error: Not found: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    training = [f for root in train for f in training_files(root)]
+    if not training:
+        print("Warning: No finished text to train on; only the Planescape terms inform the model "
+              "(finish a book or pass --train with clean text)", file=sys.stderr)
+
+    with span('train n-gram model', 'stage'):
+        model_path = ensure_model(train, Path(args.model) if args.model else output_root / MODEL_NAME)
+    with span('resolve in context', 'stage'):
+        corrected, uncertain, examples = resolve_chapters(output_root, model_path, args.threshold,
+                                                          args.jobs, args.dry_run, training)
+
+    for old, new in sorted(examples.items())[:20]:
+        print(f"  {old!r:20} → {new!r}", file=sys.stderr)
+    verb = "Would correct" if args.dry_run else "Corrected"
+    print(f"✨ {verb} {corrected} words in context", file=sys.stderr)
+    print(f"   {uncertain} words left for AI review ({RESIDUE_DIR}/{RESIDUE_FILE} per chapter)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
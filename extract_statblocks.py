@@ -4,14 +4,26 @@ AD&D 2e Stat Block Extractor
 Parses OCR'd text and extracts stat blocks into formatted markdown
 
 Usage: python3 extract_statblocks.py input.md [output_dir]
+       python3 extract_statblocks.py --batch INPUT... [--output-dir DIR] [--jsonl FILE] [--binary FILE] [--jobs N]
+       (add --no-cache to ignore the per-output-directory extraction cache,
+        --profile [FILE] for function-level timings of the scan and parse loops)
 """
 
 import re
 import sys
 import os
+import glob
+import json
+import mmap
+import struct
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Iterator, Tuple
+
+from pipeline_trace import span, Profile, profiled_call
 
 # Try to import tqdm for progress bars, fall back gracefully
 try:
@@ -33,9 +45,28 @@ except ImportError:
         print(file=sys.stderr)  # New line after completion
 
 
-@dataclass
+# Markdown layout: (label, attribute) rows per section, in output order
+COMBAT_ROWS = (
+    ("AC", "ac"), ("THAC0", "thac0"), ("hp", "hp"), ("MV", "mv"), ("#AT", "attacks"), ("Dmg", "damage"),
+)
+SPECIAL_ROWS = (
+    ("Special Attacks", "special_attacks"), ("Special Defenses", "special_defenses"),
+    ("Magic Resistance", "magic_resistance"),
+)
+ABILITY_ROWS = (
+    ("Str", "strength"), ("Dex", "dexterity"), ("Con", "constitution"),
+    ("Int", "intelligence"), ("Wis", "wisdom"), ("Cha", "charisma"),
+)
+OTHER_ROWS = (("Size", "size"), ("Morale", "morale"), ("Alignment", "alignment"), ("XP", "xp"))
+
+
+@dataclass(slots=True)
 class StatBlock:
-    """Represents an AD&D 2e stat block"""
+    """Represents an AD&D 2e stat block
+
+    The raw text is not copied: start/end are byte offsets of the region in
+    source_file and raw_text reads it back on demand.
+    """
     name: str = ""
     race_class: str = ""
     alignment: str = ""
@@ -67,118 +98,286 @@ class StatBlock:
     charisma: str = ""
     
     # Equipment and spells
-    equipment: List[str] = field(default_factory=list)
-    spells: List[str] = field(default_factory=list)
+    equipment: Tuple[str, ...] = ()
+    spells: Tuple[str, ...] = ()
     
-    # Raw text for reference
-    raw_text: str = ""
-    source_location: str = ""
+    # Where the raw text lives
+    source_file: str = ""
+    start: int = 0
+    end: int = 0
+
+    @property
+    def source_location(self) -> str:
+        return f"bytes {self.start}-{self.end}"
+
+    @property
+    def raw_text(self) -> str:
+        """Region text, read from the source file"""
+        if not self.source_file or self.end <= self.start:
+            return ""
+        with open(self.source_file, 'rb') as f:
+            f.seek(self.start)
+            return f.read(self.end - self.start).decode('utf-8', errors='replace')
+
+    def to_record(self) -> dict:
+        """JSON-ready record: name, source, byte offsets and the non-empty fields"""
+        record = {
+            'name': self.name,
+            'source': self.source_file,
+            'start': self.start,
+            'end': self.end,
+            'fields': {name: value for name in STAT_FIELDS if (value := getattr(self, name))},
+        }
+        if self.equipment:
+            record['equipment'] = list(self.equipment)
+        if self.spells:
+            record['spells'] = list(self.spells)
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'StatBlock':
+        return cls(
+            name=record.get('name', ""),
+            source_file=record.get('source', ""),
+            start=record.get('start', 0),
+            end=record.get('end', 0),
+            equipment=tuple(record.get('equipment', ())),
+            spells=tuple(record.get('spells', ())),
+            **record.get('fields', {}),
+        )
 
     def to_markdown(self) -> str:
         """Convert to nicely formatted markdown"""
-        lines = []
-        
-        # Header
-        lines.append(f"## {self.name}")
-        lines.append("")
+        lines = [f"## {self.name}", ""]
         
         if self.race_class:
-            lines.append(f"*{self.race_class}*")
-            lines.append("")
+            lines += [f"*{self.race_class}*", ""]
         
         # Core stats table
-        lines.append("### Combat Statistics")
-        lines.append("")
-        lines.append("| Stat | Value |")
-        lines.append("|------|-------|")
-        
-        if self.ac:
-            lines.append(f"| **AC** | {self.ac} |")
-        if self.thac0:
-            lines.append(f"| **THAC0** | {self.thac0} |")
-        if self.hp:
-            lines.append(f"| **hp** | {self.hp} |")
-        if self.mv:
-            lines.append(f"| **MV** | {self.mv} |")
-        if self.attacks:
-            lines.append(f"| **#AT** | {self.attacks} |")
-        if self.damage:
-            lines.append(f"| **Dmg** | {self.damage} |")
-        
+        lines += ["### Combat Statistics", "", "| Stat | Value |", "|------|-------|"]
+        lines += [f"| **{label}** | {value} |" for label, attr in COMBAT_ROWS if (value := getattr(self, attr))]
         lines.append("")
         
         # Special abilities
-        if self.special_attacks or self.special_defenses or self.magic_resistance:
-            lines.append("### Special Abilities")
-            lines.append("")
-            if self.special_attacks:
-                lines.append(f"- **Special Attacks:** {self.special_attacks}")
-            if self.special_defenses:
-                lines.append(f"- **Special Defenses:** {self.special_defenses}")
-            if self.magic_resistance:
-                lines.append(f"- **Magic Resistance:** {self.magic_resistance}")
-            lines.append("")
+        special = [f"- **{label}:** {value}" for label, attr in SPECIAL_ROWS if (value := getattr(self, attr))]
+        if special:
+            lines += ["### Special Abilities", "", *special, ""]
         
         # Ability scores (if present)
-        abilities = []
-        if self.strength:
-            abilities.append(f"Str {self.strength}")
-        if self.dexterity:
-            abilities.append(f"Dex {self.dexterity}")
-        if self.constitution:
-            abilities.append(f"Con {self.constitution}")
-        if self.intelligence:
-            abilities.append(f"Int {self.intelligence}")
-        if self.wisdom:
-            abilities.append(f"Wis {self.wisdom}")
-        if self.charisma:
-            abilities.append(f"Cha {self.charisma}")
-        
+        abilities = [f"{label} {value}" for label, attr in ABILITY_ROWS if (value := getattr(self, attr))]
         if abilities:
-            lines.append("### Ability Scores")
-            lines.append("")
-            lines.append(" | ".join(abilities))
-            lines.append("")
+            lines += ["### Ability Scores", "", " | ".join(abilities), ""]
         
         # Other info
-        other = []
-        if self.size:
-            other.append(f"**Size:** {self.size}")
-        if self.morale:
-            other.append(f"**Morale:** {self.morale}")
-        if self.alignment:
-            other.append(f"**Alignment:** {self.alignment}")
-        if self.xp:
-            other.append(f"**XP:** {self.xp}")
-        
+        other = [f"**{label}:** {value}" for label, attr in OTHER_ROWS if (value := getattr(self, attr))]
         if other:
-            lines.append("### Additional Info")
-            lines.append("")
-            lines.append(" | ".join(other))
-            lines.append("")
+            lines += ["### Additional Info", "", " | ".join(other), ""]
         
-        # Equipment
+        # Equipment and spells
         if self.equipment:
-            lines.append("### Equipment")
-            lines.append("")
-            for item in self.equipment:
-                lines.append(f"- {item}")
-            lines.append("")
-        
-        # Spells
+            lines += ["### Equipment", "", *(f"- {item}" for item in self.equipment), ""]
         if self.spells:
-            lines.append("### Spells")
-            lines.append("")
-            for spell in self.spells:
-                lines.append(f"- {spell}")
-            lines.append("")
+            lines += ["### Spells", "", *(f"- {spell}" for spell in self.spells), ""]
         
-        lines.append("---")
-        lines.append("")
+        lines += ["---", ""]
         
         return "\n".join(lines)
 
 
+# String fields that hold parsed values, in declaration order
+STAT_FIELDS = (
+    'race_class', 'alignment', 'ac', 'thac0', 'hp', 'mv', 'attacks', 'damage',
+    'special_attacks', 'special_defenses', 'magic_resistance', 'size', 'morale', 'xp',
+    'strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma',
+)
+
+
+# Common patterns for AD&D 2e stats. Each field lists (keyword, pattern) in priority
+# order: the first pattern that matches anywhere in the block wins. The keyword is
+# the literal text the pattern starts with and is used by the lexer to find
+# candidate positions.
+STAT_PATTERNS = {
+    'ac': [
+        ('AC', r'AC[:\s]+(-?\d+(?:/[-\d]+)?)'),
+        ('Armor Class', r'Armor Class[:\s]+(-?\d+)'),
+    ],
+    'thac0': [
+        ('THAC0', r'THAC0[:\s]+(\d+)'),
+        ('THACO', r'THACO[:\s]+(\d+)'),
+        ('To Hit', r'To Hit[:\s]+(\d+)'),
+    ],
+    'hp': [
+        ('hp', r'hp[:\s]+(\d+(?:\s*\([^)]+\))?)'),
+        ('Hit Point', r'Hit Points?[:\s]+(\d+)'),
+        ('HP', r'HP[:\s]+(\d+)'),
+    ],
+    'mv': [
+        ('MV', r'MV[:\s]+([\d,\s\w()]+?)(?:\s*[;#]|\s*$)'),
+        ('Movement', r'Movement[:\s]+([\d\'"]+)'),
+    ],
+    'attacks': [
+        ('#AT', r'#AT[:\s]+([\d/]+)'),
+        ('Attack', r'Attacks?[:\s]+([\d/]+)'),
+    ],
+    'damage': [
+        ('Dmg', r'Dmg[:\s]+([^;]+?)(?:;|\s*SA|\s*SD|\s*MR|\s*$)'),
+        ('Damage', r'Damage[:\s]+([^;]+)'),
+    ],
+    'special_attacks': [
+        ('SA', r'SA[:\s]+([^;]+?)(?:;|\s*SD|\s*MR|\s*$)'),
+        ('Special Attack', r'Special Attacks?[:\s]+([^;]+)'),
+    ],
+    'special_defenses': [
+        ('SD', r'SD[:\s]+([^;]+?)(?:;|\s*MR|\s*$)'),
+        ('Special Defense', r'Special Defenses?[:\s]+([^;]+)'),
+    ],
+    'magic_resistance': [
+        ('MR', r'MR[:\s]+(\d+%?)'),
+        ('Magic Resistance', r'Magic Resistance[:\s]+(\d+%?)'),
+    ],
+    'size': [
+        ('SZ', r'SZ[:\s]+([TFSMHLG](?:\s*\([^)]+\))?)'),
+        ('Size', r'Size[:\s]+(\w+)'),
+    ],
+    'morale': [
+        ('ML', r'ML[:\s]+(\d+(?:-\d+)?(?:\s*\([^)]+\))?)'),
+        ('Morale', r'Morale[:\s]+(\d+)'),
+    ],
+    'xp': [
+        ('XP', r'XP[:\s]+([\d,]+)'),
+        ('Experience', r'Experience[:\s]+([\d,]+)'),
+    ],
+    'alignment': [
+        (('LG', 'NG', 'CG', 'LN', 'N', 'CN', 'LE', 'NE', 'CE'), r'\b(LG|NG|CG|LN|N|CN|LE|NE|CE)\b'),
+        ('AL', r'AL[:\s]+(\w+)'),
+    ],
+}
+
+# Ability score patterns
+ABILITY_PATTERNS = {
+    'strength': [('Str', r'\bStr\s+(\d+(?:/\d+)?)'), ('Strength', r'Strength[:\s]+(\d+)')],
+    'dexterity': [('Dex', r'\bDex\s+(\d+)'), ('Dexterity', r'Dexterity[:\s]+(\d+)')],
+    'constitution': [('Con', r'\bCon\s+(\d+)'), ('Constitution', r'Constitution[:\s]+(\d+)')],
+    'intelligence': [('Int', r'\bInt\s+(\d+)'), ('Intelligence', r'Intelligence[:\s]+(\d+)')],
+    'wisdom': [('Wis', r'\bWis\s+(\d+)'), ('Wisdom', r'Wisdom[:\s]+(\d+)')],
+    'charisma': [('Cha', r'\bCha\s+(\d+)'), ('Charisma', r'Charisma[:\s]+(\d+)')],
+}
+
+
+# Non-ASCII characters re.IGNORECASE treats as ASCII letters (İ, ı, ſ, Kelvin sign).
+# Text without them can be lowercased and scanned case-sensitively.
+NOCASE_SPECIALS = re.compile('[\u0130\u0131\u017f\u212a]')
+
+
+def keyword_trie(keywords: List[str]) -> str:
+    """Factor keywords into a prefix-trie regex so each position costs one branch"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+class StatLexer:
+    """Single-pass stat block tokenizer compiled once from the pattern tables
+
+    Every pattern starts with a literal keyword that ends a word (it is followed
+    by ':', whitespace or a word boundary), so one zero-width trigger built from a
+    keyword trie visits each position where any pattern could match. The trie is
+    greedy, so the keyword it reports has every other keyword matching there as a
+    prefix; only those patterns are tried. The first hit of each pattern is the
+    one re.search would find, and field priority is resolved afterwards.
+    """
+
+    def __init__(self, tables: List[Dict[str, list]]):
+        self.fields = []
+        self.slots = []  # (field, priority, compiled pattern)
+        self._keyword_slots = {}
+        for table in tables:
+            for stat_name, stat_patterns in table.items():
+                self.fields.append(stat_name)
+                for priority, (keywords, pattern) in enumerate(stat_patterns):
+                    slot = len(self.slots)
+                    self.slots.append((stat_name, priority, re.compile(pattern, re.IGNORECASE)))
+                    if isinstance(keywords, str):
+                        keywords = (keywords,)
+                    for keyword in keywords:
+                        keyword = keyword.lower()
+                        self._keyword_slots.setdefault(keyword, []).append(slot)
+                        # "Attacks?" style patterns also end a word one character later
+                        if pattern.lower().removeprefix('\\b').startswith(keyword + 's?'):
+                            self._keyword_slots.setdefault(keyword + 's', [])
+
+        trigger = '(?=(' + keyword_trie(self._keyword_slots) + r')(?!\w))'
+        self._trigger = re.compile(trigger)
+        self._trigger_nocase = re.compile(trigger, re.IGNORECASE)
+        self._dispatch = {}
+
+    def _slots_for(self, keyword: str) -> List[int]:
+        """Slots whose keyword is a prefix of the keyword the trigger reported"""
+        slots = self._dispatch.get(keyword)
+        if slots is None:
+            slots = sorted({slot for other, other_slots in self._keyword_slots.items()
+                            if keyword.startswith(other) for slot in other_slots})
+            if not slots:
+                # Unicode case folding reached a keyword without spelling it; try everything
+                slots = list(range(len(self.slots)))
+            self._dispatch[keyword] = slots
+        return slots
+
+    def tokens(self, text: str):
+        """Yield (field, priority, value) tokens in text order
+
+        Each pattern yields at most its first match, and patterns already
+        outranked by an earlier token for the same field are skipped.
+        """
+        folded = text.lower()
+        if len(folded) == len(text) and (text.isascii() or not NOCASE_SPECIALS.search(text)):
+            hits = self._trigger.finditer(folded)
+        else:
+            hits = self._trigger_nocase.finditer(text)
+
+        best = {}  # field -> best priority found so far
+        settled = 0
+        slots = self.slots
+        for hit in hits:
+            pos = hit.start()
+            for slot in self._slots_for(hit.group(1).lower()):
+                stat_name, priority, pattern = slots[slot]
+                if best.get(stat_name, priority + 1) <= priority:
+                    continue
+                match = pattern.match(text, pos)
+                if match:
+                    best[stat_name] = priority
+                    yield stat_name, priority, match.group(1).strip()
+                    if priority == 0:
+                        settled += 1
+                        if settled == len(self.fields):
+                            return
+
+    def scan(self, text: str) -> Dict[str, str]:
+        """Return every field's value using the pattern priority rules"""
+        best = {}
+        for stat_name, priority, value in self.tokens(text):
+            current = best.get(stat_name)
+            if current is None or priority < current[0]:
+                best[stat_name] = (priority, value)
+        return {name: best[name][1] if name in best else "" for name in self.fields}
+
+
+STAT_LEXER = StatLexer([STAT_PATTERNS, ABILITY_PATTERNS])
+
+
 def parse_stat_value(text: str, patterns: List[str]) -> str:
     """Extract a stat value using multiple possible patterns"""
     for pattern in patterns:
@@ -190,85 +389,10 @@ def parse_stat_value(text: str, patterns: List[str]) -> str:
 
 def extract_stat_block(text: str, start_pos: int = 0) -> Optional[StatBlock]:
     """Extract a single stat block from text"""
-    
-    # Common patterns for AD&D 2e stats
-    patterns = {
-        'ac': [
-            r'AC[:\s]+(-?\d+(?:/[-\d]+)?)',
-            r'Armor Class[:\s]+(-?\d+)',
-        ],
-        'thac0': [
-            r'THAC0[:\s]+(\d+)',
-            r'THACO[:\s]+(\d+)',
-            r'To Hit[:\s]+(\d+)',
-        ],
-        'hp': [
-            r'hp[:\s]+(\d+(?:\s*\([^)]+\))?)',
-            r'Hit Points?[:\s]+(\d+)',
-            r'HP[:\s]+(\d+)',
-        ],
-        'mv': [
-            r'MV[:\s]+([\d,\s\w()]+?)(?:\s*[;#]|\s*$)',
-            r'Movement[:\s]+([\d\'"]+)',
-        ],
-        'attacks': [
-            r'#AT[:\s]+([\d/]+)',
-            r'Attacks?[:\s]+([\d/]+)',
-        ],
-        'damage': [
-            r'Dmg[:\s]+([^;]+?)(?:;|\s*SA|\s*SD|\s*MR|\s*$)',
-            r'Damage[:\s]+([^;]+)',
-        ],
-        'special_attacks': [
-            r'SA[:\s]+([^;]+?)(?:;|\s*SD|\s*MR|\s*$)',
-            r'Special Attacks?[:\s]+([^;]+)',
-        ],
-        'special_defenses': [
-            r'SD[:\s]+([^;]+?)(?:;|\s*MR|\s*$)',
-            r'Special Defenses?[:\s]+([^;]+)',
-        ],
-        'magic_resistance': [
-            r'MR[:\s]+(\d+%?)',
-            r'Magic Resistance[:\s]+(\d+%?)',
-        ],
-        'size': [
-            r'SZ[:\s]+([TFSMHLG](?:\s*\([^)]+\))?)',
-            r'Size[:\s]+(\w+)',
-        ],
-        'morale': [
-            r'ML[:\s]+(\d+(?:-\d+)?(?:\s*\([^)]+\))?)',
-            r'Morale[:\s]+(\d+)',
-        ],
-        'xp': [
-            r'XP[:\s]+([\d,]+)',
-            r'Experience[:\s]+([\d,]+)',
-        ],
-        'alignment': [
-            r'\b(LG|NG|CG|LN|N|CN|LE|NE|CE)\b',
-            r'AL[:\s]+(\w+)',
-        ],
-    }
-    
-    # Ability score patterns
-    ability_patterns = {
-        'strength': [r'\bStr\s+(\d+(?:/\d+)?)', r'Strength[:\s]+(\d+)'],
-        'dexterity': [r'\bDex\s+(\d+)', r'Dexterity[:\s]+(\d+)'],
-        'constitution': [r'\bCon\s+(\d+)', r'Constitution[:\s]+(\d+)'],
-        'intelligence': [r'\bInt\s+(\d+)', r'Intelligence[:\s]+(\d+)'],
-        'wisdom': [r'\bWis\s+(\d+)', r'Wisdom[:\s]+(\d+)'],
-        'charisma': [r'\bCha\s+(\d+)', r'Charisma[:\s]+(\d+)'],
-    }
-    
     block = StatBlock()
-    block.raw_text = text
-    
-    # Extract each stat
-    for stat_name, stat_patterns in patterns.items():
-        value = parse_stat_value(text, stat_patterns)
-        setattr(block, stat_name, value)
     
-    for stat_name, stat_patterns in ability_patterns.items():
-        value = parse_stat_value(text, stat_patterns)
+    # Extract every stat in one pass over the block
+    for stat_name, value in STAT_LEXER.scan(text).items():
         setattr(block, stat_name, value)
     
     # A valid stat block should have at least THAC0 or AC or HP
@@ -278,137 +402,561 @@ def extract_stat_block(text: str, start_pos: int = 0) -> Optional[StatBlock]:
     return block
 
 
+# Region scanner: a name can precede THAC0 by up to REGION_LOOKBACK characters and a
+# block ends at the first XP value within REGION_LOOKAHEAD characters after it
+REGION_LOOKBACK = 500
+REGION_LOOKAHEAD = 1000
+REGION_PATTERNS = {
+    'thac0': (r'THAC0', re.IGNORECASE),
+    'xp': (r'XP\s+[\d,]+\.?', 0),
+    'blank': (r'\n\n', 0),
+    'bold': (r'\*\*([^*]+)\*\*', 0),
+    'caps': (r'\b([A-Z][A-Z\s]{2,}[A-Z])\b', 0),
+}
+REGION_REGEX = {name: re.compile(p, flags) for name, (p, flags) in REGION_PATTERNS.items()}
+REGION_REGEX_BYTES = {name: re.compile(p.encode('ascii'), flags) for name, (p, flags) in REGION_PATTERNS.items()}
+
+
+def scan_stat_regions(buffer) -> Iterator[Tuple[int, int, str]]:
+    """Yield (start, end, name) for each stat block region in one forward pass
+
+    buffer may be a str or any bytes-like object such as an mmap (offsets are then
+    byte offsets). Each THAC0 opens a region at the first bold **name** (else
+    ALL-CAPS heading) found since the previous region ended, within
+    REGION_LOOKBACK. A region closes at the first XP value within
+    REGION_LOOKAHEAD, otherwise at the first blank line; if the next THAC0 comes
+    first, the region is cut where the next one starts, so regions never overlap.
+    All searches run on the buffer with pos/endpos bounds, so nothing is sliced
+    and every byte is examined a bounded number of times.
+    """
+    is_text = isinstance(buffer, str)
+    rx = REGION_REGEX if is_text else REGION_REGEX_BYTES
+    size = len(buffer)
+
+    def name_before(pos: int, low: int) -> Tuple[int, str]:
+        for kind in ('bold', 'caps'):
+            match = rx[kind].search(buffer, low, pos)
+            if match:
+                name = match.group(1) if is_text else match.group(1).decode('utf-8', errors='replace')
+                return match.start(), name.strip('* ')
+        return pos, ""
+
+    def end_after(thac0_end: int, limit: int) -> Optional[int]:
+        match = rx['xp'].search(buffer, thac0_end, limit)
+        if match:
+            return match.end()
+        match = rx['blank'].search(buffer, thac0_end, limit)
+        return match.start() if match else None
+
+    floor = 0       # End of the previous region; names before it are taken
+    region = None   # (start, name, thac0_end) of the open region
+
+    for anchor in rx['thac0'].finditer(buffer):
+        pos = anchor.start()
+        if region is not None:
+            start, name, thac0_end = region
+            deadline = min(thac0_end + REGION_LOOKAHEAD, size)
+            end = end_after(thac0_end, min(deadline, pos))
+            if end is None and pos >= deadline:
+                end = deadline
+            if end is None:
+                # Next block starts inside the lookahead: cut the open region there
+                next_start, next_name = name_before(pos, max(thac0_end, pos - REGION_LOOKBACK))
+                yield start, next_start, name
+                floor = next_start
+                region = (next_start, next_name, anchor.end())
+                continue
+            yield start, end, name
+            floor = end
+
+        next_start, next_name = name_before(pos, max(floor, pos - REGION_LOOKBACK))
+        region = (next_start, next_name, anchor.end())
+
+    if region is not None:
+        start, name, thac0_end = region
+        deadline = min(thac0_end + REGION_LOOKAHEAD, size)
+        end = end_after(thac0_end, deadline)
+        yield start, end if end is not None else deadline, name
+
+
 def find_stat_blocks(text: str) -> List[tuple]:
     """Find all potential stat block regions in text"""
+    return [(start, end, name, text[start:end]) for start, end, name in scan_stat_regions(text)]
+
+
+# Incremental extraction cache, stored per output directory. Bump CACHE_VERSION
+# whenever parsing changes in a way the pattern fingerprint below does not capture.
+CACHE_FILE = ".statblock_cache.json"
+CACHE_VERSION = 1
+EXTRACTOR_VERSION = f"{CACHE_VERSION}-" + hashlib.blake2b(
+    repr((STAT_PATTERNS, ABILITY_PATTERNS, REGION_PATTERNS)).encode('utf-8'), digest_size=6).hexdigest()
+
+
+def region_key(region: bytes) -> str:
+    """Content address of a region: hash of the extractor version plus its bytes"""
+    digest = hashlib.blake2b(region, digest_size=12, key=EXTRACTOR_VERSION.encode('ascii'))
+    return digest.hexdigest()
+
+
+def content_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def load_cache(cache_path: Path) -> dict:
+    """Load an extraction cache, discarding it if unreadable or from another extractor version"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == EXTRACTOR_VERSION:
+            return {'regions': cache.get('regions', {}), 'files': cache.get('files', {})}
+    except (OSError, ValueError):
+        pass
+    return {'regions': {}, 'files': {}}
+
+
+def save_cache(cache_path: Path, cache: dict):
+    """Write the extraction cache atomically"""
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': EXTRACTOR_VERSION, **cache}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}", file=sys.stderr)
+
+
+def extract_file(input_path: str, cache: Optional[dict] = None) -> Tuple[List[StatBlock], dict]:
+    """Scan a markdown file and return its parsed stat blocks (nothing is written)
+
+    cache maps region keys to parsed fields (None for regions that are not stat
+    blocks); hits skip parsing. Returns the blocks and the cache entries for the
+    regions seen in this run, so stale entries drop out.
+    """
+    with span('extract statblocks', 'file', file=os.path.basename(input_path)):
+        return _extract_file(input_path, cache or {})
+
+
+def _extract_file(input_path: str, cache: dict) -> Tuple[List[StatBlock], dict]:
+    stat_blocks = []
+    seen = {}
     
-    # Look for regions that contain stat block indicators
-    # THAC0 is the most reliable indicator for AD&D 2e
+    # Scan the memory-mapped file; only region offsets are kept and a block's
+    # text is decoded only when it has to be parsed
+    with open(input_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return stat_blocks, seen
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
     
-    stat_regions = []
+    with content:
+        for i, (start, end, name) in enumerate(scan_stat_regions(content)):
+            region = content[start:end]
+            key = region_key(region)
+            
+            if key in cache:
+                values = cache[key]
+                block = StatBlock(**values) if values is not None else None
+            else:
+                block = extract_stat_block(region.decode('utf-8', errors='replace'))
+                values = None
+                if block:
+                    values = {stat: value for stat in STAT_FIELDS if (value := getattr(block, stat))}
+            seen[key] = values
+            
+            if block:
+                block.name = name if name else f"Unknown NPC {i+1}"
+                block.source_file = input_path
+                block.start = start
+                block.end = end
+                stat_blocks.append(block)
     
-    # Pattern to find stat block starts (name followed by stats)
-    # Common patterns:
-    # 1. Name in bold/caps followed by stats
-    # 2. "Pl/♂ human" type race/class indicators
-    # 3. Direct stat listings
+    return stat_blocks, seen
+
+
+def safe_filename(name: str, fallback: str) -> str:
+    """Turn an NPC name into a markdown file name stem"""
+    safe_name = re.sub(r'[^\w\s-]', '', name).strip().replace(' ', '_')
+    return safe_name or fallback
+
+
+def render_markdown(stat_blocks: List[StatBlock], input_path: str) -> Dict[str, str]:
+    """Rendered output files: one <Name>.md per block plus _all_statblocks.md"""
+    if not stat_blocks:
+        return {}
     
-    # Split by common delimiters
-    # Look for THAC0 as anchor point
-    thac0_matches = list(re.finditer(r'THAC0', text, re.IGNORECASE))
+    # Later blocks with the same name overwrite earlier ones, as before
+    files = {}
+    for i, block in enumerate(stat_blocks):
+        files[f"{safe_filename(block.name, f'statblock_{i+1}')}.md"] = block.to_markdown()
     
-    for match in thac0_matches:
-        # Find the start of this stat block (look backwards for name)
-        start = match.start()
-        
-        # Look back up to 500 chars for a name (usually bold or caps)
-        lookback_start = max(0, start - 500)
-        lookback_text = text[lookback_start:start]
-        
-        # Try to find a name - often in bold (**name**) or all caps
-        name_match = None
-        
-        # Check for bold markdown name
-        bold_match = re.search(r'\*\*([^*]+)\*\*', lookback_text)
-        if bold_match:
-            name_match = bold_match
-            start = lookback_start + bold_match.start()
-        else:
-            # Check for caps name (at least 3 chars, possibly with spaces)
-            caps_match = re.search(r'\b([A-Z][A-Z\s]{2,}[A-Z])\b', lookback_text)
-            if caps_match:
-                name_match = caps_match
-                start = lookback_start + caps_match.start()
-        
-        # Find the end of this stat block (look for XP value or next stat block)
-        end = match.end()
-        lookahead_text = text[end:end + 1000]
-        
-        # XP typically ends a stat block
-        xp_match = re.search(r'XP\s+[\d,]+\.?', lookahead_text)
-        if xp_match:
-            end = match.end() + xp_match.end()
-        else:
-            # Look for double newline or next stat block
-            break_match = re.search(r'\n\n', lookahead_text)
-            if break_match:
-                end = match.end() + break_match.start()
-            else:
-                end = match.end() + len(lookahead_text)
-        
-        block_text = text[start:end]
-        
-        # Extract name if found
-        name = ""
-        if name_match:
-            name = name_match.group(1).strip('* ')
-        
-        stat_regions.append((start, end, name, block_text))
+    combined = [
+        "# Extracted Stat Blocks\n\n",
+        f"*Extracted from: {input_path}*\n\n",
+        f"*Total NPCs: {len(stat_blocks)}*\n\n",
+        "---\n\n",
+    ]
+    for block in stat_blocks:
+        combined.append(block.to_markdown())
+        combined.append("\n")
+    files["_all_statblocks.md"] = "".join(combined)
     
-    return stat_regions
+    return files
 
 
-def process_file(input_path: str, output_dir: str) -> List[StatBlock]:
-    """Process a markdown file and extract all stat blocks"""
+def write_markdown(stat_blocks: List[StatBlock], input_path: str, output_dir: str,
+                   written: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], int]:
+    """Write the rendered markdown, touching only files whose content changed
+
+    written maps file names from the previous run to their content digests;
+    files it lists that are no longer produced are removed. Returns the new
+    mapping and the number of files actually written.
+    """
+    written = written or {}
+    files = render_markdown(stat_blocks, input_path)
+    digests = {}
+    changed = 0
+    
+    if files:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    for filename, text in files.items():
+        digest = content_digest(text)
+        digests[filename] = digest
+        output_file = os.path.join(output_dir, filename)
+        if written.get(filename) == digest and os.path.exists(output_file):
+            continue
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        changed += 1
     
-    with open(input_path, 'r', encoding='utf-8', errors='replace') as f:
-        content = f.read()
+    for filename in written.keys() - digests.keys():
+        try:
+            os.remove(os.path.join(output_dir, filename))
+        except OSError:
+            pass
+    
+    return digests, changed
+
+
+def update_output_dir(stat_blocks: List[StatBlock], input_path: str, output_dir: str,
+                      cache: dict, regions: dict) -> int:
+    """Write markdown for one input and save its cache; returns files written"""
+    digests, changed = write_markdown(stat_blocks, input_path, output_dir, cache['files'])
+    if digests or regions:
+        os.makedirs(output_dir, exist_ok=True)
+        save_cache(Path(output_dir) / CACHE_FILE, {'regions': regions, 'files': digests})
+    return changed
+
+
+def process_file(input_path: str, output_dir: str, use_cache: bool = True,
+                 profile: Optional[Profile] = None) -> List[StatBlock]:
+    """Process a markdown file and extract all stat blocks"""
     
     os.makedirs(output_dir, exist_ok=True)
     
-    stat_blocks = []
-    regions = find_stat_blocks(content)
+    cache = load_cache(Path(output_dir) / CACHE_FILE) if use_cache else {'regions': {}, 'files': {}}
+    if profile:
+        stat_blocks, regions = profile.run(extract_file, input_path, cache['regions'])
+    else:
+        stat_blocks, regions = extract_file(input_path, cache['regions'])
+    reused = len(regions.keys() & cache['regions'].keys())
     
-    print(f"Found {len(regions)} potential stat block regions")
+    print(f"Found {len(regions)} potential stat block regions ({reused} unchanged)")
     
-    for i, (start, end, name, block_text) in enumerate(tqdm(regions, desc="Extracting stat blocks", unit="block")):
-        block = extract_stat_block(block_text)
-        
-        if block:
-            block.name = name if name else f"Unknown NPC {i+1}"
-            block.source_location = f"chars {start}-{end}"
-            stat_blocks.append(block)
-            
-            # Save individual stat block
-            safe_name = re.sub(r'[^\w\s-]', '', block.name).strip().replace(' ', '_')
-            if not safe_name:
-                safe_name = f"statblock_{i+1}"
-            
-            output_file = os.path.join(output_dir, f"{safe_name}.md")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(block.to_markdown())
-            
-            print(f"  Extracted: {block.name}")
+    for block in stat_blocks:
+        print(f"  Extracted: {block.name}")
     
-    # Also create combined file
+    changed = update_output_dir(stat_blocks, input_path, output_dir, cache, regions)
     if stat_blocks:
-        combined_file = os.path.join(output_dir, "_all_statblocks.md")
-        with open(combined_file, 'w', encoding='utf-8') as f:
-            f.write("# Extracted Stat Blocks\n\n")
-            f.write(f"*Extracted from: {input_path}*\n\n")
-            f.write(f"*Total NPCs: {len(stat_blocks)}*\n\n")
-            f.write("---\n\n")
-            
-            for block in stat_blocks:
-                f.write(block.to_markdown())
-                f.write("\n")
-        
-        print(f"\nCombined output: {combined_file}")
+        print(f"\nCombined output: {os.path.join(output_dir, '_all_statblocks.md')} ({changed} files updated)")
     
     return stat_blocks
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 extract_statblocks.py input.md [output_dir]")
-        sys.exit(1)
+# ============================================================================
+# SERIALIZATION
+# ============================================================================
+
+# Binary layout (little-endian):
+#   magic (8 bytes) | field count, source count, block count (uint32 × 3)
+#   field names, then source paths: length-prefixed (uint32) utf-8
+#   per block: source index (uint32) | start, end (uint64) | blob length (uint32) | blob
+#   blob = name, STAT_FIELDS values, equipment, spells joined by NUL; list items joined by \x1f
+BINARY_MAGIC = b'HHSTB\x00\x01\x00'
+BINARY_HEADER = struct.Struct('<8sIII')
+BINARY_BLOCK = struct.Struct('<IQQI')
+BINARY_LENGTH = struct.Struct('<I')
+RECORD_FIELDS = ('name',) + STAT_FIELDS
+
+
+def _clean(value: str) -> str:
+    return value.replace('\x00', '\ufffd').replace('\x1f', '\ufffd')
+
+
+def write_jsonl(stat_blocks: List[StatBlock], path: str):
+    """Write one JSON record per block"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for block in stat_blocks:
+            f.write(json.dumps(block.to_record(), ensure_ascii=False) + "\n")
+
+
+def read_jsonl(path: str) -> List[StatBlock]:
+    """Load blocks written by write_jsonl or batch mode"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [StatBlock.from_record(json.loads(line)) for line in f if line.strip()]
+
+
+def write_binary(stat_blocks: List[StatBlock], path: str):
+    """Write blocks in the compact binary form"""
+    sources = {}
+    for block in stat_blocks:
+        sources.setdefault(block.source_file, len(sources))
+    
+    parts = [BINARY_HEADER.pack(BINARY_MAGIC, len(RECORD_FIELDS), len(sources), len(stat_blocks))]
+    for text in (*RECORD_FIELDS, *sources):
+        data = text.encode('utf-8')
+        parts += [BINARY_LENGTH.pack(len(data)), data]
+    
+    for block in stat_blocks:
+        values = [_clean(getattr(block, name)) for name in RECORD_FIELDS]
+        values.append('\x1f'.join(_clean(item) for item in block.equipment))
+        values.append('\x1f'.join(_clean(item) for item in block.spells))
+        blob = '\x00'.join(values).encode('utf-8')
+        parts += [BINARY_BLOCK.pack(sources[block.source_file], block.start, block.end, len(blob)), blob]
+    
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(parts))
+    os.replace(tmp_path, path)
+
+
+def read_binary(path: str) -> List[StatBlock]:
+    """Load blocks written by write_binary"""
+    with open(path, 'rb') as f:
+        data = f.read()
     
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "extracted_statblocks"
+    magic, field_count, source_count, block_count = BINARY_HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"Not a stat block file: {path}")
     
-    if not os.path.exists(input_file):
-        print(f"Error: Input file not found: {input_file}")
+    offset = BINARY_HEADER.size
+    strings = []
+    for _ in range(field_count + source_count):
+        (length,) = BINARY_LENGTH.unpack_from(data, offset)
+        offset += BINARY_LENGTH.size
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+    names, sources = strings[:field_count], strings[field_count:]
+    
+    # Files written with a different field list still load by name
+    known = [name if name in RECORD_FIELDS else None for name in names]
+    
+    stat_blocks = []
+    unpack_block = BINARY_BLOCK.unpack_from
+    for _ in range(block_count):
+        source, start, end, length = unpack_block(data, offset)
+        offset += BINARY_BLOCK.size
+        values = data[offset:offset + length].decode('utf-8').split('\x00')
+        offset += length
+        block = StatBlock(**{name: value for name, value in zip(known, values) if name and value})
+        block.equipment = tuple(values[-2].split('\x1f')) if values[-2] else ()
+        block.spells = tuple(values[-1].split('\x1f')) if values[-1] else ()
+        block.source_file = sources[source]
+        block.start = start
+        block.end = end
+        stat_blocks.append(block)
+    
+    return stat_blocks
+
+
+def save_blocks(stat_blocks: List[StatBlock], path: str):
+    """Save blocks as JSONL (.jsonl) or in the binary form (anything else, e.g. .stb)"""
+    if path.endswith('.jsonl'):
+        write_jsonl(stat_blocks, path)
+    else:
+        write_binary(stat_blocks, path)
+
+
+def load_blocks(path: str) -> List[StatBlock]:
+    """Load blocks saved by save_blocks without re-parsing any markdown"""
+    if path.endswith('.jsonl'):
+        return read_jsonl(path)
+    return read_binary(path)
+
+
+# ============================================================================
+# BATCH MODE
+# ============================================================================
+
+# Best chapter source first (same preference as harbinger_master.fish)
+CHAPTER_SOURCES = ("ai_cleaned.md", "corrected.md", "dict_cleaned.md", "cleaned.md", "converted.md")
+SKIP_DIRS = ("final", "statblocks", "diagnostics")
+
+
+def find_chapter_source(chapter_dir: Path) -> Optional[Path]:
+    """Pick the best source file in a chapter directory"""
+    for candidate in CHAPTER_SOURCES:
+        path = chapter_dir / candidate
+        if path.is_file():
+            return path
+    return None
+
+
+def expand_inputs(patterns: List[str]) -> List[Path]:
+    """Resolve files, chapter directories, converted roots and globs to input files
+
+    A directory with a chapter source file contributes that file; any other
+    directory is treated as a converted root and each chapter inside it
+    contributes its best source.
+    """
+    inputs = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            path = Path(match)
+            if path.is_file():
+                inputs.append(path)
+            elif path.is_dir():
+                source = find_chapter_source(path)
+                if source:
+                    inputs.append(source)
+                    continue
+                for chapter_dir in sorted(d for d in path.iterdir() if d.is_dir() and d.name not in SKIP_DIRS):
+                    source = find_chapter_source(chapter_dir)
+                    if source:
+                        inputs.append(source)
+    
+    # Drop duplicates from overlapping patterns, keeping the first occurrence
+    seen = set()
+    return [p for p in inputs if not (p.resolve() in seen or seen.add(p.resolve()))]
+
+
+def output_subdirs(inputs: List[Path]) -> Dict[Path, str]:
+    """Per-input output directory names: chapter dirs relative to their common root
+
+    Inputs from the same directory get one subdirectory per file stem (ch/a,
+    ch/b), so their markdown and extraction caches never overwrite each other.
+    """
+    parents = [p.resolve().parent for p in inputs]
+    if len(set(parents)) <= 1:
+        subdirs = {p: parent.name for p, parent in zip(inputs, parents)}
+    else:
+        common = Path(os.path.commonpath(parents))
+        subdirs = {p: str(parent.relative_to(common)) for p, parent in zip(inputs, parents)}
+    shared = Counter(subdirs.values())
+    return {p: os.path.join(subdir, p.stem) if shared[subdir] > 1 else subdir for p, subdir in subdirs.items()}
+
+
+def _extract_worker(input_path: str, cache: Optional[dict]) -> Tuple[str, List[StatBlock], dict]:
+    return (input_path, *extract_file(input_path, cache))
+
+
+def process_batch(inputs: List[Path], jsonl_out, output_dir: Optional[str] = None,
+                  jobs: Optional[int] = None, use_cache: bool = True,
+                  profile: Optional[Profile] = None) -> List[StatBlock]:
+    """Extract many files in parallel, streaming JSONL as each file finishes
+
+    Markdown (per-NPC files and _all_statblocks.md per input) is written at the
+    end, into output_dir/<chapter>, where each chapter's extraction cache lives.
+    With a profile, the workers extract under cProfile. Returns every stat
+    block, in input order.
+    """
+    results = {}
+    
+    subdirs = output_subdirs(inputs) if output_dir else {}
+    caches = {}
+    for path in inputs:
+        if output_dir and use_cache:
+            caches[str(path)] = load_cache(Path(output_dir) / subdirs[path] / CACHE_FILE)
+        else:
+            caches[str(path)] = {'regions': {}, 'files': {}}
+    
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        if profile:
+            futures = [pool.submit(profiled_call, _extract_worker, str(p), caches[str(p)]['regions'])
+                       for p in inputs]
+        else:
+            futures = [pool.submit(_extract_worker, str(p), caches[str(p)]['regions']) for p in inputs]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Extracting stat blocks", unit="file"):
+            if profile:
+                (input_path, stat_blocks, regions), raw = future.result()
+                profile.add(raw)
+            else:
+                input_path, stat_blocks, regions = future.result()
+            results[input_path] = (stat_blocks, regions)
+            for block in stat_blocks:
+                jsonl_out.write(json.dumps(block.to_record(), ensure_ascii=False) + "\n")
+            jsonl_out.flush()
+    
+    if output_dir:
+        changed = 0
+        for path in inputs:
+            stat_blocks, regions = results[str(path)]
+            changed += update_output_dir(stat_blocks, str(path), os.path.join(output_dir, subdirs[path]),
+                                         caches[str(path)], regions)
+        print(f"{changed} markdown files updated", file=sys.stderr)
+    
+    return [block for path in inputs for block in results[str(path)][0]]
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Extract AD&D 2e stat blocks from OCR\'d markdown')
+    parser.add_argument('inputs', nargs='+',
+                        help='input.md [output_dir], or with --batch: files, chapter dirs, converted roots or globs')
+    parser.add_argument('--batch', action='store_true',
+                        help='Extract many inputs in parallel and stream JSONL records')
+    parser.add_argument('--output-dir', help='Batch mode: also write markdown to DIR/<chapter>/')
+    parser.add_argument('--jsonl', default='-', help='Batch mode: JSONL output file (default: stdout)')
+    parser.add_argument('--binary', help='Batch mode: also save all blocks in the compact binary form (.stb)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Batch mode: worker processes (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Re-extract every region and rewrite every file instead of using {CACHE_FILE}')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FILE',
+                        help='Profile the scan and parse loops; print the top functions (and save pstats to FILE)')
+    args = parser.parse_args()
+    profile = Profile(args.profile or None) if args.profile is not None else None
+    
+    if not args.batch:
+        if len(args.inputs) > 2:
+            parser.error("expected input.md [output_dir]; use --batch for multiple inputs")
+        input_file = args.inputs[0]
+        output_dir = args.inputs[1] if len(args.inputs) > 1 else "extracted_statblocks"
+        
+        if not os.path.exists(input_file):
+            print(f"Error: Input file not found: {input_file}")
+            sys.exit(1)
+        
+        blocks = process_file(input_file, output_dir, use_cache=not args.no_cache, profile=profile)
+        
+        print(f"\nExtracted {len(blocks)} stat blocks")
+        if profile:
+            profile.report()
+        return
+    
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("Error: No input files found", file=sys.stderr)
         sys.exit(1)
     
-    blocks = process_file(input_file, output_dir)
+    print(f"Extracting stat blocks from {len(inputs)} files", file=sys.stderr)
     
-    print(f"\nExtracted {len(blocks)} stat blocks")
+    if args.jsonl == '-':
+        blocks = process_batch(inputs, sys.stdout, args.output_dir, args.jobs, not args.no_cache, profile)
+    else:
+        with open(args.jsonl, 'w', encoding='utf-8') as jsonl_out:
+            blocks = process_batch(inputs, jsonl_out, args.output_dir, args.jobs, not args.no_cache, profile)
+        print(f"✨ JSONL saved to {args.jsonl}", file=sys.stderr)
+    
+    if args.binary:
+        write_binary(blocks, args.binary)
+        print(f"✨ Binary stat blocks saved to {args.binary}", file=sys.stderr)
+    
+    print(f"Extracted {len(blocks)} stat blocks from {len(inputs)} files", file=sys.stderr)
+    if profile:
+        profile.report()
+
+
+if __name__ == "__main__":
+    main()
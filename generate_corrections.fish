@@ -4,6 +4,7 @@
 # Analyzes low-confidence OCR words and generates corrections.json
 #
 # Usage: ./generate_corrections.fish [converted_dir] [--threshold N] [--output FILE]
+#        ./generate_corrections.fish --corpus ARCHIVE_DIR [--jobs N]   (learn from every converted book)
 
 set -g SCRIPT_DIR (dirname (status filename))
 
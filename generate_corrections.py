@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
 """
 generate_corrections.py - Analyze low-confidence OCR words and generate corrections
-Parses *-lowconf.txt files across chapters, finds recurring patterns, and outputs
-suggested corrections to corrections.json
-
-Usage: python3 generate_corrections.py [converted_dir] [--threshold N] [--output FILE]
+Reads the tesseract *.tsv files in each chapter's .temp directory (falling back to
+*-lowconf.txt for older runs), finds recurring patterns, and outputs suggested
+corrections to corrections.json. Parsed files are cached by path, mtime and size,
+so re-runs only re-parse files that changed.
+
+Chapters are analyzed as map-reduce shards: each worker reduces its chapter to
+mergeable per-word aggregates (count, confidence sum/min/max, first location,
+per-book counts), which are merged as they arrive. With --corpus every converted
+book under the given directories is analyzed together, and corrections.json
+records which books each correction was learned from.
+
+Usage: python3 generate_corrections.py [converted_dir] [--threshold N] [--output FILE] [--no-cache]
+       python3 generate_corrections.py --corpus ARCHIVE_DIR [...] [--jobs N]
+       (add --profile [FILE] for function-level timings of the analysis and suggestion loops)
 """
 
 import os
@@ -12,17 +22,13 @@ import sys
 import json
 import re
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
-# Try to import spell checker for dictionary validation
-try:
-    from spellchecker import SpellChecker
-    spell = SpellChecker()
-    HAS_SPELLCHECK = True
-except ImportError:
-    HAS_SPELLCHECK = False
-    print("Note: Install pyspellchecker for better accuracy: pip install pyspellchecker", file=sys.stderr)
+from lexicon import Lexicon
+from ocr_candidates import CandidateIndex
+from pipeline_trace import span, Profile, profiled_call
 
 # Try to import tqdm for progress bars, fall back gracefully
 try:
@@ -47,6 +53,22 @@ except ImportError:
 DEFAULT_THRESHOLD = 40
 DEFAULT_MIN_OCCURRENCES = 2
 DEFAULT_OUTPUT = "corrections.json"
+MAX_SUGGESTION_COST = 1.0  # Suggestions must be cheaper than one plain edit
+CACHE_FILE = ".lowconf_cache.json"
+CACHE_VERSION = 2
+
+# Tesseract TSV columns
+TSV_LEVEL = 0
+TSV_BLOCK = 2
+TSV_PAR = 3
+TSV_LINE = 4
+TSV_LEFT = 6
+TSV_CONF = 10
+TSV_TEXT = 11
+TSV_WORD_LEVEL = '5'
+
+# Legacy *-lowconf.txt line: "word (conf: XX.XXX)"
+LOWCONF_LINE_RE = re.compile(r'^(.+?) \(conf: ([\d.]+)\)$')
 
 # Known corrections for common OCR errors (seed the learning)
 KNOWN_CORRECTIONS = {
@@ -104,21 +126,15 @@ def is_preserved_term(word: str) -> bool:
     return word.lower() in PRESERVE_TERMS
 
 
+# Word list used for validation and its candidate index, both mapped lazily on first use
+lexicon = Lexicon()
+candidate_index = CandidateIndex(lexicon)
+
+
 def is_valid_word(word: str) -> bool:
-    """Check if word is a valid English word using dictionary"""
-    if not HAS_SPELLCHECK:
-        return False
-    
-    # Check the word as-is and lowercase
-    if spell.known([word]) or spell.known([word.lower()]):
-        return True
-    
-    # Check without trailing punctuation
-    clean_word = word.rstrip('.,;:!?')
-    if clean_word != word and (spell.known([clean_word]) or spell.known([clean_word.lower()])):
-        return True
-    
-    return False
+    """Check if word is a valid English or Planescape word (case-insensitive)"""
+    # Also accept the word without trailing punctuation
+    return lexicon.known_any((word, word.rstrip('.,;:!?')))
 
 
 def is_garbage(word: str) -> bool:
@@ -171,37 +187,100 @@ def suggest_correction(word: str) -> str | None:
     if is_valid_word(word):
         return None
     
-    # Pattern-based suggestions for clear OCR errors
-    suggestion = word
-    
-    # Only fix obvious OCR character errors
-    # 0 -> o at start of words
-    if re.match(r'^0[a-z]+$', word, re.I):  # 0f -> of
-        suggestion = 'o' + word[1:]
-    # 1 -> l at start of words (but not 1st, 1d6, etc.)
-    elif re.match(r'^1[a-z]+$', word, re.I) and not word.startswith('1st') and not word.startswith('1d'):
-        suggestion = 'l' + word[1:]  # 1ady -> lady
-    # vv -> w (common OCR error)
-    elif 'vv' in word:
-        suggestion = word.replace('vv', 'w')
-    # rn -> m ligature ONLY if result is a valid word
-    elif 'rn' in word:
-        test_suggestion = re.sub(r'rn(?=[aeiouy])', 'm', word)
-        if test_suggestion != word and is_valid_word(test_suggestion):
-            suggestion = test_suggestion
-    
-    # Only return suggestion if it differs and is valid
-    if suggestion != word:
-        # Verify the suggestion is actually better (valid word or in known corrections)
-        if is_valid_word(suggestion) or suggestion in KNOWN_CORRECTIONS.values():
-            return suggestion
+    # Ranked OCR-confusion candidates (rn→m, vv→w, 0→o, ...) from the deletion index;
+    # only an unambiguous candidate cheaper than a plain edit is accepted
+    core = word.rstrip('.,;:!?')
+    if len(core) <= 2:
+        return None
+    suggestion = candidate_index.best(core, max_cost=MAX_SUGGESTION_COST)
+    if suggestion is not None and suggestion != core:
+        return suggestion + word[len(core):]
     
     return None
 
 
-def parse_lowconf_file(filepath: Path) -> list[tuple[str, float]]:
-    """Parse a lowconf file and return list of (word, confidence) tuples"""
-    results = []
+def should_count_word(word: str) -> bool:
+    """Filter out entries that never become corrections"""
+    # Skip empty or whitespace
+    if not word.strip():
+        return False
+
+    # Skip pure punctuation
+    if is_pure_punctuation(word):
+        return False
+
+    # Skip preserved terms
+    if is_preserved_term(word):
+        return False
+
+    return True
+
+
+def add_confidence(stats: dict, word: str, conf: float):
+    """Fold one confidence into the word's [count, sum, min, max]"""
+    entry = stats.get(word)
+    if entry is None:
+        stats[word] = [1, conf, conf, conf]
+        return
+    entry[0] += 1
+    entry[1] += conf
+    if conf < entry[2]:
+        entry[2] = conf
+    if conf > entry[3]:
+        entry[3] = conf
+
+
+def merge_stats(into: dict, stats: dict):
+    """Merge per-word [count, sum, min, max] aggregates"""
+    for word, (count, total, low, high) in stats.items():
+        entry = into.get(word)
+        if entry is None:
+            into[word] = [count, total, low, high]
+        else:
+            entry[0] += count
+            entry[1] += total
+            entry[2] = min(entry[2], low)
+            entry[3] = max(entry[3], high)
+
+
+def parse_tsv_file(filepath: Path, threshold: float) -> dict:
+    """Stream a tesseract TSV and collect low-confidence words with their locations
+
+    Returns {"words": {word: [count, sum, min, max]}, "locations": {word: [line_key, left, top, width, height]}}
+    where the location is the first occurrence in the file.
+    """
+    words = {}
+    locations = {}
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            next(f, None)  # Header row
+            for line in f:
+                cols = line.rstrip('\r\n').split('\t', TSV_TEXT)
+                if len(cols) <= TSV_TEXT or cols[TSV_LEVEL] != TSV_WORD_LEVEL:
+                    continue
+
+                word = cols[TSV_TEXT]
+                try:
+                    conf = float(cols[TSV_CONF])
+                except ValueError:
+                    continue
+
+                if conf < 0 or conf >= threshold or not should_count_word(word):
+                    continue
+
+                add_confidence(words, word, conf)
+                if word not in locations:
+                    line_key = f"{cols[TSV_BLOCK]}.{cols[TSV_PAR]}.{cols[TSV_LINE]}"
+                    locations[word] = [line_key] + [int(v) for v in cols[TSV_LEFT:TSV_LEFT + 4]]
+    except Exception as e:
+        print(f"Warning: Error reading {filepath}: {e}", file=sys.stderr)
+
+    return {'words': words, 'locations': locations}
+
+
+def parse_lowconf_file(filepath: Path, threshold: float) -> dict:
+    """Parse a legacy lowconf file (no locations) into the same shape as parse_tsv_file"""
+    words = {}
     try:
         with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
             for line in f:
@@ -210,88 +289,251 @@ def parse_lowconf_file(filepath: Path) -> list[tuple[str, float]]:
                     continue
                 
                 # Parse format: "word (conf: XX.XXX)"
-                match = re.match(r'^(.+?) \(conf: ([\d.]+)\)$', line)
+                match = LOWCONF_LINE_RE.match(line)
                 if match:
                     word = match.group(1)
                     conf = float(match.group(2))
-                    results.append((word, conf))
+                    if conf < threshold and should_count_word(word):
+                        add_confidence(words, word, conf)
     except Exception as e:
         print(f"Warning: Error reading {filepath}: {e}", file=sys.stderr)
     
-    return results
+    return {'words': words, 'locations': {}}
 
 
-def find_lowconf_files(output_root: Path) -> list[Path]:
-    """Find all lowconf files in the converted directory"""
-    files = []
-    for chapter_dir in output_root.iterdir():
+def find_chapter_dirs(output_root: Path) -> list[Path]:
+    """Chapter directories of a converted book that have OCR output"""
+    chapters = []
+    for chapter_dir in sorted(output_root.iterdir()):
         if not chapter_dir.is_dir():
             continue
         if chapter_dir.name in ('final', 'statblocks', 'diagnostics'):
             continue
-        
-        temp_dir = chapter_dir / '.temp'
-        if temp_dir.exists():
-            for f in temp_dir.glob('*-lowconf.txt'):
-                files.append(f)
-    
-    return files
+        if (chapter_dir / '.temp').exists():
+            chapters.append(chapter_dir)
+    return chapters
 
 
-def analyze_lowconf_words(output_root: Path, threshold: float) -> dict:
-    """Analyze all low-confidence words and return statistics"""
-    word_counts = Counter()
-    word_confidences = defaultdict(list)
-    chapter_stats = defaultdict(int)
-    
-    lowconf_files = find_lowconf_files(output_root)
-    
-    for filepath in tqdm(lowconf_files, desc="Analyzing files", unit="file"):
-        chapter_name = filepath.parent.parent.name
-        entries = parse_lowconf_file(filepath)
-        
-        for word, conf in entries:
-            # Skip if above threshold
-            if conf >= threshold:
-                continue
-            
-            # Skip empty or whitespace
-            if not word.strip():
-                continue
-            
-            # Skip pure punctuation
-            if is_pure_punctuation(word):
-                continue
-            
-            # Skip preserved terms
-            if is_preserved_term(word):
-                continue
-            
-            word_counts[word] += 1
-            word_confidences[word].append(conf)
-            chapter_stats[chapter_name] += 1
-    
+def chapter_ocr_files(chapter_dir: Path) -> list[Path]:
+    """The chapter's OCR result files
+
+    Prefers tesseract TSVs; chapters without any fall back to *-lowconf.txt.
+    A page that was OCR'd per column only contributes its column TSVs.
+    """
+    temp_dir = chapter_dir / '.temp'
+    tsv_files = sorted(temp_dir.glob('*.tsv'))
+    if not tsv_files:
+        return sorted(temp_dir.glob('*-lowconf.txt'))
+    return [f for f in tsv_files if not (temp_dir / f'{f.stem}-col1.tsv').exists()]
+
+
+def find_ocr_files(output_root: Path) -> list[Path]:
+    """Find the OCR result files for every chapter in the converted directory"""
+    return [f for chapter_dir in find_chapter_dirs(output_root) for f in chapter_ocr_files(chapter_dir)]
+
+
+def find_books(archive: Path) -> list[Path]:
+    """The converted books in an archive directory (or the directory itself if it is one)"""
+    if find_chapter_dirs(archive):
+        return [archive]
+    return [d for d in sorted(archive.iterdir()) if d.is_dir() and find_chapter_dirs(d)]
+
+
+def load_cache(cache_path: Path) -> dict:
+    """Load the per-file parse cache, discarding it if unreadable or outdated"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache.get('files', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_cache(cache_path: Path, entries: dict):
+    """Write the parse cache atomically"""
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}", file=sys.stderr)
+
+
+def parse_ocr_file(filepath: Path, threshold: float) -> dict:
+    """Parse a TSV or legacy lowconf file"""
+    if filepath.suffix == '.tsv':
+        return parse_tsv_file(filepath, threshold)
+    return parse_lowconf_file(filepath, threshold)
+
+
+def new_partial(order: int = 0) -> dict:
+    """An empty mergeable aggregate; order ranks its shard for first-location ties"""
+    return {
+        'order': order,
+        'word_stats': {},                       # word → [count, sum, min, max]
+        'word_locations': {},                   # word → [page, line_key, left, top, width, height]
+        'location_order': {},                   # word → order of the shard its location came from
+        'chapter_stats': Counter(),
+        'provenance': defaultdict(Counter),     # word → book → count
+        'files': 0,
+        'parsed': 0,
+    }
+
+
+def analyze_chapter(order: int, book: str, label: str, chapter_dir: str, threshold: float,
+                    cache: dict) -> tuple[dict, dict]:
+    """Map: one chapter's partial aggregate and its refreshed cache entries"""
+    with span('analyze chapter', 'chapter', chapter=label):
+        return _analyze_chapter(order, book, label, Path(chapter_dir), threshold, cache)
+
+
+def _analyze_chapter(order: int, book: str, label: str, chapter_dir: Path, threshold: float,
+                     cache: dict) -> tuple[dict, dict]:
+    partial = new_partial(order)
+    entries = {}
+
+    for filepath in chapter_ocr_files(chapter_dir):
+        key = str(filepath.relative_to(chapter_dir.parent))
+        stat = filepath.stat()
+
+        entry = cache.get(key)
+        if not (entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+                and entry['threshold'] == threshold):
+            result = parse_ocr_file(filepath, threshold)
+            entry = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'threshold': threshold,
+                **result,
+            }
+            partial['parsed'] += 1
+        entries[key] = entry
+        partial['files'] += 1
+
+        merge_stats(partial['word_stats'], entry['words'])
+        for word, (count, *_) in entry['words'].items():
+            partial['chapter_stats'][label] += count
+            partial['provenance'][word][book] += count
+            if word not in partial['word_locations'] and word in entry['locations']:
+                partial['word_locations'][word] = [filepath.stem] + entry['locations'][word]
+                partial['location_order'][word] = order
+
+    return partial, entries
+
+
+def merge_partial(total: dict, partial: dict):
+    """Reduce: fold a chapter's partial aggregate into the running total"""
+    merge_stats(total['word_stats'], partial['word_stats'])
+    for word, location in partial['word_locations'].items():
+        # Keep the first occurrence in chapter order, whatever order shards finish in
+        if word not in total['word_locations'] or partial['order'] < total['location_order'][word]:
+            total['word_locations'][word] = location
+            total['location_order'][word] = partial['order']
+    total['chapter_stats'].update(partial['chapter_stats'])
+    for word, books in partial['provenance'].items():
+        total['provenance'][word].update(books)
+    total['files'] += partial['files']
+    total['parsed'] += partial['parsed']
+
+
+def analyze_corpus(books: list[Path], threshold: float, use_cache: bool = True,
+                   jobs: int | None = None, profile: Profile | None = None) -> dict:
+    """Analyze the low-confidence words of every chapter of every book
+
+    With a profile, every chapter is analyzed under cProfile, in the workers too.
+    """
+    shards = []
+    caches = {}
+    for book in books:
+        caches[book] = load_cache(book / CACHE_FILE) if use_cache else {}
+        for chapter_dir in find_chapter_dirs(book):
+            label = chapter_dir.name if len(books) == 1 else f"{book.name}/{chapter_dir.name}"
+            shards.append((book, label, chapter_dir))
+
+    def chapter_cache(book: Path, chapter_dir: Path) -> dict:
+        prefix = chapter_dir.name + os.sep
+        return {key: entry for key, entry in caches[book].items() if key.startswith(prefix)}
+
+    total = new_partial()
+    new_caches = defaultdict(dict)
+    args = [(order, book.name, label, str(chapter_dir), threshold, chapter_cache(book, chapter_dir))
+            for order, (book, label, chapter_dir) in enumerate(shards)]
+
+    if jobs == 1 or len(shards) <= 1:
+        results = (profile.run(analyze_chapter, *a) if profile else analyze_chapter(*a) for a in args)
+        for (book, _, _), (partial, entries) in tqdm(zip(shards, results), total=len(shards),
+                                                     desc="Analyzing chapters", unit="chapter"):
+            merge_partial(total, partial)
+            new_caches[book].update(entries)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            if profile:
+                futures = {pool.submit(profiled_call, analyze_chapter, *a): shards[a[0]][0] for a in args}
+            else:
+                futures = {pool.submit(analyze_chapter, *a): shards[a[0]][0] for a in args}
+            del args
+            for future in tqdm(as_completed(futures), total=len(futures),
+                               desc="Analyzing chapters", unit="chapter"):
+                if profile:
+                    (partial, entries), raw = future.result()
+                    profile.add(raw)
+                else:
+                    partial, entries = future.result()
+                merge_partial(total, partial)
+                new_caches[futures[future]].update(entries)
+
+    if use_cache:
+        for book in books:
+            if new_caches[book] != caches[book]:
+                save_cache(book / CACHE_FILE, new_caches[book])
+
+    # Ties in most_common() fall back to alphabetical order, independent of shard timing
+    word_counts = Counter({word: stats[0] for word, stats in sorted(total['word_stats'].items())})
     return {
         'word_counts': word_counts,
-        'word_confidences': word_confidences,
-        'chapter_stats': chapter_stats,
-        'total_files': len(lowconf_files),
+        'word_stats': total['word_stats'],
+        'word_locations': total['word_locations'],
+        'chapter_stats': total['chapter_stats'],
+        'provenance': total['provenance'],
+        'books': [book.name for book in books],
+        'total_files': total['files'],
+        'parsed_files': total['parsed'],
     }
 
 
-def generate_corrections_json(analysis: dict, min_occurrences: int) -> dict:
+def analyze_lowconf_words(output_root: Path, threshold: float, use_cache: bool = True,
+                          jobs: int | None = None, profile: Profile | None = None) -> dict:
+    """Analyze all low-confidence words of one converted book and return statistics"""
+    return analyze_corpus([output_root], threshold, use_cache, jobs, profile)
+
+
+def suggest_corrections(analysis: dict, min_occurrences: int, report_top: int = 20) -> dict:
+    """Compute suggestions once for every word that is written or reported"""
+    counts = analysis['word_counts']
+    words = [word for word, count in counts.items() if count >= min_occurrences]
+    words += [word for word, _ in counts.most_common(report_top)]
+    return {word: suggest_correction(word) for word in dict.fromkeys(words)}
+
+
+def generate_corrections_json(analysis: dict, min_occurrences: int, suggestions: dict | None = None) -> dict:
     """Generate the corrections.json structure"""
     corrections = {}
+    suggestions = suggestions or {}
     
     for word, count in analysis['word_counts'].most_common():
         if count < min_occurrences:
             continue
         
-        suggestion = suggest_correction(word)
+        suggestion = suggestions[word] if word in suggestions else suggest_correction(word)
         if suggestion is not None:
             # Store as: wrong_ocr_word -> correct_word (so sed replaces wrong with correct)
             corrections[word] = suggestion
     
+    # Which books each correction was learned from, and how often it was seen in each
+    provenance = analysis.get('provenance', {})
     return {
         "metadata": {
             "description": "OCR correction patterns learned from low-confidence word analysis",
@@ -299,15 +541,18 @@ def generate_corrections_json(analysis: dict, min_occurrences: int) -> dict:
             "generated": datetime.now().isoformat(),
             "word_count": len(analysis['word_counts']),
             "corrections_count": len(corrections),
+            "books": analysis.get('books', []),
         },
         "corrections": corrections,
+        "provenance": {word: dict(provenance[word]) for word in corrections if word in provenance},
         "garbage_patterns": GARBAGE_PATTERNS,
         "preserve_terms": list(PRESERVE_TERMS),
     }
 
 
-def print_report(analysis: dict, threshold: float, min_occurrences: int):
+def print_report(analysis: dict, threshold: float, min_occurrences: int, suggestions: dict | None = None):
     """Print a human-readable analysis report"""
+    suggestions = suggestions or {}
     print()
     print("╔════════════════════════════════════════════════════════════╗")
     print("║       LOW-CONFIDENCE WORD ANALYSIS REPORT              ║")
@@ -326,15 +571,16 @@ def print_report(analysis: dict, threshold: float, min_occurrences: int):
     print()
     print("Most Common Low-Confidence Words (top 20):")
     for word, count in analysis['word_counts'].most_common(20):
-        suggestion = suggest_correction(word)
-        avg_conf = sum(analysis['word_confidences'][word]) / len(analysis['word_confidences'][word])
+        suggestion = suggestions[word] if word in suggestions else suggest_correction(word)
+        _, conf_sum, conf_min, conf_max = analysis['word_stats'][word]
+        conf = f"conf {conf_sum / count:.0f}, {conf_min:.0f}-{conf_max:.0f}"
         if suggestion is not None:
             if suggestion == "":
-                print(f"  {count:4} × {word:20} → (delete)")
+                print(f"  {count:4} × {word:20} → (delete)  [{conf}]")
             else:
-                print(f"  {count:4} × {word:20} → {suggestion}")
+                print(f"  {count:4} × {word:20} → {suggestion}  [{conf}]")
         else:
-            print(f"  {count:4} × {word:20}   (no suggestion)")
+            print(f"  {count:4} × {word:20}   (no suggestion)  [{conf}]")
     print()
 
 
@@ -342,8 +588,12 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Analyze OCR low-confidence words and generate corrections')
-    parser.add_argument('output_root', nargs='?', default='converted_harbinger_house',
-                        help='Path to converted directory')
+    parser.add_argument('output_root', nargs='*', default=['converted_harbinger_house'],
+                        help='Path to converted directory (with --corpus: archive directories of books)')
+    parser.add_argument('--corpus', action='store_true',
+                        help='Learn from every converted book under the given directories')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Parallel chapter workers (default: CPU count)')
     parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
                         help=f'Confidence threshold (default: {DEFAULT_THRESHOLD})')
     parser.add_argument('--min-occur', type=int, default=DEFAULT_MIN_OCCURRENCES,
@@ -352,23 +602,54 @@ def main():
                         help=f'Output file (default: {DEFAULT_OUTPUT})')
     parser.add_argument('--quiet', action='store_true',
                         help='Suppress report output')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'Re-parse every OCR file instead of using {CACHE_FILE}')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FILE',
+                        help='Profile the analysis and suggestion loops; print the top functions '
+                             '(and save pstats to FILE)')
     
     args = parser.parse_args()
+    profile = Profile(args.profile or None) if args.profile is not None else None
     
-    output_root = Path(args.output_root)
-    if not output_root.exists():
-        print(f"Error: Directory not found: {output_root}", file=sys.stderr)
+    roots = [Path(root) for root in args.output_root]
+    for root in roots:
+        if not root.exists():
+            print(f"Error: Directory not found: {root}", file=sys.stderr)
+            sys.exit(1)
+
+    if not args.corpus and len(roots) > 1:
+        print("Error: Several directories need --corpus", file=sys.stderr)
         sys.exit(1)
-    
+
     # Analyze
-    print(f"Analyzing low-confidence words in {output_root}...", file=sys.stderr)
-    analysis = analyze_lowconf_words(output_root, args.threshold)
+    if args.corpus:
+        books = list(dict.fromkeys(book for root in roots for book in find_books(root)))
+        if not books:
+            print(f"Error: No converted books found in {', '.join(map(str, roots))}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Analyzing low-confidence words in {len(books)} books...", file=sys.stderr)
+        with span('analyze', 'stage', books=len(books)):
+            analysis = analyze_corpus(books, args.threshold, use_cache=not args.no_cache,
+                                      jobs=args.jobs, profile=profile)
+    else:
+        print(f"Analyzing low-confidence words in {roots[0]}...", file=sys.stderr)
+        with span('analyze', 'stage', book=roots[0].name):
+            analysis = analyze_lowconf_words(roots[0], args.threshold, use_cache=not args.no_cache,
+                                             jobs=args.jobs, profile=profile)
+    print(f"Parsed {analysis['parsed_files']} of {analysis['total_files']} files "
+          f"({analysis['total_files'] - analysis['parsed_files']} cached)", file=sys.stderr)
+    
+    with span('suggest', 'stage', words=len(analysis['word_counts'])):
+        if profile:
+            suggestions = profile.run(suggest_corrections, analysis, args.min_occur)
+        else:
+            suggestions = suggest_corrections(analysis, args.min_occur)
     
     if not args.quiet:
-        print_report(analysis, args.threshold, args.min_occur)
+        print_report(analysis, args.threshold, args.min_occur, suggestions)
     
     # Generate corrections
-    corrections_data = generate_corrections_json(analysis, args.min_occur)
+    corrections_data = generate_corrections_json(analysis, args.min_occur, suggestions)
     
     # Write output
     with open(args.output, 'w', encoding='utf-8') as f:
@@ -377,6 +658,9 @@ def main():
     print(f"✨ Corrections saved to {args.output}")
     print(f"   {len(corrections_data['corrections'])} corrections generated")
 
+    if profile:
+        profile.report()
+
 
 if __name__ == '__main__':
     main()
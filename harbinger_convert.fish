@@ -32,16 +32,21 @@ set -g OCR_PSM 6
 set -g OCR_OEM 1
 set -g OCR_USER_WORDS ""
 set -g OCR_LANGUAGE "eng"
-
-# Detect ImageMagick version and set command
-if command -v magick &>/dev/null
-    set -g MAGICK_CMD magick
-else if command -v convert &>/dev/null
-    set -g MAGICK_CMD convert
-else
-    echo (set_color red)"[ERROR]"(set_color normal) "ImageMagick not found. Please install it." >&2
-    exit 1
-end
+set -g OCR_DRIVER (dirname (status filename))/ocr_pool.py
+# v2.2: NumPy preprocessing; -processed.png is only written when something reads it
+set -g PREPROCESS_ENGINE (dirname (status filename))/preprocess_pages.py
+set -g WRITE_PROCESSED false
+set -g SHARED_MEMORY false
+# v2.3: Pages are rendered once per DPI into a shared store and linked into .temp
+set -g RASTER_ENGINE (dirname (status filename))/rasterize_pages.py
+set -g SCHEDULER (dirname (status filename))/pipeline_scheduler.py
+set -g PAGE_STORE ""
+set -g PAGE_RANGE ""
+# v2.4: Columns, sidebars and boxes are detected automatically (segment_pages.py)
+set -g SEGMENT_PAGES false
+# v2.5: OCR results are cached by image content and OCR settings across runs (ocr_cache.py)
+set -g OCR_CACHE true
+set -g OCR_CACHE_MAX_MB 2048
 
 # ============================================================================
 # LOGGING FUNCTIONS
@@ -76,82 +81,50 @@ function log_complete
 end
 
 # ============================================================================
-# UNIFIED CHECKPOINT FUNCTIONS (Single JSON file)
+# UNIFIED CHECKPOINT FUNCTIONS (SQLite state store, see pipeline_state.py)
 # ============================================================================
 
-set -g CHECKPOINT_FILE ".pipeline_state.json"
-
-function checkpoint_init
-    set state_file "$OUTPUT_DIR/$CHECKPOINT_FILE"
-    if not test -f $state_file
-        echo '{"steps": {}, "created": "'(date -Iseconds)'", "version": "2.0"}' > $state_file
-    end
-end
+set -g STATE_TOOL (dirname (status filename))/pipeline_state.py
 
 function checkpoint_exists
     set step_name $argv[1]
-    set state_file "$OUTPUT_DIR/$CHECKPOINT_FILE"
-
-    if not test -f $state_file
-        return 1
-    end
-
-    if not command -v jq &>/dev/null
-        # Fallback: simple grep
-        grep -q "\"$step_name\"" $state_file
-        return $status
-    end
-
-    set result (jq -r ".steps.\"$step_name\" // \"null\"" $state_file 2>/dev/null)
-    test "$result" != "null"
+    python3 $STATE_TOOL $OUTPUT_DIR has-step $step_name 2>/dev/null
 end
 
 function checkpoint_mark
     set step_name $argv[1]
-    set state_file "$OUTPUT_DIR/$CHECKPOINT_FILE"
-
-    checkpoint_init
 
-    if not command -v jq &>/dev/null
-        log_warn "jq not available, checkpoint tracking limited"
+    if not python3 $STATE_TOOL $OUTPUT_DIR mark-step $step_name
+        log_warn "Could not record checkpoint: $step_name"
         return
     end
 
-    # Update the JSON with timestamp for this step
-    jq ".steps.\"$step_name\" = \""(date -Iseconds)"\" | .updated = \""(date -Iseconds)"\"" $state_file > $state_file.tmp
-    mv $state_file.tmp $state_file
-
     log_substep "Checkpoint saved: $step_name"
 end
 
 function checkpoint_clear
-    set state_file "$OUTPUT_DIR/$CHECKPOINT_FILE"
-    rm -f $state_file 2>/dev/null
+    python3 $STATE_TOOL $OUTPUT_DIR clear --pages 2>/dev/null
 
     # Also clean up old-style checkpoints
-    rm -f $OUTPUT_DIR/.checkpoint_* 2>/dev/null
+    rm -f $OUTPUT_DIR/.checkpoint_* $OUTPUT_DIR/.pipeline_state.json 2>/dev/null
 
     log_info "All checkpoints cleared"
 end
 
 function checkpoint_status
-    set state_file "$OUTPUT_DIR/$CHECKPOINT_FILE"
-
     echo (set_color yellow)"Checkpoint Status:"(set_color normal) >&2
 
-    if not test -f $state_file
+    set steps (python3 $STATE_TOOL $OUTPUT_DIR steps 2>/dev/null)
+    if test (count $steps) -eq 0
         echo "  No checkpoints found" >&2
         return
     end
 
     for step in extract preprocess ocr cleanup
-        if checkpoint_exists $step
-            if command -v jq &>/dev/null
-                set timestamp (jq -r ".steps.\"$step\"" $state_file 2>/dev/null)
-                echo "  ✓ $step ($timestamp)" >&2
-            else
-                echo "  ✓ $step" >&2
-            end
+        set -l recorded (string match -r "^$step\t.*" -- $steps)
+        if test -n "$recorded"
+            set timestamp (string split -f2 \t -- $recorded)
+            echo "  ✓ $step ($timestamp)" >&2
         else
             echo "  ○ $step" >&2
         end
@@ -194,6 +167,11 @@ function load_config
         set -g DO_MORPHOLOGY true
         set -g MORPHOLOGY_OP $morphology_val
     end
+
+    # -processed.png defaults to on when the interactive tool will read it
+    set -g WRITE_PROCESSED (jq -r 'if (.preprocessing | has("write_processed")) then .preprocessing.write_processed else (.interactive_preprocessing.enabled // false) end' $CONFIG_FILE)
+    set -g SHARED_MEMORY (jq -r '.preprocessing.shared_memory // false' $CONFIG_FILE)
+    set -g SEGMENT_PAGES (jq -r '.segmentation.enabled // false' $CONFIG_FILE)
     
     # Load OCR settings
     set -g OCR_CONFIDENCE_THRESHOLD (jq -r '.ocr.confidence_threshold // 60' $CONFIG_FILE)
@@ -201,6 +179,8 @@ function load_config
     set -g OCR_PSM (jq -r '.ocr.psm // 6' $CONFIG_FILE)
     set -g OCR_OEM (jq -r '.ocr.oem // 1' $CONFIG_FILE)
     set -g OCR_LANGUAGE (jq -r '.ocr.language // "eng"' $CONFIG_FILE)
+    set -g OCR_CACHE (jq -r 'if (.ocr | has("cache")) then .ocr.cache else true end' $CONFIG_FILE)
+    set -g OCR_CACHE_MAX_MB (jq -r '.ocr.cache_max_mb // 2048' $CONFIG_FILE)
     
     # Load user words file (relative to config file or absolute)
     set user_words_val (jq -r '.ocr.user_words // ""' $CONFIG_FILE)
@@ -222,77 +202,10 @@ function load_config
     end
 end
 
-# ============================================================================
-# PREPROCESSING FUNCTION (Advanced)
-# ============================================================================
-
-function preprocess_image
-    set input_img $argv[1]
-    set output_img $argv[2]
-    
-    # Build ImageMagick command dynamically based on config
-    set cmd $MAGICK_CMD $input_img
-    
-    # Always convert to grayscale
-    set cmd $cmd -colorspace Gray
-    
-    # Deskew if enabled
-    if test "$DO_DESKEW" = "true"
-        set cmd $cmd -deskew "$DESKEW_THRESHOLD%"
-    end
-    
-    # Despeckle if enabled
-    if test "$DO_DESPECKLE" = "true"
-        set cmd $cmd -despeckle
-    end
-    
-    # Contrast stretch
-    if test -n "$CONTRAST_STRETCH"
-        set cmd $cmd -contrast-stretch $CONTRAST_STRETCH
-    end
-    
-    # Level adjustment
-    if test -n "$LEVEL_ADJUST"
-        set cmd $cmd -level $LEVEL_ADJUST
-    end
-    
-    # Morphology for cleaning up broken characters
-    if test "$DO_MORPHOLOGY" = "true"
-        set cmd $cmd -morphology $MORPHOLOGY_OP
-    end
-    
-    # Finalize: remove alpha, set white background
-    set cmd $cmd -background white -alpha remove -alpha off $output_img
-    
-    # Execute
-    eval $cmd
-end
-
 # ============================================================================
 # PARALLEL PAGE PROCESSOR - PREPROCESSING STAGE
 # ============================================================================
 
-function preprocess_single_page
-    set img $argv[1]
-    set temp_dir $argv[2]
-    set basename (basename $img .png)
-
-    # Skip if interactive preprocessing artifacts exist (user already cleaned)
-    set cleaned_img $temp_dir/$basename-cleaned.png
-    set column_1_img $temp_dir/$basename-column-1.png
-
-    if test -f $cleaned_img; or test -f $column_1_img
-        # Interactive preprocessing already done, skip auto-preprocessing
-        echo "done" > $temp_dir/$basename-preprocess.complete
-        return 0
-    end
-
-    # Run auto-preprocessing
-    preprocess_image $img $temp_dir/$basename-processed.png
-
-    echo "done" > $temp_dir/$basename-preprocess.complete
-end
-
 function preprocess_pages_parallel
     set temp_dir $argv[1]
     # Only process original pages, not intermediate files
@@ -301,52 +214,23 @@ function preprocess_pages_parallel
                     -not -name "*-cleaned.png" \
                     -not -name "*-column-*.png" | sort -V)
     set total_pages (count $page_files)
-    set processed 0
-    set completed 0
-
-    log_substep "Preprocessing $total_pages pages with $PARALLEL_JOBS parallel jobs..."
-
-    progress_start $total_pages "Preprocess images"
 
-    for img in $page_files
-        set basename (basename $img .png)
-
-        # Skip if already preprocessed
-        if test -f $temp_dir/$basename-preprocess.complete
-            set processed (math $processed + 1)
-            set completed (math $completed + 1)
-            progress_update $completed
-            continue
-        end
-
-        # Launch background job
-        preprocess_single_page $img $temp_dir &
-
-        # Limit concurrent jobs
-        while test (jobs -p | wc -l) -ge $PARALLEL_JOBS
-            set new_completed (count $temp_dir/*-preprocess.complete 2>/dev/null)
-            if test $new_completed -gt $completed
-                set completed $new_completed
-                progress_update $completed
-            end
-            sleep 0.2
-        end
-
-        set processed (math $processed + 1)
+    if test "$WRITE_PROCESSED" != "true"
+        # The OCR workers preprocess each page in memory, no PNG round-trip
+        log_substep "Preprocessing $total_pages pages in memory during OCR (write_processed is off)"
+        return 0
     end
 
-    # Wait for all jobs
-    while test (jobs -p | wc -l) -gt 0
-        set new_completed (count $temp_dir/*-preprocess.complete 2>/dev/null)
-        if test $new_completed -gt $completed
-            set completed $new_completed
-            progress_update $completed
-        end
-        sleep 0.3
+    log_substep "Preprocessing $total_pages pages with $PARALLEL_JOBS parallel jobs..."
+
+    # Pages with interactive artifacts (cleaned or column images) are skipped by the engine
+    set preprocess_args $temp_dir --jobs $PARALLEL_JOBS
+    if test -n "$CONFIG_FILE"; and test -f "$CONFIG_FILE"
+        set preprocess_args $preprocess_args --config $CONFIG_FILE
     end
 
-    progress_update $total_pages
-    progress_finish
+    # The engine reports progress as its pool completes pages
+    python3 $PREPROCESS_ENGINE $preprocess_args
 
     log_substep "All $total_pages pages preprocessed"
 end
@@ -355,186 +239,61 @@ end
 # PARALLEL PAGE PROCESSOR - OCR STAGE
 # ============================================================================
 
-function ocr_single_page
-    set temp_dir $argv[1]
-    set basename $argv[2]
-
-    # Check for interactive preprocessing artifacts
-    set cleaned_img $temp_dir/$basename-cleaned.png
-    set column_1_img $temp_dir/$basename-column-1.png
-    set processed_img $temp_dir/$basename-processed.png
-    set original_img $temp_dir/$basename.png
-
-    # Determine which image(s) to use for OCR
-    if test -f $column_1_img
-        # Interactive preprocessing created column images - OCR each separately
-        # Write status to progress queue (for inline progress display)
-        progress_set_status "columns: $basename" "$temp_dir/.progress_status"
-
-        # Find all column images
-        set column_images
-        set col_num 1
-        while test -f $temp_dir/$basename-column-$col_num.png
-            set column_images $column_images $temp_dir/$basename-column-$col_num.png
-            set col_num (math $col_num + 1)
-        end
-
-        # OCR each column
-        set combined_text ""
-        set combined_tsv_header ""
-        set combined_lowconf ""
-
-        for col_idx in (seq 1 (count $column_images))
-            set col_img $column_images[$col_idx]
-            set col_base "$basename-col$col_idx"
-
-            # Run OCR on this column
-            set tess_args $col_img $temp_dir/$col_base
-            set tess_args $tess_args -l $OCR_LANGUAGE
-            set tess_args $tess_args --psm $OCR_PSM
-            set tess_args $tess_args --oem $OCR_OEM
-
-            if test -n "$OCR_USER_WORDS"; and test -f "$OCR_USER_WORDS"
-                set tess_args $tess_args --user-words $OCR_USER_WORDS
-            end
-
-            tesseract $tess_args tsv 2>/dev/null
-            tesseract $tess_args txt 2>/dev/null
-
-            # Extract low-confidence words from this column
-            if test -f $temp_dir/$col_base.tsv
-                awk -F'\t' -v threshold=$OCR_CONFIDENCE_THRESHOLD \
-                    'NR > 1 && $11 != "" && $11 < threshold && $12 != "" {
-                        print $12 " (conf: " $11 ")"
-                    }' $temp_dir/$col_base.tsv >> $temp_dir/$basename-lowconf.txt
-            end
-        end
-
-        # Combine column text files into single output
-        echo "" > $temp_dir/$basename-text.txt
-        for col_idx in (seq 1 (count $column_images))
-            set col_base "$basename-col$col_idx"
-            if test -f $temp_dir/$col_base.txt
-                echo "" >> $temp_dir/$basename-text.txt
-                echo "" >> $temp_dir/$basename-text.txt
-                echo "<!-- COLUMN $col_idx -->" >> $temp_dir/$basename-text.txt
-                echo "" >> $temp_dir/$basename-text.txt
-                cat $temp_dir/$col_base.txt >> $temp_dir/$basename-text.txt
-            end
-        end
-
-    else if test -f $cleaned_img
-        # Interactive preprocessing created a cleaned image (no columns)
-        # Write status to progress queue (for inline progress display)
-        progress_set_status "cleaned: $basename" "$temp_dir/.progress_status"
-
-        # Use cleaned image directly (already preprocessed by user)
-        set tess_args $cleaned_img $temp_dir/$basename
-        set tess_args $tess_args -l $OCR_LANGUAGE
-        set tess_args $tess_args --psm $OCR_PSM
-        set tess_args $tess_args --oem $OCR_OEM
-
-        if test -n "$OCR_USER_WORDS"; and test -f "$OCR_USER_WORDS"
-            set tess_args $tess_args --user-words $OCR_USER_WORDS
-        end
-
-        tesseract $tess_args tsv 2>/dev/null
-        tesseract $tess_args txt 2>/dev/null
-
-        # Extract low-confidence words
-        if test -f $temp_dir/$basename.tsv
-            awk -F'\t' -v threshold=$OCR_CONFIDENCE_THRESHOLD \
-                'NR > 1 && $11 != "" && $11 < threshold && $12 != "" {
-                    print $12 " (conf: " $11 ")"
-                }' $temp_dir/$basename.tsv > $temp_dir/$basename-lowconf.txt
-        end
-
-    else if test -f $processed_img
-        # Auto-preprocessed image exists
-        set tess_args $processed_img $temp_dir/$basename
-        set tess_args $tess_args -l $OCR_LANGUAGE
-        set tess_args $tess_args --psm $OCR_PSM
-        set tess_args $tess_args --oem $OCR_OEM
-
-        if test -n "$OCR_USER_WORDS"; and test -f "$OCR_USER_WORDS"
-            set tess_args $tess_args --user-words $OCR_USER_WORDS
-        end
-
-        tesseract $tess_args tsv 2>/dev/null
-        tesseract $tess_args txt 2>/dev/null
-
-        # Extract low-confidence words
-        if test -f $temp_dir/$basename.tsv
-            awk -F'\t' -v threshold=$OCR_CONFIDENCE_THRESHOLD \
-                'NR > 1 && $11 != "" && $11 < threshold && $12 != "" {
-                    print $12 " (conf: " $11 ")"
-                }' $temp_dir/$basename.tsv > $temp_dir/$basename-lowconf.txt
-        end
-    else
-        log_warn "No preprocessed image found for $basename, skipping OCR"
-        return 1
-    end
-
-    echo "done" > $temp_dir/$basename-ocr.complete
-end
-
 function ocr_pages_parallel
     set temp_dir $argv[1]
-    
-    # Find unique page basenames from any page artifact (columns, cleaned, processed, or original)
-    set page_basenames (find $temp_dir -name "page-*.png" -o -name "page-*-column-*.png" -o -name "page-*-cleaned.png" | \
+
+    # Unique page basenames from any page artifact (columns, cleaned, processed, or original)
+    set page_basenames (find $temp_dir -name "page-*.png" | \
                         sed 's/-column-[0-9]*\.png$//' | sed 's/-cleaned\.png$//' | sed 's/-processed\.png$//' | \
                         sed 's/\.png$//' | sort -u | xargs -n1 basename)
-    
-    set total_pages (count $page_basenames)
-    set processed 0
-    set completed 0
 
-    log_substep "OCR $total_pages pages with $PARALLEL_JOBS parallel jobs..."
+    set total_pages (count $page_basenames)
 
-    # Initialize progress tracking with status file for parallel jobs
-    progress_start $total_pages "OCR pages" $temp_dir
+    log_substep "OCR $total_pages pages with $PARALLEL_JOBS persistent workers..."
 
-    for basename in $page_basenames
-        # Skip if already OCR'd (for resume capability)
-        if test -f $temp_dir/$basename-ocr.complete
-            set processed (math $processed + 1)
-            set completed (math $completed + 1)
-            progress_update $completed
-            continue
-        end
+    # One long-lived worker per job loads the model and user words once and
+    # recognizes each image a single time for the .tsv, -text.txt and -lowconf.txt
+    set ocr_args $temp_dir --jobs $PARALLEL_JOBS
+    set ocr_args $ocr_args --lang $OCR_LANGUAGE --psm $OCR_PSM --oem $OCR_OEM
+    set ocr_args $ocr_args --threshold $OCR_CONFIDENCE_THRESHOLD
 
-        # Launch background job
-        ocr_single_page $temp_dir $basename &
+    # Pages without a -processed.png are preprocessed in memory
+    set ocr_args $ocr_args --preprocess
+    if test -n "$CONFIG_FILE"; and test -f "$CONFIG_FILE"
+        set ocr_args $ocr_args --config $CONFIG_FILE
+    end
+    if test "$SHARED_MEMORY" = "true"
+        set ocr_args $ocr_args --shared-memory
+    end
+    # Pages nobody drew columns for are split into detected regions
+    if test "$SEGMENT_PAGES" = "true"
+        set ocr_args $ocr_args --segment
+    end
+    # Unchanged pages are answered from the OCR cache (true, false or a directory)
+    switch $OCR_CACHE
+        case false null
+            set ocr_args $ocr_args --no-cache
+        case true
+            set ocr_args $ocr_args --cache-max-mb $OCR_CACHE_MAX_MB
+        case '*'
+            set ocr_args $ocr_args --cache-dir $OCR_CACHE --cache-max-mb $OCR_CACHE_MAX_MB
+    end
+    if test -n "$OCR_USER_WORDS"; and test -f "$OCR_USER_WORDS"
+        set ocr_args $ocr_args --user-words $OCR_USER_WORDS
+    end
 
-        # Limit concurrent jobs
-        while test (jobs -p | wc -l) -ge $PARALLEL_JOBS
-            # Check for newly completed jobs and update progress
-            set new_completed (count $temp_dir/*-ocr.complete 2>/dev/null)
-            if test $new_completed -gt $completed
-                set completed $new_completed
-                progress_update $completed
-            end
-            sleep 0.2
-        end
+    # The driver reports progress as its pool completes pages
+    python3 $OCR_DRIVER $ocr_args
+    set ocr_status $status
 
-        set processed (math $processed + 1)
+    set completed (python3 $STATE_TOOL $OUTPUT_DIR count ocr)
+    if test $completed -lt $total_pages
+        log_warn (math $total_pages - $completed)" of $total_pages pages failed OCR"
     end
-
-    # Wait for all jobs to complete
-    while test (jobs -p | wc -l) -gt 0
-        set new_completed (count $temp_dir/*-ocr.complete 2>/dev/null)
-        if test $new_completed -gt $completed
-            set completed $new_completed
-            progress_update $completed
-        end
-        sleep 0.3
+    if test $ocr_status -ne 0
+        return $ocr_status
     end
 
-    # Final update
-    progress_update $total_pages
-    progress_finish
-
     log_substep "All $total_pages pages OCR'd"
 end
 
@@ -549,68 +308,42 @@ function stage_extract
     else
         log_step "STEP 1: PDF Extraction"
 
-        # Get total page count for progress
-        set total_pages 0
-        if command -v pdfinfo &>/dev/null
-            set total_pages (pdfinfo $PDF_FILE 2>/dev/null | grep "Pages:" | awk '{print $2}')
-        end
-        if test -z "$total_pages"; or test "$total_pages" = "0"
-            set total_pages 1
+        # Default: the whole PDF; --page-range limits it to a chapter's book pages
+        set page_range $PAGE_RANGE
+        if test -z "$page_range"
+            set total_pages 0
+            if command -v pdfinfo &>/dev/null
+                set total_pages (pdfinfo $PDF_FILE 2>/dev/null | grep "Pages:" | awk '{print $2}')
+            end
+            if test -z "$total_pages"; or test "$total_pages" = "0"
+                set total_pages 1
+            end
+            set page_range "1-$total_pages"
         end
 
         if set -q DEMO_MODE
+            set first_page (string split "-" $page_range)[1]
+            set page_range "$first_page-$first_page"
             log_substep "DEMO MODE: Extracting first page only at $DPI DPI..."
-            set total_pages 1
         end
 
-        log_substep "Extracting $total_pages pages at $DPI DPI (using pdftocairo)..."
-        progress_start $total_pages "Extracting pages"
-
-        # Use pdftocairo with JPEG for faster extraction (2-3x faster than pdftoppm PNG)
-        # Falls back to pdftoppm if pdftocairo not available
-        if command -v pdftocairo &>/dev/null
-            if set -q DEMO_MODE
-                pdftocairo -jpeg -r $DPI -f 1 -l 1 $PDF_FILE $TEMP_DIR/page 2>/dev/null &
-            else
-                pdftocairo -jpeg -r $DPI $PDF_FILE $TEMP_DIR/page 2>/dev/null &
-            end
-        else
-            log_warn "pdftocairo not found, falling back to pdftoppm (slower)"
-            if set -q DEMO_MODE
-                pdftoppm -jpeg -r $DPI -f 1 -l 1 $PDF_FILE $TEMP_DIR/page 2>/dev/null &
-            else
-                pdftoppm -jpeg -r $DPI $PDF_FILE $TEMP_DIR/page 2>/dev/null &
-            end
+        set page_store $PAGE_STORE
+        if test -z "$page_store"
+            set page_store $OUTPUT_DIR/.pages
         end
 
-        set extract_pid $last_pid
-
-        # Monitor progress by counting extracted files
-        set extracted_count 0
-        while kill -0 $extract_pid 2>/dev/null
-            set new_count (count $TEMP_DIR/page-*.jpg 2>/dev/null)
-            if test $new_count -gt $extracted_count
-                set extracted_count $new_count
-                progress_update $extracted_count
-            end
-            sleep 0.3
+        if not command -v python3 &>/dev/null; or not test -f $RASTER_ENGINE
+            log_error "python3 and rasterize_pages.py are required for extraction"
+            return 1
         end
 
-        # Wait for completion and get final count
-        wait $extract_pid
-
-        # Rename jpg to png for consistency with rest of pipeline
-        for jpg_file in $TEMP_DIR/page-*.jpg
-            if test -f $jpg_file
-                set png_file (string replace '.jpg' '.png' $jpg_file)
-                mv $jpg_file $png_file
-            end
-        end
+        # Pages already in the store are linked, not rendered again
+        log_substep "Extracting pages $page_range at $DPI DPI (store: $page_store/$DPI""dpi)..."
+        python3 $RASTER_ENGINE $PDF_FILE --store $page_store --dpi $DPI --jobs $PARALLEL_JOBS \
+            --chapter "$page_range:$TEMP_DIR"
 
         set page_files $TEMP_DIR/page-*.png
         set final_count (count $page_files)
-        progress_update $final_count
-        progress_finish
 
         if test $final_count -eq 0
             log_error "No pages extracted from PDF!"
@@ -672,7 +405,11 @@ function stage_ocr
     else
         log_step "STEP 3: OCR (Parallel)"
 
-        ocr_pages_parallel $TEMP_DIR
+        # Failed pages leave the stage unrecorded so the next run retries them
+        if not ocr_pages_parallel $TEMP_DIR
+            log_error "OCR failed; rerun --stage ocr to retry the failed pages"
+            return 1
+        end
 
         checkpoint_mark "ocr"
     end
@@ -761,6 +498,56 @@ function stage_combine
     log_complete
 end
 
+function stage_all
+    if checkpoint_exists "combine"
+        log_step "ALL STAGES [CACHED]"
+        log_substep "Using cached output from previous run"
+        log_complete
+        return 0
+    end
+
+    log_step "ALL STAGES: Extract → Preprocess → OCR → Combine (streaming)"
+
+    if not command -v python3 &>/dev/null; or not test -f $SCHEDULER
+        log_error "python3 and pipeline_scheduler.py are required"
+        return 1
+    end
+
+    set page_range $PAGE_RANGE
+    if test -z "$page_range"
+        set total_pages (pdfinfo $PDF_FILE 2>/dev/null | grep "Pages:" | awk '{print $2}')
+        if test -z "$total_pages"; or test "$total_pages" = "0"
+            set total_pages 1
+        end
+        set page_range "1-$total_pages"
+    end
+
+    set page_store $PAGE_STORE
+    if test -z "$page_store"
+        set page_store $OUTPUT_DIR/.pages
+    end
+
+    set scheduler_args $PDF_FILE --chapter "$page_range:$OUTPUT_DIR" --store $page_store
+    set scheduler_args $scheduler_args --dpi $DPI --jobs $PARALLEL_JOBS
+    if test -n "$CONFIG_FILE"; and test -f "$CONFIG_FILE"
+        set scheduler_args $scheduler_args --config $CONFIG_FILE
+    end
+    if set -q DEMO_MODE
+        set scheduler_args $scheduler_args --demo
+    end
+
+    python3 $SCHEDULER $scheduler_args
+    or log_warn "Some pages failed, see errors above"
+
+    if not checkpoint_exists "combine"
+        log_error "Conversion did not complete"
+        return 1
+    end
+
+    log_substep "Markdown output: $OUTPUT_DIR/converted.md"
+    log_complete
+end
+
 function run_conversion
     # Run based on STAGE variable
     switch $STAGE
@@ -773,12 +560,9 @@ function run_conversion
         case "combine"
             stage_combine
         case "all"
-            # Run all stages in sequence
-            stage_extract
-            stage_preprocess
-            # Note: Interactive preprocessing happens externally between preprocess and ocr
-            stage_ocr
-            stage_combine
+            # Pages stream through every stage; interactive preprocessing
+            # needs the staged runs (--stage preprocess, then --stage ocr)
+            stage_all
         case "*"
             log_error "Invalid stage: $STAGE"
             log_error "Valid stages: extract, preprocess, ocr, combine, all"
@@ -806,6 +590,12 @@ function parse_args
             case --stage
                 set i (math $i + 1)
                 set -g STAGE $argv[$i]
+            case --page-store
+                set i (math $i + 1)
+                set -g PAGE_STORE $argv[$i]
+            case --page-range
+                set i (math $i + 1)
+                set -g PAGE_RANGE $argv[$i]
             case --resume
                 # Don't clear checkpoints
                 set -g RESUME_MODE true
@@ -858,6 +648,8 @@ if test -z "$PDF_FILE"
     echo "  --clean              Clear checkpoints and start fresh"
     echo "  --status             Show checkpoint status only"
     echo "  --demo               Demo mode: only process first page"
+    echo "  --page-store DIR     Shared page store (default: output_dir/.pages)"
+    echo "  --page-range A-B     Only extract these pages of the PDF"
     echo ""
     echo "Examples:"
     echo "  # Full pipeline (all stages):"
@@ -925,8 +717,9 @@ end
 # Record start time
 set START_TIME (date +%s)
 
-# Run the conversion
+# Run the conversion; a failed stage keeps its images and exits non-zero
 run_conversion
+or exit 1
 
 # Cleanup temp files (but keep checkpoints)
 # Only cleanup images if we completed OCR or running full pipeline
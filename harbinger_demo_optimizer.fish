@@ -1,7 +1,8 @@
 #!/usr/bin/env fish
 
 # harbinger_demo_optimizer.fish - Test multiple preprocessing configs and pick the best
-# Usage: ./harbinger_demo_optimizer.fish --config pipeline_config.json
+# Presets run in parallel through benchmark_presets.py (preset × page cells, Pareto summary)
+# Usage: ./harbinger_demo_optimizer.fish --config pipeline_config.json [--pages 1-3]
 
 # Source progress utilities
 source (dirname (status filename))/progress_utils.fish
@@ -10,6 +11,8 @@ set -g PDF_FILE ""
 set -g CONFIG_FILE ""
 set -g OUTPUT_ROOT ""
 set -g DEMO_ROOT ""
+set -g SAMPLE_PAGES "1-3"
+set -g BENCHMARK_ENGINE (dirname (status filename))"/benchmark_presets.py"
 
 # ============================================================================
 # LOGGING FUNCTIONS
@@ -85,111 +88,9 @@ function create_test_config
 end
 
 # ============================================================================
-# RUN SINGLE TEST
+# SELECTION
 # ============================================================================
 
-function run_single_test
-    set preset_name $argv[1]
-    set preset_json $argv[2]
-
-    log_substep "Testing: $preset_name"
-
-    set test_output "$DEMO_ROOT/test_$preset_name"
-    set test_config "$DEMO_ROOT/config_$preset_name.json"
-
-    # Create test config
-    create_test_config $preset_name $test_config $preset_json
-
-    # Run conversion with this config
-    ./harbinger_master.fish \
-        --config $test_config \
-        --output $test_output \
-        --demo \
-        --clean >/dev/null 2>&1
-
-    # Check for confidence report
-    if test -f "$test_output/diagnostics/all_confidence_reports.md"
-        log_substep "✓ $preset_name completed"
-        return 0
-    else
-        log_warn "✗ $preset_name failed or incomplete"
-        return 1
-    end
-end
-
-# ============================================================================
-# ANALYZE RESULTS
-# ============================================================================
-
-function analyze_confidence_report
-    set report_file $argv[1]
-
-    if not test -f $report_file
-        echo "0"
-        return
-    end
-
-    # Count low-confidence words (lines with "conf:" in them)
-    set low_conf_count (grep -c "(conf:" $report_file 2>/dev/null || echo 0)
-    echo $low_conf_count
-end
-
-function calculate_avg_confidence
-    set report_file $argv[1]
-
-    if not test -f $report_file
-        echo "0.0"
-        return
-    end
-
-    # Extract confidence values and calculate average
-    grep "(conf:" $report_file | \
-        sed 's/.*conf: \([0-9.]*\).*/\1/' | \
-        awk '{sum+=$1; count++} END {if(count>0) print sum/count; else print 0}'
-end
-
-# ============================================================================
-# PRESENT RESULTS
-# ============================================================================
-
-function present_results
-    echo ""
-    echo (set_color cyan)"╔════════════════════════════════════════════════════════════╗"(set_color normal)
-    echo (set_color cyan)"║"(set_color normal)(set_color yellow)"          PREPROCESSING CONFIGURATION COMPARISON          "(set_color normal)(set_color cyan)"║"(set_color normal)
-    echo (set_color cyan)"╚════════════════════════════════════════════════════════════╝"(set_color normal)
-    echo ""
-
-    echo (set_color yellow)"Results from testing different preprocessing configurations:"(set_color normal)
-    echo ""
-
-    # Table header
-    printf "%-15s %-10s %-10s %s\n" "Config" "Low Conf" "Avg Conf" "Description"
-    printf "%-15s %-10s %-10s %s\n" "===============" "==========" "==========" "================================"
-
-    # Analyze each test result
-    set presets (get_config_presets | jq -c '.[]')
-
-    for preset_json in $presets
-        set preset_name (echo $preset_json | jq -r '.name')
-        set preset_desc (echo $preset_json | jq -r '.description')
-        set test_output "$DEMO_ROOT/test_$preset_name"
-        set report_file "$test_output/diagnostics/all_confidence_reports.md"
-
-        if test -f $report_file
-            set low_count (analyze_confidence_report $report_file)
-            set avg_conf (calculate_avg_confidence $report_file)
-
-            printf "%-15s %-10s %-10.1f %s\n" $preset_name $low_count $avg_conf $preset_desc
-        else
-            printf "%-15s %-10s %-10s %s\n" $preset_name "FAILED" "-" $preset_desc
-        end
-    end
-
-    echo ""
-    echo (set_color cyan)"Lower 'Low Conf' count and higher 'Avg Conf' are better"(set_color normal)
-    echo ""
-end
-
 function prompt_selection
     echo (set_color yellow)"Which configuration would you like to use?"(set_color normal)
     echo ""
@@ -255,6 +156,9 @@ while test $i -le (count $argv)
         case --config -c
             set i (math $i + 1)
             set -g CONFIG_FILE $argv[$i]
+        case --pages
+            set i (math $i + 1)
+            set -g SAMPLE_PAGES $argv[$i]
         case '*.json'
             set -g CONFIG_FILE $argv[$i]
     end
@@ -301,38 +205,34 @@ echo ""
 
 log_step "Testing Preprocessing Configurations"
 
+if not command -v python3 &>/dev/null; or not test -f "$BENCHMARK_ENGINE"
+    log_error "python3 and benchmark_presets.py are required"
+    exit 1
+end
+
 set presets (get_config_presets | jq -c '.[]')
 set total_tests (count $presets)
 
-log_substep "Will test $total_tests configurations on first page..."
-echo ""
-
-# Initialize progress tracking
-progress_start $total_tests "Testing configs"
-
-set test_num 1
+# Write one config per preset so the selected one can be applied afterwards
 for preset_json in $presets
     set preset_name (echo $preset_json | jq -r '.name')
-    set preset_desc (echo $preset_json | jq -r '.description')
-
-    # Update progress display with current config name
-    if is_interactive
-        spinner_clear
-    end
-    echo (set_color cyan)"│ Test $test_num/$total_tests:"(set_color normal)" $preset_name - $preset_desc" >&2
-    
-    run_single_test $preset_name $preset_json
-    
-    progress_update $test_num
-
-    set test_num (math $test_num + 1)
+    create_test_config $preset_name "$DEMO_ROOT/config_$preset_name.json" $preset_json
 end
 
-progress_finish
+log_substep "Benchmarking $total_tests configurations on pages $SAMPLE_PAGES in parallel..."
 log_complete
 
-# Present results
-present_results
+# Every preset × page cell runs in parallel on cached rasterized pages
+python3 $BENCHMARK_ENGINE \
+    --config $CONFIG_FILE \
+    --presets (dirname (status filename))/presets.json \
+    --pages $SAMPLE_PAGES \
+    --output $DEMO_ROOT/preset_benchmark.csv
+or exit 1
+
+echo ""
+echo (set_color cyan)"Lower 'Low Conf' count and higher 'Avg Conf' are better"(set_color normal)
+echo ""
 
 # Prompt for selection
 set selection (prompt_selection)
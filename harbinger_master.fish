@@ -70,56 +70,27 @@ function log_complete
 end
 
 # ============================================================================
-# UNIFIED CHECKPOINT FUNCTIONS (Single JSON file)
+# UNIFIED CHECKPOINT FUNCTIONS (SQLite state store, see pipeline_state.py)
 # ============================================================================
 
-set -g CHECKPOINT_FILE ".pipeline_state.json"
-
-function master_checkpoint_init
-    set state_file "$OUTPUT_ROOT/$CHECKPOINT_FILE"
-    if not test -f $state_file
-        echo '{"master_steps": {}, "chapters": {}, "created": "'(date -Iseconds)'", "version": "2.0"}' > $state_file
-    end
-end
+set -g STATE_TOOL (dirname (status filename))/pipeline_state.py
 
 function master_checkpoint_exists
     set step_name $argv[1]
-    set state_file "$OUTPUT_ROOT/$CHECKPOINT_FILE"
-
-    if not test -f $state_file
-        return 1
-    end
-
-    if not command -v jq &>/dev/null
-        grep -q "\"$step_name\"" $state_file
-        return $status
-    end
-
-    set result (jq -r ".master_steps.\"$step_name\" // \"null\"" $state_file 2>/dev/null)
-    test "$result" != "null"
+    python3 $STATE_TOOL $OUTPUT_ROOT --root has-step $step_name 2>/dev/null
 end
 
 function master_checkpoint_mark
     set step_name $argv[1]
-    set state_file "$OUTPUT_ROOT/$CHECKPOINT_FILE"
-
-    master_checkpoint_init
-
-    if not command -v jq &>/dev/null
-        log_warn "jq not available, checkpoint tracking limited"
-        return
-    end
-
-    jq ".master_steps.\"$step_name\" = \""(date -Iseconds)"\" | .updated = \""(date -Iseconds)"\"" $state_file > $state_file.tmp
-    mv $state_file.tmp $state_file
+    python3 $STATE_TOOL $OUTPUT_ROOT --root mark-step $step_name
+    or log_warn "Could not record checkpoint: $step_name"
 end
 
 function master_checkpoint_clear
-    set state_file "$OUTPUT_ROOT/$CHECKPOINT_FILE"
-    rm -f $state_file 2>/dev/null
+    python3 $STATE_TOOL $OUTPUT_ROOT --root clear --all 2>/dev/null
 
     # Also clean up old-style checkpoints
-    set -l master_checkpoints $OUTPUT_ROOT/.master_checkpoint_* 2>/dev/null
+    set -l master_checkpoints $OUTPUT_ROOT/.master_checkpoint_* $OUTPUT_ROOT/.pipeline_state.json 2>/dev/null
     if test (count $master_checkpoints) -gt 0
         rm -f $master_checkpoints
     end
@@ -127,48 +98,39 @@ function master_checkpoint_clear
     # Clean up old chapter-level checkpoints
     for chapter_dir in $OUTPUT_ROOT/*/
         # Use 'set' to safely expand globs that may not match
-        set -l checkpoint_files $chapter_dir/.checkpoint_* 2>/dev/null
+        set -l checkpoint_files $chapter_dir/.checkpoint_* $chapter_dir/.pipeline_state.json 2>/dev/null
         if test (count $checkpoint_files) -gt 0
             rm -f $checkpoint_files 2>/dev/null
         end
-        if test -f $chapter_dir/.pipeline_state.json
-            rm -f $chapter_dir/.pipeline_state.json
-        end
     end
 
-    log_info "All checkpoints cleared (unified to single file)"
+    log_info "All checkpoints cleared"
 end
 
 function master_checkpoint_status
-    set state_file "$OUTPUT_ROOT/$CHECKPOINT_FILE"
-
     echo (set_color yellow)"Master Pipeline Status:"(set_color normal) >&2
 
-    if not test -f $state_file
+    set steps (python3 $STATE_TOOL $OUTPUT_ROOT --root steps 2>/dev/null)
+    if test (count $steps) -eq 0
         echo "  No checkpoints found" >&2
         return
     end
 
     for step in chapters cleanup dictionary learned_corrections ai_cleanup statblocks finalize diagnostics
-        if master_checkpoint_exists $step
-            if command -v jq &>/dev/null
-                set timestamp (jq -r ".master_steps.\"$step\"" $state_file 2>/dev/null)
-                echo "  ✓ $step ($timestamp)" >&2
-            else
-                echo "  ✓ $step" >&2
-            end
+        set -l recorded (string match -r "^$step\t.*" -- $steps)
+        if test -n "$recorded"
+            set timestamp (string split -f2 \t -- $recorded)
+            echo "  ✓ $step ($timestamp)" >&2
         else
             echo "  ○ $step" >&2
         end
     end
 
     # Show chapter status if available
-    if command -v jq &>/dev/null
-        set chapter_count (jq -r '.chapters | length' $state_file 2>/dev/null)
-        if test "$chapter_count" -gt 0
-            echo "" >&2
-            echo (set_color cyan)"  Chapters processed: $chapter_count"(set_color normal) >&2
-        end
+    set chapter_count (count (python3 $STATE_TOOL $OUTPUT_ROOT --root chapters 2>/dev/null))
+    if test "$chapter_count" -gt 0
+        echo "" >&2
+        echo (set_color cyan)"  Chapters processed: $chapter_count"(set_color normal) >&2
     end
 end
 
@@ -269,6 +231,9 @@ function parse_args
             case --ai-claude
                 set -g DO_AI_CLEANUP true
                 set -g AI_BACKEND "claude"
+            case --ai-ollama
+                set -g DO_AI_CLEANUP true
+                set -g AI_BACKEND "ollama"
             case --no-statblocks
                 set -g EXTRACT_STATBLOCKS false
             case --open
@@ -279,6 +244,10 @@ function parse_args
                 set -g CLEAN_MODE true
             case --status
                 set -g STATUS_ONLY true
+            case --trace
+                # Chrome trace of every step, chapter and page
+                set i (math $i + 1)
+                set -gx HARBINGER_TRACE $argv[$i]
             case --demo
                 # Demo mode: only process first chapter/page
                 set -g DEMO_MODE true
@@ -307,7 +276,7 @@ function step_extract_and_preprocess
 
     if master_checkpoint_exists "extract_preprocess"
         log_substep "Using cached extraction & preprocessing (--clean to redo)"
-        set -g TOTAL_CHAPTERS (count $OUTPUT_ROOT/*/.pipeline_state.json 2>/dev/null)
+        set -g TOTAL_CHAPTERS (count (python3 $STATE_TOOL $OUTPUT_ROOT --root chapters 2>/dev/null))
         log_complete
         return 0
     end
@@ -338,7 +307,7 @@ function step_extract_and_preprocess
     end
 
     master_checkpoint_mark "extract_preprocess"
-    set -g TOTAL_CHAPTERS (count $OUTPUT_ROOT/*/.pipeline_state.json 2>/dev/null)
+    set -g TOTAL_CHAPTERS (count (python3 $STATE_TOOL $OUTPUT_ROOT --root chapters 2>/dev/null))
     log_substep "Extracted & preprocessed $TOTAL_CHAPTERS chapters"
 
     log_complete
@@ -424,6 +393,21 @@ function step_interactive_preprocessing
     log_warn "Browser will open. Draw columns and clean images, then click 'Finish'."
     log_substep "This runs BEFORE OCR for maximum effectiveness!"
 
+    # Detected regions leave only the pages the detector is unsure of for review
+    set segmentation_enabled (jq -r '.segmentation.enabled // false' $CONFIG_FILE)
+    if test "$segmentation_enabled" = "true"
+        log_substep "Detecting columns, sidebars and boxes..."
+        if not python3 ./segment_pages.py $OUTPUT_ROOT --config $CONFIG_FILE --jobs $PARALLEL_JOBS
+            log_warn "Some pages could not be segmented; they stay in the review session"
+        end
+    end
+
+    # Previews and tiles let the browser show 800 DPI pages without loading them whole
+    log_substep "Building page previews and tiles..."
+    if not python3 ./page_tiles.py $OUTPUT_ROOT --jobs $PARALLEL_JOBS
+        log_warn "Some pages could not be tiled; the server will retry them on demand"
+    end
+
     ./interactive_preprocessing_server.fish $OUTPUT_ROOT $CONFIG_FILE
 
     if test $status -eq 0
@@ -470,7 +454,7 @@ function step_reprocess_lowconf
 
     log_substep "Reprocessing regions below $reprocess_threshold% confidence..."
 
-    ./reprocess_lowconf_regions.fish $OUTPUT_ROOT --threshold $reprocess_threshold
+    ./reprocess_lowconf_regions.fish $OUTPUT_ROOT --threshold $reprocess_threshold --config $CONFIG_FILE
 
     master_checkpoint_mark "reprocess_lowconf"
     log_complete
@@ -705,6 +689,17 @@ function step_learned_corrections
         log_warn "apply_corrections.fish not found, skipping"
     end
     
+    # Resolve the ambiguous low-confidence words left over with a local n-gram model;
+    # only what it cannot decide is left for the AI cleanup step
+    if test -f "./context_corrections.py"
+        log_substep "Resolving ambiguous words in context..."
+        if python3 ./context_corrections.py $OUTPUT_ROOT --jobs $PARALLEL_JOBS
+            master_checkpoint_mark "context_corrections"
+        else
+            log_warn "Context corrections failed, AI cleanup will review whole chapters"
+        end
+    end
+    
     master_checkpoint_mark "learned_corrections"
     log_complete
 end
@@ -757,9 +752,24 @@ function step_ai_cleanup
         
         log_substep "AI processing: $chapter_name..."
         
-        # Use the AI cleanup script
-        if test -f ./ai_cleanup_claude.fish
-            ./ai_cleanup_claude.fish $input_file $ai_file
+        # Use the AI cleanup script, on just the words context corrections left uncertain
+        set residue $chapter_dir/.uncertain/context-lowconf.txt
+        if master_checkpoint_exists "context_corrections"; and not test -f $residue
+            log_substep "No uncertain words left in $chapter_name, copying input"
+            cp $input_file $ai_file
+        else if test $AI_BACKEND = "ollama"; and test -f ./ai_cleanup_ollama.fish
+            set ollama_args $input_file $ai_file --jobs $PARALLEL_JOBS
+            if test -f $residue
+                set ollama_args $ollama_args --targeted $chapter_dir/.uncertain
+            end
+            ./ai_cleanup_ollama.fish $ollama_args
+            or log_warn "Ollama cleanup incomplete for $chapter_name (re-run to retry failed chunks)"
+        else if test -f ./ai_cleanup_claude.fish
+            if test -f $residue
+                ./ai_cleanup_claude.fish $input_file $ai_file --targeted $chapter_dir/.uncertain
+            else
+                ./ai_cleanup_claude.fish $input_file $ai_file
+            end
         else
             log_warn "AI cleanup script not found, copying input"
             cp $input_file $ai_file
@@ -792,33 +802,17 @@ function step_extract_statblocks
     set statblock_dir $OUTPUT_ROOT/statblocks
     mkdir -p $statblock_dir
     
-    # Process each chapter
-    for chapter_dir in $OUTPUT_ROOT/*/
-        set chapter_name (basename $chapter_dir)
-        
-        if test "$chapter_name" = "final"; or test "$chapter_name" = "statblocks"; or test "$chapter_name" = "diagnostics"
-            continue
-        end
-        
-        # Find best input file (prefer AI cleaned, then corrected, then dict)
-        set input_file ""
-        for candidate in ai_cleaned.md corrected.md dict_cleaned.md cleaned.md converted.md
-            if test -f $chapter_dir/$candidate
-                set input_file $chapter_dir/$candidate
-                break
-            end
-        end
-        
-        if test -z "$input_file"
-            continue
-        end
-        
-        log_substep "Scanning: $chapter_name..."
-        
-        # Run stat block extraction
-        if test -f ./extract_statblocks.fish
-            ./extract_statblocks.fish $input_file $statblock_dir/$chapter_name 2>/dev/null
-        end
+    # Extract every chapter in one parallel batch run; each chapter's best source
+    # (AI cleaned, then corrected, then dict) is picked by extract_statblocks.py
+    if test -f ./extract_statblocks.py
+        log_substep "Scanning chapters ($PARALLEL_JOBS jobs)..."
+        python3 ./extract_statblocks.py --batch $OUTPUT_ROOT \
+            --output-dir $statblock_dir \
+            --jsonl $statblock_dir/statblocks.jsonl \
+            --jobs $PARALLEL_JOBS 2>/dev/null
+        or log_warn "Stat block extraction failed"
+    else
+        log_warn "extract_statblocks.py not found, skipping"
     end
     
     # Count extracted blocks
@@ -1057,12 +1051,14 @@ if test -z "$PDF_FILE"
     echo "  --no-cleanup        Skip OCR cleanup"
     echo "  --no-dict           Skip dictionary corrections"
     echo "  --ai-claude         Enable AI cleanup with Claude"
+    echo "  --ai-ollama         Enable AI cleanup with a local Ollama model"
     echo "  --no-statblocks     Skip stat block extraction"
     echo "  --open              Open results in VS Code"
     echo "  --resume            Resume from checkpoints"
     echo "  --clean             Clear all checkpoints"
     echo "  --status            Show pipeline status"
     echo "  --demo              Demo mode: only process first chapter"
+    echo "  --trace FILE        Write a Chrome trace of the run (open in ui.perfetto.dev)"
     echo ""
     echo "Examples:"
     echo "  # With config file (PDF specified in config):"
@@ -1131,6 +1127,11 @@ end
 # Record start time
 set -g START_TIME (date +%s)
 
+if set -q HARBINGER_TRACE
+    python3 $TRACE_TOOL init $HARBINGER_TRACE --pid $fish_pid --process harbinger_master.fish
+    or set -e HARBINGER_TRACE
+end
+
 # Initialize pipeline step tracking (10 steps total)
 set -g PIPELINE_TOTAL_STEPS 10
 set -g PIPELINE_CURRENT_STEP 0
@@ -1156,24 +1157,29 @@ end
 
 # Run pipeline steps in correct order
 # NEW ORDER: Extract -> Auto-Preprocess -> Interactive Preprocess -> OCR -> Text Cleanup
-step_extract_and_preprocess
+# Each step is a span in the --trace timeline
+trace_step step_extract_and_preprocess
 or exit 1
 
-step_interactive_preprocessing
+trace_step step_interactive_preprocessing
 or exit 1
 
-step_ocr_chapters
+trace_step step_ocr_chapters
 or exit 1
 
-step_reprocess_lowconf
-step_ocr_cleanup
-step_dictionary_cleanup
-step_learned_corrections
-step_ai_cleanup
-step_extract_statblocks
-step_finalize
-step_generate_stats
-step_archive_diagnostics
+trace_step step_reprocess_lowconf
+trace_step step_ocr_cleanup
+trace_step step_dictionary_cleanup
+trace_step step_learned_corrections
+trace_step step_ai_cleanup
+trace_step step_extract_statblocks
+trace_step step_finalize
+trace_step step_generate_stats
+trace_step step_archive_diagnostics
+
+if set -q HARBINGER_TRACE
+    python3 $TRACE_TOOL finish $HARBINGER_TRACE
+end
 
 # Final report
 set END_TIME (date +%s)
@@ -3,8 +3,9 @@ import { initSession, session, currentPage, nextPage, prevPage, canGoNext, canGo
 import { columns, setColumns, addColumn, removeColumn, syncColumnsFromPage } from './stores/imageStore';
 import { toolState, setActiveTool, setBrushSize, setBrushColor } from './stores/toolStore';
 import { detectPageColor } from './services/colorDetector';
-import { finishSession } from './services/api';
+import { finishSession, assetUrl } from './services/api';
 import { drawRectangle, drawBrush } from './utils/canvas';
+import { TileLayer } from './utils/tiles';
 import type { Column } from './types';
 
 const App: Component = () => {
@@ -12,6 +13,8 @@ const App: Component = () => {
   let maskCanvasRef: HTMLCanvasElement | undefined;
   let imageRef: HTMLImageElement | undefined;
   let containerRef: HTMLDivElement | undefined;
+  let tileLayer: TileLayer | null = null;
+  let redrawQueued = false;
 
   const [isDrawing, setIsDrawing] = createSignal(false);
   const [startPos, setStartPos] = createSignal({ x: 0, y: 0 });
@@ -75,7 +78,9 @@ const App: Component = () => {
       if (pageId !== currentPageId()) {
         setCurrentPageId(pageId);
         syncColumnsFromPage();
-        imageRef.src = `data:image/png;base64,${page.imageData}`;
+        // Show the downscaled preview; sharper tiles are drawn over it as they arrive
+        tileLayer = new TileLayer(page, scheduleRedraw);
+        imageRef.src = assetUrl(page.previewUrl);
         setZoom(1); // Reset zoom when changing pages
         setSelectedColumnId(null); // Clear selection when changing pages
         setPanOffset({ x: 0, y: 0 }); // Reset pan when changing pages
@@ -104,14 +109,25 @@ const App: Component = () => {
     redrawCanvas();
   });
 
+  // Load the tiles for the visible region when zooming or panning
+  createEffect(() => {
+    zoom();
+    panOffset();
+    requestAnimationFrame(updateTiles);
+  });
+
   function handleImageLoad() {
     if (!canvasRef || !imageRef || !maskCanvasRef) return;
 
-    // Set canvas size to match image
-    canvasRef.width = imageRef.width;
-    canvasRef.height = imageRef.height;
-    maskCanvasRef.width = imageRef.width;
-    maskCanvasRef.height = imageRef.height;
+    // The canvas works in full-resolution page pixels, whatever resolution is drawn into it,
+    // so columns and masks line up with the page the server crops and masks
+    const page = currentPage();
+    const width = page?.width || imageRef.naturalWidth;
+    const height = page?.height || imageRef.naturalHeight;
+    canvasRef.width = width;
+    canvasRef.height = height;
+    maskCanvasRef.width = width;
+    maskCanvasRef.height = height;
 
     // Clear mask canvas to transparent (nothing masked)
     const maskCtx = maskCanvasRef.getContext('2d');
@@ -119,7 +135,6 @@ const App: Component = () => {
       maskCtx.clearRect(0, 0, maskCanvasRef.width, maskCanvasRef.height);
 
       // Restore mask from page data if it exists
-      const page = currentPage();
       if (page && page.maskData) {
         const maskImg = new Image();
         maskImg.onload = () => {
@@ -131,10 +146,50 @@ const App: Component = () => {
     }
 
     // Set brush size based on image dimensions (e.g., 3% of image width)
-    const scaledBrushSize = Math.round(imageRef.width * 0.03);
+    const scaledBrushSize = Math.round(width * 0.03);
     setBrushSize(Math.max(50, Math.min(500, scaledBrushSize)));
 
     redrawCanvas();
+    requestAnimationFrame(updateTiles);
+  }
+
+  function updateTiles() {
+    if (!canvasRef || !containerRef || !tileLayer || !canvasRef.width) return;
+
+    // Visible part of the canvas, in full-resolution page pixels
+    const rect = canvasRef.getBoundingClientRect();
+    const box = containerRef.getBoundingClientRect();
+    const scale = rect.width / canvasRef.width;
+    const left = Math.max(rect.left, box.left);
+    const top = Math.max(rect.top, box.top);
+    const right = Math.min(rect.right, box.right);
+    const bottom = Math.min(rect.bottom, box.bottom);
+    if (!scale || right <= left || bottom <= top) return;
+
+    tileLayer.update(scale, {
+      x: (left - rect.left) / scale,
+      y: (top - rect.top) / scale,
+      width: (right - left) / scale,
+      height: (bottom - top) / scale,
+    });
+    scheduleRedraw();
+  }
+
+  // Coalesce tile arrivals into one redraw per frame
+  function scheduleRedraw() {
+    if (redrawQueued) return;
+    redrawQueued = true;
+    requestAnimationFrame(() => {
+      redrawQueued = false;
+      redrawCanvas();
+    });
+  }
+
+  // Preview scaled up to page size, then whichever tiles have loaded
+  function drawPage(ctx: CanvasRenderingContext2D) {
+    if (!canvasRef || !imageRef) return;
+    ctx.drawImage(imageRef, 0, 0, canvasRef.width, canvasRef.height);
+    tileLayer?.draw(ctx);
   }
 
   function redrawCanvas() {
@@ -145,7 +200,7 @@ const App: Component = () => {
 
     // Clear and draw image
     ctx.clearRect(0, 0, canvasRef.width, canvasRef.height);
-    ctx.drawImage(imageRef!, 0, 0);
+    drawPage(ctx);
 
     // Draw mask layer on top of image (shows brushed areas)
     ctx.drawImage(maskCanvasRef, 0, 0);
@@ -373,17 +428,18 @@ const App: Component = () => {
   function sampleColorAt(x: number, y: number) {
     if (!canvasRef || !imageRef) return;
 
-    // Create a temporary canvas to sample from the original image (not the drawn-on canvas)
+    // Render just the pixel under the cursor from the page (not the drawn-on canvas)
     const tempCanvas = document.createElement('canvas');
     const tempCtx = tempCanvas.getContext('2d');
     if (!tempCtx) return;
 
-    tempCanvas.width = imageRef.width;
-    tempCanvas.height = imageRef.height;
-    tempCtx.drawImage(imageRef, 0, 0);
+    tempCanvas.width = 1;
+    tempCanvas.height = 1;
+    tempCtx.translate(-Math.floor(x), -Math.floor(y));
+    drawPage(tempCtx);
 
     // Sample the pixel color
-    const pixelData = tempCtx.getImageData(Math.floor(x), Math.floor(y), 1, 1).data;
+    const pixelData = tempCtx.getImageData(0, 0, 1, 1).data;
     const r = pixelData[0];
     const g = pixelData[1];
     const b = pixelData[2];
@@ -662,6 +718,7 @@ const App: Component = () => {
           <div class="canvas-container">
             <img
               ref={imageRef}
+              crossOrigin="anonymous"
               style="display: none;"
               onLoad={handleImageLoad}
             />
@@ -1,6 +1,14 @@
 import { Session, Page } from '../types';
 
-const API_BASE = 'http://localhost:3001/api';
+const SERVER_BASE = 'http://localhost:3001';
+const API_BASE = `${SERVER_BASE}/api`;
+
+/**
+ * Absolute URL for a server-relative image URL (previews and tiles)
+ */
+export function assetUrl(url: string): string {
+  return `${SERVER_BASE}${url}`;
+}
 
 export async function fetchSession(): Promise<Session> {
   const response = await fetch(`${API_BASE}/session`);
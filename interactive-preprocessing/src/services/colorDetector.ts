@@ -1,5 +1,6 @@
 import { currentPage } from '../stores/sessionStore';
 import { setBrushColor } from '../stores/toolStore';
+import { assetUrl } from './api';
 
 /**
  * Auto-detect the most common color in the image (likely page background)
@@ -8,7 +9,7 @@ import { setBrushColor } from '../stores/toolStore';
  */
 export async function detectPageColor(): Promise<string> {
   const page = currentPage();
-  if (!page || !page.imageData) return '#ffffff';
+  if (!page) return '#ffffff';
 
   // Create temporary canvas
   const canvas = document.createElement('canvas');
@@ -17,7 +18,8 @@ export async function detectPageColor(): Promise<string> {
 
   // Load image
   const img = new Image();
-  img.src = `data:image/png;base64,${page.imageData}`;
+  img.crossOrigin = 'anonymous';
+  img.src = assetUrl(page.previewUrl);
   await new Promise(resolve => (img.onload = resolve));
 
   canvas.width = img.width;
@@ -25,7 +27,8 @@ export async function detectPageColor(): Promise<string> {
   ctx.drawImage(img, 0, 0);
 
   // Sample corners and edges (page background is usually at borders)
-  const sampleSize = 150;
+  // The preview is downscaled, so shrink the full-resolution 150px corners to match
+  const sampleSize = Math.max(8, Math.round((150 * img.width) / (page.width || img.width)));
   const sampleRegions = [
     { x: 0, y: 0, w: sampleSize, h: sampleSize }, // Top-left
     { x: img.width - sampleSize, y: 0, w: sampleSize, h: sampleSize }, // Top-right
@@ -1,6 +1,6 @@
 import { createSignal } from 'solid-js';
 import { Session, Page } from '../types';
-import { fetchSession, fetchPage, savePage } from '../services/api';
+import { fetchSession, fetchPage, savePage, assetUrl } from '../services/api';
 
 export const [session, setSession] = createSignal<Session | null>(null);
 export const [currentPage, setCurrentPage] = createSignal<Page | null>(null);
@@ -44,9 +44,12 @@ function findFirstUnprocessedPage(session: Session): number {
   return -1; // All processed
 }
 
-export async function loadPage(index: number) {
+// Page metadata by "chapter:pageNum", so the prefetched next page loads instantly
+const pageCache = new Map<string, Promise<Page>>();
+
+function pageAt(index: number): { chapter: string; pageNum: number } | null {
   const s = session();
-  if (!s) return;
+  if (!s) return null;
 
   // Calculate which chapter/page based on index
   let currentIndex = 0;
@@ -61,17 +64,49 @@ export async function loadPage(index: number) {
       const match = pagePath.match(/page-(\d+)\.png$/);
       if (!match) {
         console.error('Could not extract page number from:', pagePath);
-        return;
+        return null;
       }
 
-      const pageNum = parseInt(match[1], 10);
-      const pageData = await fetchPage(chapter.name, pageNum);
-      setCurrentPage(pageData);
-      setPageIndex(index);
-      return;
+      return { chapter: chapter.name, pageNum: parseInt(match[1], 10) };
     }
     currentIndex += chapter.pages.length;
   }
+  return null;
+}
+
+function getPage(chapter: string, pageNum: number): Promise<Page> {
+  const key = `${chapter}:${pageNum}`;
+  let page = pageCache.get(key);
+  if (!page) {
+    page = fetchPage(chapter, pageNum);
+    page.catch(() => pageCache.delete(key));
+    pageCache.set(key, page);
+  }
+  return page;
+}
+
+// Fetch a page's metadata and warm the browser cache with its preview
+function prefetchPage(index: number) {
+  const ref = pageAt(index);
+  if (!ref) return;
+
+  getPage(ref.chapter, ref.pageNum)
+    .then((page) => {
+      const preview = new Image();
+      preview.crossOrigin = 'anonymous';
+      preview.src = assetUrl(page.previewUrl);
+    })
+    .catch(() => {}); // Loading the page for real will report the error
+}
+
+export async function loadPage(index: number) {
+  const ref = pageAt(index);
+  if (!ref) return;
+
+  const pageData = await getPage(ref.chapter, ref.pageNum);
+  setCurrentPage(pageData);
+  setPageIndex(index);
+  prefetchPage(index + 1);
 }
 
 export async function nextPage() {
@@ -98,6 +133,7 @@ export async function saveCurrentPage() {
     // Get mask data from canvas if available
     const maskData = getMaskData();
     await savePage(page.chapter, page.pageNum, page.columns, maskData);
+    pageCache.delete(`${page.chapter}:${page.pageNum}`); // Columns may have changed on the server
   } catch (error) {
     console.error('Failed to save page:', error);
   } finally {
@@ -7,11 +7,27 @@ export interface Column {
   order: number;
 }
 
+export interface TileLevel {
+  z: number;
+  scale: number; // 1 / 2^z of the full-resolution page
+  width: number;
+  height: number;
+  cols: number;
+  rows: number;
+}
+
 export interface Page {
   chapter: string;
   pageNum: number;
   imagePath: string;
-  imageData?: string; // base64
+  width: number; // Full-resolution size; columns and masks use these coordinates
+  height: number;
+  version: string;
+  previewUrl: string;
+  preview: { width: number; height: number };
+  tileUrl: string; // Template with {z}, {x} and {y}
+  tileSize: number;
+  levels: TileLevel[];
   columns: Column[];
   maskData?: ImageData;
   processed: boolean;
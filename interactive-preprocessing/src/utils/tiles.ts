@@ -0,0 +1,83 @@
+import type { Page, TileLevel } from '../types';
+import { assetUrl } from '../services/api';
+
+interface Tile {
+  x: number;
+  y: number;
+  image: HTMLImageElement;
+}
+
+/**
+ * Loads a page's pyramid tiles and draws them in full-resolution coordinates.
+ * The preview covers the page first; tiles from the coarsest level that is still
+ * at least as sharp as the screen replace it where they are visible.
+ */
+export class TileLayer {
+  private tiles = new Map<string, Tile>();
+  private level: TileLevel | null = null;
+
+  constructor(private page: Page, private onTile: () => void) {}
+
+  /**
+   * Pick the level for the current display scale and load its tiles in view
+   * @param displayScale - Screen pixels per full-resolution pixel
+   * @param view - Visible region in full-resolution pixels
+   */
+  update(displayScale: number, view: { x: number; y: number; width: number; height: number }) {
+    const needed = displayScale * (window.devicePixelRatio || 1);
+    if (!this.page.levels?.length || this.page.preview.width / this.page.width >= needed) {
+      this.level = null; // The preview is already sharp enough
+      return;
+    }
+
+    // Levels run from full resolution (z = 0) down; keep the last one that is sharp enough
+    let level = this.page.levels[0];
+    for (const candidate of this.page.levels) {
+      if (candidate.scale >= needed) level = candidate;
+    }
+    this.level = level;
+
+    const extent = this.page.tileSize / level.scale; // One tile in full-resolution pixels
+    const x0 = Math.max(0, Math.floor(view.x / extent));
+    const y0 = Math.max(0, Math.floor(view.y / extent));
+    const x1 = Math.min(level.cols - 1, Math.floor((view.x + view.width) / extent));
+    const y1 = Math.min(level.rows - 1, Math.floor((view.y + view.height) / extent));
+
+    for (let y = y0; y <= y1; y++) {
+      for (let x = x0; x <= x1; x++) {
+        const key = `${level.z}/${x}/${y}`;
+        if (this.tiles.has(key)) continue;
+
+        const image = new Image();
+        image.crossOrigin = 'anonymous'; // Keeps the canvas readable for the eyedropper
+        image.onload = this.onTile;
+        image.src = assetUrl(this.page.tileUrl
+          .replace('{z}', `${level.z}`)
+          .replace('{x}', `${x}`)
+          .replace('{y}', `${y}`));
+        this.tiles.set(key, { x, y, image });
+      }
+    }
+  }
+
+  /**
+   * Draw the loaded tiles of the current level, scaled up to full-resolution coordinates
+   */
+  draw(ctx: CanvasRenderingContext2D) {
+    const level = this.level;
+    if (!level) return;
+
+    const extent = this.page.tileSize / level.scale;
+    const prefix = `${level.z}/`;
+    for (const [key, tile] of this.tiles) {
+      if (!key.startsWith(prefix) || !tile.image.complete || !tile.image.naturalWidth) continue;
+      ctx.drawImage(
+        tile.image,
+        tile.x * extent,
+        tile.y * extent,
+        tile.image.naturalWidth / level.scale,
+        tile.image.naturalHeight / level.scale
+      );
+    }
+  }
+}
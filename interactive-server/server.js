@@ -4,6 +4,8 @@ const { Server } = require('socket.io');
 const http = require('http');
 const path = require('path');
 const fs = require('fs').promises;
+const { execFile } = require('child_process');
+const { promisify } = require('util');
 const { applyMask, cropColumn } = require('./imageProcessor');
 
 const app = express();
@@ -19,6 +21,16 @@ app.use(express.json({ limit: '50mb' }));
 let SESSION_FILE = '';
 let OUTPUT_ROOT = '';
 
+// Processed pages live in the pipeline state store, not the session file
+const STATE_TOOL = path.join(__dirname, '..', 'pipeline_state.py');
+const execFileAsync = promisify(execFile);
+
+// Page previews and tile pyramids, precomputed (or built on first request) by page_tiles.py
+const TILES_TOOL = path.join(__dirname, '..', 'page_tiles.py');
+const TILES_DIR = '.tiles';
+const IMMUTABLE = 'public, max-age=31536000, immutable';
+const tileBuilds = new Map(); // pagePath -> Promise<manifest>, so concurrent requests share one build
+
 // ============================================================================
 // HELPER FUNCTIONS
 // ============================================================================
@@ -28,9 +40,10 @@ let OUTPUT_ROOT = '';
  * Prioritizes preprocessed images over originals
  * @param {string} chapter - Chapter name
  * @param {number} pageNum - Page number
+ * @param {boolean} quiet - Skip logging (tile and preview requests)
  * @returns {Promise<string|null>} - Path to the page file, or null if not found
  */
-async function findPagePath(chapter, pageNum) {
+async function findPagePath(chapter, pageNum, quiet = false) {
   const paddingFormats = [
     pageNum.toString().padStart(3, '0'), // page-001.png
     pageNum.toString().padStart(2, '0'), // page-01.png
@@ -42,7 +55,7 @@ async function findPagePath(chapter, pageNum) {
     const processedPath = path.join(OUTPUT_ROOT, chapter, '.temp', `page-${paddedNum}-processed.png`);
     try {
       await fs.access(processedPath);
-      console.log(`[Server] Found preprocessed image: ${processedPath}`);
+      if (!quiet) console.log(`[Server] Found preprocessed image: ${processedPath}`);
       return processedPath;
     } catch {
       continue;
@@ -54,7 +67,7 @@ async function findPagePath(chapter, pageNum) {
     const originalPath = path.join(OUTPUT_ROOT, chapter, '.temp', `page-${paddedNum}.png`);
     try {
       await fs.access(originalPath);
-      console.log(`[Server] Using original image: ${originalPath}`);
+      if (!quiet) console.log(`[Server] Using original image: ${originalPath}`);
       return originalPath;
     } catch {
       continue;
@@ -64,6 +77,107 @@ async function findPagePath(chapter, pageNum) {
   return null;
 }
 
+/**
+ * Runs pipeline_state.py and returns its output lines
+ * @param {string[]} args - Arguments after the script path
+ * @returns {Promise<string[]>}
+ */
+async function pipelineState(args) {
+  const { stdout } = await execFileAsync('python3', [STATE_TOOL, ...args]);
+  return stdout.split('\n').filter(Boolean);
+}
+
+/**
+ * Loads the session with its page totals and the processed pages
+ * recorded in the state store ("chapter:pageNum" ids)
+ * @returns {Promise<object>}
+ */
+async function loadSession() {
+  const data = await fs.readFile(SESSION_FILE, 'utf-8');
+  const session = JSON.parse(data);
+
+  // Calculate total pages
+  let totalPages = 0;
+  for (const chapter of session.chapters) {
+    totalPages += chapter.pages.length;
+  }
+  session.totalPages = totalPages;
+
+  const processed = new Set(session.processedPages || []);
+  const rows = await pipelineState([OUTPUT_ROOT, '--root', 'pages', 'interactive']);
+  for (const row of rows) {
+    const [chapter, page] = row.split('\t');
+    processed.add(`${chapter}:${parseInt(page.slice('page-'.length))}`);
+  }
+  session.processedPages = [...processed];
+  return session;
+}
+
+/**
+ * Version of a page image, matching page_tiles.py: size and mtime in hex
+ * @param {string} pagePath - Full path to page file
+ * @returns {Promise<string>}
+ */
+async function pageVersion(pagePath) {
+  const stat = await fs.stat(pagePath, { bigint: true });
+  return `${stat.size.toString(16)}-${stat.mtimeNs.toString(16)}`;
+}
+
+/**
+ * Directory holding a page's preview, tiles and manifest.json
+ * @param {string} pagePath - Full path to page file
+ * @returns {string}
+ */
+function getTilesDir(pagePath) {
+  return path.join(path.dirname(pagePath), TILES_DIR, path.basename(pagePath, '.png'));
+}
+
+/**
+ * Returns the page's tile manifest, building the pyramid if it is missing or stale
+ * @param {string} pagePath - Full path to page file
+ * @returns {Promise<object>}
+ */
+async function ensureTiles(pagePath) {
+  const manifestPath = path.join(getTilesDir(pagePath), 'manifest.json');
+  const version = await pageVersion(pagePath);
+  try {
+    const manifest = JSON.parse(await fs.readFile(manifestPath, 'utf-8'));
+    if (manifest.version === version) {
+      return manifest;
+    }
+  } catch {
+    // Not built yet
+  }
+
+  if (!tileBuilds.has(pagePath)) {
+    console.log(`[Server] Building tiles: ${pagePath}`);
+    const build = execFileAsync('python3', [TILES_TOOL, pagePath])
+      .then(async () => JSON.parse(await fs.readFile(manifestPath, 'utf-8')))
+      .finally(() => tileBuilds.delete(pagePath));
+    tileBuilds.set(pagePath, build);
+  }
+  return tileBuilds.get(pagePath);
+}
+
+/**
+ * Sends a versioned image with a strong ETag; the URL carries the version, so it never changes
+ * @param {object} req - Express request
+ * @param {object} res - Express response
+ * @param {string} filePath - Image to send
+ * @param {string} etag - Quoted ETag
+ */
+function sendImmutable(req, res, filePath, etag) {
+  res.set({ 'ETag': etag, 'Cache-Control': IMMUTABLE });
+  if (req.headers['if-none-match'] === etag) {
+    return res.status(304).end();
+  }
+  res.sendFile(path.resolve(filePath), { etag: false, lastModified: false }, (error) => {
+    if (error && !res.headersSent) {
+      res.status(404).json({ error: 'Tile not found' });
+    }
+  });
+}
+
 /**
  * Gets the base path (without extension) for a page
  * @param {string} pagePath - Full path to page file
@@ -83,17 +197,7 @@ function getBasePath(pagePath) {
  */
 app.get('/api/session', async (req, res) => {
   try {
-    const data = await fs.readFile(SESSION_FILE, 'utf-8');
-    const session = JSON.parse(data);
-
-    // Calculate total pages
-    let totalPages = 0;
-    for (const chapter of session.chapters) {
-      totalPages += chapter.pages.length;
-    }
-    session.totalPages = totalPages;
-
-    res.json(session);
+    res.json(await loadSession());
   } catch (error) {
     console.error('[Server] Error loading session:', error.message);
     res.status(500).json({ error: error.message });
@@ -102,7 +206,8 @@ app.get('/api/session', async (req, res) => {
 
 /**
  * GET /api/page/:chapter/:pageNum
- * Returns page image as base64 with existing metadata
+ * Returns page metadata: full-resolution size, preview and tile URLs, and saved columns.
+ * Column and mask coordinates are always in full-resolution pixels.
  */
 app.get('/api/page/:chapter/:pageNum', async (req, res) => {
   const { chapter, pageNum } = req.params;
@@ -115,9 +220,7 @@ app.get('/api/page/:chapter/:pageNum', async (req, res) => {
   }
 
   try {
-    // Read image and convert to base64
-    const imageBuffer = await fs.readFile(pagePath);
-    const base64 = imageBuffer.toString('base64');
+    const tiles = await ensureTiles(pagePath);
 
     // Determine if this is a preprocessed image
     const isPreprocessed = pagePath.includes('-processed.png');
@@ -133,11 +236,20 @@ app.get('/api/page/:chapter/:pageNum', async (req, res) => {
       // No metadata yet - that's OK
     }
 
+    const pageUrl = `/api/page/${encodeURIComponent(chapter)}/${parseInt(pageNum)}`;
+    res.set('Cache-Control', 'no-cache'); // Columns change as pages are saved
     res.json({
       chapter,
       pageNum: parseInt(pageNum),
       imagePath: pagePath,
-      imageData: base64,
+      width: tiles.width,
+      height: tiles.height,
+      version: tiles.version,
+      previewUrl: `${pageUrl}/preview?v=${tiles.version}`,
+      preview: tiles.preview,
+      tileUrl: `${pageUrl}/tiles/{z}/{x}/{y}?v=${tiles.version}`,
+      tileSize: tiles.tileSize,
+      levels: tiles.levels,
       ...metadata,
     });
   } catch (error) {
@@ -146,6 +258,52 @@ app.get('/api/page/:chapter/:pageNum', async (req, res) => {
   }
 });
 
+/**
+ * GET /api/page/:chapter/:pageNum/preview
+ * Low-resolution JPEG of the whole page
+ */
+app.get('/api/page/:chapter/:pageNum/preview', async (req, res) => {
+  const { chapter, pageNum } = req.params;
+  const pagePath = await findPagePath(chapter, parseInt(pageNum), true);
+  if (!pagePath) {
+    return res.status(404).json({ error: 'Page not found' });
+  }
+
+  try {
+    const tiles = await ensureTiles(pagePath);
+    sendImmutable(req, res, path.join(getTilesDir(pagePath), 'preview.jpg'), `"${tiles.version}-preview"`);
+  } catch (error) {
+    console.error(`[Server] Error loading preview ${chapter}/${pageNum}:`, error.message);
+    res.status(500).json({ error: error.message });
+  }
+});
+
+/**
+ * GET /api/page/:chapter/:pageNum/tiles/:z/:x/:y
+ * One JPEG tile; level z is the full page scaled by 1/2^z
+ */
+app.get('/api/page/:chapter/:pageNum/tiles/:z/:x/:y', async (req, res) => {
+  const { chapter, pageNum } = req.params;
+  const [z, x, y] = [req.params.z, req.params.x, req.params.y].map((v) => parseInt(v));
+  if ([z, x, y].some((v) => !Number.isInteger(v) || v < 0)) {
+    return res.status(400).json({ error: 'Invalid tile' });
+  }
+
+  const pagePath = await findPagePath(chapter, parseInt(pageNum), true);
+  if (!pagePath) {
+    return res.status(404).json({ error: 'Page not found' });
+  }
+
+  try {
+    const tiles = await ensureTiles(pagePath);
+    const tilePath = path.join(getTilesDir(pagePath), `${z}`, `${x}_${y}.${tiles.format}`);
+    sendImmutable(req, res, tilePath, `"${tiles.version}-${z}-${x}-${y}"`);
+  } catch (error) {
+    console.error(`[Server] Error loading tile ${chapter}/${pageNum}/${z}/${x}/${y}:`, error.message);
+    res.status(500).json({ error: error.message });
+  }
+});
+
 /**
  * POST /api/save
  * Saves user edits: applies mask, crops columns, saves metadata
@@ -198,18 +356,10 @@ app.post('/api/save', async (req, res) => {
     };
     await fs.writeFile(`${basePath}-metadata.json`, JSON.stringify(metadata, null, 2));
 
-    // 4. Update session state
-    const sessionContent = await fs.readFile(SESSION_FILE, 'utf-8');
-    const session = JSON.parse(sessionContent);
-
-    if (!session.processedPages) session.processedPages = [];
-    const pageId = `${chapter}:${pageNum}`;
-
-    if (!session.processedPages.includes(pageId)) {
-      session.processedPages.push(pageId);
-    }
-
-    await fs.writeFile(SESSION_FILE, JSON.stringify(session, null, 2));
+    // 4. Record the page in the state store (one row, no session rewrite)
+    await pipelineState([path.join(OUTPUT_ROOT, chapter), 'mark-page', baseMatch[1], 'interactive',
+                         '--artifact', cleanedPath]);
+    const session = await loadSession();
 
     // 5. Emit progress update via WebSocket
     const totalPages = session.totalPages || 0;
@@ -41,6 +41,20 @@ set total_pages 0
 for chapter_temp in $chapters
     set chapter_name (basename (dirname $chapter_temp))
     set pages (find $chapter_temp -name "page-*.png" -not -name "*-processed.png" -not -name "*-cleaned.png" -not -name "*-column-*.png" | sort)
+
+    # Pages segmented automatically (segment_pages.py) only need review when flagged
+    set review_pages
+    for page in $pages
+        set metadata (string replace -r '\.png$' '-metadata.json' $page)
+        if test -f $metadata; and command -v jq &>/dev/null
+            if test (jq -r 'if .source == "auto" and .segmentation.flagged == false then "skip" else "review" end' $metadata) = "skip"
+                continue
+            end
+        end
+        set -a review_pages $page
+    end
+    set auto_count (math (count $pages) - (count $review_pages))
+    set pages $review_pages
     set page_count (count $pages)
 
     if test $page_count -eq 0
@@ -70,7 +84,11 @@ for chapter_temp in $chapters
         echo (set_color yellow)"[WARN]"(set_color normal) "jq not found, using basic JSON (may not work correctly)"
     end
 
-    echo (set_color green)"  ✓"(set_color normal) "Chapter: $chapter_name ($page_count pages)"
+    if test $auto_count -gt 0
+        echo (set_color green)"  ✓"(set_color normal) "Chapter: $chapter_name ($page_count pages, $auto_count segmented automatically)"
+    else
+        echo (set_color green)"  ✓"(set_color normal) "Chapter: $chapter_name ($page_count pages)"
+    end
 end
 
 echo (set_color cyan)"Total pages to process: $total_pages"(set_color normal)
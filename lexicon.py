@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+lexicon.py - Prebuilt, memory-mapped word list for OCR validation
+Merges pyspellchecker's English word list, planescape_words.txt and the
+planescape_dictionary terms/factions from pipeline_config.json into one sorted
+on-disk artifact. Lookups binary-search the mmap'd file, so loading costs
+almost nothing and nothing is parsed until the first lookup.
+
+Artifact layout (little-endian):
+    magic (8 bytes) | count (uint32) | offsets (uint32 × count+1) | utf-8 words, sorted
+
+Usage: python3 lexicon.py build [--output FILE] [--words FILE] [--config FILE]
+       python3 lexicon.py check WORD [WORD ...]
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from functools import lru_cache
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_LEXICON = SCRIPT_DIR / "lexicon.bin"
+DEFAULT_USER_WORDS = SCRIPT_DIR / "planescape_words.txt"
+DEFAULT_CONFIG = SCRIPT_DIR / "pipeline_config.json"
+MEMO_SIZE = 65536
+
+MAGIC = b'HHLEX\x00\x01\x00'
+HEADER = struct.Struct('<8sI')
+
+
+def read_user_words(path: Path) -> list[str]:
+    """Read a tesseract user-words file (one term per line, # comments)"""
+    words = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    words.append(line)
+    except OSError as e:
+        print(f"Warning: Could not read {path}: {e}", file=sys.stderr)
+    return words
+
+
+def read_config_terms(path: Path) -> list[str]:
+    """Read planescape_dictionary terms and factions from a pipeline config"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read {path}: {e}", file=sys.stderr)
+        return []
+    dictionary = config.get('planescape_dictionary', {})
+    return list(dictionary.get('terms', [])) + list(dictionary.get('factions', []))
+
+
+def read_spellchecker_words() -> list[str]:
+    """Return pyspellchecker's English word list, or nothing if it isn't installed"""
+    try:
+        from spellchecker import SpellChecker
+    except ImportError:
+        print("Note: Install pyspellchecker for better accuracy: pip install pyspellchecker", file=sys.stderr)
+        return []
+    return list(SpellChecker().word_frequency.keys())
+
+
+def normalize_terms(terms) -> set[str]:
+    """Lowercase terms; multi-word terms contribute the phrase and each word"""
+    words = set()
+    for term in terms:
+        term = term.strip().lower()
+        if not term:
+            continue
+        words.add(term)
+        if ' ' in term:
+            words.update(term.split())
+    return words
+
+
+def build_lexicon(output: Path = DEFAULT_LEXICON, user_words: Path = DEFAULT_USER_WORDS,
+                  config: Path = DEFAULT_CONFIG) -> int:
+    """Build the lexicon artifact and return the number of words written"""
+    terms = read_spellchecker_words()
+    if user_words and Path(user_words).exists():
+        terms += read_user_words(user_words)
+    if config and Path(config).exists():
+        terms += read_config_terms(config)
+
+    encoded = sorted(w.encode('utf-8') for w in normalize_terms(terms))
+    offsets = array('I', [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    output = Path(output)
+    tmp_path = output.with_name(output.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(offsets.tobytes())
+        for word in encoded:
+            f.write(word)
+    os.replace(tmp_path, output)
+    return len(encoded)
+
+
+def is_stale(lexicon: Path, sources: list[Path]) -> bool:
+    """Check whether the artifact is missing or older than any of its sources"""
+    if not lexicon.exists():
+        return True
+    built = lexicon.stat().st_mtime
+    return any(p.exists() and p.stat().st_mtime > built for p in sources)
+
+
+class Lexicon:
+    """Read-only view over a lexicon artifact, mapped on first lookup"""
+
+    def __init__(self, path: Path = DEFAULT_LEXICON, user_words: Path = DEFAULT_USER_WORDS,
+                 config: Path = DEFAULT_CONFIG, auto_build: bool = True):
+        self.path = Path(path)
+        self.user_words = Path(user_words) if user_words else None
+        self.config = Path(config) if config else None
+        self.auto_build = auto_build
+        self._mm = None
+        self._offsets = None
+        self._count = 0
+        self._blob = 0
+        self._contains = lru_cache(maxsize=MEMO_SIZE)(self._lookup)
+
+    def _open(self):
+        sources = [p for p in (self.user_words, self.config) if p]
+        if self.auto_build and is_stale(self.path, sources):
+            count = build_lexicon(self.path, self.user_words, self.config)
+            print(f"Built lexicon {self.path} ({count} words)", file=sys.stderr)
+
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a lexicon file: {self.path}")
+        start = HEADER.size
+        self._blob = start + 4 * (self._count + 1)
+        if sys.byteorder == 'little':
+            self._offsets = memoryview(self._mm)[start:self._blob].cast('I')
+        else:
+            self._offsets = array('I', self._mm[start:self._blob])
+            self._offsets.byteswap()
+
+    def __len__(self) -> int:
+        if self._mm is None:
+            self._open()
+        return self._count
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.word(i)
+
+    def _word_at(self, i: int) -> bytes:
+        return self._mm[self._blob + self._offsets[i]:self._blob + self._offsets[i + 1]]
+
+    def word(self, i: int) -> str:
+        """Return the i-th word (lowercase, sorted order)"""
+        if self._mm is None:
+            self._open()
+        return self._word_at(i).decode('utf-8')
+
+    def _lookup(self, word: str) -> bool:
+        if self._mm is None:
+            self._open()
+        key = word.lower().encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self._count and self._word_at(lo) == key
+
+    def __contains__(self, word: str) -> bool:
+        return self._contains(word)
+
+    def known(self, words) -> set[str]:
+        """Return the subset of words found in the lexicon (case-insensitive)"""
+        return {w for w in words if self._contains(w)}
+
+    def known_any(self, words) -> bool:
+        """Check whether any of the words is in the lexicon"""
+        return any(self._contains(w) for w in words)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the OCR validation lexicon')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Build the lexicon artifact')
+    build.add_argument('--output', default=str(DEFAULT_LEXICON),
+                       help=f'Output file (default: {DEFAULT_LEXICON.name})')
+    build.add_argument('--words', default=str(DEFAULT_USER_WORDS),
+                       help=f'User words file (default: {DEFAULT_USER_WORDS.name})')
+    build.add_argument('--config', default=str(DEFAULT_CONFIG),
+                       help=f'Pipeline config with planescape_dictionary (default: {DEFAULT_CONFIG.name})')
+
+    check = sub.add_parser('check', help='Look up words')
+    check.add_argument('words', nargs='+')
+    check.add_argument('--lexicon', default=str(DEFAULT_LEXICON),
+                       help=f'Lexicon file (default: {DEFAULT_LEXICON.name})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_lexicon(Path(args.output), Path(args.words), Path(args.config))
+        print(f"✨ Lexicon saved to {args.output}")
+        print(f"   {count} words")
+    else:
+        lexicon = Lexicon(Path(args.lexicon))
+        for word in args.words:
+            print(f"{word}: {'known' if word in lexicon else 'unknown'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+ngram_model.py - Compact, memory-mapped word trigram model for scoring OCR corrections
+Trained on finished text only: the final/*.md chapters of converted books and
+directories or files of clean external text, plus the Planescape term lists, so
+candidate corrections can be ranked by how well they fit their neighbours
+instead of in isolation. In-progress chapter files (corrected.md and friends)
+are never training data: their recurring OCR misreadings would gain counts and
+become harder to correct. held_out() takes a chapter's own final text back out
+of the counts while that chapter is being corrected.
+
+Counts are stored in sorted uint64 key arrays (word ids packed ID_BITS apart)
+with parallel uint32 count arrays, and lookups bisect the mmap'd file directly:
+loading costs nothing, and scoring a candidate is a handful of binary searches.
+Scores are stupid-backoff log10 probabilities.
+
+Artifact layout (little-endian):
+    magic (8 bytes) | tokens (uint64) | vocab, bigrams, trigrams (uint32 × 3) | pad (4)
+    bigram keys (uint64 × B) | trigram keys (uint64 × T)
+    word offsets (uint32 × V+1) | unigram counts (uint32 × V) | bigram counts (uint32 × B)
+    trigram counts (uint32 × T) | utf-8 words, sorted
+
+Usage: python3 ngram_model.py build [converted_dir | text_dir | file.md ...] [--output FILE]
+       python3 ngram_model.py score "some text to score" [--model FILE]
+"""
+
+import os
+import re
+import sys
+import copy
+import mmap
+import math
+import struct
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from functools import lru_cache
+
+from lexicon import DEFAULT_USER_WORDS, DEFAULT_CONFIG, read_user_words, read_config_terms, is_stale
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_MODEL = SCRIPT_DIR / "ngram.bin"
+TERM_COUNT = 5          # Unigram count given to each Planescape term
+BACKOFF = 0.4           # Stupid-backoff penalty per dropped context word
+MEMO_SIZE = 65536
+
+# Finished text: converted books contribute final/, other directories their text files
+TEXT_PATTERNS = ("*.md", "*.txt")
+SKIP_DIRS = ("final", "statblocks", "diagnostics")
+
+MAGIC = b'HHNGRAM\x02'     # \x02: trained on finished text only; older models are rebuilt
+HEADER = struct.Struct('<8sQIII4x')
+ID_BITS = 21
+MAX_VOCAB = (1 << ID_BITS) - 1
+START = '<s>'
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['’][a-z]+)*")
+PAGE_BREAK_RE = re.compile(r'^<!-- PAGE BREAK:')
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens, as the model sees them"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def is_converted_book(root: Path) -> bool:
+    """A pipeline output directory: chapter directories with a .temp"""
+    return any((d / '.temp').is_dir() for d in root.iterdir() if d.is_dir() and d.name not in SKIP_DIRS)
+
+
+def training_files(root: Path) -> list[Path]:
+    """The finished text to learn from: a file, a book's final/ chapters or a directory of clean text
+
+    A converted book that has not been finished yet contributes nothing.
+    """
+    if root.is_file():
+        return [root]
+    if (root / 'final').is_dir():
+        return sorted((root / 'final').glob('*.md'))
+    if is_converted_book(root):
+        return []
+    return sorted({f for pattern in TEXT_PATTERNS for f in root.rglob(pattern) if f.is_file()})
+
+
+def pack(*ids: int) -> int:
+    key = 0
+    for word_id in ids:
+        key = (key << ID_BITS) | word_id
+    return key
+
+
+def count_ngrams(files: list[Path], terms: list[str]) -> tuple[Counter, Counter, Counter]:
+    """Unigram, bigram and trigram counts over the files; each line is one sequence"""
+    unigrams, bigrams, trigrams = Counter(), Counter(), Counter()
+    for path in files:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if PAGE_BREAK_RE.match(line):
+                        continue
+                    tokens = tokenize(line)
+                    if not tokens:
+                        continue
+                    tokens.insert(0, START)
+                    unigrams.update(tokens)
+                    bigrams.update(zip(tokens, tokens[1:]))
+                    trigrams.update(zip(tokens, tokens[1:], tokens[2:]))
+        except OSError as e:
+            print(f"Warning: Could not read {path}: {e}", file=sys.stderr)
+    for term in terms:
+        for token in tokenize(term):
+            unigrams[token] += TERM_COUNT
+    return unigrams, bigrams, trigrams
+
+
+def build_model(roots: list[Path], output: Path = DEFAULT_MODEL, user_words: Path = DEFAULT_USER_WORDS,
+                config: Path = DEFAULT_CONFIG) -> tuple[int, int, int]:
+    """Build the model artifact; returns (vocabulary, bigrams, trigrams)"""
+    files = [f for root in roots for f in training_files(Path(root))]
+    terms = []
+    if user_words and Path(user_words).exists():
+        terms += read_user_words(user_words)
+    if config and Path(config).exists():
+        terms += read_config_terms(config)
+    unigrams, bigrams, trigrams = count_ngrams(files, terms)
+
+    if len(unigrams) > MAX_VOCAB:
+        unigrams = Counter(dict(unigrams.most_common(MAX_VOCAB)))
+    vocab = sorted(unigrams, key=lambda w: w.encode('utf-8'))
+    ids = {word: i for i, word in enumerate(vocab)}
+
+    bigram_table = sorted((pack(ids[a], ids[b]), n) for (a, b), n in bigrams.items()
+                          if a in ids and b in ids)
+    trigram_table = sorted((pack(ids[a], ids[b], ids[c]), n) for (a, b, c), n in trigrams.items()
+                           if a in ids and b in ids and c in ids)
+
+    encoded = [w.encode('utf-8') for w in vocab]
+    offsets = array('I', [0])
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+    arrays = [
+        array('Q', (k for k, _ in bigram_table)),
+        array('Q', (k for k, _ in trigram_table)),
+        offsets,
+        array('I', (unigrams[w] for w in vocab)),
+        array('I', (n for _, n in bigram_table)),
+        array('I', (n for _, n in trigram_table)),
+    ]
+    if sys.byteorder != 'little':
+        for values in arrays:
+            values.byteswap()
+
+    output = Path(output)
+    tmp_path = output.with_name(output.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, sum(unigrams.values()), len(vocab), len(bigram_table), len(trigram_table)))
+        for values in arrays:
+            f.write(values.tobytes())
+        for word in encoded:
+            f.write(word)
+    os.replace(tmp_path, output)
+    return len(vocab), len(bigram_table), len(trigram_table)
+
+
+def has_current_format(path: Path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def ensure_model(roots: list[Path], path: Path = DEFAULT_MODEL) -> Path:
+    """Build the model unless it is newer than every training file and term list"""
+    sources = [f for root in roots for f in training_files(Path(root))] + [DEFAULT_USER_WORDS, DEFAULT_CONFIG]
+    if is_stale(Path(path), sources) or not has_current_format(Path(path)):
+        vocab, bigrams, trigrams = build_model(roots, Path(path))
+        print(f"Built n-gram model {path} ({vocab} words, {trigrams} trigrams)", file=sys.stderr)
+    return Path(path)
+
+
+class NgramModel:
+    """Read-only view over a model artifact, mapped on first lookup"""
+
+    def __init__(self, path: Path = DEFAULT_MODEL):
+        self.path = Path(path)
+        self._mm = None
+        self._id = lru_cache(maxsize=MEMO_SIZE)(self._lookup)
+        self._held = None
+
+    def _view(self, start: int, count: int, code: str):
+        size = array(code).itemsize
+        if sys.byteorder == 'little':
+            return memoryview(self._mm)[start:start + size * count].cast(code), start + size * count
+        values = array(code, self._mm[start:start + size * count])
+        values.byteswap()
+        return values, start + size * count
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.tokens, self.vocab, bigrams, trigrams = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not an n-gram model: {self.path}")
+        pos = HEADER.size
+        self._bigram_keys, pos = self._view(pos, bigrams, 'Q')
+        self._trigram_keys, pos = self._view(pos, trigrams, 'Q')
+        self._offsets, pos = self._view(pos, self.vocab + 1, 'I')
+        self._unigram_counts, pos = self._view(pos, self.vocab, 'I')
+        self._bigram_counts, pos = self._view(pos, bigrams, 'I')
+        self._trigram_counts, pos = self._view(pos, trigrams, 'I')
+        self._blob = pos
+        self._floor = math.log10(1 / (self.tokens + self.vocab))
+
+    def _word_at(self, i: int) -> bytes:
+        return self._mm[self._blob + self._offsets[i]:self._blob + self._offsets[i + 1]]
+
+    def _lookup(self, word: str) -> int | None:
+        if self._mm is None:
+            self._open()
+        key = word.encode('utf-8')
+        lo, hi = 0, self.vocab
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.vocab and self._word_at(lo) == key else None
+
+    def word_id(self, word: str) -> int | None:
+        """The word's id, or None if the model never saw it"""
+        return self._id(word.lower())
+
+    @staticmethod
+    def _find(keys, counts, key: int) -> int:
+        i = bisect_left(keys, key)
+        return counts[i] if i < len(keys) and keys[i] == key else 0
+
+    def held_out(self, files: list[Path]) -> 'NgramModel':
+        """A view of the model without the counts of some of its training files
+
+        Shares the mapping with this model; used to score a chapter against every
+        text but its own.
+        """
+        if self._mm is None:
+            self._open()
+        view = copy.copy(self)
+        if files:
+            unigrams, bigrams, trigrams = count_ngrams(files, [])
+            view._held = (unigrams, bigrams, trigrams)
+            view.tokens = max(1, self.tokens - sum(unigrams.values()))
+        return view
+
+    def count(self, *words: str) -> int:
+        """How often the 1-3 word sequence occurred in training"""
+        ids = [self.word_id(w) for w in words]
+        if None in ids:
+            return 0
+        if len(ids) == 1:
+            found = self._unigram_counts[ids[0]]
+        elif len(ids) == 2:
+            found = self._find(self._bigram_keys, self._bigram_counts, pack(*ids))
+        else:
+            found = self._find(self._trigram_keys, self._trigram_counts, pack(*ids))
+        if self._held is None:
+            return found
+        key = words[0].lower() if len(words) == 1 else tuple(w.lower() for w in words)
+        return max(0, found - self._held[len(words) - 1][key])
+
+    def logprob(self, word: str, context: tuple[str, ...] = ()) -> float:
+        """Stupid-backoff log10 score of word after up to two context words"""
+        if self._mm is None:
+            self._open()
+        penalty = 0.0
+        context = tuple(context[-2:])
+        while context:
+            joint = self.count(*context, word)
+            if joint:
+                return penalty + math.log10(joint / max(joint, self.count(*context)))
+            penalty += math.log10(BACKOFF)
+            context = context[1:]
+        unigram = self.count(word)
+        if unigram:
+            return penalty + math.log10(unigram / self.tokens)
+        return penalty + self._floor
+
+    def window_score(self, left: list[str], word: str, right: list[str]) -> float:
+        """Score of word in place: its own probability plus that of the words it conditions"""
+        sequence = [*left[-2:], word, *right[:2]]
+        start = len(sequence) - len(right[:2]) - 1
+        return sum(self.logprob(sequence[i], tuple(sequence[max(0, i - 2):i]))
+                   for i in range(start, len(sequence)))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the word n-gram model')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Build the model from finished text')
+    build.add_argument('sources', nargs='+',
+                       help='Finished converted books (their final/), directories of clean text or files')
+    build.add_argument('--output', default=str(DEFAULT_MODEL),
+                       help=f'Output file (default: {DEFAULT_MODEL.name})')
+    build.add_argument('--words', default=str(DEFAULT_USER_WORDS),
+                       help=f'User words file (default: {DEFAULT_USER_WORDS.name})')
+    build.add_argument('--config', default=str(DEFAULT_CONFIG),
+                       help=f'Pipeline config with planescape_dictionary (default: {DEFAULT_CONFIG.name})')
+
+    score = sub.add_parser('score', help='Score each word of a text in context')
+    score.add_argument('text')
+    score.add_argument('--model', default=str(DEFAULT_MODEL),
+                       help=f'Model file (default: {DEFAULT_MODEL.name})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        missing = [s for s in args.sources if not Path(s).exists()]
+        if missing:
+            print(f"Error: Not found: {', '.join(missing)}", file=sys.stderr)
+            sys.exit(1)
+        vocab, bigrams, trigrams = build_model([Path(s) for s in args.sources], Path(args.output),
+                                               Path(args.words), Path(args.config))
+        print(f"✨ N-gram model saved to {args.output}")
+        print(f"   {vocab} words, {bigrams} bigrams, {trigrams} trigrams")
+        return
+
+    if not Path(args.model).exists():
+        print(f"Error: Model not found: {args.model} (run: python3 ngram_model.py build DIR)", file=sys.stderr)
+        sys.exit(1)
+    model = NgramModel(Path(args.model))
+    tokens = [START] + tokenize(args.text)
+    total = 0.0
+    for i in range(1, len(tokens)):
+        score = model.logprob(tokens[i], tuple(tokens[max(0, i - 2):i]))
+        total += score
+        print(f"  {tokens[i]:20} {score:7.2f}")
+    print(f"Total: {total:.2f} (log10)")
+
+
+if __name__ == '__main__':
+    main()
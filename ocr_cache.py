@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+ocr_cache.py - Content-addressed OCR result cache
+Tesseract results keyed by what actually determines them: a hash of the input
+image bytes (the encoded file, or the raw pixels of an in-memory image) plus
+the language, psm, oem, tesseract variables, the contents of the user words
+file and the tesseract version. Every chapter, preset benchmark and re-run
+looks here before recognizing a page (or a re-OCR batch of word crops), so
+images whose preprocessed pixels did not change are never OCR'd twice, whatever
+directory or preset they came from.
+
+Entries hold the zlib-compressed TSV and text and the seconds the recognition
+took. They live in one SQLite database (WAL mode, so every worker process can
+read and write it). Once the entries exceed the size limit, the least recently
+used ones are evicted.
+
+Usage: python3 ocr_cache.py [--cache-dir DIR] stats
+       python3 ocr_cache.py [--cache-dir DIR] prune [--max-mb N]
+       python3 ocr_cache.py [--cache-dir DIR] clear
+"""
+
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import subprocess
+from pathlib import Path
+from functools import lru_cache
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_CACHE = SCRIPT_DIR / ".ocr_cache"
+DEFAULT_MAX_MB = 2048
+CACHE_DB = "ocr_cache.db"
+BUSY_TIMEOUT_MS = 30000
+LOW_WATER = 0.9             # Eviction frees space down to this share of the limit
+COMPRESS_LEVEL = 1          # TSV compresses ~5× even at the fastest level
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key      TEXT PRIMARY KEY,
+    tsv      BLOB NOT NULL,
+    text     BLOB NOT NULL,
+    seconds  REAL,
+    size     INTEGER NOT NULL,
+    used     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+@lru_cache(maxsize=None)
+def tesseract_version(engine: str) -> str:
+    """Version of the library or binary an engine runs, read once per process"""
+    if engine == 'TesserocrEngine':
+        import tesserocr
+        return tesserocr.tesseract_version().splitlines()[0].strip()
+    try:
+        result = subprocess.run(['tesseract', '--version'], capture_output=True, text=True)
+    except OSError:
+        return 'unknown'
+    output = (result.stdout or result.stderr).strip()  # Older releases print it to stderr
+    return output.splitlines()[0] if output else 'unknown'
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path: str) -> str:
+    try:
+        return hashlib.blake2b(Path(path).read_bytes(), digest_size=16).hexdigest()
+    except OSError:
+        return 'missing'
+
+
+def engine_salt(engine: str, lang: str, psm: int, oem: int, user_words: str | None,
+                variables: dict | None = None) -> str:
+    """Everything besides the image that changes what tesseract returns"""
+    return json.dumps({
+        'engine': engine,
+        'version': tesseract_version(engine),
+        'lang': lang,
+        'psm': psm,
+        'oem': oem,
+        'user_words': _file_digest(user_words) if user_words else None,
+        'variables': variables or {},
+    }, sort_keys=True)
+
+
+class OcrCache:
+    """Size-bounded LRU store of (tsv, text, seconds) by content key"""
+
+    def __init__(self, directory: Path = DEFAULT_CACHE, max_mb: float = DEFAULT_MAX_MB):
+        self.path = Path(directory) / CACHE_DB
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> tuple[str, str, float | None] | None:
+        row = self.db.execute("SELECT tsv, text, seconds FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return zlib.decompress(row[0]).decode('utf-8'), zlib.decompress(row[1]).decode('utf-8'), row[2]
+
+    def put(self, key: str, tsv: str, text: str, seconds: float | None = None):
+        tsv_blob = zlib.compress(tsv.encode('utf-8'), COMPRESS_LEVEL)
+        text_blob = zlib.compress(text.encode('utf-8'), COMPRESS_LEVEL)
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, tsv_blob, text_blob, seconds, len(tsv_blob) + len(text_blob), time.time()))
+            self._evict(self.max_bytes)
+
+    def _evict(self, max_bytes: int) -> int:
+        """Drop least recently used entries until under the low-water mark; inside a transaction"""
+        total = self.db.execute("SELECT total(size) FROM results").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        target = total - max_bytes * LOW_WATER
+        freed = 0
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY used"):
+            if freed >= target:
+                break
+            doomed.append((key,))
+            freed += size
+        self.db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        return len(doomed)
+
+    def prune(self, max_bytes: int | None = None) -> int:
+        """Evict down to a limit now and give the space back to the file system"""
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            evicted = self._evict(self.max_bytes if max_bytes is None else max_bytes)
+        self.db.execute("VACUUM")
+        return evicted
+
+    def clear(self):
+        self.db.execute("DELETE FROM results")
+        self.db.execute("VACUUM")
+
+    def stats(self) -> tuple[int, int]:
+        """(entries, stored bytes)"""
+        count, size = self.db.execute("SELECT COUNT(*), total(size) FROM results").fetchone()
+        return count, int(size)
+
+
+class CachedEngine:
+    """Wraps an OCR engine (see ocr_pool.py) and answers repeat images from an OcrCache
+
+    last_seconds is the recognition time of the latest image, measured on a miss
+    and as originally recorded on a hit, so benchmarks stay comparable.
+    """
+
+    def __init__(self, engine, cache: OcrCache, salt: str):
+        self.engine = engine
+        self.cache = cache
+        self.salt = salt.encode('utf-8')
+        self.hits = 0
+        self.misses = 0
+        self.last_seconds = 0.0
+
+    def _key(self, *parts: bytes) -> str:
+        digest = hashlib.blake2b(self.salt, digest_size=20)
+        for part in parts:
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _lookup(self, key: str, recognize) -> tuple[str, str]:
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            tsv, text, seconds = cached
+            self.last_seconds = seconds or 0.0
+            return tsv, text
+        self.misses += 1
+        start = time.perf_counter()
+        tsv, text = recognize()
+        self.last_seconds = time.perf_counter() - start
+        if tsv:  # A failed tesseract run returns nothing; try again next time
+            self.cache.put(key, tsv, text, round(self.last_seconds, 3))
+        return tsv, text
+
+    def recognize(self, image: Path) -> tuple[str, str]:
+        """Recognize an image file, keyed by its encoded bytes"""
+        key = self._key(b'file\0', Path(image).read_bytes())
+        return self._lookup(key, lambda: self.engine.recognize(image))
+
+    def recognize_image(self, image) -> tuple[str, str]:
+        """Recognize an in-memory PIL image, keyed by its raw pixels"""
+        key = self._key(f"pixels\0{image.mode}\0{image.size}\0".encode('utf-8'), image.tobytes())
+        return self._lookup(key, lambda: self.engine.recognize_image(image))
+
+    def recognize_batch(self, images: list) -> list[str]:
+        """Recognize in-memory PIL images, sending only the cache misses to the engine as one batch
+
+        Keyed by pixels like recognize_image, but kept apart from it because batch
+        results have no text. last_seconds is the batch's total, with recorded times for hits.
+        """
+        keys = [self._key(f"batch\0{image.mode}\0{image.size}\0".encode('utf-8'), image.tobytes())
+                for image in images]
+        results = [None] * len(images)
+        seconds = 0.0
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached[0]
+                seconds += cached[2] or 0.0
+        misses = [i for i, tsv in enumerate(results) if tsv is None]
+        self.hits += len(images) - len(misses)
+        self.misses += len(misses)
+        if misses:
+            start = time.perf_counter()
+            tsvs = self.engine.recognize_batch([images[i] for i in misses])
+            elapsed = time.perf_counter() - start
+            seconds += elapsed
+            for i, tsv in zip(misses, tsvs):
+                results[i] = tsv
+                self.cache.put(keys[i], tsv, '', round(elapsed / len(misses), 3))
+        self.last_seconds = seconds
+        return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inspect and trim the OCR result cache')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE),
+                        help=f'Cache directory (default: {DEFAULT_CACHE.name})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stats', help='Entries and size')
+    prune = sub.add_parser('prune', help='Evict least recently used entries down to a size')
+    prune.add_argument('--max-mb', type=float, default=DEFAULT_MAX_MB,
+                       help=f'Size to keep (default: {DEFAULT_MAX_MB})')
+    sub.add_parser('clear', help='Remove every entry')
+    args = parser.parse_args()
+
+    with OcrCache(Path(args.cache_dir), getattr(args, 'max_mb', DEFAULT_MAX_MB)) as cache:
+        if args.command == 'stats':
+            count, size = cache.stats()
+            print(f"{count} results, {size / 1024 / 1024:.1f} MB in {cache.path}")
+        elif args.command == 'prune':
+            evicted = cache.prune()
+            count, size = cache.stats()
+            print(f"✨ Evicted {evicted} results", file=sys.stderr)
+            print(f"   {count} results, {size / 1024 / 1024:.1f} MB left", file=sys.stderr)
+        else:
+            cache.clear()
+            print(f"✨ Cleared {cache.path}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+ocr_candidates.py - OCR-confusion-aware correction candidates (symmetric-delete index)
+Builds a deletion index over the lexicon so ranked corrections for any token come
+back from a handful of lookups instead of enumerating every possible edit.
+
+Words and tokens are first folded to an OCR "skeleton" (rn→m, cl→d, vv→w, 1→l,
+0→o, ...) so glyph confusions cost nothing to find. Deletes of up to MAX_DISTANCE
+characters from the first PREFIX_LENGTH skeleton characters are hashed into a
+sorted on-disk table (SymSpell style). Candidates are ranked by an edit distance
+weighted with the OCR confusion table.
+
+Artifact layout (little-endian):
+    magic (8 bytes) | lexicon size (uint32) | count (uint32) | entries (uint64 × count)
+    entry = key hash << 24 | lexicon word id
+
+Usage: python3 ocr_candidates.py build [--lexicon FILE] [--output FILE]
+       python3 ocr_candidates.py suggest WORD [WORD ...] [--top N]
+"""
+
+import os
+import sys
+import mmap
+import zlib
+import struct
+from array import array
+from pathlib import Path
+from itertools import combinations
+
+from lexicon import Lexicon, DEFAULT_LEXICON
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_INDEX = SCRIPT_DIR / "candidates.bin"
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+DEFAULT_TOP = 5
+
+MAGIC = b'HHCAND\x01\x00'
+HEADER = struct.Struct('<8sII')
+ID_BITS = 24
+ID_MASK = (1 << ID_BITS) - 1
+
+# Weighted OCR confusions: (what OCR read, what was printed, cost)
+# Plain insert/delete/substitute cost 1.0, so anything below that is a known glyph confusion
+OCR_CONFUSIONS = [
+    ('rn', 'm', 0.3),
+    ('m', 'rn', 0.3),
+    ('cl', 'd', 0.3),
+    ('d', 'cl', 0.3),
+    ('li', 'h', 0.4),
+    ('lI', 'h', 0.4),
+    ('vv', 'w', 0.2),
+    ('ii', 'u', 0.4),
+    ('ri', 'n', 0.5),
+    ('in', 'm', 0.5),
+    ('1', 'l', 0.2),
+    ('1', 'i', 0.3),
+    ('l', 'i', 0.4),
+    ('i', 'l', 0.4),
+    ('|', 'l', 0.2),
+    ('!', 'l', 0.4),
+    ('0', 'o', 0.2),
+    ('o', '0', 0.4),
+    ('5', 's', 0.3),
+    ('8', 'b', 0.4),
+    ('6', 'b', 0.5),
+    ('j', 'f', 0.5),
+    ('c', 'e', 0.5),
+    ('e', 'c', 0.5),
+    ('v', 'y', 0.5),
+    ('h', 'b', 0.5),
+    ('b', 'h', 0.5),
+    ('n', 'u', 0.6),
+    ('u', 'n', 0.6),
+    ('+', 't', 0.5),
+]
+
+# Skeleton folding: multi-character glyph confusions first, then single characters
+FOLD_SEQUENCES = [('vv', 'w'), ('rn', 'm'), ('cl', 'd')]
+FOLD_CHARS = str.maketrans({'1': 'l', '|': 'l', '0': 'o', '5': 's'})
+
+_CONFUSIONS_BY_FIRST = {}
+for _src, _dst, _cost in OCR_CONFUSIONS:
+    _CONFUSIONS_BY_FIRST.setdefault(_src[0], []).append((_src, _dst, _cost))
+
+
+def skeleton(word: str) -> str:
+    """Fold a word so common OCR glyph confusions map to the same string"""
+    folded = word.lower()
+    for src, dst in FOLD_SEQUENCES:
+        folded = folded.replace(src, dst)
+    return folded.translate(FOLD_CHARS)
+
+
+def deletes(text: str, max_distance: int = MAX_DISTANCE) -> set[str]:
+    """All strings reachable by deleting up to max_distance characters"""
+    results = {text}
+    for d in range(1, min(max_distance, len(text)) + 1):
+        for positions in combinations(range(len(text)), d):
+            results.add(''.join(c for i, c in enumerate(text) if i not in positions))
+    return results
+
+
+def key_hash(key: str) -> int:
+    """Stable 40-bit hash of a delete key (crc32 plus length)"""
+    data = key.encode('utf-8')
+    return ((len(data) & 0xFF) << 32) | zlib.crc32(data)
+
+
+def ocr_distance(source: str, target: str, max_cost: float = float('inf')) -> float:
+    """Edit distance where known OCR confusions are cheaper than plain edits
+
+    Supports multi-character confusions (rn→m, vv→w) and adjacent transpositions.
+    Returns inf when the distance exceeds max_cost.
+    """
+    n, m = len(source), len(target)
+    inf = float('inf')
+    dist = [[inf] * (m + 1) for _ in range(n + 1)]
+    dist[0][0] = 0.0
+
+    for i in range(n + 1):
+        row = dist[i]
+        for j in range(m + 1):
+            d = row[j]
+            if d > max_cost:
+                continue
+            if i < n and d + 1 < dist[i + 1][j]:
+                dist[i + 1][j] = d + 1
+            if j < m and d + 1 < row[j + 1]:
+                row[j + 1] = d + 1
+            if i < n and j < m:
+                cost = 0.0 if source[i] == target[j] else 1.0
+                if d + cost < dist[i + 1][j + 1]:
+                    dist[i + 1][j + 1] = d + cost
+                if (i + 1 < n and j + 1 < m and source[i] == target[j + 1]
+                        and source[i + 1] == target[j] and d + 1 < dist[i + 2][j + 2]):
+                    dist[i + 2][j + 2] = d + 1
+            if i < n:
+                for src, dst, cost in _CONFUSIONS_BY_FIRST.get(source[i], ()):
+                    if source.startswith(src, i) and target.startswith(dst, j):
+                        ni, nj = i + len(src), j + len(dst)
+                        if d + cost < dist[ni][nj]:
+                            dist[ni][nj] = d + cost
+
+    result = dist[n][m]
+    return result if result <= max_cost else inf
+
+
+def match_case(template: str, word: str) -> str:
+    """Apply the capitalization of template to word"""
+    if len(template) > 1 and template.isupper():
+        return word.upper()
+    if template[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+def build_index(lexicon: Lexicon, output: Path = DEFAULT_INDEX,
+                max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH) -> int:
+    """Build the deletion index for every lexicon word and return the entry count"""
+    entries = array('Q')
+    for word_id, word in enumerate(lexicon):
+        prefix = skeleton(word)[:prefix_length]
+        for key in deletes(prefix, max_distance):
+            entries.append((key_hash(key) << ID_BITS) | word_id)
+
+    entries = array('Q', sorted(set(entries)))
+    if sys.byteorder != 'little':
+        entries.byteswap()
+
+    output = Path(output)
+    tmp_path = output.with_name(output.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(lexicon), len(entries)))
+        f.write(entries.tobytes())
+    os.replace(tmp_path, output)
+    return len(entries)
+
+
+class CandidateIndex:
+    """Ranked correction candidates backed by the mmap'd deletion index"""
+
+    def __init__(self, lexicon: Lexicon | None = None, path: Path = DEFAULT_INDEX,
+                 max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.lexicon = lexicon or Lexicon()
+        self.path = Path(path)
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._mm = None
+        self._entries = None
+
+    def _open(self):
+        size = len(self.lexicon)  # Builds the lexicon if needed
+        if not self._is_current(size):
+            count = build_index(self.lexicon, self.path, self.max_distance, self.prefix_length)
+            print(f"Built candidate index {self.path} ({count} entries)", file=sys.stderr)
+
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, count = HEADER.unpack_from(self._mm, 0)
+        end = HEADER.size + 8 * count
+        if sys.byteorder == 'little':
+            self._entries = memoryview(self._mm)[HEADER.size:end].cast('Q')
+        else:
+            self._entries = array('Q', self._mm[HEADER.size:end])
+            self._entries.byteswap()
+
+    def _is_current(self, lexicon_size: int) -> bool:
+        if not self.path.exists():
+            return False
+        if self.lexicon.path.exists() and self.lexicon.path.stat().st_mtime > self.path.stat().st_mtime:
+            return False
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, size, _ = HEADER.unpack(header)
+        return magic == MAGIC and size == lexicon_size
+
+    def _ids_for(self, key: str) -> list[int]:
+        """Word ids whose skeleton prefix has this delete key (may include hash collisions)"""
+        entries = self._entries
+        low = key_hash(key) << ID_BITS
+        high = low | ID_MASK
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[mid] < low:
+                lo = mid + 1
+            else:
+                hi = mid
+        ids = []
+        while lo < len(entries) and entries[lo] <= high:
+            ids.append(entries[lo] & ID_MASK)
+            lo += 1
+        return ids
+
+    def candidates(self, token: str, top: int = DEFAULT_TOP,
+                   max_cost: float | None = None) -> list[tuple[str, float]]:
+        """Return up to `top` (word, cost) pairs ranked by OCR-weighted distance"""
+        if self._mm is None:
+            self._open()
+        if max_cost is None:
+            max_cost = float(self.max_distance)
+
+        lowered = token.lower()
+        folded = skeleton(token)
+        word_ids = set()
+        for key in deletes(folded[:self.prefix_length], self.max_distance):
+            word_ids.update(self._ids_for(key))
+
+        ranked = []
+        for word_id in word_ids:
+            word = self.lexicon.word(word_id)
+            if abs(len(skeleton(word)) - len(folded)) > self.max_distance:
+                continue
+            cost = ocr_distance(lowered, word, max_cost)
+            if cost <= max_cost:
+                ranked.append((cost, word))
+
+        ranked.sort(key=lambda item: (item[0], abs(len(item[1]) - len(token)), item[1]))
+        return [(match_case(token, word), cost) for cost, word in ranked[:top]]
+
+    def best(self, token: str, max_cost: float = 1.0) -> str | None:
+        """Return the single best candidate if it is cheaper than max_cost and unambiguous"""
+        ranked = self.candidates(token, top=2, max_cost=max_cost)
+        if not ranked or ranked[0][1] >= max_cost:
+            return None
+        if len(ranked) > 1 and ranked[1][1] <= ranked[0][1]:
+            return None
+        return ranked[0][0]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the OCR correction candidate index')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Build the deletion index')
+    build.add_argument('--lexicon', default=str(DEFAULT_LEXICON),
+                       help=f'Lexicon file (default: {DEFAULT_LEXICON.name})')
+    build.add_argument('--output', default=str(DEFAULT_INDEX),
+                       help=f'Output file (default: {DEFAULT_INDEX.name})')
+
+    suggest = sub.add_parser('suggest', help='Show ranked candidates for tokens')
+    suggest.add_argument('words', nargs='+')
+    suggest.add_argument('--top', type=int, default=DEFAULT_TOP,
+                         help=f'Candidates per word (default: {DEFAULT_TOP})')
+    suggest.add_argument('--index', default=str(DEFAULT_INDEX),
+                         help=f'Index file (default: {DEFAULT_INDEX.name})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_index(Lexicon(Path(args.lexicon)), Path(args.output))
+        print(f"✨ Candidate index saved to {args.output}")
+        print(f"   {count} entries")
+    else:
+        index = CandidateIndex(path=Path(args.index))
+        for word in args.words:
+            ranked = index.candidates(word, top=args.top)
+            shown = ', '.join(f"{w} ({cost:.1f})" for w, cost in ranked) or '(no candidates)'
+            print(f"{word:20} → {shown}")
+
+
+if __name__ == '__main__':
+    main()
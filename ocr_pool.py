@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+ocr_pool.py - Persistent tesseract worker pool for page OCR
+Runs one long-lived worker per core. Each worker loads the language model and
+the --user-words list once, recognizes every image a single time and derives the
+.tsv, -text.txt and -lowconf.txt artifacts from that one result. Each finished
+page is recorded in the pipeline state store (pipeline_state.py); recorded pages
+are skipped, so interrupted runs resume.
+
+Workers use tesserocr (in-process libtesseract) when it is installed. Without it
+each image is still recognized once: a single tesseract call renders both the
+tsv and txt outputs. Results are looked up in the shared OCR cache first
+(ocr_cache.py), keyed by the image bytes and the OCR parameters, so unchanged
+pages are not recognized again by a re-run, another chapter or a benchmark.
+
+Per page, in the same order of preference as the interactive preprocessing:
+    page-N-column-K.png → page-N-colK.tsv/.txt, combined into page-N-text.txt
+    page-N-cleaned.png  → page-N.tsv, page-N-text.txt
+    page-N-processed.png → page-N.tsv, page-N-text.txt
+and page-N-lowconf.txt lists every word below the confidence threshold.
+
+Pages with automatic regions (segment_pages.py, "source": "auto" in
+page-N-metadata.json) are cropped in memory and recognized region by region,
+like drawn columns; their page-N-colK.tsv boxes are in page coordinates. With
+--segment, pages without any metadata are segmented by the worker first, and
+pages scoring below --min-confidence (or the config's
+segmentation.min_confidence) are flagged for review.
+
+With --preprocess, pages that only have the original page-N.png are
+preprocessed in memory with the pipeline config's settings (preprocess_pages.py)
+instead of being read from a -processed.png.
+
+Usage: python3 ocr_pool.py TEMP_DIR [--jobs N] [--lang eng] [--psm 6] [--oem 1]
+                           [--user-words FILE] [--threshold 60] [--quiet]
+                           [--preprocess [--config FILE] [--shared-memory]]
+                           [--segment [--min-confidence N]]
+                           [--cache-dir DIR | --no-cache] [--cache-max-mb N]
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from ocr_cache import OcrCache, CachedEngine, engine_salt, DEFAULT_CACHE, DEFAULT_MAX_MB
+from pipeline_state import StateStore, file_hash, DONE, FAILED
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_LANGUAGE = "eng"
+DEFAULT_PSM = 6
+DEFAULT_OEM = 1
+DEFAULT_THRESHOLD = 60
+
+# Header written by tesseract's own TSV renderer
+TSV_HEADER = ("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\t"
+              "left\ttop\twidth\theight\tconf\ttext\n")
+TSV_PAGE = 1
+TSV_LEFT = 6
+TSV_TOP = 7
+TSV_CONF = 10
+TSV_TEXT = 11
+
+PAGE_IMAGE = re.compile(r'^(page-.*?)(?:-column-\d+|-cleaned|-processed)?\.png$')
+
+
+class TesserocrEngine:
+    """In-process libtesseract handle, initialized once per worker"""
+
+    def __init__(self, lang: str, psm: int, oem: int, user_words: str | None,
+                 variables: dict | None = None):
+        from tesserocr import PyTessBaseAPI
+        variables = dict(variables or {})
+        if user_words:
+            variables['user_words_file'] = user_words
+        self.api = PyTessBaseAPI(lang=lang, psm=psm, oem=oem, variables=variables)
+
+    def _recognize(self):
+        if not self.api.Recognize():
+            raise RuntimeError("tesseract could not recognize the image")
+
+    def recognize(self, image: Path) -> tuple[str, str]:
+        """Recognize an image once and return (tsv, text)"""
+        self.api.SetImageFile(str(image))
+        self._recognize()
+        return TSV_HEADER + self.api.GetTSVText(0), self.api.GetUTF8Text()
+
+    def recognize_image(self, image) -> tuple[str, str]:
+        """Recognize an in-memory PIL image once and return (tsv, text)"""
+        self.api.SetImage(image)
+        self._recognize()
+        return TSV_HEADER + self.api.GetTSVText(0), self.api.GetUTF8Text()
+
+    def recognize_batch(self, images: list) -> list[str]:
+        """Recognize in-memory PIL images and return one TSV per image"""
+        results = []
+        for image in images:
+            self.api.SetImage(image)
+            self._recognize()
+            results.append(TSV_HEADER + self.api.GetTSVText(0))
+        return results
+
+
+class TesseractCliEngine:
+    """tesseract binary rendering tsv and txt from a single recognition"""
+
+    def __init__(self, lang: str, psm: int, oem: int, user_words: str | None,
+                 variables: dict | None = None):
+        self.args = ['-l', lang, '--psm', str(psm), '--oem', str(oem)]
+        if user_words:
+            self.args += ['--user-words', user_words]
+        for name, value in (variables or {}).items():
+            self.args += ['-c', f'{name}={value}']
+
+    @staticmethod
+    def _run(command: list[str]):
+        """Run tesseract; a non-zero exit raises with the last line it printed"""
+        result = subprocess.run(['tesseract', *command], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors='replace')
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            raise RuntimeError(f"tesseract exited with status {result.returncode}"
+                               + (f": {lines[-1]}" if lines else ""))
+
+    def recognize(self, image: Path) -> tuple[str, str]:
+        """Recognize an image once and return (tsv, text)"""
+        outbase = image.parent / f".ocr-{os.getpid()}"
+        tsv_path = outbase.with_suffix('.tsv')
+        txt_path = outbase.with_suffix('.txt')
+        try:
+            self._run([str(image), str(outbase), *self.args, 'tsv', 'txt'])
+            tsv = tsv_path.read_text(encoding='utf-8', errors='replace')
+            text = txt_path.read_text(encoding='utf-8', errors='replace')
+        finally:
+            tsv_path.unlink(missing_ok=True)
+            txt_path.unlink(missing_ok=True)
+        return tsv, text
+
+    def recognize_image(self, image) -> tuple[str, str]:
+        """Recognize an in-memory PIL image once; the binary needs it written to a scratch file"""
+        with tempfile.TemporaryDirectory(prefix='ocr_image_') as scratch:
+            path = Path(scratch) / 'page.png'
+            image.save(path)
+            return self.recognize(path)
+
+    def recognize_batch(self, images: list) -> list[str]:
+        """Recognize in-memory PIL images with one tesseract call and return one TSV per image
+
+        The images go through an image list file, so the model loads once per batch
+        and tesseract numbers them as pages of a single TSV.
+        """
+        with tempfile.TemporaryDirectory(prefix='ocr_batch_') as scratch:
+            scratch = Path(scratch)
+            paths = []
+            for i, image in enumerate(images):
+                path = scratch / f"{i:05d}.png"
+                image.save(path)
+                paths.append(str(path))
+            list_file = scratch / 'images.txt'
+            list_file.write_text('\n'.join(paths) + '\n', encoding='utf-8')
+            self._run([str(list_file), str(scratch / 'out'), *self.args, 'tsv'])
+            tsv = (scratch / 'out.tsv').read_text(encoding='utf-8', errors='replace')
+
+        pages = [[] for _ in images]
+        for row in tsv.splitlines()[1:]:
+            fields = row.split('\t')
+            if len(fields) > TSV_PAGE and fields[TSV_PAGE].isdigit():
+                page = int(fields[TSV_PAGE]) - 1
+                if 0 <= page < len(pages):
+                    pages[page].append(row + '\n')
+        return [TSV_HEADER + ''.join(rows) for rows in pages]
+
+
+def make_engine(lang: str, psm: int, oem: int, user_words: str | None,
+                variables: dict | None = None, cache_dir: str | None = None,
+                cache_max_mb: float = DEFAULT_MAX_MB):
+    """Prefer in-process tesserocr, fall back to the tesseract binary; cached when cache_dir is set"""
+    try:
+        engine = TesserocrEngine(lang, psm, oem, user_words, variables)
+    except ImportError:
+        engine = TesseractCliEngine(lang, psm, oem, user_words, variables)
+    if cache_dir is None:
+        return engine
+    salt = engine_salt(type(engine).__name__, lang, psm, oem, user_words, variables)
+    return CachedEngine(engine, OcrCache(Path(cache_dir), cache_max_mb), salt)
+
+
+def lowconf_lines(tsv: str, threshold: float) -> list[str]:
+    """Words below the confidence threshold, formatted as "word (conf: XX)" """
+    lines = []
+    for row in tsv.splitlines()[1:]:
+        fields = row.split('\t')
+        if len(fields) <= TSV_TEXT or not fields[TSV_CONF] or not fields[TSV_TEXT]:
+            continue
+        try:
+            conf = float(fields[TSV_CONF])
+        except ValueError:
+            continue
+        if conf < threshold:
+            lines.append(f"{fields[TSV_TEXT]} (conf: {fields[TSV_CONF]})\n")
+    return lines
+
+
+def offset_tsv(tsv: str, dx: int, dy: int) -> str:
+    """Shift the boxes of a cropped region's TSV back into page coordinates"""
+    lines = tsv.splitlines(keepends=True)
+    for i in range(1, len(lines)):
+        fields = lines[i].split('\t')
+        if len(fields) > TSV_TOP and fields[TSV_LEFT].lstrip('-').isdigit():
+            fields[TSV_LEFT] = str(int(fields[TSV_LEFT]) + dx)
+            fields[TSV_TOP] = str(int(fields[TSV_TOP]) + dy)
+            lines[i] = '\t'.join(fields)
+    return ''.join(lines)
+
+
+def load_ocr_settings(config: dict) -> dict:
+    """OCR parameters from a pipeline config dict; user_words resolves next to the scripts"""
+    ocr = config.get('ocr', {})
+    user_words = ocr.get('user_words') or None
+    if user_words and not Path(user_words).is_file():
+        user_words = str(SCRIPT_DIR / user_words) if (SCRIPT_DIR / user_words).is_file() else None
+    cache = ocr.get('cache', True)
+    if cache is True:
+        cache = str(DEFAULT_CACHE)
+    return {
+        'language': ocr.get('language', DEFAULT_LANGUAGE),
+        'psm': int(ocr.get('psm', DEFAULT_PSM)),
+        'oem': int(ocr.get('oem', DEFAULT_OEM)),
+        'user_words': user_words,
+        'threshold': float(ocr.get('confidence_threshold', DEFAULT_THRESHOLD)),
+        'segment': bool(config.get('segmentation', {}).get('enabled', False)),
+        'segment_min_confidence': config.get('segmentation', {}).get('min_confidence'),  # None: module default
+        'cache_dir': cache or None,     # false turns the OCR cache off; a string moves it
+        'cache_max_mb': float(ocr.get('cache_max_mb', DEFAULT_MAX_MB)),
+    }
+
+
+def page_basenames(temp_dir: Path) -> list[str]:
+    """Unique page basenames from any page artifact (columns, cleaned, processed, original)"""
+    names = set()
+    for path in temp_dir.glob('page-*.png'):
+        match = PAGE_IMAGE.match(path.name)
+        if match:
+            names.add(match.group(1))
+    return sorted(names)
+
+
+def column_images(temp_dir: Path, basename: str) -> list[Path]:
+    images = []
+    while (temp_dir / f"{basename}-column-{len(images) + 1}.png").exists():
+        images.append(temp_dir / f"{basename}-column-{len(images) + 1}.png")
+    return images
+
+
+def needs_preprocessing(temp_dir: Path, basename: str) -> bool:
+    """Only the original page exists: no columns, cleaned or processed image"""
+    return (not (temp_dir / f"{basename}-column-1.png").exists()
+            and not (temp_dir / f"{basename}-cleaned.png").exists()
+            and not (temp_dir / f"{basename}-processed.png").exists()
+            and (temp_dir / f"{basename}.png").exists())
+
+
+def ocr_page(engine, temp_dir: Path, basename: str, threshold: float, page_image=None,
+             segment: bool = False, min_confidence: float | None = None) -> list[Path]:
+    """OCR one page's best available image(s) and write its artifacts
+
+    page_image is the in-memory preprocessed page, used when no preprocessed file exists.
+    With segment, a page without metadata is segmented before it is recognized,
+    and flagged for review when it scores below min_confidence.
+    Returns the image files the text came from; empty when the page was skipped.
+    Nothing is written unless every image was recognized, so a failing engine
+    (which raises) leaves no partial artifacts behind.
+    """
+    columns = column_images(temp_dir, basename)
+    lowconf = []
+    outputs = {}
+
+    if columns:
+        combined = ["\n"]
+        for col_idx, image in enumerate(columns, 1):
+            col_base = f"{basename}-col{col_idx}"
+            tsv, text = engine.recognize(image)
+            outputs[f"{col_base}.tsv"] = tsv
+            outputs[f"{col_base}.txt"] = text
+            lowconf.extend(lowconf_lines(tsv, threshold))
+            combined.append(f"\n\n<!-- COLUMN {col_idx} -->\n\n{text}")
+        text = ''.join(combined)
+        inputs = columns
+    else:
+        image = next((p for p in (temp_dir / f"{basename}-cleaned.png",
+                                  temp_dir / f"{basename}-processed.png") if p.exists()), None)
+        if image is None and page_image is None:
+            print(f"Warning: No preprocessed image found for {basename}, skipping OCR", file=sys.stderr)
+            return []
+        regions = page_regions(temp_dir, basename, image, page_image, segment, min_confidence)
+        if regions:
+            text = ocr_regions(engine, basename, image, page_image, regions, threshold, lowconf, outputs)
+        else:
+            tsv, text = engine.recognize(image) if image is not None else engine.recognize_image(page_image)
+            outputs[f"{basename}.tsv"] = tsv
+            lowconf.extend(lowconf_lines(tsv, threshold))
+        inputs = [image if image is not None else temp_dir / f"{basename}.png"]
+
+    outputs[f"{basename}-text.txt"] = text
+    outputs[f"{basename}-lowconf.txt"] = ''.join(lowconf)
+    for name, content in outputs.items():
+        (temp_dir / name).write_text(content, encoding='utf-8')
+    return inputs
+
+
+def page_regions(temp_dir: Path, basename: str, image: Path | None, page_image, segment: bool,
+                 min_confidence: float | None = None) -> list[dict]:
+    """Auto-detected regions of a page, segmenting it first when asked and it has no metadata"""
+    from segment_pages import auto_columns, metadata_path, segment_and_save
+
+    regions = auto_columns(temp_dir, basename)
+    if regions is None and segment and not metadata_path(temp_dir, basename).exists():
+        import numpy as np
+        from preprocess_pages import load_gray
+
+        gray = np.asarray(page_image) if page_image is not None else load_gray(image)
+        regions = segment_and_save(temp_dir, basename, gray, min_confidence)
+    return regions or []
+
+
+def ocr_regions(engine, basename: str, image: Path | None, page_image, regions: list[dict],
+                threshold: float, lowconf: list[str], outputs: dict[str, str]) -> str:
+    """Crop each region in memory and recognize it like a drawn column; returns the combined text
+
+    The per-region TSV and text are added to outputs by file name for ocr_page to write.
+    """
+    from PIL import Image
+
+    # Regions are read one after another in this worker; the pool keeps the other cores on other pages
+    source = page_image if page_image is not None else Image.open(image)
+    try:
+        combined = ["\n"]
+        for col_idx, region in enumerate(regions, 1):
+            x, y = int(region['x']), int(region['y'])
+            crop = source.crop((x, y, x + int(region['width']), y + int(region['height'])))
+            tsv, text = engine.recognize_image(crop)
+            tsv = offset_tsv(tsv, x, y)
+            col_base = f"{basename}-col{col_idx}"
+            outputs[f"{col_base}.tsv"] = tsv
+            outputs[f"{col_base}.txt"] = text
+            lowconf.extend(lowconf_lines(tsv, threshold))
+            combined.append(f"\n\n<!-- COLUMN {col_idx} -->\n\n{text}")
+    finally:
+        if source is not page_image:
+            source.close()
+    return ''.join(combined)
+
+
+# Per-process engine and preprocessing settings, created once by the pool initializer
+_engine = None
+_threshold = DEFAULT_THRESHOLD
+_settings = None
+_segment = False
+_min_confidence = None
+
+
+def _init_worker(lang: str, psm: int, oem: int, user_words: str | None, threshold: float, settings=None,
+                 segment: bool = False, cache_dir: str | None = None, cache_max_mb: float = DEFAULT_MAX_MB,
+                 min_confidence: float | None = None):
+    global _engine, _threshold, _settings, _segment, _min_confidence
+    _engine = make_engine(lang, psm, oem, user_words, cache_dir=cache_dir, cache_max_mb=cache_max_mb)
+    _threshold = threshold
+    _settings = settings
+    _segment = segment
+    _min_confidence = min_confidence
+
+
+def _ocr_worker(temp_dir: str, basename: str, shared: tuple | None = None) -> tuple[str, bool, dict]:
+    """OCR one page; returns (basename, ok, page_stages record fields)
+
+    An engine failure marks the page failed (not done), so the next run retries it.
+    """
+    start = time.perf_counter()
+    temp_dir = Path(temp_dir)
+    with span('ocr', 'page', chapter=temp_dir.parent.name, page=basename):
+        try:
+            inputs = _recognize(temp_dir, basename, shared)
+        except (RuntimeError, OSError) as e:
+            print(f"Error: OCR of {basename} failed: {e}", file=sys.stderr)
+            inputs = []
+    record = {
+        'seconds': round(time.perf_counter() - start, 3),
+        'input_hash': file_hash(inputs),
+        'artifact': str(temp_dir / f"{basename}-text.txt") if inputs else None,
+    }
+    return basename, bool(inputs), record
+
+
+def _recognize(temp_dir: Path, basename: str, shared: tuple | None) -> list[Path]:
+    if shared is not None:
+        # Preprocessed by the preprocessing pool, read straight from shared memory
+        from PIL import Image
+        from preprocess_pages import attach_shared
+
+        name, (height, width) = shared
+        shm = attach_shared(name)
+        try:
+            image = Image.frombuffer('L', (width, height), shm.buf, 'raw', 'L', 0, 1)
+            inputs = ocr_page(_engine, temp_dir, basename, _threshold, image, _segment, _min_confidence)
+            image.close()
+            del image
+        finally:
+            shm.close()
+        return inputs
+
+    page_image = None
+    if _settings is not None and needs_preprocessing(temp_dir, basename):
+        from PIL import Image
+        from preprocess_pages import preprocess_page
+
+        gray = preprocess_page(temp_dir / f"{basename}.png", _settings, record_deskew=True)
+        page_image = Image.fromarray(gray)
+    return ocr_page(_engine, temp_dir, basename, _threshold, page_image, _segment, _min_confidence)
+
+
+def _completed_pages(temp_dir: Path, pending: list[str], jobs: int, initargs: tuple,
+                     shared_memory: bool):
+    """Run the pools and yield (basename, ok, record) as pages finish"""
+    settings = initargs[5]
+    prepass = [name for name in pending if shared_memory and needs_preprocessing(temp_dir, name)]
+    direct = [name for name in pending if name not in prepass]
+
+    with ExitStack() as stack:
+        pool = stack.enter_context(ProcessPoolExecutor(max_workers=min(jobs, len(pending)),
+                                                       initializer=_init_worker, initargs=initargs))
+        ocr_futures = {pool.submit(_ocr_worker, str(temp_dir), name): None for name in direct}
+        prep_futures = {}
+        queue = deque(prepass)
+        if queue:
+            from preprocess_pages import preprocess_to_shared, release_shared
+            prep_pool = stack.enter_context(ProcessPoolExecutor(max_workers=min(jobs, len(queue))))
+            # Bound the preprocessed pages held in shared memory at once
+            limit = 2 * jobs
+
+        def refill():
+            in_flight = len(prep_futures) + sum(1 for shm in ocr_futures.values() if shm)
+            while queue and in_flight < limit:
+                name = queue.popleft()
+                prep_futures[prep_pool.submit(preprocess_to_shared, str(temp_dir / f"{name}.png"),
+                                              settings)] = name
+                in_flight += 1
+
+        if queue:
+            refill()
+        while ocr_futures or prep_futures:
+            done, _ = wait([*ocr_futures, *prep_futures], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in prep_futures:
+                    name = prep_futures.pop(future)
+                    try:
+                        shared = future.result()
+                    except Exception as e:
+                        print(f"Error: Preprocessing {name} failed: {e}", file=sys.stderr)
+                        yield name, False, None
+                        continue
+                    ocr_futures[pool.submit(_ocr_worker, str(temp_dir), name, shared)] = shared[0]
+                    continue
+
+                shm_name = ocr_futures.pop(future)
+                if shm_name:
+                    release_shared(shm_name)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    print(f"Error: OCR worker failed: {e}", file=sys.stderr)
+                    yield None, False, None
+            if queue:
+                refill()
+
+
+def ocr_pages(temp_dir: Path, jobs: int, lang: str = DEFAULT_LANGUAGE, psm: int = DEFAULT_PSM,
+              oem: int = DEFAULT_OEM, user_words: str | None = None,
+              threshold: float = DEFAULT_THRESHOLD, quiet: bool = False,
+              settings=None, shared_memory: bool = False, segment: bool = False,
+              cache_dir: str | None = None, cache_max_mb: float = DEFAULT_MAX_MB,
+              min_confidence: float | None = None) -> tuple[int, int]:
+    """OCR every pending page in temp_dir; returns (pages done, pages failed)
+
+    With preprocessing settings, pages that only have the original image are
+    preprocessed in memory: inside the OCR worker, or with shared_memory in a
+    separate pool whose output buffers the OCR workers read directly.
+    With segment, pages without metadata are split into automatic regions first;
+    those scoring below min_confidence are flagged for review.
+    With cache_dir, results are looked up in (and added to) the OCR cache.
+    """
+    store, chapter = StateStore.for_chapter(temp_dir.parent)
+    with store:
+        finished = store.done_pages(chapter, 'ocr')
+        pending = [name for name in page_basenames(temp_dir) if name not in finished]
+        if not pending:
+            return 0, 0
+
+        done = failed = 0
+        initargs = (lang, psm, oem, user_words, threshold, settings, segment, cache_dir, cache_max_mb,
+                    min_confidence)
+        completed = _completed_pages(temp_dir, pending, jobs, initargs, shared_memory and settings is not None)
+        if not quiet:
+            completed = tqdm(completed, total=len(pending), desc="OCR pages")
+        for name, ok, record in completed:
+            if name is not None:
+                store.mark_page(chapter, name, 'ocr', DONE if ok else FAILED, **(record or {}))
+            done += ok
+            failed += not ok
+    return done, failed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OCR page images with a persistent tesseract worker pool')
+    parser.add_argument('temp_dir', help='Directory with page-N*.png images')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: one per core)')
+    parser.add_argument('--lang', default=DEFAULT_LANGUAGE,
+                        help=f'Tesseract language (default: {DEFAULT_LANGUAGE})')
+    parser.add_argument('--psm', type=int, default=DEFAULT_PSM,
+                        help=f'Page segmentation mode (default: {DEFAULT_PSM})')
+    parser.add_argument('--oem', type=int, default=DEFAULT_OEM,
+                        help=f'OCR engine mode (default: {DEFAULT_OEM})')
+    parser.add_argument('--user-words', default=None,
+                        help='Tesseract user words file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Low-confidence threshold (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--preprocess', action='store_true',
+                        help='Preprocess pages without a -processed.png in memory (see preprocess_pages.py)')
+    parser.add_argument('--config', default=None,
+                        help='Pipeline config with the preprocessing block (default: built-in settings)')
+    parser.add_argument('--shared-memory', action='store_true',
+                        help='With --preprocess, preprocess in a separate pool and pass pages through shared memory')
+    parser.add_argument('--segment', action='store_true',
+                        help='Detect columns, sidebars and boxes on pages without metadata (see segment_pages.py)')
+    parser.add_argument('--min-confidence', type=float, default=None,
+                        help='With --segment, flag pages scoring below this for review '
+                             '(default: the config\'s segmentation.min_confidence, else segment_pages.py\'s)')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE),
+                        help=f'OCR result cache shared by every run (default: {DEFAULT_CACHE.name})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always run tesseract, without reading or filling the cache')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_MB,
+                        help=f'Evict least recently used results beyond this size (default: {DEFAULT_MAX_MB})')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='No progress output')
+    args = parser.parse_args()
+
+    temp_dir = Path(args.temp_dir)
+    if not temp_dir.is_dir():
+        print(f"Error: Directory not found: {temp_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    user_words = args.user_words if args.user_words and Path(args.user_words).is_file() else None
+
+    try:
+        import tesserocr  # noqa: F401
+    except ImportError:
+        if not shutil.which('tesseract'):
+            print("Error: Neither tesserocr nor the tesseract binary is available", file=sys.stderr)
+            sys.exit(1)
+
+    settings = None
+    if args.preprocess:
+        try:
+            from preprocess_pages import load_settings
+        except ImportError:
+            print("Error: numpy and Pillow are required for --preprocess: pip install numpy pillow", file=sys.stderr)
+            sys.exit(1)
+        settings = load_settings(Path(args.config) if args.config else None)
+
+    min_confidence = args.min_confidence
+    if min_confidence is None and args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                min_confidence = load_ocr_settings(json.load(f))['segment_min_confidence']
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {args.config}: {e}", file=sys.stderr)
+
+    done, failed = ocr_pages(temp_dir, max(1, args.jobs), args.lang, args.psm, args.oem,
+                             user_words, args.threshold, args.quiet, settings, args.shared_memory,
+                             args.segment, None if args.no_cache else args.cache_dir, args.cache_max_mb,
+                             min_confidence)
+
+    if not args.quiet:
+        print(f"✨ OCR results saved to {temp_dir}", file=sys.stderr)
+        print(f"   {done} pages recognized, {failed} failed or skipped", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+ocr_quality.py - Single-pass OCR quality scanner
+Compiles every check of the old ocr_quality_checker.fish (encoding mojibake,
+suspicious symbols, common OCR word mistakes, the garbage words of
+generate_corrections.py, malformed headers, stat block lines, all-caps
+Planescape terms and overlong lines) into one regular expression and scans each
+file with it once. Files are scanned in parallel.
+
+Writes the markdown report and a JSON metrics file; --compare takes the metrics
+of an earlier run and adds the change per category to both.
+
+Usage: python3 ocr_quality.py FILE.md [FILE.md ...] [--report quality_report.md]
+                              [--metrics quality_metrics.json] [--compare OLD.json] [--jobs N]
+"""
+
+import os
+import re
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from generate_corrections import GARBAGE_PATTERNS
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+DEFAULT_REPORT = "quality_report.md"
+DEFAULT_METRICS = "quality_metrics.json"
+LONG_LINE = 200         # Characters; longer lines are usually merged columns
+EXAMPLES = 5            # Example lines kept per finding
+
+# Mojibake left by UTF-8 read as Windows-1252 (longest first, so 'â€' only counts bare)
+ENCODING_PATTERNS = ['â€™', 'â€œ', 'â€˜', 'â€¢', 'â€"', 'â€', 'Â']
+
+# Characters that shouldn't appear in normal text
+SUSPICIOUS_CHARS = {
+    '¢': 'cent sign',
+    '®': 'registered trademark',
+    '™': 'trademark',
+    '§': 'section sign',
+    '¶': 'pilcrow',
+    '†': 'dagger',
+    '‡': 'double dagger',
+    '°': 'degree',
+    '±': 'plus-minus',
+    'µ': 'micro',
+    '×': 'multiplication',
+    '÷': 'division',
+}
+
+# Common OCR misreadings
+OCR_MISTAKES = {
+    'Jrom': 'from', 'Jaction': 'faction', 'eves': 'eyes', 'vou': 'you',
+    'thar': 'that', 'rhe': 'the', 'wilh': 'with', 'somerhing': 'something',
+    'anv': 'any', 'mav': 'may', 'savs': 'says', 'Ladv': 'Lady', 'lll': 'III',
+    'Dav': 'Day',
+}
+
+# Terms that should be lowercase unless they start a sentence
+PLANESCAPE_TERMS = ['berk', 'basher', 'blood', 'barmy', 'factol', 'dabus', 'sigil',
+                    "tanar'ri", 'baatezu', 'yugoloth']
+
+STAT_KEYS = ['THAC0', '#AT', 'Dmg', 'hp', 'MV', 'XP']
+STAT_BLOCK_KEYS = ('hp', 'AC', 'MV')   # Expected within two lines of a THAC0 line
+
+# Report categories: (key, heading, summary label, clean message); all count towards the total
+CATEGORIES = [
+    ('encoding', 'Encoding Issues', 'Encoding Problems', 'No encoding issues found'),
+    ('suspicious', 'Suspicious Characters', 'Suspicious Characters', 'No suspicious characters found'),
+    ('words', 'Common OCR Mistakes', 'OCR Word Mistakes', 'No common OCR mistakes found'),
+    ('garbage', 'Garbage Words', 'Garbage Words', 'No garbage words found'),
+    ('headers', 'Malformed Headers', 'Malformed Headers', 'No malformed headers found'),
+    ('stats', 'Stat Block Issues', 'Stat Block Issues', 'No stat block issues found'),
+]
+
+
+def word_pattern(pattern: str) -> str:
+    """A whole-token pattern (^...$) as a whitespace-delimited match inside a line"""
+    return rf"(?<!\S)(?:{pattern.removeprefix('^').removesuffix('$')})(?!\S)"
+
+
+def alternation(words) -> str:
+    return '|'.join(re.escape(word) for word in words)
+
+
+def build_scanner() -> re.Pattern:
+    """All checks as one pattern; the named group that matched says which check fired
+
+    Line checks are optional lookaheads in one empty match at the start of
+    every line, so the token checks still match from the same position.
+    """
+    garbage = '|'.join(word_pattern(p) for p in GARBAGE_PATTERNS)
+    return re.compile('|'.join([
+        (rf"(?P<line>^)(?=(?P<header>[+*®¢]+[A-Z])?)(?=(?P<long>[^\n]{{{LONG_LINE + 1}}})?)"
+         rf"(?=(?:[^\n]*?(?P<stat>{alternation(STAT_KEYS)}))?)"),
+        rf"(?P<garbage>{garbage})",
+        rf"(?P<encoding>{alternation(ENCODING_PATTERNS)})",
+        rf"(?P<suspicious>[{''.join(SUSPICIOUS_CHARS)}])",
+        rf"\b(?P<word>{alternation(OCR_MISTAKES)})\b",
+        rf"\b(?P<term>{alternation(term.upper() for term in PLANESCAPE_TERMS)})\b",
+    ]), re.MULTILINE)
+
+
+_scanner = None
+
+
+def scan_text(text: str) -> dict:
+    """Scan one file's text in a single pass; returns its findings"""
+    global _scanner
+    if _scanner is None:
+        _scanner = build_scanner()
+
+    counts = defaultdict(Counter)       # category → pattern → matches
+    examples = defaultdict(list)        # (category, pattern) → [(line, text)]
+    stat_lines = 0
+    thac0_lines = []
+    line_no, last = 1, 0
+    line_start = 0
+
+    def note(category: str, key: str, excerpt: str | None = None):
+        counts[category][key] += 1
+        if len(examples[category, key]) < EXAMPLES:
+            examples[category, key].append((line_no, excerpt if excerpt is not None else current_line()))
+
+    def current_line() -> str:
+        end = text.find('\n', line_start)
+        return text[line_start:end if end != -1 else len(text)]
+
+    for match in _scanner.finditer(text):
+        start = match.start()
+        newlines = text.count('\n', last, start)
+        if newlines:
+            line_no += newlines
+            line_start = text.rfind('\n', last, start) + 1
+        last = start
+
+        if match.group('line') is not None:
+            if match.group('header'):
+                note('headers', 'header')
+            if match.group('long'):
+                note('long', 'long', current_line()[:100] + '...')
+            if match.group('stat'):
+                stat_lines += 1
+                line = current_line()
+                if ':' not in line:
+                    note('stats', 'malformed', line)
+                if 'THAC0' in line:
+                    thac0_lines.append(line_no)
+            continue
+
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'garbage':
+            note('garbage', value)
+            # A garbage word of symbols also hides them from the suspicious check
+            for char in value:
+                if char in SUSPICIOUS_CHARS:
+                    note('suspicious', char)
+        elif kind == 'encoding':
+            note('encoding', value)
+        elif kind == 'suspicious':
+            note('suspicious', value)
+        elif kind == 'word':
+            note('words', value)
+        else:
+            note('terms', value.lower())
+
+    if thac0_lines:
+        lines = text.split('\n')
+        for number in thac0_lines:
+            window = '\n'.join(lines[max(0, number - 3):number + 2])
+            if not all(key in window for key in STAT_BLOCK_KEYS):
+                counts['stats']['incomplete'] += 1
+                if len(examples['stats', 'incomplete']) < EXAMPLES:
+                    examples['stats', 'incomplete'].append((number, lines[number - 1]))
+
+    return {
+        'lines': text.count('\n') + (not text.endswith('\n') and bool(text)),
+        'stat_lines': stat_lines,
+        'counts': {category: dict(found) for category, found in counts.items()},
+        'examples': {f"{category}\t{key}": found for (category, key), found in examples.items()},
+    }
+
+
+def _scan_worker(path: str) -> tuple[str, dict]:
+    return path, scan_text(Path(path).read_text(encoding='utf-8', errors='replace'))
+
+
+def scan_files(paths: list[Path], jobs: int | None = None) -> dict[str, dict]:
+    """Scan every file, in parallel when there is more than one"""
+    if len(paths) == 1:
+        path, result = _scan_worker(str(paths[0]))
+        return {path: result}
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_scan_worker, str(p)) for p in paths]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Scanning", unit="file"):
+            path, result = future.result()
+            results[path] = result
+    return {str(p): results[str(p)] for p in paths}
+
+
+def category_totals(result: dict) -> dict[str, int]:
+    totals = {key: sum(result['counts'].get(key, {}).values()) for key, *_ in CATEGORIES}
+    totals['total'] = sum(totals.values())
+    return totals
+
+
+def quality_rating(total: int) -> tuple[str, str]:
+    if total == 0:
+        return "✅ EXCELLENT", "No issues detected. This file appears to be clean!"
+    if total < 10:
+        return "✓ GOOD", "Minor issues detected. Quick cleanup recommended."
+    if total < 50:
+        return "⚠️ FAIR", "Moderate issues detected. Cleanup recommended."
+    return "❌ NEEDS WORK", "Significant issues detected. Thorough cleanup required."
+
+
+def build_metrics(results: dict[str, dict]) -> dict:
+    files = {}
+    overall = Counter()
+    for path, result in results.items():
+        totals = category_totals(result)
+        overall.update(totals)
+        files[path] = {
+            'lines': result['lines'],
+            'stat_lines': result['stat_lines'],
+            'totals': totals,
+            'counts': result['counts'],
+        }
+    return {
+        'generated': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'totals': {key: overall[key] for key in [*(c[0] for c in CATEGORIES), 'total']},
+        'files': files,
+    }
+
+
+def format_examples(found: list) -> list[str]:
+    return [f"{line}:{text}" for line, text in found]
+
+
+def file_section(path: str, result: dict) -> list[str]:
+    counts, examples = result['counts'], result['examples']
+    out = [f"## {path}", ""]
+
+    for key, heading, _, clean in CATEGORIES:
+        out += [f"### {heading}", ""]
+        found = counts.get(key, {})
+        if not found:
+            out += [f"✓ {clean}", ""]
+            continue
+        for pattern, count in sorted(found.items(), key=lambda item: -item[1]):
+            lines = format_examples(examples.get(f"{key}\t{pattern}", []))
+            if key == 'encoding':
+                out.append(f"- Found {count} instances of '{pattern}'")
+            elif key == 'suspicious':
+                out.append(f"- Found {count} instances of {SUSPICIOUS_CHARS[pattern]} ({pattern})")
+            elif key == 'words':
+                out.append(f"- **{pattern}** should be **{OCR_MISTAKES[pattern]}** ({count} instances)")
+            elif key == 'garbage':
+                out.append(f"- Found {count} instances of garbage word '{pattern}'")
+            elif key == 'headers':
+                out.append(f"Found {count} headers with special characters:")
+            elif pattern == 'malformed':
+                out.append(f"⚠️ Found {count} potentially malformed stat entries (no ':'):")
+            else:
+                out.append(f"⚠️ Found {count} THAC0 lines without hp/AC/MV nearby:")
+            out += ['```', *lines]
+            if count > len(lines):
+                out.append(f"(and {count - len(lines)} more...)")
+            out += ['```', ""]
+    out += [f"_{result['stat_lines']} potential stat block lines analyzed_", ""]
+
+    out += ["### Planescape Terminology Check", ""]
+    terms = counts.get('terms', {})
+    if terms:
+        for term, count in sorted(terms.items()):
+            out.append(f"- **{term}** has {count} potential case issues")
+        out.append("")
+    else:
+        out += ["✓ Planescape terminology looks good", ""]
+
+    out += ["### Line Length Analysis", ""]
+    long_lines = counts.get('long', {}).get('long', 0)
+    if long_lines:
+        out += [f"Found {long_lines} extremely long lines (>{LONG_LINE} chars):", '```',
+                *format_examples(examples.get("long\tlong", [])), '```', ""]
+    else:
+        out += ["✓ No extremely long lines found", ""]
+    return out
+
+
+def write_report(report: Path, results: dict[str, dict], metrics: dict, previous: dict | None):
+    totals = metrics['totals']
+    out = ["# OCR Quality Report", "",
+           f"**Files:** {', '.join(results)}",
+           f"**Generated:** {metrics['generated']}", "", "---", ""]
+    for path, result in results.items():
+        out += file_section(path, result)
+
+    out += ["---", "", "## Summary", "",
+            "| Category | Issues Found |" + (" Change |" if previous else ""),
+            "|----------|--------------|" + ("--------|" if previous else "")]
+    before = previous.get('totals', {}) if previous else {}
+    for key, _, label, _ in [*CATEGORIES, ('total', None, '**TOTAL**', None)]:
+        value = f"**{totals[key]}**" if key == 'total' else totals[key]
+        row = f"| {label} | {value} |"
+        if previous:
+            row += f" {totals[key] - before.get(key, 0):+d} |"
+        out.append(row)
+    out.append("")
+
+    rating, verdict = quality_rating(totals['total'])
+    out += [f"### Quality: {rating}", "", verdict, "", "## Recommendations", ""]
+    if totals['encoding']:
+        out.append("1. Run `./fix_encoding.fish` to fix encoding issues")
+    if totals['words'] or totals['garbage']:
+        out.append("2. Apply dictionary corrections with `python3 apply_corrections.py`")
+    if totals['headers']:
+        out.append("3. Manually review and fix malformed headers")
+    if totals['stats']:
+        out.append("4. Review stat blocks for accuracy and completeness")
+    out += ["", "---", "", "_Report generated by ocr_quality.py_", ""]
+
+    tmp_path = report.with_name(report.name + '.tmp')
+    tmp_path.write_text('\n'.join(out), encoding='utf-8')
+    os.replace(tmp_path, report)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Scan converted markdown for OCR quality issues in one pass')
+    parser.add_argument('files', nargs='+', type=Path, help='Markdown files to scan')
+    parser.add_argument('--report', type=Path, default=None,
+                        help=f'Markdown report (default: {DEFAULT_REPORT} next to the first file)')
+    parser.add_argument('--metrics', type=Path, default=None,
+                        help=f'JSON metrics (default: {DEFAULT_METRICS} next to the report)')
+    parser.add_argument('--compare', type=Path, default=None,
+                        help='Metrics of an earlier run to compare against')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Parallel file workers (default: CPU count)')
+
+    args = parser.parse_args()
+
+    missing = [p for p in args.files if not p.is_file()]
+    if missing:
+        print(f"Error: Input file not found: {missing[0]}", file=sys.stderr)
+        sys.exit(1)
+
+    report = args.report or args.files[0].parent / DEFAULT_REPORT
+    metrics_file = args.metrics or report.parent / DEFAULT_METRICS
+
+    previous = None
+    if args.compare:
+        try:
+            previous = json.loads(args.compare.read_text(encoding='utf-8'))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read {args.compare}: {e}", file=sys.stderr)
+
+    results = scan_files(args.files, args.jobs)
+    metrics = build_metrics(results)
+    if previous:
+        metrics['previous'] = {'generated': previous.get('generated'), 'totals': previous.get('totals', {})}
+
+    write_report(report, results, metrics, previous)
+    tmp_path = metrics_file.with_name(metrics_file.name + '.tmp')
+    tmp_path.write_text(json.dumps(metrics, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_path, metrics_file)
+
+    totals = metrics['totals']
+    rating, _ = quality_rating(totals['total'])
+    print(f"✨ Quality report saved to {report} (metrics: {metrics_file})", file=sys.stderr)
+    print(f"   Quality: {rating}", file=sys.stderr)
+    for key, _, label, _ in CATEGORIES:
+        change = ''
+        if previous:
+            change = f" ({totals[key] - previous.get('totals', {}).get(key, 0):+d})"
+        print(f"   {label + ':':24} {totals[key]}{change}", file=sys.stderr)
+    change = f" ({totals['total'] - previous.get('totals', {}).get('total', 0):+d})" if previous else ''
+    print(f"   {'TOTAL:':24} {totals['total']}{change}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
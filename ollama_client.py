@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+ollama_client.py - Chunked, concurrent, cached OCR cleanup through the Ollama API
+Splits a chapter on its <!-- PAGE BREAK --> and <!-- COLUMN N --> markers (and
+long chunks on blank lines), sends the chunks to the local Ollama HTTP API over
+a small pool of keep-alive connections with a bounded number in flight, and
+reassembles the cleaned chapter with the markers untouched.
+
+Responses are cached on disk by a hash of model, prompt, options and chunk, so a
+re-run only pays for chunks that changed or failed. A failed chunk keeps its
+original text. With --targeted only chunks containing a low-confidence word
+(from *-lowconf.txt files) are sent; the rest pass through as they are.
+
+OLLAMA_HOST (or --host) points the client at another server, e.g. a local stub.
+
+Usage: python3 ollama_client.py input.md output.md [--model NAME] [--jobs N]
+                                [--targeted LOWCONF_DIR] [--no-cache] [--host URL]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import hashlib
+import http.client
+from pathlib import Path
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Configuration defaults
+DEFAULT_MODEL = "llama3.2"
+DEFAULT_HOST = "http://127.0.0.1:11434"
+DEFAULT_JOBS = 2                # Requests in flight; Ollama serializes per model beyond its own parallelism
+DEFAULT_CACHE = SCRIPT_DIR / ".ollama_cache"
+MAX_CHUNK_CHARS = 6000          # Longer chunks are split on blank lines to stay inside the context window
+REQUEST_TIMEOUT = 600           # Seconds per chunk
+RETRIES = 2
+OPTIONS = {"temperature": 0}
+
+PROMPT = ("Fix OCR errors and merge split headers in this D&D book markdown. Keep ALL game terms "
+          "(THAC0, factol, dabus, tanar'ri, etc). Fix: 'bro-ken'→'broken', "
+          "'## THE TALE OF\\n## HARBINGER HOUSE'→'## THE TALE OF HARBINGER HOUSE'. "
+          "Remove artifacts like '+2+'. Output ONLY the cleaned markdown, no commentary:")
+
+MARKER_RE = re.compile(r'^<!-- (?:PAGE BREAK|COLUMN \d+)\b.*-->\s*$')
+PREAMBLE_RE = re.compile(r"^(?:Here is the cleaned|Here's the cleaned|I've cleaned|The cleaned|# Cleaned)")
+LOWCONF_LINE_RE = re.compile(r'^(.+?) \(conf: [\d.]+\)$')
+
+
+def split_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[tuple[bool, str]]:
+    """Split markdown into (is_marker, text) pieces; marker lines are kept on their own"""
+    pieces = []
+    current = []
+
+    def flush():
+        if current:
+            pieces.extend((False, chunk) for chunk in split_long(''.join(current), max_chars))
+            current.clear()
+
+    for line in text.splitlines(keepends=True):
+        if MARKER_RE.match(line):
+            flush()
+            pieces.append((True, line))
+        else:
+            current.append(line)
+    flush()
+    return pieces
+
+
+def split_long(text: str, max_chars: int) -> list[str]:
+    """Split an over-long chunk on paragraph boundaries"""
+    if len(text) <= max_chars:
+        return [text]
+    chunks, current = [], ''
+    for paragraph in re.split(r'(?<=\n\n)', text):
+        if current and len(current) + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def read_lowconf_words(lowconf_dir: Path) -> set[str]:
+    """Words listed in a directory's *-lowconf.txt files"""
+    words = set()
+    for path in sorted(lowconf_dir.glob('*-lowconf.txt')):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = LOWCONF_LINE_RE.match(line.strip())
+                if match:
+                    words.add(match.group(1).strip())
+    return words
+
+
+def clean_response(response: str, original: str) -> str:
+    """Drop model preamble and keep the chunk's surrounding blank lines"""
+    lines = response.splitlines()
+    while lines and (not lines[0].strip() or PREAMBLE_RE.match(lines[0])):
+        lines.pop(0)
+    body = '\n'.join(lines).rstrip('\n')
+    leading = len(original) - len(original.lstrip('\n'))
+    trailing = len(original) - len(original.rstrip('\n'))
+    return '\n' * leading + body + '\n' * trailing
+
+
+class ResponseCache:
+    """Cleaned chunks on disk, keyed by model, prompt, options and chunk text"""
+
+    def __init__(self, directory: Path, model: str, prompt: str, options: dict):
+        self.directory = Path(directory)
+        self.salt = json.dumps([model, prompt, options], sort_keys=True, ensure_ascii=False)
+
+    def key(self, chunk: str) -> str:
+        return hashlib.sha256((self.salt + '\0' + chunk).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt"
+
+    def get(self, chunk: str) -> str | None:
+        try:
+            return self._path(self.key(chunk)).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def put(self, chunk: str, cleaned: str):
+        path = self._path(self.key(chunk))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(cleaned, encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache response: {e}", file=sys.stderr)
+
+
+class OllamaClient:
+    """Blocking /api/generate calls over a pool of keep-alive HTTP connections"""
+
+    def __init__(self, host: str = DEFAULT_HOST, model: str = DEFAULT_MODEL, prompt: str = PROMPT,
+                 options: dict | None = None, pool_size: int = DEFAULT_JOBS, timeout: float = REQUEST_TIMEOUT):
+        url = urlsplit(host if '://' in host else f"http://{host}")
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.model = model
+        self.prompt = prompt
+        self.options = OPTIONS if options is None else options
+        self.timeout = timeout
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(None)  # Connections are opened on first use
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.netloc, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: dict | None = None) -> dict:
+        """One JSON request on a pooled connection; blocks while all connections are busy"""
+        conn = self._pool.get() or self._connect()
+        try:
+            payload = json.dumps(body).encode('utf-8') if body is not None else None
+            conn.request(method, path, body=payload, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            data = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}")
+            result = json.loads(data)
+        except Exception:
+            conn.close()
+            conn = None  # Reconnect on next use
+            raise
+        finally:
+            self._pool.put(conn)
+        return result
+
+    def version(self) -> str:
+        return self.request('GET', '/api/version').get('version', 'unknown')
+
+    def generate(self, chunk: str, retries: int = RETRIES) -> str:
+        """Clean one chunk, retrying connection errors and server failures"""
+        body = {'model': self.model, 'prompt': f"{self.prompt}\n\n{chunk}", 'stream': False,
+                'options': self.options}
+        for attempt in range(retries + 1):
+            try:
+                return self.request('POST', '/api/generate', body).get('response', '')
+            except (OSError, http.client.HTTPException, RuntimeError, ValueError):
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn:
+                conn.close()
+
+
+def clean_document(text: str, client: OllamaClient, cache: ResponseCache | None = None,
+                   jobs: int = DEFAULT_JOBS, only_words: set[str] | None = None) -> tuple[str, dict]:
+    """Clean every chunk (or only chunks containing only_words); returns (text, counts)"""
+    pieces = split_chunks(text)
+    results = [piece for _, piece in pieces]
+    counts = {'chunks': 0, 'cached': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+    pending = {}
+
+    for i, (is_marker, chunk) in enumerate(pieces):
+        if is_marker or not chunk.strip():
+            continue
+        counts['chunks'] += 1
+        if only_words is not None and not any(word in chunk for word in only_words):
+            counts['skipped'] += 1
+            continue
+        cached = cache.get(chunk) if cache else None
+        if cached is not None:
+            results[i] = cached
+            counts['cached'] += 1
+        else:
+            pending[i] = chunk
+
+    def clean_chunk(i: int) -> str:
+        with span('ollama chunk', 'chunk', chunk=i, chars=len(pending[i])):
+            return clean_response(client.generate(pending[i]), pending[i])
+
+    if pending:
+        # The executor's worker count bounds the requests in flight
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(clean_chunk, i): i for i in pending}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Cleaning chunks", unit="chunk"):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"Warning: Chunk {i} failed, keeping original text: {e}", file=sys.stderr)
+                    counts['failed'] += 1
+                    continue
+                counts['sent'] += 1
+                if cache:
+                    cache.put(pending[i], results[i])
+
+    return ''.join(results), counts
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Clean OCR markdown with Ollama, chunk by chunk')
+    parser.add_argument('input', help='Input markdown file')
+    parser.add_argument('output', help='Output markdown file')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f'Ollama model (default: {DEFAULT_MODEL})')
+    parser.add_argument('--host', default=os.environ.get('OLLAMA_HOST', DEFAULT_HOST),
+                        help=f'Ollama API address (default: $OLLAMA_HOST or {DEFAULT_HOST})')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Chunks in flight at once (default: {DEFAULT_JOBS})')
+    parser.add_argument('--targeted', default=None, metavar='LOWCONF_DIR',
+                        help='Only send chunks containing words from LOWCONF_DIR/*-lowconf.txt')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE),
+                        help=f'Response cache directory (default: {DEFAULT_CACHE.name})')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not write the response cache')
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.is_file():
+        print(f"Error: Input file not found: {input_path}", file=sys.stderr)
+        sys.exit(1)
+    text = input_path.read_text(encoding='utf-8', errors='replace')
+
+    only_words = None
+    if args.targeted:
+        if not Path(args.targeted).is_dir():
+            print(f"Warning: No lowconf directory {args.targeted}, cleaning every chunk", file=sys.stderr)
+        else:
+            only_words = read_lowconf_words(Path(args.targeted))
+            print(f"Targeting chunks with {len(only_words)} low-confidence words", file=sys.stderr)
+
+    client = OllamaClient(args.host, args.model, pool_size=args.jobs)
+    cache = None if args.no_cache else ResponseCache(Path(args.cache_dir), args.model, client.prompt, client.options)
+    try:
+        try:
+            client.version()
+        except (OSError, http.client.HTTPException, RuntimeError, ValueError) as e:
+            print(f"Error: Ollama not reachable at {args.host}: {e}", file=sys.stderr)
+            print(f"Start it with `ollama serve`, then run: ollama pull {args.model}", file=sys.stderr)
+            sys.exit(1)
+        with span('ollama cleanup', 'stage', file=input_path.name, model=args.model):
+            cleaned, counts = clean_document(text, client, cache, args.jobs, only_words)
+    finally:
+        client.close()
+
+    output = Path(args.output)
+    tmp_path = output.with_name(output.name + '.tmp')
+    tmp_path.write_text(cleaned, encoding='utf-8')
+    os.replace(tmp_path, output)
+
+    print(f"✨ Cleaned markdown saved to {output}", file=sys.stderr)
+    print(f"   {counts['chunks']} chunks: {counts['sent']} sent, {counts['cached']} cached, "
+          f"{counts['skipped']} skipped, {counts['failed']} failed", file=sys.stderr)
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+page_tiles.py - Tile pyramids and previews for the interactive preprocessing UI
+For every page the review UI shows (page-N-processed.png, else page-N.png) this
+writes a low-resolution preview and a pyramid of fixed-size JPEG tiles, halving
+the resolution per level, into .temp/.tiles/<page>/. The server hands them out
+as cacheable binary files instead of base64-encoding the full 800-DPI page into
+JSON, and the browser draws only the tiles it needs for the current zoom.
+
+Tiles are for display only: masks and column crops are still applied to the
+full-resolution page, in its pixel coordinates (level 0).
+
+manifest.json records the source's size and mtime as the pyramid's version, so
+up-to-date pages are skipped and the server can use it as an ETag.
+
+Usage: python3 page_tiles.py [converted_dir | chapter/.temp | page.png ...] [--jobs N] [--force]
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+TILE_SIZE = 512
+PREVIEW_WIDTH = 1200
+JPEG_QUALITY = 85
+TILES_DIR = ".tiles"
+MANIFEST = "manifest.json"
+SKIP_DIRS = ("final", "statblocks", "diagnostics")
+
+PAGE_RE = re.compile(r'^page-\d+\.png$')
+
+
+def tiles_dir(page: Path) -> Path:
+    """Where a page's pyramid lives: <.temp>/.tiles/<page stem>/"""
+    return page.parent / TILES_DIR / page.stem
+
+
+def page_version(page: Path) -> str:
+    """Changes whenever the page is rewritten (same value the server computes)"""
+    stat = page.stat()
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def display_page(original: Path) -> Path:
+    """The image the review UI shows for a page: preprocessed if available"""
+    processed = original.with_name(f"{original.stem}-processed.png")
+    return processed if processed.exists() else original
+
+
+def find_pages(target: Path) -> list[Path]:
+    """Display images under a page file, a .temp directory or a converted root"""
+    if target.is_file():
+        return [target]
+    if target.name == '.temp':
+        temp_dirs = [target]
+    else:
+        temp_dirs = sorted(d / '.temp' for d in target.iterdir()
+                           if d.is_dir() and d.name not in SKIP_DIRS and (d / '.temp').is_dir())
+    return [display_page(p) for temp_dir in temp_dirs for p in sorted(temp_dir.iterdir())
+            if PAGE_RE.match(p.name)]
+
+
+def is_current(page: Path) -> bool:
+    try:
+        with open(tiles_dir(page) / MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f).get('version') == page_version(page)
+    except (OSError, ValueError):
+        return False
+
+
+def build_tiles(page: str) -> dict:
+    """Write the preview and tile pyramid for one page; returns its manifest"""
+    with span('page tiles', 'page', page=Path(page).name):
+        return _build_tiles(Path(page))
+
+
+def _build_tiles(page: Path) -> dict:
+    version = page_version(page)
+    out_dir = tiles_dir(page)
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    with Image.open(page) as source:
+        if source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info:
+            image = Image.new('RGB', source.size, (255, 255, 255))
+            image.paste(source.convert('RGBA'), mask=source.convert('RGBA').getchannel('A'))
+        elif source.mode in ('1', 'L', 'I', 'I;16', 'F'):
+            image = source.convert('L')
+        else:
+            image = source.convert('RGB')
+
+    width, height = image.size
+    preview_scale = min(1.0, PREVIEW_WIDTH / width)
+    preview = image.resize((max(1, round(width * preview_scale)), max(1, round(height * preview_scale))),
+                           Image.Resampling.LANCZOS)
+    preview.save(tmp_dir / 'preview.jpg', quality=JPEG_QUALITY)
+
+    levels = []
+    level = image
+    z = 0
+    while True:
+        cols = -(-level.width // TILE_SIZE)
+        rows = -(-level.height // TILE_SIZE)
+        level_dir = tmp_dir / str(z)
+        level_dir.mkdir()
+        for y in range(rows):
+            for x in range(cols):
+                box = (x * TILE_SIZE, y * TILE_SIZE,
+                       min(level.width, (x + 1) * TILE_SIZE), min(level.height, (y + 1) * TILE_SIZE))
+                level.crop(box).save(level_dir / f"{x}_{y}.jpg", quality=JPEG_QUALITY)
+        levels.append({'z': z, 'scale': 1 / (1 << z), 'width': level.width, 'height': level.height,
+                       'cols': cols, 'rows': rows})
+        if cols == 1 and rows == 1:
+            break
+        level = level.reduce(2)
+        z += 1
+
+    manifest = {
+        'version': version,
+        'source': page.name,
+        'width': width,
+        'height': height,
+        'tileSize': TILE_SIZE,
+        'format': 'jpg',
+        'preview': {'width': preview.width, 'height': preview.height},
+        'levels': levels,
+    }
+    with open(tmp_dir / MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished pyramid into place so the server never sees a partial one
+    old_dir = out_dir.with_name(f"{out_dir.name}.{os.getpid()}.old")
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build preview and tile pyramids for the review UI')
+    parser.add_argument('targets', nargs='+', help='Converted directories, chapter .temp directories or page images')
+    parser.add_argument('--jobs', type=int, default=None, help='Parallel workers (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Rebuild pyramids that are up to date')
+    args = parser.parse_args()
+
+    pages = []
+    for target in map(Path, args.targets):
+        if not target.exists():
+            print(f"Error: Not found: {target}", file=sys.stderr)
+            sys.exit(1)
+        pages.extend(find_pages(target))
+
+    todo = [p for p in pages if args.force or not is_current(p)]
+    failed = 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {pool.submit(build_tiles, str(p)): p for p in todo}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Building tiles", unit="page"):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Warning: Could not tile {futures[future]}: {e}", file=sys.stderr)
+                    failed += 1
+
+    print(f"✨ Tiles saved to {TILES_DIR}/ in each chapter's .temp", file=sys.stderr)
+    print(f"   {len(todo) - failed} pages tiled, {len(pages) - len(todo)} up to date, {failed} failed",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+pf2e_convert.py - Table-driven AD&D 2e → PF2e creature conversion
+Converts extracted stat blocks (JSONL or binary from extract_statblocks.py) into
+Foundry VTT PF2e NPC actor JSON.
+
+The whole batch is converted column by column: 2e values are parsed into integer
+columns once, each column is mapped to a table index, and every PF2e number is
+gathered from the Building Creatures tables below with one C-level itemgetter
+call per column. Only the final JSON assembly is per creature.
+
+Usage: python3 pf2e_convert.py blocks.jsonl|blocks.stb [--output FILE] [--split DIR]
+       python3 pf2e_convert.py blocks.stb --benchmark N [--repeat N]
+"""
+
+import re
+import sys
+import json
+import time
+from bisect import bisect_right
+from operator import itemgetter
+from pathlib import Path
+
+from extract_statblocks import StatBlock, load_blocks, safe_filename
+
+# Configuration defaults
+DEFAULT_SOURCE = "Harbinger House (AD&D 2e conversion)"
+DEFAULT_REPEAT = 5
+DEFAULT_LEVEL = 1
+MIN_LEVEL = -1
+MAX_LEVEL = 24
+
+# ============================================================================
+# PF2E BUILDING CREATURES TABLES (levels -1 .. 24, row index = level + 1)
+# ============================================================================
+
+# Tiers used as column indexes below
+EXTREME, HIGH, MODERATE, LOW, TERRIBLE = range(5)
+
+# Armor Class: extreme, high, moderate, low
+CREATURE_AC = (
+    (18, 15, 14, 12), (19, 16, 15, 13), (19, 16, 15, 13), (21, 18, 17, 15), (22, 19, 18, 16),
+    (24, 21, 20, 18), (25, 22, 21, 19), (27, 24, 23, 21), (28, 25, 24, 22), (30, 27, 26, 24),
+    (31, 28, 27, 25), (33, 30, 29, 27), (34, 31, 30, 28), (36, 33, 32, 30), (37, 34, 33, 31),
+    (39, 36, 35, 33), (40, 37, 36, 34), (42, 39, 38, 36), (43, 40, 39, 37), (45, 42, 41, 39),
+    (46, 43, 42, 40), (48, 45, 44, 42), (49, 46, 45, 43), (51, 48, 47, 45), (52, 49, 48, 46),
+    (54, 51, 50, 48),
+)
+
+# Saving throws and Perception: extreme, high, moderate, low, terrible
+CREATURE_SAVES = (
+    (9, 8, 5, 2, 0), (10, 9, 6, 3, 1), (11, 10, 7, 4, 2), (12, 11, 8, 5, 3), (14, 12, 9, 6, 4),
+    (15, 14, 11, 8, 6), (17, 15, 12, 9, 7), (18, 17, 14, 11, 8), (20, 18, 15, 12, 10),
+    (21, 19, 16, 13, 11), (23, 21, 18, 15, 12), (24, 22, 19, 16, 14), (26, 24, 21, 18, 15),
+    (27, 25, 22, 19, 16), (29, 26, 23, 20, 18), (30, 28, 25, 22, 19), (32, 29, 26, 23, 20),
+    (33, 30, 28, 25, 22), (35, 32, 29, 26, 23), (36, 33, 30, 27, 24), (38, 35, 32, 29, 26),
+    (39, 36, 33, 30, 27), (41, 38, 35, 32, 28), (43, 39, 36, 33, 30), (44, 40, 37, 34, 31),
+    (46, 42, 38, 36, 32),
+)
+
+# Hit Points (middle of each range): high, moderate, low
+CREATURE_HP = (
+    (9, 8, 6), (19, 15, 12), (25, 20, 15), (38, 30, 23), (56, 45, 34), (75, 60, 45), (94, 75, 56),
+    (119, 95, 71), (144, 115, 86), (169, 135, 101), (194, 155, 116), (219, 175, 131),
+    (244, 195, 146), (269, 215, 161), (294, 235, 176), (319, 255, 191), (344, 275, 206),
+    (369, 295, 221), (394, 315, 236), (419, 335, 251), (444, 355, 266), (469, 375, 281),
+    (500, 400, 300), (538, 430, 323), (575, 460, 345), (625, 500, 375),
+)
+
+# Strike attack bonus: extreme, high, moderate, low
+STRIKE_BONUS = (
+    (10, 8, 6, 4), (10, 8, 6, 4), (11, 9, 7, 5), (13, 11, 9, 7), (14, 12, 10, 8), (16, 14, 12, 9),
+    (17, 15, 13, 11), (19, 17, 15, 12), (20, 18, 16, 13), (22, 20, 18, 15), (23, 21, 19, 16),
+    (25, 23, 21, 17), (27, 24, 22, 19), (28, 26, 24, 20), (29, 27, 25, 21), (31, 29, 27, 23),
+    (32, 30, 28, 24), (34, 32, 30, 25), (35, 33, 31, 27), (37, 35, 33, 28), (38, 36, 34, 29),
+    (40, 38, 36, 31), (41, 39, 37, 32), (43, 41, 39, 33), (44, 42, 40, 35), (46, 44, 42, 36),
+)
+
+# Strike damage: extreme, high, moderate, low
+STRIKE_DAMAGE = (
+    ("1d6+1", "1d4+1", "1d4", "1d4"), ("1d6+3", "1d6+2", "1d4+2", "1d4+1"),
+    ("1d8+4", "1d6+3", "1d6+2", "1d4+2"), ("1d12+4", "1d10+4", "1d8+4", "1d6+3"),
+    ("1d12+8", "1d10+6", "1d8+6", "1d6+5"), ("2d10+7", "2d8+5", "2d6+5", "2d4+4"),
+    ("2d12+7", "2d8+7", "2d6+6", "2d4+6"), ("2d12+10", "2d8+9", "2d6+8", "2d4+7"),
+    ("2d12+12", "2d10+9", "2d8+8", "2d6+6"), ("2d12+15", "2d10+11", "2d8+9", "2d6+8"),
+    ("2d12+17", "2d10+13", "2d8+11", "2d6+9"), ("2d12+20", "2d12+13", "2d10+11", "2d6+10"),
+    ("2d12+22", "2d12+15", "2d10+12", "2d8+10"), ("3d12+19", "3d10+14", "3d8+12", "3d6+10"),
+    ("3d12+21", "3d10+16", "3d8+14", "3d6+11"), ("3d12+24", "3d10+18", "3d8+15", "3d6+13"),
+    ("3d12+26", "3d12+17", "3d10+14", "3d6+14"), ("3d12+29", "3d12+18", "3d10+15", "3d6+15"),
+    ("3d12+31", "3d12+19", "3d10+16", "3d6+16"), ("3d12+34", "3d12+20", "3d10+17", "3d6+17"),
+    ("4d12+29", "4d10+20", "4d8+17", "4d6+14"), ("4d12+32", "4d10+22", "4d8+19", "4d6+15"),
+    ("4d12+34", "4d10+24", "4d8+20", "4d6+17"), ("4d12+37", "4d10+26", "4d8+22", "4d6+18"),
+    ("4d12+39", "4d12+24", "4d10+20", "4d6+19"), ("4d12+42", "4d12+26", "4d10+22", "4d6+21"),
+)
+
+# ============================================================================
+# AD&D 2E → TABLE INDEX LOOKUPS
+# ============================================================================
+
+# Monster XP value (2e DMG, by Hit Dice) → PF2e level: XP_THRESHOLDS[i] starts level i - 1
+XP_THRESHOLDS = (
+    0, 15, 35, 65, 120, 175, 270, 420, 650, 975, 1400, 2000, 3000, 4000, 5000, 6000,
+    7000, 8000, 9000, 10000, 12000, 14000, 16000, 18000, 20000, 22000,
+)
+
+# THAC0 (index 0..21) → PF2e level: a warrior's THAC0 is 21 minus their level
+THAC0_LEVEL = tuple(max(MIN_LEVEL, min(MAX_LEVEL, 20 - thac0)) for thac0 in range(22))
+
+# 2e hit points → PF2e level, using d8 Hit Dice (4.5 per HD, HD = level + 1)
+HP_THRESHOLDS = tuple(round(4.5 * (level + 1)) for level in range(MIN_LEVEL, MAX_LEVEL + 1))
+
+# 2e AC (index = AC + 10, descending AC is better) → AC tier
+AC_TIER = tuple(EXTREME if ac <= -3 else HIGH if ac <= 2 else MODERATE if ac <= 6 else LOW
+                for ac in range(-10, 11))
+
+# 2e hp relative to the level's expected hp (percent buckets) → HP column (high, moderate, low)
+HP_RATIO_BUCKETS = (75, 125)
+HP_TIER = (2, 1, 0)
+
+# Attacks per round (index = attacks, capped at 3) → strike tier
+ATTACK_TIER = (MODERATE, MODERATE, HIGH, EXTREME)
+
+# 2e ability score (index 0 = not given, 1..25) → save/perception tier
+SCORE_TIER = (MODERATE,) + tuple(
+    EXTREME if s >= 19 else HIGH if s >= 16 else MODERATE if s >= 12 else LOW if s >= 8 else TERRIBLE
+    for s in range(1, 26))
+
+# 2e ability score (index 0 = not given) → PF2e ability modifier
+SCORE_MOD = (0,) + tuple((s - 10) // 2 for s in range(1, 26))
+
+# 2e movement rate (index = MV, capped at 30) → land speed in feet (MV 12 ≈ 30 ft)
+SPEED = tuple(max(5, 5 * round(mv * 2.5 / 5)) for mv in range(31))
+
+SIZES = {'T': 'tiny', 'S': 'sm', 'M': 'med', 'L': 'lg', 'H': 'huge', 'G': 'grg'}
+
+# Damage keywords → PF2e damage type (first match wins)
+DAMAGE_TYPES = (
+    ('fire', 'fire'), ('cold', 'cold'), ('acid', 'acid'), ('electric', 'electricity'),
+    ('lightning', 'electricity'), ('poison', 'poison'), ('bite', 'piercing'), ('dagger', 'piercing'),
+    ('spear', 'piercing'), ('bow', 'piercing'), ('arrow', 'piercing'), ('claw', 'slashing'),
+    ('sword', 'slashing'), ('axe', 'slashing'), ('weapon', 'slashing'),
+)
+
+ABILITIES = (('str', 'strength'), ('dex', 'dexterity'), ('con', 'constitution'),
+             ('int', 'intelligence'), ('wis', 'wisdom'), ('cha', 'charisma'))
+
+INT_RE = re.compile(r'-?\d[\d,]*')
+ATTACKS_RE = re.compile(r'(\d+)(?:/(\d+))?')
+
+
+# ============================================================================
+# COLUMN HELPERS
+# ============================================================================
+
+def take(table, indexes: list) -> list:
+    """Gather table[i] for every index in one C-level call"""
+    if not indexes:
+        return []
+    if len(indexes) == 1:
+        return [table[indexes[0]]]
+    return list(itemgetter(*indexes)(table))
+
+
+def int_column(values: list) -> list:
+    """First integer in each value, or None"""
+    column = []
+    for value in values:
+        match = INT_RE.search(value) if value else None
+        column.append(int(match.group().replace(',', '')) if match else None)
+    return column
+
+
+def attacks_column(values: list) -> list:
+    """Whole attacks per round ("3/2" counts as 1), or None"""
+    column = []
+    for value in values:
+        match = ATTACKS_RE.search(value) if value else None
+        column.append(int(match.group(1)) // int(match.group(2) or 1) if match and match.group(2) != '0' else None)
+    return column
+
+
+def clamp_column(values: list, low: int, high: int, missing: int) -> list:
+    return [missing if v is None else low if v < low else high if v > high else v for v in values]
+
+
+def level_column(blocks: list) -> list:
+    """PF2e level per block from XP and THAC0 (averaged when both exist), else hp"""
+    xp = int_column([b.xp for b in blocks])
+    thac0 = int_column([b.thac0 for b in blocks])
+    hp = int_column([b.hp for b in blocks])
+
+    xp_level = [None if v is None else bisect_right(XP_THRESHOLDS, v) - 2 for v in xp]
+    thac0_level = [None if v is None else THAC0_LEVEL[max(0, min(21, v))] for v in thac0]
+    hp_level = [None if v is None else bisect_right(HP_THRESHOLDS, v) - 2 for v in hp]
+
+    levels = []
+    for x, t, h in zip(xp_level, thac0_level, hp_level):
+        if x is not None and t is not None:
+            level = -((-(x + t)) // 2)
+        elif x is not None or t is not None:
+            level = x if x is not None else t
+        elif h is not None:
+            level = h
+        else:
+            level = DEFAULT_LEVEL
+        levels.append(max(MIN_LEVEL, min(MAX_LEVEL, level)))
+    return levels
+
+
+def damage_type(text: str) -> str:
+    lowered = text.lower()
+    for keyword, kind in DAMAGE_TYPES:
+        if keyword in lowered:
+            return kind
+    return 'bludgeoning'
+
+
+# ============================================================================
+# CONVERSION
+# ============================================================================
+
+def convert_blocks(blocks: list[StatBlock], source: str = DEFAULT_SOURCE) -> list[dict]:
+    """Convert a batch of stat blocks to Foundry PF2e NPC actors"""
+    if not blocks:
+        return []
+
+    levels = level_column(blocks)
+    rows = [level - MIN_LEVEL for level in levels]
+
+    # Tier columns
+    ac_tier = take(AC_TIER, [a + 10 for a in clamp_column(int_column([b.ac for b in blocks]), -10, 10, 5)])
+    attacks = clamp_column(attacks_column([b.attacks for b in blocks]), 0, 3, 1)
+    strike_tier = take(ATTACK_TIER, attacks)
+    scores = {key: clamp_column(int_column([getattr(b, attr) for b in blocks]), 0, 25, 0)
+              for key, attr in ABILITIES}
+
+    hp_2e = int_column([b.hp for b in blocks])
+    hp_tier = [1 if hp is None else HP_TIER[bisect_right(HP_RATIO_BUCKETS, 100 * hp // max(1, HP_THRESHOLDS[r]))]
+               for hp, r in zip(hp_2e, rows)]
+
+    # Gather every PF2e number from the tables
+    ac_rows = take(CREATURE_AC, rows)
+    save_rows = take(CREATURE_SAVES, rows)
+    hp_rows = take(CREATURE_HP, rows)
+    bonus_rows = take(STRIKE_BONUS, rows)
+    damage_rows = take(STRIKE_DAMAGE, rows)
+
+    ac = [row[tier] for row, tier in zip(ac_rows, ac_tier)]
+    hp = [row[tier] for row, tier in zip(hp_rows, hp_tier)]
+    bonus = [row[tier] for row, tier in zip(bonus_rows, strike_tier)]
+    damage = [row[tier] for row, tier in zip(damage_rows, strike_tier)]
+    fortitude = [row[tier] for row, tier in zip(save_rows, take(SCORE_TIER, scores['con']))]
+    reflex = [row[tier] for row, tier in zip(save_rows, take(SCORE_TIER, scores['dex']))]
+    will = [row[tier] for row, tier in zip(save_rows, take(SCORE_TIER, scores['wis']))]
+    mods = {key: take(SCORE_MOD, column) for key, column in scores.items()}
+    speed = take(SPEED, clamp_column(int_column([b.mv for b in blocks]), 0, 30, 12))
+
+    actors = []
+    for i, block in enumerate(blocks):
+        actors.append({
+            'name': block.name,
+            'type': 'npc',
+            'img': 'systems/pf2e/icons/default-icons/npc.svg',
+            'system': {
+                'abilities': {key: {'mod': mods[key][i]} for key, _ in ABILITIES},
+                'attributes': {
+                    'ac': {'value': ac[i], 'details': ''},
+                    'hp': {'value': hp[i], 'max': hp[i], 'temp': 0, 'details': ''},
+                    'speed': {'value': speed[i], 'otherSpeeds': []},
+                },
+                'perception': {'mod': will[i]},
+                'saves': {
+                    'fortitude': {'value': fortitude[i]},
+                    'reflex': {'value': reflex[i]},
+                    'will': {'value': will[i]},
+                },
+                'details': {
+                    'level': {'value': levels[i]},
+                    'publicNotes': conversion_notes(block),
+                    'source': {'value': source},
+                },
+                'traits': {
+                    'rarity': 'unique',
+                    'size': {'value': SIZES.get(block.size[:1].upper(), 'med')},
+                    'value': [],
+                },
+            },
+            'items': [{
+                'name': 'Strike',
+                'type': 'melee',
+                'system': {
+                    'bonus': {'value': bonus[i]},
+                    'damageRolls': {'strike': {'damage': damage[i], 'damageType': damage_type(block.damage)}},
+                    'traits': {'value': []},
+                },
+            }],
+        })
+    return actors
+
+
+def conversion_notes(block: StatBlock) -> str:
+    """Original 2e values for the GM, as the actor's public notes"""
+    parts = [f"<p><strong>{label}</strong> {value}</p>" for label, value in (
+        ("AD&D 2e:", f"AC {block.ac or '?'}; THAC0 {block.thac0 or '?'}; hp {block.hp or '?'}; "
+                     f"#AT {block.attacks or '?'}; Dmg {block.damage or '?'}"),
+        ("Special Attacks:", block.special_attacks),
+        ("Special Defenses:", block.special_defenses),
+        ("Magic Resistance:", block.magic_resistance),
+        ("Alignment:", block.alignment),
+    ) if value]
+    return "".join(parts)
+
+
+def benchmark(blocks: list[StatBlock], count: int, repeat: int):
+    """Time conversion of `count` blocks (the input repeated as needed)"""
+    batch = (blocks * (count // len(blocks) + 1))[:count]
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        convert_blocks(batch)
+        best = min(best, time.perf_counter() - start)
+    print(f"Converted {count} stat blocks in {best * 1000:.1f} ms ({best / count * 1e6:.1f} µs/block)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert extracted AD&D 2e stat blocks to PF2e Foundry actors')
+    parser.add_argument('input', help='Stat blocks from extract_statblocks.py (.jsonl or binary .stb)')
+    parser.add_argument('--output', '-o', default='-', help='JSON array output file (default: stdout)')
+    parser.add_argument('--split', metavar='DIR', help='Also write one <Name>.json actor per creature')
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help='Source book recorded on each actor')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Time converting N blocks instead')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Benchmark runs, best is reported (default: {DEFAULT_REPEAT})')
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"Error: Input file not found: {args.input}", file=sys.stderr)
+        sys.exit(1)
+
+    blocks = load_blocks(args.input)
+    if not blocks:
+        print("Error: No stat blocks in input", file=sys.stderr)
+        sys.exit(1)
+
+    if args.benchmark:
+        benchmark(blocks, args.benchmark, args.repeat)
+        return
+
+    actors = convert_blocks(blocks, args.source)
+
+    if args.split:
+        split_dir = Path(args.split)
+        split_dir.mkdir(parents=True, exist_ok=True)
+        for i, actor in enumerate(actors):
+            path = split_dir / f"{safe_filename(actor['name'], f'creature_{i+1}')}.json"
+            path.write_text(json.dumps(actor, indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+        print(f"✨ {len(actors)} actors saved to {split_dir}", file=sys.stderr)
+
+    text = json.dumps(actors, indent=2, ensure_ascii=False) + "\n"
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        Path(args.output).write_text(text, encoding='utf-8')
+        print(f"✨ Converted {len(actors)} stat blocks to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
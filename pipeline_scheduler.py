@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+pipeline_scheduler.py - Streaming page-level scheduler for chapter conversion
+Models every page as a small DAG
+
+    rasterize → preprocess → OCR (+ low-confidence words) → chapter combine
+
+and runs the pages of all chapters through one scheduler with a concurrency
+limit per stage. Completion is event driven: the moment a stage finishes a
+page, the page is queued for its next stage. Pages are OCR'd while later
+shards are still rendering, and the next chapter's pages keep the cores busy
+while the previous chapter finishes. Combine is a join node that runs once all
+of a chapter's pages are through OCR.
+
+Preprocessing happens in memory inside the OCR worker, so each page goes
+straight from preprocessing into OCR. It only becomes a stage of its own when
+-processed.png files are written for the interactive tool, or when
+preprocessing.shared_memory hands pages to OCR through shared memory.
+
+Chapters keep the harbinger_convert.fish layout. Every page stage and chapter
+step is recorded in the pipeline state store (pipeline_state.py); finished
+pages and combined chapters are skipped, so staged runs and interrupted runs
+pick up where they left off.
+
+Usage: python3 pipeline_scheduler.py book.pdf --chapter 1-12:OUTPUT_ROOT/intro [--chapter ...]
+                                     [--config FILE] [--stage all] [--jobs N] [--demo]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+from dataclasses import dataclass
+from contextlib import ExitStack
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ocr_pool import _init_worker, _ocr_worker, load_ocr_settings, needs_preprocessing
+from rasterize_pages import check_source, make_shards, render_shard, link_page, store_dir, store_page
+from pipeline_state import StateStore, DONE, FAILED
+from pipeline_trace import tracer, span, now_us
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+DEFAULT_DPI = 300
+DEFAULT_STAGE = "all"
+
+# Pipeline stages, in order; each run goes up to and including its target
+STAGES = ('extract', 'preprocess', 'ocr', 'combine')
+
+# Same substitutions, in the same order, as stage_combine's sed cleanup
+ENCODING_FIXES = [
+    ('â€™', "'"),
+    ('â€œ', '"'),
+    ('â€', '"'),
+    ('â€"', '—'),
+    ('â€˜', "'"),
+    ('â€"', '–'),
+    ('Â', ''),
+    ('â€¢', '•'),
+]
+
+
+@dataclass(eq=False)
+class Chapter:
+    output_dir: Path
+    first: int
+    last: int
+    pending: int = 0
+    failed: int = 0
+    lowconf: int = 0
+    started: int = 0        # Trace timestamp of the chapter's first scheduled page
+
+    @property
+    def temp_dir(self) -> Path:
+        return self.output_dir / '.temp'
+
+    @property
+    def key(self) -> str:
+        """The chapter's name in the state store"""
+        return self.output_dir.resolve().name
+
+
+@dataclass(eq=False)
+class PageNode:
+    chapter: Chapter
+    book_page: int
+    basename: str
+    shared: tuple | None = None
+
+
+def parse_chapter(spec: str) -> Chapter:
+    """START-END:DIR, the chapter's book pages and its output directory"""
+    pages, sep, dest = spec.partition(':')
+    first, dash, last = pages.partition('-')
+    if not sep or not dest:
+        raise ValueError(f"expected START-END:DIR, got '{spec}'")
+    first = int(first)
+    last = int(last) if dash else first
+    if first < 1 or last < first:
+        raise ValueError(f"invalid page range '{pages}'")
+    return Chapter(Path(dest), first, last)
+
+
+def chapter_pages(chapter: Chapter) -> list[tuple[int, str]]:
+    """(book page, basename) pairs, numbered from 1 within the chapter like rasterize_pages.py"""
+    width = len(str(chapter.last - chapter.first + 1))
+    return [(page, f"page-{index:0{width}d}")
+            for index, page in enumerate(range(chapter.first, chapter.last + 1), start=1)]
+
+
+def natural_key(path: Path) -> list:
+    """Sort like `sort -V`: page-9 before page-10"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path.name)]
+
+
+def fix_encoding(text: str) -> str:
+    for bad, good in ENCODING_FIXES:
+        text = text.replace(bad, good)
+    return re.sub(r' {2,}', ' ', text)
+
+
+def combine_chapter(chapter: Chapter, title: str, dpi: int, jobs: int, threshold: float,
+                    report: bool) -> int:
+    """Write combined.txt, the confidence report and converted.md; returns low-confidence items"""
+    with span('combine', 'chapter', chapter=chapter.key):
+        return _combine_chapter(chapter, title, dpi, jobs, threshold, report)
+
+
+def _combine_chapter(chapter: Chapter, title: str, dpi: int, jobs: int, threshold: float,
+                     report: bool) -> int:
+    temp_dir = chapter.temp_dir
+    generated = datetime.now().astimezone().strftime('%a %b %d %H:%M:%S %Z %Y')
+    combined = ["\n"]
+    report_lines = [f"# OCR Confidence Report\nGenerated: {generated}\nThreshold: {threshold:g}%\n\n"]
+
+    for txt_file in sorted(temp_dir.glob('page-*-text.txt'), key=natural_key):
+        basename = txt_file.name[:-len('-text.txt')]
+        combined.append(f"\n<!-- PAGE BREAK: {basename} -->\n\n")
+        combined.append(txt_file.read_text(encoding='utf-8'))
+        lowconf_file = temp_dir / f"{basename}-lowconf.txt"
+        if report and lowconf_file.exists() and lowconf_file.stat().st_size:
+            report_lines.append(f"## {basename}\n{lowconf_file.read_text(encoding='utf-8')}\n")
+
+    text = ''.join(combined)
+    (temp_dir / 'combined.txt').write_text(text, encoding='utf-8')
+
+    lowconf = 0
+    if report:
+        report_text = ''.join(report_lines)
+        (chapter.output_dir / 'ocr_confidence_report.txt').write_text(report_text, encoding='utf-8')
+        lowconf = report_text.count('\n')
+
+    header = (f"# {title} - Converted Content\n\n"
+              f"> Auto-converted on {generated}\n"
+              f"> DPI: {dpi} | Parallel Jobs: {jobs}\n\n---\n\n")
+    final_md = chapter.output_dir / 'converted.md'
+    tmp_path = final_md.with_name(final_md.name + '.tmp')
+    tmp_path.write_text(header + fix_encoding(text), encoding='utf-8')
+    os.replace(tmp_path, final_md)
+
+    # Same cleanup as a full harbinger_convert.fish run; the page store keeps the renders.
+    # A chapter with failed pages keeps its images for the retry.
+    if not chapter.failed:
+        for image in [*temp_dir.glob('page-*.png'), *temp_dir.glob('*-processed.png')]:
+            image.unlink(missing_ok=True)
+    return lowconf
+
+
+def timed(fn, *args):
+    """Run fn in a pool thread; returns (result, seconds)"""
+    start = time.perf_counter()
+    return fn(*args), time.perf_counter() - start
+
+
+class PageScheduler:
+    """Runs the page DAGs of all chapters with per-stage concurrency limits"""
+
+    def __init__(self, pdf: Path, store: Path, dpi: int, target: str, limits: dict,
+                 settings, ocr: dict, write_processed: bool = False, shared_memory: bool = False,
+                 report: bool = True, jobs: int = 1):
+        self.pdf = pdf
+        self.store = store
+        self.dpi = dpi
+        self.target = STAGES.index(target)
+        self.limits = limits
+        self.settings = settings
+        self.ocr = ocr
+        self.write_processed = write_processed
+        self.shared_memory = shared_memory and not write_processed
+        self.report = report
+        self.jobs = jobs
+
+        self.chapters: list[Chapter] = []
+        self.ready = {stage: deque() for stage in STAGES}
+        self.active = Counter()
+        self.running = {}                   # future → (stage, shard, page node or chapter)
+        self.waiting = defaultdict(list)    # book page → nodes waiting for its render
+        self.pools = {}
+        self.stores = {}                    # output root → StateStore
+        self.done = deque()                 # (node, ok) for pages through their last stage
+        self.total = 0
+
+    def reaches(self, stage: str) -> bool:
+        return self.target >= STAGES.index(stage)
+
+    def state(self, chapter: Chapter) -> StateStore:
+        root = chapter.output_dir.resolve().parent
+        if root not in self.stores:
+            self.stores[root] = StateStore(root)
+        return self.stores[root]
+
+    def record(self, node: PageNode, stage: str, ok: bool, fields: dict | None = None):
+        self.state(node.chapter).mark_page(node.chapter.key, node.basename, stage,
+                                           DONE if ok else FAILED, **(fields or {}))
+
+    def add_chapter(self, chapter: Chapter, limit: int | None = None):
+        """Queue the chapter's unfinished pages at the first stage each still needs"""
+        self.chapters.append(chapter)
+        chapter.started = now_us()
+        chapter.temp_dir.mkdir(parents=True, exist_ok=True)
+        ocr_done = self.state(chapter).done_pages(chapter.key, 'ocr') if self.reaches('ocr') else set()
+        for book_page, basename in chapter_pages(chapter)[:limit]:
+            node = PageNode(chapter, book_page, basename)
+            if basename in ocr_done:
+                continue
+            if not self.has_image(node):
+                stage = 'extract'
+            else:
+                stage = self.next_stage(node, 'extract')
+                if stage is None:
+                    continue
+            chapter.pending += 1
+            self.total += 1
+            if stage == 'extract':
+                self.waiting[book_page].append(node)
+            else:
+                self.ready[stage].append(node)
+
+    def has_image(self, node: PageNode) -> bool:
+        temp_dir = node.chapter.temp_dir
+        return any((temp_dir / f"{node.basename}{suffix}.png").exists()
+                   for suffix in ('', '-column-1', '-cleaned', '-processed'))
+
+    def next_stage(self, node: PageNode, finished: str) -> str | None:
+        """The page's next stage, or None once it is through the target"""
+        temp_dir = node.chapter.temp_dir
+        if finished == 'extract' and self.reaches('preprocess'):
+            separate = self.write_processed or (self.shared_memory and self.reaches('ocr'))
+            if separate and needs_preprocessing(temp_dir, node.basename):
+                return 'preprocess'
+        if finished in ('extract', 'preprocess') and self.reaches('ocr'):
+            return 'ocr'
+        return None
+
+    def pool(self, stage: str):
+        """Per-stage executors, started on first use"""
+        if stage not in self.pools:
+            workers = self.limits[stage]
+            if stage == 'ocr':
+                initargs = (self.ocr['language'], self.ocr['psm'], self.ocr['oem'],
+                            self.ocr['user_words'], self.ocr['threshold'], self.settings, self.ocr['segment'],
+                            self.ocr['cache_dir'], self.ocr['cache_max_mb'], self.ocr['segment_min_confidence'])
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+            elif stage == 'preprocess':
+                pool = ProcessPoolExecutor(max_workers=workers)
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers)
+            self.pools[stage] = self.stack.enter_context(pool)
+        return self.pools[stage]
+
+    def submit(self, stage: str, item):
+        if stage == 'extract':
+            future = self.pool(stage).submit(timed, render_shard, self.pdf, self.store, self.dpi, item, self.tool)
+        elif stage == 'preprocess':
+            from preprocess_pages import _preprocess_worker, preprocess_to_shared
+
+            worker = _preprocess_worker if self.write_processed else preprocess_to_shared
+            path = item.chapter.temp_dir / f"{item.basename}.png"
+            future = self.pool(stage).submit(worker, str(path), self.settings)
+        elif stage == 'ocr':
+            future = self.pool(stage).submit(_ocr_worker, str(item.chapter.temp_dir), item.basename, item.shared)
+        else:
+            future = self.pool(stage).submit(combine_chapter, item, self.pdf.stem, self.dpi, self.jobs,
+                                             self.ocr['threshold'], self.report)
+        self.running[future] = (stage, item)
+        self.active[stage] += 1
+
+    def dispatch(self):
+        """Fill free slots, downstream stages first so started pages finish before new ones"""
+        for stage in reversed(STAGES):
+            queue = self.ready[stage]
+            while queue and self.active[stage] < self.limits[stage]:
+                # Backpressure: preprocessed pages wait in memory only as long as OCR lags
+                if stage == 'preprocess' and (self.active[stage] + len(self.ready['ocr'])
+                                              >= self.limits['preprocess'] + self.limits['ocr']):
+                    break
+                self.submit(stage, queue.popleft())
+
+    def advance(self, node: PageNode, finished: str, ok: bool = True):
+        stage = self.next_stage(node, finished) if ok else None
+        if stage is not None:
+            self.ready[stage].append(node)
+            return
+        self.done.append((node, ok))
+        chapter = node.chapter
+        chapter.pending -= 1
+        chapter.failed += not ok
+        if chapter.pending == 0:
+            self.chapter_done(chapter)
+
+    def chapter_done(self, chapter: Chapter):
+        """Join node: every page of the chapter is through its last page stage"""
+        if chapter.failed and chapter.failed == len(chapter_pages(chapter)):
+            print(f"Error: {chapter.output_dir.name}: no page made it through the pipeline", file=sys.stderr)
+            return
+        if self.reaches('combine'):
+            self.ready['combine'].append(chapter)   # Combined even with failed pages, but not recorded
+        else:
+            self.mark_chapter(chapter, *STAGES[:self.target + 1])
+            self.trace_chapter(chapter)
+
+    def mark_chapter(self, chapter: Chapter, *steps: str):
+        """Record the chapter's steps, unless pages failed: those must be retried by the next run"""
+        if chapter.failed:
+            print(f"Error: {chapter.output_dir.name}: {chapter.failed} page(s) failed; "
+                  f"not recorded as done, the next run retries them", file=sys.stderr)
+            return
+        self.state(chapter).mark_steps(chapter.key, *steps)
+
+    def trace_chapter(self, chapter: Chapter):
+        """The chapter's span, from its first scheduled page to its last finished stage"""
+        tracer.complete(chapter.key, 'chapter', chapter.started, now_us() - chapter.started,
+                        {'pages': len(chapter_pages(chapter)), 'failed': chapter.failed,
+                         'target': STAGES[self.target]})
+
+    def link_rendered(self, first: int, last: int, seconds: float | None = None):
+        """Link freshly rendered store pages into the chapters waiting for them"""
+        for book_page in range(first, last + 1):
+            source = store_page(self.store, self.dpi, book_page)
+            for node in self.waiting.pop(book_page, []):
+                ok = source.exists()
+                if ok:
+                    link_page(source, node.chapter.temp_dir / f"{node.basename}.png")
+                else:
+                    print(f"Warning: page {book_page} did not render", file=sys.stderr)
+                self.record(node, 'extract', ok, {'artifact': str(source) if ok else None, 'seconds': seconds})
+                self.advance(node, 'extract', ok)
+
+    def complete(self, stage: str, item, future):
+        from preprocess_pages import release_shared
+
+        try:
+            result = future.result()
+            error = None
+        except Exception as e:
+            result, error = None, e
+
+        if stage == 'extract':
+            seconds = None
+            if error:
+                print(f"Error: Rendering pages {item[0]}-{item[1]} failed: {error}", file=sys.stderr)
+            elif result:
+                seconds = round(result[1] / (item[1] - item[0] + 1), 3)
+            self.link_rendered(*item, seconds=seconds)
+        elif stage == 'preprocess':
+            fields = None
+            if error:
+                print(f"Error: Preprocessing {item.basename} failed: {error}", file=sys.stderr)
+            elif self.write_processed:
+                fields = result[1]
+            else:
+                item.shared = result
+            self.record(item, stage, error is None, fields)
+            self.advance(item, stage, ok=error is None)
+        elif stage == 'ocr':
+            if item.shared:
+                release_shared(item.shared[0])
+                item.shared = None
+            if error:
+                print(f"Error: OCR of {item.basename} failed: {error}", file=sys.stderr)
+            ok = error is None and result[1]
+            self.record(item, stage, ok, result[2] if result else None)
+            self.advance(item, stage, ok=ok)
+        else:
+            if error:
+                print(f"Error: Combining {item.output_dir.name} failed: {error}", file=sys.stderr)
+                return
+            item.lowconf = result
+            self.mark_chapter(item, *STAGES)
+            self.trace_chapter(item)
+
+    def run(self):
+        """Drive the DAG; yields (page node, ok) as pages finish"""
+        import shutil
+
+        self.tool = 'pdftocairo' if shutil.which('pdftocairo') else 'pdftoppm'
+
+        # Pages already in the store only need linking; the rest render in shards
+        missing = []
+        for book_page in sorted(self.waiting):
+            if store_page(self.store, self.dpi, book_page).exists():
+                self.link_rendered(book_page, book_page)
+            else:
+                missing.append(book_page)
+        self.ready['extract'].extend(make_shards(missing, self.limits['extract']))
+
+        for chapter in self.chapters:
+            if chapter.pending == 0:
+                self.chapter_done(chapter)
+
+        with ExitStack() as self.stack:
+            for store in self.stores.values():
+                self.stack.callback(store.close)
+            self.dispatch()
+            while self.done or self.running:
+                while self.done:
+                    yield self.done.popleft()
+                if not self.running:
+                    break
+                finished, _ = wait(self.running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, item = self.running.pop(future)
+                    self.active[stage] -= 1
+                    self.complete(stage, item, future)
+                self.dispatch()
+
+
+def failed_pages(state: StateStore, chapter: str) -> set[str]:
+    """Pages whose last preprocessing or OCR attempt failed and that have no OCR result since"""
+    failed = {row['page'] for stage in ('preprocess', 'ocr') for row in state.page_records(stage, chapter)
+              if row['status'] == FAILED}
+    return failed - state.done_pages(chapter, 'ocr')
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Stream pages of all chapters through rasterize → preprocess → OCR → combine',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Convert two chapters end to end
+  python3 pipeline_scheduler.py book.pdf --config pipeline_config.json \\
+      --chapter 1-12:converted/intro --chapter 13-40:converted/act1
+
+  # Extract and preprocess only, for the interactive tool
+  python3 pipeline_scheduler.py book.pdf --chapter 1-12:converted/intro --stage preprocess
+        """
+    )
+    parser.add_argument('pdf', type=Path, help='Source PDF (the whole book)')
+    parser.add_argument('--chapter', action='append', default=[], metavar='START-END:DIR',
+                        help='Book pages and output directory of a chapter (repeatable)')
+    parser.add_argument('--config', '-c', type=Path, default=None, help='Pipeline config JSON')
+    parser.add_argument('--stage', default=DEFAULT_STAGE, choices=[*STAGES, 'all'],
+                        help=f'Last stage to run (default: {DEFAULT_STAGE})')
+    parser.add_argument('--store', type=Path, default=None,
+                        help='Shared page store (default: .pages next to the chapter directories)')
+    parser.add_argument('--dpi', type=int, default=None, help=f'Render resolution (default: config or {DEFAULT_DPI})')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Default per-stage concurrency (default: config parallel_jobs or CPU count)')
+    parser.add_argument('--extract-jobs', type=int, default=None, help='Concurrent renderers')
+    parser.add_argument('--preprocess-jobs', type=int, default=None, help='Concurrent preprocessing workers')
+    parser.add_argument('--ocr-jobs', type=int, default=None, help='Concurrent OCR workers')
+    parser.add_argument('--demo', action='store_true', help='Demo mode: first page of the first chapter only')
+    parser.add_argument('--quiet', '-q', action='store_true', help='No progress output')
+
+    args = parser.parse_args()
+
+    if not args.pdf.is_file():
+        print(f"Error: PDF not found: {args.pdf}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        chapters = [parse_chapter(spec) for spec in args.chapter]
+    except ValueError as e:
+        print(f"Error: --chapter {e}", file=sys.stderr)
+        sys.exit(1)
+    if not chapters:
+        print("Error: no --chapter page ranges given", file=sys.stderr)
+        sys.exit(1)
+
+    config = {}
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        from preprocess_pages import load_settings
+    except ImportError:
+        print("Error: numpy and Pillow are required: pip install numpy pillow", file=sys.stderr)
+        sys.exit(1)
+
+    preprocessing = config.get('preprocessing', {})
+    write_processed = preprocessing.get('write_processed',
+                                        config.get('interactive_preprocessing', {}).get('enabled', False))
+    dpi = args.dpi or int(config.get('dpi', DEFAULT_DPI))
+    jobs = max(1, args.jobs or int(config.get('parallel_jobs', 0)) or os.cpu_count() or 1)
+    limits = {
+        'extract': max(1, args.extract_jobs or jobs),
+        'preprocess': max(1, args.preprocess_jobs or jobs),
+        'ocr': max(1, args.ocr_jobs or jobs),
+        'combine': 1,
+    }
+    target = 'combine' if args.stage == 'all' else args.stage
+    store = args.store or chapters[0].output_dir.parent / '.pages'
+
+    if not check_source(args.pdf, store_dir(store, dpi)):
+        print(f"Error: {store_dir(store, dpi)} holds pages from a different PDF; use another --store",
+              file=sys.stderr)
+        sys.exit(1)
+
+    scheduler = PageScheduler(args.pdf, store, dpi, target, limits,
+                              load_settings(args.config), load_ocr_settings(config),
+                              bool(write_processed), bool(preprocessing.get('shared_memory', False)),
+                              bool(config.get('ocr', {}).get('output_confidence_report', True)), jobs)
+
+    if args.demo:
+        chapters = chapters[:1]
+    for chapter in chapters:
+        state = scheduler.state(chapter)
+        if failed_pages(state, chapter.key):
+            state.clear_steps(chapter.key)  # Recorded despite failed pages: retry them
+        elif target == 'combine' and state.has_step(chapter.key, 'combine'):
+            continue
+        scheduler.add_chapter(chapter, limit=1 if args.demo else None)
+
+    events = scheduler.run()
+    if not args.quiet and scheduler.total:
+        events = tqdm(events, total=scheduler.total, desc=f"Pages → {target}")
+    with span(f"pipeline {target}", 'stage', chapters=len(scheduler.chapters), pages=scheduler.total):
+        failed = sum(not ok for _, ok in events)
+
+    if not args.quiet:
+        print(f"✨ Pipeline ({target}) finished for {len(scheduler.chapters)} chapter(s)", file=sys.stderr)
+        print(f"   {scheduler.total - failed} pages done, {failed} failed", file=sys.stderr)
+        if target == 'combine' and scheduler.report:
+            for chapter in scheduler.chapters:
+                if (chapter.output_dir / 'converted.md').exists():
+                    print(f"   {chapter.output_dir.name}: {chapter.lowconf} low-confidence report lines",
+                          file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
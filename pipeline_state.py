@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+pipeline_state.py - SQLite pipeline state store
+One database per output root (OUTPUT_ROOT/.pipeline_state.db, WAL mode) holds
+every checkpoint of the pipeline:
+
+    steps        master and chapter checkpoints (extract, ocr, combine, cleanup, ...)
+    page_stages  per-page, per-stage status with input hash, artifact path and timing
+
+Chapters are keyed by their directory name; master steps use the empty chapter.
+Resume is an indexed lookup on (chapter, stage) instead of globbing .temp for
+marker files. The Python tools use StateStore directly; the fish scripts and the
+interactive server use the command line below.
+
+Usage: python3 pipeline_state.py CHAPTER_DIR has-step STEP      (exit status 0/1)
+       python3 pipeline_state.py CHAPTER_DIR mark-step STEP
+       python3 pipeline_state.py CHAPTER_DIR steps | clear | count STAGE | pages STAGE
+       python3 pipeline_state.py CHAPTER_DIR mark-page PAGE STAGE [--artifact F] [--input-hash H]
+       python3 pipeline_state.py OUTPUT_ROOT --root has-step STEP | mark-step STEP | chapters | clear [--all]
+"""
+
+import sys
+import sqlite3
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+# Configuration defaults
+STATE_DB = ".pipeline_state.db"
+BUSY_TIMEOUT_MS = 30000
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    chapter   TEXT NOT NULL,
+    step      TEXT NOT NULL,
+    finished  TEXT NOT NULL,
+    PRIMARY KEY (chapter, step)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS page_stages (
+    chapter    TEXT NOT NULL,
+    stage      TEXT NOT NULL,
+    page       TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    input_hash TEXT,
+    artifact   TEXT,
+    seconds    REAL,
+    updated    TEXT NOT NULL,
+    PRIMARY KEY (chapter, stage, page)
+) WITHOUT ROWID;
+"""
+
+
+def now() -> str:
+    return datetime.now().astimezone().isoformat(timespec='seconds')
+
+
+def file_hash(paths) -> str | None:
+    """Content hash of a page's input image(s)"""
+    digest = hashlib.blake2b(digest_size=16)
+    found = False
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            found = True
+        except OSError:
+            continue
+    return digest.hexdigest() if found else None
+
+
+class StateStore:
+    """Checkpoints and page stage records for one output root"""
+
+    def __init__(self, root: Path):
+        self.path = Path(root) / STATE_DB
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def for_chapter(cls, chapter_dir: Path) -> tuple['StateStore', str]:
+        """The store of the chapter's output root, and the chapter key"""
+        chapter_dir = Path(chapter_dir).resolve()
+        return cls(chapter_dir.parent), chapter_dir.name
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Steps (chapter '' holds the master pipeline steps)
+
+    def has_step(self, chapter: str, step: str) -> bool:
+        return self.db.execute("SELECT 1 FROM steps WHERE chapter = ? AND step = ?",
+                               (chapter, step)).fetchone() is not None
+
+    def mark_steps(self, chapter: str, *steps: str):
+        stamp = now()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany("INSERT OR REPLACE INTO steps VALUES (?, ?, ?)",
+                                [(chapter, step, stamp) for step in steps])
+
+    def steps(self, chapter: str) -> dict[str, str]:
+        return {row['step']: row['finished'] for row in self.db.execute(
+            "SELECT step, finished FROM steps WHERE chapter = ? ORDER BY finished", (chapter,))}
+
+    def clear_steps(self, chapter: str | None = None, step: str | None = None):
+        """Forget steps of one chapter, one step everywhere, or everything (None)"""
+        query, params = "DELETE FROM steps WHERE 1", []
+        if chapter is not None:
+            query, params = query + " AND chapter = ?", params + [chapter]
+        if step is not None:
+            query, params = query + " AND step = ?", params + [step]
+        self.db.execute(query, params)
+
+    def chapters(self) -> list[str]:
+        return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT chapter FROM steps WHERE chapter != '' ORDER BY chapter")]
+
+    # Page stages
+
+    def mark_page(self, chapter: str, page: str, stage: str, status: str = DONE,
+                  input_hash: str | None = None, artifact: str | None = None, seconds: float | None = None):
+        self.mark_pages([(chapter, page, stage, status, input_hash, artifact, seconds)])
+
+    def mark_pages(self, rows: list[tuple]):
+        """Many (chapter, page, stage, status, input_hash, artifact, seconds) rows in one transaction"""
+        stamp = now()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO page_stages "
+                "(chapter, page, stage, status, input_hash, artifact, seconds, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, stamp) for row in rows])
+
+    def done_pages(self, chapter: str, stage: str) -> set[str]:
+        return {row[0] for row in self.db.execute(
+            "SELECT page FROM page_stages WHERE chapter = ? AND stage = ? AND status = ?",
+            (chapter, stage, DONE))}
+
+    def count(self, chapter: str, stage: str, status: str = DONE) -> int:
+        return self.db.execute(
+            "SELECT COUNT(*) FROM page_stages WHERE chapter = ? AND stage = ? AND status = ?",
+            (chapter, stage, status)).fetchone()[0]
+
+    def page_records(self, stage: str, chapter: str | None = None) -> list[sqlite3.Row]:
+        if chapter is None:
+            return self.db.execute("SELECT * FROM page_stages WHERE stage = ? ORDER BY chapter, page",
+                                   (stage,)).fetchall()
+        return self.db.execute("SELECT * FROM page_stages WHERE chapter = ? AND stage = ? ORDER BY page",
+                               (chapter, stage)).fetchall()
+
+    def clear_pages(self, chapter: str, stage: str | None = None):
+        if stage is None:
+            self.db.execute("DELETE FROM page_stages WHERE chapter = ?", (chapter,))
+        else:
+            self.db.execute("DELETE FROM page_stages WHERE chapter = ? AND stage = ?", (chapter, stage))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Query and update the SQLite pipeline state store')
+    parser.add_argument('dir', type=Path, help='Chapter output directory (or the output root with --root)')
+    parser.add_argument('--root', action='store_true', help='DIR is the output root; steps are master steps')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    for name in ('has-step', 'mark-step'):
+        commands.add_parser(name).add_argument('step')
+    commands.add_parser('steps', help='List finished steps with timestamps')
+    clear = commands.add_parser('clear', help='Forget steps (of the chapter, or with --root the master steps)')
+    clear.add_argument('--all', action='store_true', help='With --root: every chapter too')
+    clear.add_argument('--step', default=None, help='Only this step')
+    clear.add_argument('--pages', action='store_true', help='Also forget the chapter\'s page stages')
+    commands.add_parser('chapters', help='Chapters with recorded steps')
+    for name in ('count', 'pages'):
+        commands.add_parser(name).add_argument('stage')
+    mark = commands.add_parser('mark-page')
+    mark.add_argument('page')
+    mark.add_argument('stage')
+    mark.add_argument('--status', default=DONE)
+    mark.add_argument('--artifact', default=None)
+    mark.add_argument('--input-hash', default=None)
+    mark.add_argument('--seconds', type=float, default=None)
+
+    args = parser.parse_args()
+
+    try:
+        if args.root:
+            store, chapter = StateStore(args.dir), ''
+        else:
+            store, chapter = StateStore.for_chapter(args.dir)
+    except sqlite3.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    with store:
+        if args.command == 'has-step':
+            sys.exit(0 if store.has_step(chapter, args.step) else 1)
+        elif args.command == 'mark-step':
+            store.mark_steps(chapter, args.step)
+        elif args.command == 'steps':
+            for step, finished in store.steps(chapter).items():
+                print(f"{step}\t{finished}")
+        elif args.command == 'clear':
+            if args.root and args.all:
+                store.clear_steps(step=args.step)
+            else:
+                store.clear_steps(chapter, args.step)
+            if args.pages and chapter:
+                store.clear_pages(chapter)
+        elif args.command == 'chapters':
+            for name in store.chapters():
+                print(name)
+        elif args.command == 'count':
+            print(store.count(chapter, args.stage))
+        elif args.command == 'pages':
+            for row in store.page_records(args.stage, chapter or None):
+                if row['status'] == DONE:
+                    print(f"{row['chapter']}\t{row['page']}\t{row['artifact'] or ''}")
+        elif args.command == 'mark-page':
+            store.mark_page(chapter, args.page, args.stage, args.status,
+                            args.input_hash, args.artifact, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
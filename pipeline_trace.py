@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+pipeline_trace.py - Span tracing and profiling shared by the pipeline tools
+When HARBINGER_TRACE names a file, every tool appends Chrome trace events to it:
+one complete ("X") event per stage, chapter or page span with its wall time, CPU
+time (own and child processes) and the process's peak RSS. The fish scripts emit
+matching begin/end events through the command line below, so a whole
+harbinger_master.fish --trace run opens as one timeline in chrome://tracing or
+https://ui.perfetto.dev.
+
+Events are appended one line at a time in the JSON array format, which trace
+viewers read even without the closing bracket; `finish` rewrites the file as a
+complete {"traceEvents": [...]} document.
+
+Profile gives the --profile flags of the Python tools function-level cProfile
+statistics for their hot loops, merged across pool workers.
+
+Usage: python3 pipeline_trace.py init TRACE.json [--pid PID --process NAME]
+       python3 pipeline_trace.py begin NAME [--cat step] [--pid PID] [--arg KEY=VALUE ...]
+       python3 pipeline_trace.py end NAME [--cat step] [--pid PID]
+       python3 pipeline_trace.py finish TRACE.json
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows: no peak RSS
+
+# Configuration defaults
+TRACE_ENV = "HARBINGER_TRACE"
+PROFILE_LIMIT = 30      # Functions listed by --profile
+
+
+def now_us() -> int:
+    """Wall clock in microseconds since the epoch, comparable across processes"""
+    return time.time_ns() // 1000
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+class Tracer:
+    """Appends trace events to the HARBINGER_TRACE file; does nothing when unset"""
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.named = set()      # pids that have a process_name event
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def emit(self, event: dict):
+        if not self.path:
+            return
+        pid = event.setdefault('pid', os.getpid())
+        event.setdefault('tid', threading.get_native_id())
+        lines = []
+        if pid not in self.named and pid == os.getpid():
+            self.named.add(pid)
+            lines.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                          'args': {'name': f"{Path(sys.argv[0]).name} ({pid})"}})
+        lines.append(event)
+        data = ''.join(json.dumps(e, ensure_ascii=False) + ',\n' for e in lines).encode('utf-8')
+        try:
+            if not os.path.exists(self.path):
+                init_trace(Path(self.path), exist_ok=True)
+            # One O_APPEND write per event keeps lines from concurrent processes whole
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Warning: Tracing disabled, cannot write {self.path}: {e}", file=sys.stderr)
+            self.path = None
+
+    def complete(self, name: str, cat: str, start_us: int, dur_us: int, args: dict | None = None):
+        """A finished span, for work whose start and end were timed elsewhere"""
+        self.emit({'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': max(0, dur_us),
+                   'args': args or {}})
+
+    @contextmanager
+    def span(self, name: str, cat: str = 'stage', **args):
+        """Time the block as a span with wall time, CPU time and peak RSS"""
+        if not self.path:
+            yield
+            return
+        start = now_us()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        children = os.times()
+        try:
+            yield
+        finally:
+            ended = os.times()
+            args['cpu_ms'] = round((time.process_time() - cpu) * 1000, 1)
+            child_cpu = (ended.children_user + ended.children_system
+                         - children.children_user - children.children_system)
+            if child_cpu:
+                args['child_cpu_ms'] = round(child_cpu * 1000, 1)
+            args['peak_rss_mb'] = peak_rss_mb()
+            self.complete(name, cat, start, round((time.perf_counter() - wall) * 1e6), args)
+
+
+tracer = Tracer(os.environ.get(TRACE_ENV))
+span = tracer.span
+
+
+def init_trace(path: Path, exist_ok: bool = False):
+    """Start an empty trace in the JSON array format (keeping an existing one with exist_ok)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_EXCL if exist_ok else os.O_TRUNC)
+    try:
+        fd = os.open(path, flags)
+    except FileExistsError:
+        return
+    try:
+        os.write(fd, b'[\n')
+    finally:
+        os.close(fd)
+
+
+def finish_trace(path: Path) -> int:
+    """Rewrite an appended trace as a complete JSON document; returns the event count"""
+    text = path.read_text(encoding='utf-8')
+    if text.lstrip().startswith('{'):
+        return len(json.loads(text).get('traceEvents', []))
+    events = []
+    for line in text.splitlines():
+        line = line.strip().rstrip(',')
+        if line and line not in ('[', ']'):
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # A line cut short by a killed process
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}), encoding='utf-8')
+    os.replace(tmp_path, path)
+    return len(events)
+
+
+# ============================================================================
+# FUNCTION-LEVEL PROFILING (--profile)
+# ============================================================================
+
+class _Collected:
+    """Raw cProfile statistics in the shape pstats.Stats loads"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profiled_call(fn, *args):
+    """Run fn under cProfile; returns (result, raw stats). Picklable, so it works as a pool task."""
+    profile = cProfile.Profile()
+    result = profile.runcall(fn, *args)
+    profile.create_stats()
+    return result, profile.stats
+
+
+class Profile:
+    """Merged cProfile statistics of the hot loops, from this process and pool workers"""
+
+    def __init__(self, dump: str | None = None):
+        self.dump = dump
+        self.stats = None
+
+    def add(self, raw: dict):
+        if self.stats is None:
+            self.stats = pstats.Stats(_Collected(raw), stream=sys.stderr)
+        else:
+            self.stats.add(_Collected(raw))
+
+    def run(self, fn, *args):
+        result, raw = profiled_call(fn, *args)
+        self.add(raw)
+        return result
+
+    def report(self, limit: int = PROFILE_LIMIT):
+        """Print the top functions by cumulative time; also dump the stats when a file was given"""
+        if self.stats is None:
+            return
+        if self.dump:
+            self.stats.dump_stats(self.dump)
+            print(f"✨ Profile saved to {self.dump} (open with snakeviz or pstats)", file=sys.stderr)
+        self.stats.sort_stats('cumulative').print_stats(limit)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write Chrome trace events for the pipeline')
+    commands = parser.add_subparsers(dest='command', required=True)
+    init = commands.add_parser('init', help='Start a new trace file')
+    init.add_argument('trace', type=Path)
+    init.add_argument('--pid', type=int, default=None, help='Process to name in the viewer')
+    init.add_argument('--process', default=None, help='Its name, e.g. harbinger_master.fish')
+    commands.add_parser('finish', help='Close the trace as a complete JSON document').add_argument('trace', type=Path)
+    for name in ('begin', 'end'):
+        command = commands.add_parser(name)
+        command.add_argument('name')
+        command.add_argument('--cat', default='step', help='Span category (default: step)')
+        command.add_argument('--pid', type=int, default=None,
+                             help='Process the span belongs to (the calling script, e.g. $fish_pid)')
+        command.add_argument('--arg', action='append', default=[], metavar='KEY=VALUE',
+                             help='Span argument shown in the viewer (repeatable)')
+
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        init_trace(args.trace)
+        if args.pid and args.process:
+            Tracer(str(args.trace)).emit({'name': 'process_name', 'ph': 'M', 'pid': args.pid, 'tid': 0,
+                                          'args': {'name': f"{args.process} ({args.pid})"}})
+        return
+    if args.command == 'finish':
+        if not args.trace.exists():
+            print(f"Error: Trace not found: {args.trace}", file=sys.stderr)
+            sys.exit(1)
+        count = finish_trace(args.trace)
+        print(f"✨ Trace saved to {args.trace}", file=sys.stderr)
+        print(f"   {count} events (open in chrome://tracing or ui.perfetto.dev)", file=sys.stderr)
+        return
+
+    pid = args.pid or os.getppid()
+    event = {'name': args.name, 'cat': args.cat, 'ph': 'B' if args.command == 'begin' else 'E',
+             'ts': now_us(), 'pid': pid, 'tid': pid}
+    if args.arg:
+        event['args'] = dict(item.partition('=')[::2] for item in args.arg)
+    tracer.emit(event)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+preprocess_pages.py - Vectorized page preprocessing for OCR
+Applies the operations configured in the `preprocessing` block of
+pipeline_config.json (grayscale, deskew, despeckle, contrast stretch, level,
+morphology) with NumPy array operations instead of one ImageMagick process per
+page. Contrast stretch and level are folded into a single 256-entry lookup table.
+
+Pages are processed in a worker pool. The OCR stage normally preprocesses in
+memory (ocr_pool.py --preprocess), either inside each OCR worker or in a separate
+pool that hands the grayscale buffer over through shared memory, so no
+-processed.png is encoded and decoded again. This CLI writes -processed.png files
+for the interactive preprocessing tool or for debugging.
+
+Deskewing changes the page frame that the OCR boxes and automatic regions are
+in. So when an in-memory page is rotated, its angle is recorded in
+page-N-deskew.json. Re-OCR rotates the original page the same way before it
+crops word boxes (reocr_regions.py).
+Pages it has written are recorded in the pipeline state store (pipeline_state.py)
+and skipped on the next run unless --force is given.
+
+Usage: python3 preprocess_pages.py TEMP_DIR [--config pipeline_config.json] [--jobs N] [--force]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image
+
+from pipeline_state import StateStore, file_hash
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults (match harbinger_convert.fish when no config is given)
+DEFAULT_PREPROCESSING = {
+    'deskew': True,
+    'deskew_threshold': 40,
+    'despeckle': False,
+    'contrast_stretch': "2%x2%",
+    'level': "10%,90%,1.0",
+    'morphology': None,
+}
+
+# ImageMagick's -colorspace Gray weights
+REC709_LUMA = (0.212656, 0.715158, 0.072186, 0)
+
+# Deskew: angles are searched on a downsampled page, coarse then fine
+DESKEW_WIDTH = 1200
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_COARSE_STEP = 0.5
+DESKEW_FINE_STEP = 0.05
+DESKEW_MIN_ANGLE = 0.05
+DESKEW_SUFFIX = "-deskew.json"     # page-N-deskew.json: rotation applied to an in-memory page
+
+STRIP_ROWS = 256  # Rows per despeckle strip, bounds the stacked neighbourhood memory
+
+MORPHOLOGY_SPEC = re.compile(r'^\s*(erode|dilate|open|close)\s+(diamond|square|disk|plus)(?::(\d+))?\s*$',
+                             re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PreprocessSettings:
+    """The `preprocessing` block of pipeline_config.json"""
+    deskew: bool = True
+    deskew_threshold: float = 40.0
+    despeckle: bool = False
+    contrast_stretch: str | None = "2%x2%"
+    level: str | None = "10%,90%,1.0"
+    morphology: str | None = None
+
+
+def load_settings(config_path: Path | None = None) -> PreprocessSettings:
+    """Read preprocessing settings from a pipeline config, falling back to the defaults"""
+    values = dict(DEFAULT_PREPROCESSING)
+    if config_path:
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                block = json.load(f).get('preprocessing', {})
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {config_path}: {e}", file=sys.stderr)
+            block = {}
+        values.update({k: v for k, v in block.items() if k in values})
+    return PreprocessSettings(
+        deskew=bool(values['deskew']),
+        deskew_threshold=float(values['deskew_threshold']),
+        despeckle=bool(values['despeckle']),
+        contrast_stretch=values['contrast_stretch'] or None,
+        level=values['level'] or None,
+        morphology=values['morphology'] or None,
+    )
+
+
+def parse_fraction(value: str) -> float:
+    """'12%' → 0.12; bare numbers are on the 0-255 scale"""
+    value = value.strip()
+    if value.endswith('%'):
+        return float(value[:-1]) / 100
+    return float(value) / 255
+
+
+def load_gray(path: Path) -> np.ndarray:
+    """Decode a page to uint8 grayscale, flattening any alpha onto white"""
+    with Image.open(path) as image:
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+            image = Image.alpha_composite(background, image.convert('RGBA'))
+        if image.mode == 'L':
+            return np.asarray(image)
+        if image.mode in ('1', 'I', 'I;16', 'F'):
+            return np.asarray(image.convert('L'))
+        return np.asarray(image.convert('RGB').convert('L', REC709_LUMA))
+
+
+def deskew_angle(gray: np.ndarray, threshold: float) -> float:
+    """Skew angle in degrees that maximizes the row projection profile of the ink"""
+    step = max(1, gray.shape[1] // DESKEW_WIDTH)
+    small = gray[::step, ::step]
+    ys, xs = np.nonzero(small < 255 * threshold / 100)
+    if len(ys) < 100:
+        return 0.0
+    ys = ys.astype(np.float32)
+    xs = xs.astype(np.float32) - small.shape[1] / 2
+
+    def score(angle: float) -> float:
+        rows = np.rint(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        return float(np.sum(np.diff(profile.astype(np.float64)) ** 2))
+
+    coarse = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 1e-9, DESKEW_COARSE_STEP)
+    best = max(coarse, key=score)
+    fine = np.arange(best - DESKEW_COARSE_STEP, best + DESKEW_COARSE_STEP + 1e-9, DESKEW_FINE_STEP)
+    return float(max(fine, key=score))
+
+
+def rotate_page(gray: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate by angle degrees, expanding onto a white background (uint8 or float32 pages)"""
+    rotated = Image.fromarray(gray).rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    return np.asarray(rotated)
+
+
+def deskew(gray: np.ndarray, threshold: float, angle: float | None = None) -> np.ndarray:
+    """Rotate the page straight, expanding onto a white background like -deskew"""
+    if angle is None:
+        angle = deskew_angle(gray, threshold)
+    if abs(angle) < DESKEW_MIN_ANGLE:
+        return gray
+    return rotate_page(gray, angle)
+
+
+def deskew_path(page: Path) -> Path:
+    return page.with_name(f"{page.stem}{DESKEW_SUFFIX}")
+
+
+def save_deskew(page: Path, angle: float):
+    """Record the rotation applied to an in-memory page, or clear it when the frame is unchanged"""
+    path = deskew_path(page)
+    if abs(angle) < DESKEW_MIN_ANGLE:
+        path.unlink(missing_ok=True)
+        return
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': page.name, 'angle': angle}, f)
+    os.replace(tmp_path, path)
+
+
+def load_deskew(page: Path) -> float:
+    """Rotation recorded for an original page image; 0.0 when it was not rotated"""
+    try:
+        with open(deskew_path(page), 'r', encoding='utf-8') as f:
+            return float(json.load(f).get('angle', 0.0))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0.0
+
+
+# Median-of-9 sorting network (compare-exchange pairs), evaluated with np.minimum/np.maximum
+MEDIAN9_NETWORK = [(1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8),
+                   (0, 3), (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2)]
+
+
+def despeckle(gray: np.ndarray) -> np.ndarray:
+    """3×3 median filter, computed in row strips with a sorting network"""
+    padded = np.pad(gray, 1, mode='edge')
+    h, w = gray.shape
+    out = np.empty_like(gray)
+    for top in range(0, h, STRIP_ROWS):
+        bottom = min(h, top + STRIP_ROWS)
+        p = [padded[top + dy:bottom + dy, dx:dx + w].copy() for dy in range(3) for dx in range(3)]
+        for a, b in MEDIAN9_NETWORK:
+            p[a], p[b] = np.minimum(p[a], p[b]), np.maximum(p[a], p[b])
+        out[top:bottom] = p[4]
+    return out
+
+
+def stretch_lut(hist: np.ndarray, spec: str) -> np.ndarray:
+    """-contrast-stretch black%xwhite%: saturate that share of darkest and brightest pixels"""
+    parts = spec.lower().split('x')
+    black = parse_fraction(parts[0])
+    white = parse_fraction(parts[1]) if len(parts) > 1 and parts[1] else black
+    total = hist.sum()
+    cdf = np.cumsum(hist)
+    low = int(np.searchsorted(cdf, black * total, side='right'))
+    high = int(np.searchsorted(cdf, total - white * total, side='left'))
+    values = np.arange(256, dtype=np.float64)
+    if high <= low:
+        return values
+    return np.clip((values - low) * 255 / (high - low), 0, 255)
+
+
+def level_curve(values: np.ndarray, spec: str) -> np.ndarray:
+    """-level black,white,gamma applied to 0-255 values"""
+    parts = [p for p in spec.split(',') if p.strip()]
+    black = parse_fraction(parts[0]) if parts else 0.0
+    white = parse_fraction(parts[1]) if len(parts) > 1 else 1.0
+    gamma = float(parts[2]) if len(parts) > 2 else 1.0
+    scaled = np.clip((values / 255 - black) / max(white - black, 1e-6), 0, 1)
+    return scaled ** (1 / gamma) * 255
+
+
+def morphology_offsets(shape: str, radius: int) -> list[tuple[int, int]]:
+    span = range(-radius, radius + 1)
+    if shape == 'diamond':
+        return [(dy, dx) for dy in span for dx in span if abs(dy) + abs(dx) <= radius]
+    if shape == 'disk':
+        return [(dy, dx) for dy in span for dx in span if dy * dy + dx * dx <= radius * radius]
+    if shape == 'plus':
+        return [(dy, dx) for dy in span for dx in span if dy == 0 or dx == 0]
+    return [(dy, dx) for dy in span for dx in span]
+
+
+def morph(gray: np.ndarray, offsets: list[tuple[int, int]], reduce) -> np.ndarray:
+    """Grayscale dilate (np.maximum) or erode (np.minimum) over the kernel offsets"""
+    r = max(max(abs(dy), abs(dx)) for dy, dx in offsets)
+    padded = np.pad(gray, r, mode='edge')
+    h, w = gray.shape
+    out = gray.copy()
+    for dy, dx in offsets:
+        reduce(out, padded[r + dy:r + dy + h, r + dx:r + dx + w], out=out)
+    return out
+
+
+def morphology(gray: np.ndarray, spec: str) -> np.ndarray:
+    """-morphology {erode,dilate,open,close} {diamond,square,disk,plus}[:N]"""
+    match = MORPHOLOGY_SPEC.match(spec)
+    if not match:
+        print(f"Warning: Unsupported morphology '{spec}', skipping", file=sys.stderr)
+        return gray
+    op, shape, radius = match.group(1).lower(), match.group(2).lower(), int(match.group(3) or 1)
+    offsets = morphology_offsets(shape, radius)
+    steps = {'dilate': [np.maximum], 'erode': [np.minimum],
+             'close': [np.maximum, np.minimum], 'open': [np.minimum, np.maximum]}[op]
+    for reduce in steps:
+        gray = morph(gray, offsets, reduce)
+    return gray
+
+
+def preprocess_array(gray: np.ndarray, settings: PreprocessSettings, angle: float | None = None) -> np.ndarray:
+    """Run the configured operations, in the same order as the ImageMagick chain
+
+    angle is an already measured deskew angle; by default it is measured here.
+    """
+    if settings.deskew:
+        gray = deskew(gray, settings.deskew_threshold, angle)
+    if settings.despeckle:
+        gray = despeckle(gray)
+    if settings.contrast_stretch or settings.level:
+        lut = np.arange(256, dtype=np.float64)
+        if settings.contrast_stretch:
+            lut = stretch_lut(np.bincount(gray.ravel(), minlength=256), settings.contrast_stretch)
+        if settings.level:
+            lut = level_curve(lut, settings.level)
+        gray = np.take(np.rint(lut).astype(np.uint8), gray)
+    if settings.morphology:
+        gray = morphology(gray, settings.morphology)
+    return np.ascontiguousarray(gray)
+
+
+def preprocess_page(path: Path, settings: PreprocessSettings, record_deskew: bool = False) -> np.ndarray:
+    """Decode and preprocess one page into a uint8 grayscale array
+
+    With record_deskew, the rotation is saved next to the page (save_deskew),
+    for pages whose preprocessed image is only kept in memory.
+    """
+    gray = load_gray(path)
+    if not record_deskew:
+        return preprocess_array(gray, settings)
+    angle = deskew_angle(gray, settings.deskew_threshold) if settings.deskew else 0.0
+    save_deskew(path, angle)
+    return preprocess_array(gray, settings, angle)
+
+
+def _untrack(shm):
+    """Keep a worker's resource tracker from unlinking a page the parent still owns"""
+    from multiprocessing import resource_tracker
+
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+
+def to_shared(gray: np.ndarray) -> tuple[str, tuple[int, int]]:
+    """Copy a page into a new shared memory block; the parent releases it"""
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, gray.nbytes))
+    _untrack(shm)
+    np.ndarray(gray.shape, dtype=np.uint8, buffer=shm.buf)[:] = gray
+    name = shm.name
+    shm.close()
+    return name, gray.shape
+
+
+def attach_shared(name: str):
+    """Attach to a shared page block from a worker; close() it when done"""
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+    _untrack(shm)
+    return shm
+
+
+def release_shared(name: str):
+    """Free a shared page block"""
+    from multiprocessing import shared_memory
+
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def preprocess_to_shared(path: str, settings: PreprocessSettings) -> tuple[str, tuple[int, int]]:
+    """Pool task: preprocess a page and hand it over through shared memory"""
+    path = Path(path)
+    with span('preprocess', 'page', chapter=path.parent.parent.name, page=path.stem):
+        return to_shared(preprocess_page(path, settings, record_deskew=True))
+
+
+def page_images(temp_dir: Path) -> list[Path]:
+    """Original page images, not intermediate files"""
+    return sorted(p for p in temp_dir.glob('page-*.png')
+                  if not re.search(r'-(processed|cleaned|column-\d+)\.png$', p.name))
+
+
+def has_interactive_artifacts(temp_dir: Path, basename: str) -> bool:
+    """The user already cleaned this page in the interactive tool"""
+    return ((temp_dir / f"{basename}-cleaned.png").exists()
+            or (temp_dir / f"{basename}-column-1.png").exists())
+
+
+def _preprocess_worker(path: str, settings: PreprocessSettings) -> tuple[str, dict]:
+    """Write one page's -processed.png; returns (basename, page_stages record fields)"""
+    start = time.perf_counter()
+    path = Path(path)
+    basename = path.stem
+    output = None
+    if not has_interactive_artifacts(path.parent, basename):
+        with span('preprocess', 'page', chapter=path.parent.parent.name, page=basename):
+            gray = preprocess_page(path, settings)
+            output = path.with_name(f"{basename}-processed.png")
+            tmp_path = output.with_name(output.name + '.tmp')
+            Image.fromarray(gray).save(tmp_path, format='PNG')
+            os.replace(tmp_path, output)
+    return basename, {
+        'seconds': round(time.perf_counter() - start, 3),
+        'input_hash': file_hash([path]),
+        'artifact': str(output) if output else None,
+    }
+
+
+def preprocess_pages(temp_dir: Path, settings: PreprocessSettings, jobs: int,
+                     force: bool = False, quiet: bool = False) -> int:
+    """Write -processed.png for every pending page; returns the number processed"""
+    store, chapter = StateStore.for_chapter(temp_dir.parent)
+    with store:
+        finished = set() if force else store.done_pages(chapter, 'preprocess')
+        pending = [p for p in page_images(temp_dir) if p.stem not in finished]
+        if not pending:
+            return 0
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = [pool.submit(_preprocess_worker, str(p), settings) for p in pending]
+            completed = as_completed(futures)
+            if not quiet:
+                completed = tqdm(completed, total=len(futures), desc="Preprocess images")
+            for future in completed:
+                basename, record = future.result()
+                store.mark_page(chapter, basename, 'preprocess', **record)
+    return len(pending)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Preprocess page images for OCR with NumPy')
+    parser.add_argument('temp_dir', help='Directory with page-N.png images')
+    parser.add_argument('--config', default=None,
+                        help='Pipeline config with a preprocessing block (default: built-in settings)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: one per core)')
+    parser.add_argument('--force', action='store_true',
+                        help='Reprocess pages the state store already records as preprocessed')
+    parser.add_argument('--quiet', '-q', action='store_true',
+                        help='No progress output')
+    args = parser.parse_args()
+
+    temp_dir = Path(args.temp_dir)
+    if not temp_dir.is_dir():
+        print(f"Error: Directory not found: {temp_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    settings = load_settings(Path(args.config) if args.config else None)
+    count = preprocess_pages(temp_dir, settings, max(1, args.jobs), args.force, args.quiet)
+
+    if not args.quiet:
+        print(f"✨ Processed images saved to {temp_dir}", file=sys.stderr)
+        print(f"   {count} pages preprocessed", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
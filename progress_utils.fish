@@ -367,3 +367,41 @@ function pipeline_summary
     echo (set_color cyan)"║"(set_color normal)"   Steps: $__pipeline_total_steps | Time: $elapsed_str                               "(set_color cyan)"║"(set_color normal) >&2
     echo (set_color cyan)"╚════════════════════════════════════════════════════════════╝"(set_color normal) >&2
 end
+
+# ============================================================================
+# TRACING
+# ============================================================================
+
+# Spans go to the Chrome trace named by HARBINGER_TRACE, next to the ones the
+# Python tools write; without it these do nothing.
+set -g TRACE_TOOL (dirname (status filename))/pipeline_trace.py
+
+function trace_begin
+    # Open a span for this script
+    # Usage: trace_begin "Span Name" [category]
+    set -q HARBINGER_TRACE; or return 0
+    set -l cat step
+    test -n "$argv[2]"; and set cat $argv[2]
+    python3 $TRACE_TOOL begin $argv[1] --cat $cat --pid $fish_pid 2>/dev/null
+    return 0
+end
+
+function trace_end
+    # Close the span opened by trace_begin
+    # Usage: trace_end "Span Name" [category]
+    set -q HARBINGER_TRACE; or return 0
+    set -l cat step
+    test -n "$argv[2]"; and set cat $argv[2]
+    python3 $TRACE_TOOL end $argv[1] --cat $cat --pid $fish_pid 2>/dev/null
+    return 0
+end
+
+function trace_step
+    # Run a command inside a span named after it, keeping its exit status
+    # Usage: trace_step step_function [args...]
+    trace_begin $argv[1]
+    $argv
+    set -l result $status
+    trace_end $argv[1]
+    return $result
+end
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+rasterize_pages.py - Sharded PDF rasterization into a shared page store
+Renders book pages once per DPI into OUTPUT_ROOT/.pages/<dpi>dpi/page-NNNN.jpg,
+splitting the missing pages into contiguous shards and running one renderer
+(pdftocairo, or pdftoppm as a fallback) per job. Pages already in the store
+are never rendered again, so adding or re-running a chapter only links.
+
+Each chapter's .temp directory gets its pages as page-N.png links to the store
+(hard links, or symlinks across filesystems), numbered from 1 within the chapter
+like the per-chapter extraction they replace.
+
+Usage: python3 rasterize_pages.py book.pdf --store OUTPUT_ROOT/.pages --dpi 300 \\
+                                  --chapter 1-12:OUTPUT_ROOT/intro/.temp [--chapter ...] [--jobs N]
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults
+DEFAULT_DPI = 300
+SHARDS_PER_JOB = 4    # Smaller shards balance uneven pages across renderers
+SOURCE_FILE = "source.json"
+
+RENDERED_PAGE = re.compile(r'^p-(\d+)\.jpg$')
+
+
+def store_dir(store: Path, dpi: int) -> Path:
+    return store / f"{dpi}dpi"
+
+
+def store_page(store: Path, dpi: int, page: int) -> Path:
+    return store_dir(store, dpi) / f"page-{page:04d}.jpg"
+
+
+def check_source(pdf: Path, directory: Path) -> bool:
+    """The store belongs to this PDF; records it on first use"""
+    source = {'pdf': pdf.name, 'size': pdf.stat().st_size}
+    marker = directory / SOURCE_FILE
+    if marker.exists():
+        try:
+            recorded = json.loads(marker.read_text())
+        except (OSError, json.JSONDecodeError):
+            recorded = None
+        return recorded == source
+    directory.mkdir(parents=True, exist_ok=True)
+    marker.write_text(json.dumps(source))
+    return True
+
+
+def parse_chapter(spec: str) -> tuple[int, int, Path]:
+    """START-END:DIR, the chapter's book pages and its .temp directory"""
+    pages, sep, dest = spec.partition(':')
+    first, dash, last = pages.partition('-')
+    if not sep or not dest:
+        raise ValueError(f"expected START-END:DIR, got '{spec}'")
+    first = int(first)
+    last = int(last) if dash else first
+    if first < 1 or last < first:
+        raise ValueError(f"invalid page range '{pages}'")
+    return first, last, Path(dest)
+
+
+def make_shards(pages: list[int], jobs: int) -> list[tuple[int, int]]:
+    """Split sorted pages into contiguous (first, last) runs of bounded size"""
+    if not pages:
+        return []
+    size = max(1, math.ceil(len(pages) / (jobs * SHARDS_PER_JOB)))
+    shards = []
+    first = prev = pages[0]
+    for page in pages[1:]:
+        if page != prev + 1 or page - first >= size:
+            shards.append((first, prev))
+            first = page
+        prev = page
+    shards.append((first, prev))
+    return shards
+
+
+def render_shard(pdf: Path, store: Path, dpi: int, shard: tuple[int, int], tool: str) -> int:
+    """Render one shard into a scratch dir, then move each page into the store"""
+    first, last = shard
+    directory = store_dir(store, dpi)
+    scratch = Path(tempfile.mkdtemp(prefix=f".shard-{first}-", dir=directory))
+    try:
+        with span('rasterize', 'shard', pages=f"{first}-{last}", dpi=dpi):
+            subprocess.run([tool, '-jpeg', '-r', str(dpi), '-f', str(first), '-l', str(last),
+                            str(pdf), str(scratch / 'p')],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        rendered = 0
+        for path in scratch.iterdir():
+            match = RENDERED_PAGE.match(path.name)
+            if match:
+                # Renaming within the store keeps partial renders out of it
+                os.replace(path, store_page(store, dpi, int(match.group(1))))
+                rendered += 1
+        return rendered
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def rasterize(pdf: Path, store: Path, dpi: int, pages: set[int], jobs: int, quiet: bool = False) -> int:
+    """Render the pages missing from the store; returns how many were rendered"""
+    missing = sorted(page for page in pages if not store_page(store, dpi, page).exists())
+    if not missing:
+        return 0
+
+    tool = 'pdftocairo' if shutil.which('pdftocairo') else 'pdftoppm'
+    if tool == 'pdftoppm':
+        print("Warning: pdftocairo not found, falling back to pdftoppm (slower)", file=sys.stderr)
+
+    shards = make_shards(missing, jobs)
+    rendered = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_shard, pdf, store, dpi, shard, tool) for shard in shards]
+        done = as_completed(futures)
+        if not quiet:
+            done = tqdm(done, total=len(futures), desc=f"Rasterizing {len(missing)} pages ({len(shards)} shards)")
+        for future in done:
+            rendered += future.result()
+    return rendered
+
+
+def link_page(source: Path, target: Path):
+    """Hard link a store page into a chapter, or symlink across filesystems"""
+    if target.exists() and os.path.samefile(target, source):
+        return
+    if target.is_symlink() or target.exists():
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        os.symlink(source.resolve(), target)
+
+
+def link_chapter(store: Path, dpi: int, first: int, last: int, dest: Path) -> int:
+    """Link the chapter's pages as page-N.png, numbered from 1 within the chapter"""
+    dest.mkdir(parents=True, exist_ok=True)
+    width = len(str(last - first + 1))   # pdftocairo pads to the document's page count
+    linked = 0
+    for index, page in enumerate(range(first, last + 1), start=1):
+        source = store_page(store, dpi, page)
+        if source.exists():
+            link_page(source, dest / f"page-{index:0{width}d}.png")
+            linked += 1
+    return linked
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Rasterize PDF pages once per DPI into a shared store and link them into chapters',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Render a whole book and link one chapter
+  python3 rasterize_pages.py book.pdf --store out/.pages --dpi 800 --chapter 1-40:out/ch1/.temp
+
+  # Render every chapter's pages in one sharded pass
+  python3 rasterize_pages.py book.pdf --store out/.pages --chapter 1-12:out/intro/.temp \\
+                             --chapter 13-40:out/act1/.temp --jobs 12
+        """
+    )
+    parser.add_argument('pdf', type=Path, help='Source PDF (the whole book)')
+    parser.add_argument('--store', type=Path, required=True, help='Shared page store directory')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help=f'Render resolution (default: {DEFAULT_DPI})')
+    parser.add_argument('--chapter', action='append', default=[], metavar='START-END:DIR',
+                        help='Book pages to link into a chapter .temp directory (repeatable)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Renderer processes (default: CPU count)')
+    parser.add_argument('--quiet', '-q', action='store_true', help='No progress bar')
+
+    args = parser.parse_args()
+
+    if not args.pdf.is_file():
+        print(f"Error: PDF not found: {args.pdf}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        chapters = [parse_chapter(spec) for spec in args.chapter]
+    except ValueError as e:
+        print(f"Error: --chapter {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not chapters:
+        print("Error: no --chapter page ranges given", file=sys.stderr)
+        sys.exit(1)
+
+    if not check_source(args.pdf, store_dir(args.store, args.dpi)):
+        print(f"Error: {store_dir(args.store, args.dpi)} holds pages from a different PDF "
+              f"(see {SOURCE_FILE}); use another --store", file=sys.stderr)
+        sys.exit(1)
+
+    pages = {page for first, last, _ in chapters for page in range(first, last + 1)}
+    reused = sum(store_page(args.store, args.dpi, page).exists() for page in pages)
+    rendered = rasterize(args.pdf, args.store, args.dpi, pages, max(1, args.jobs), args.quiet)
+
+    linked = 0
+    for first, last, dest in chapters:
+        count = link_chapter(args.store, args.dpi, first, last, dest)
+        if count < last - first + 1:
+            print(f"Warning: {dest}: only {count} of {last - first + 1} pages available", file=sys.stderr)
+        linked += count
+
+    if linked == 0:
+        print("Error: no pages rasterized from PDF", file=sys.stderr)
+        sys.exit(1)
+
+    if not args.quiet:
+        print(f"✨ Pages linked from {store_dir(args.store, args.dpi)}", file=sys.stderr)
+        print(f"   {rendered} rendered, {reused} reused, {linked} linked "
+              f"into {len(chapters)} chapter(s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+reocr_regions.py - Batched in-memory re-OCR of very low confidence words
+Reads the word boxes below the threshold from each chapter's tesseract *.tsv
+files, decodes each page image once, crops and threshold-processes all of its
+regions in memory, and recognizes the crops in batches on one persistent OCR
+engine (see ocr_pool.py). Crops already recognized by an earlier run are
+answered from the OCR cache (ocr_cache.py, configured by the `ocr` block of
+--config). Candidates are validated against the lexicon in a single lookup and
+sorted into the chapter's reocr/ directory:
+
+    corrections_auto.txt    word:new_text
+    corrections_manual.txt  word:new_text|old_conf=X|new_conf=Y|reason=spelling
+    rejected.txt            word:new_text|old_conf=X|new_conf=Y|reason=quality
+
+Usage: python3 reocr_regions.py CHAPTER_DIR [CHAPTER_DIR ...] [--threshold N] [--dry-run] [--batch N]
+                                [--config FILE] [--no-cache]
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+from ocr_pool import make_engine, load_ocr_settings, TSV_CONF, TSV_TEXT
+
+# Configuration defaults
+DEFAULT_THRESHOLD = 20
+DEFAULT_BATCH = 64
+CROP_PADDING = 10
+MIN_IMPROVEMENT = 30      # New confidence must beat the old by this many points
+CAUTIOUS_CONFIDENCE = 25  # Below this, only plain word shapes are accepted
+
+# Re-OCR settings: a single text line restricted to word characters
+REOCR_PSM = 7
+REOCR_OEM = 1
+REOCR_VARIABLES = {
+    'tessedit_char_whitelist': "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'-",
+}
+
+# Region preprocessing, matching the previous ImageMagick chain:
+# -colorspace Gray -contrast-stretch 10%x10% -level 10%,90%,1.5 -sharpen 0x1 -threshold 50%
+REC709_LUMA = (0.212656, 0.715158, 0.072186)
+STRETCH_CLIP = 10
+LEVEL_BLACK = 0.10
+LEVEL_WHITE = 0.90
+LEVEL_GAMMA = 1.5
+SHARPEN_SIGMA = 1.0
+THRESHOLD = 0.5
+
+# Tesseract TSV columns
+TSV_LEVEL = 0
+TSV_LEFT = 6
+TSV_TOP = 7
+TSV_WIDTH = 8
+TSV_HEIGHT = 9
+TSV_WORD_LEVEL = '5'
+
+PUNCTUATION_ONLY = re.compile(r'^[\W_]+$')
+GARBAGE_PATTERN = re.compile(r'(oe|ee|ii|aa|oo){3,}|[^\w\s]{3,}|^[0-9]+$')
+SPECIAL_CHAR = re.compile(r'[^A-Za-z0-9 -]')
+PLAIN_WORD = re.compile(r"^[a-z]+$|^[a-z]+-[a-z]+$|^[a-z]+'[a-z]+$", re.IGNORECASE)
+# Common D&D/Planescape terms that may be missing from the lexicon
+PLANESCAPE_TERMS = re.compile(r'^(sigil|githyanki|githzerai|modron|baatezu|tanarri|tiefling|bariaur|dabus)',
+                              re.IGNORECASE)
+COLUMN_TSV = re.compile(r'^(.*)-col(\d+)$')
+
+
+class Region(NamedTuple):
+    """A low-confidence word box from a tesseract TSV"""
+    word: str
+    left: int
+    top: int
+    width: int
+    height: int
+    conf: str  # Formatted to one decimal, as reported
+
+
+def lowconf_regions(tsv_path: Path, threshold: float) -> list[Region]:
+    """Word-level boxes below the threshold, skipping punctuation and single characters"""
+    regions = []
+    with open(tsv_path, 'r', encoding='utf-8', errors='replace') as f:
+        next(f, None)
+        for row in f:
+            fields = row.rstrip('\n').split('\t')
+            if len(fields) <= TSV_TEXT or fields[TSV_LEVEL] != TSV_WORD_LEVEL:
+                continue
+            word = fields[TSV_TEXT]
+            try:
+                conf = float(fields[TSV_CONF])
+                box = [int(fields[i]) for i in (TSV_LEFT, TSV_TOP, TSV_WIDTH, TSV_HEIGHT)]
+            except ValueError:
+                continue
+            if not 0 <= conf < threshold or len(word) <= 1 or PUNCTUATION_ONLY.match(word):
+                continue
+            regions.append(Region(word, *box, f"{conf:.1f}"))
+    return regions
+
+
+def source_image(temp_dir: Path, page_name: str) -> Path | None:
+    """The image a TSV was recognized from, so its boxes line up"""
+    match = COLUMN_TSV.match(page_name)
+    candidates = []
+    if match:
+        # Drawn columns have their own image; automatic regions are boxed in page coordinates
+        candidates.append(f"{match.group(1)}-column-{match.group(2)}.png")
+        page_name = match.group(1)
+    candidates += [f"{page_name}-cleaned.png", f"{page_name}-processed.png", f"{page_name}.png"]
+    return next((temp_dir / name for name in candidates if (temp_dir / name).exists()), None)
+
+
+def load_gray(path: Path):
+    """Decode a page once into a float32 grayscale array (0-255)
+
+    An original page that OCR only saw deskewed in memory is rotated the same
+    way (page-N-deskew.json), so the TSV boxes line up with it.
+    """
+    import numpy as np
+    from PIL import Image
+    from preprocess_pages import load_deskew, rotate_page
+
+    with Image.open(path) as image:
+        if image.mode in ('1', 'L', 'LA', 'I', 'I;16', 'F'):
+            gray = np.asarray(image.convert('F'), dtype=np.float32)
+        else:
+            gray = np.asarray(image.convert('RGB'), dtype=np.float32) @ np.asarray(REC709_LUMA, dtype=np.float32)
+    angle = load_deskew(path)
+    return rotate_page(gray, angle) if angle else gray
+
+
+def gaussian_blur(values, sigma: float):
+    """Separable gaussian blur with edge padding"""
+    import numpy as np
+
+    radius = max(1, int(3 * sigma + 0.5))
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernel = np.exp(-offsets ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+
+    padded = np.pad(values, radius, mode='edge')
+    h, w = values.shape
+    rows = sum(k * padded[:, i:i + w] for i, k in enumerate(kernel))
+    return sum(k * rows[i:i + h, :] for i, k in enumerate(kernel))
+
+
+def preprocess_region(gray, region: Region):
+    """Crop a padded region from the page and binarize it for re-OCR"""
+    import numpy as np
+    from PIL import Image
+
+    top = max(0, region.top - CROP_PADDING)
+    left = max(0, region.left - CROP_PADDING)
+    crop = gray[top:region.top + region.height + CROP_PADDING,
+                left:region.left + region.width + CROP_PADDING]
+    if crop.size == 0:
+        return None
+
+    low, high = np.percentile(crop, (STRETCH_CLIP, 100 - STRETCH_CLIP))
+    if high > low:
+        crop = np.clip((crop - low) * (255.0 / (high - low)), 0, 255)
+
+    black, white = 255 * LEVEL_BLACK, 255 * LEVEL_WHITE
+    crop = np.clip((crop - black) / (white - black), 0, 1) ** (1 / LEVEL_GAMMA) * 255
+
+    crop = crop + (crop - gaussian_blur(crop, SHARPEN_SIGMA))
+
+    binary = np.where(crop > 255 * THRESHOLD, 255, 0).astype(np.uint8)
+    return Image.fromarray(binary, mode='L')
+
+
+def first_word(tsv: str) -> tuple[str, str] | None:
+    """First recognized word and its confidence from a re-OCR TSV"""
+    for row in tsv.splitlines()[1:]:
+        fields = row.split('\t')
+        if len(fields) > TSV_TEXT and fields[TSV_LEVEL] == TSV_WORD_LEVEL and fields[TSV_TEXT]:
+            try:
+                return fields[TSV_TEXT], f"{float(fields[TSV_CONF]):.1f}"
+            except ValueError:
+                return None
+    return None
+
+
+def is_valid_word(word: str) -> bool:
+    """Check if a word looks like a real word (not garbage)"""
+    if not word or not word.strip() or PUNCTUATION_ONLY.match(word.replace(' ', '')):
+        return False
+    if len(word) <= 1:
+        return False
+    if len(SPECIAL_CHAR.findall(word)) > len(word) * 0.3:
+        return False
+    return not GARBAGE_PATTERN.search(word)
+
+
+def is_better_than_original(old_word: str, new_word: str, old_conf: float, new_conf: float) -> bool:
+    """Check if a re-OCR result is a clear improvement over the original"""
+    if old_word == new_word or not is_valid_word(new_word):
+        return False
+    if new_conf - old_conf < MIN_IMPROVEMENT:
+        return False
+    if new_conf < CAUTIOUS_CONFIDENCE and not PLAIN_WORD.match(new_word):
+        return False
+    return True
+
+
+def spelling_terms(word: str) -> set[str]:
+    """The word and its hyphenated parts, for a single lexicon lookup"""
+    return {word, *(part for part in word.split('-') if part)}
+
+
+def is_spelled(word: str, known: set[str]) -> bool:
+    if word in known or PLANESCAPE_TERMS.match(word):
+        return True
+    parts = [part for part in word.split('-') if part]
+    return len(parts) > 1 and all(part in known for part in parts)
+
+
+def recognize_regions(engine, jobs: list[tuple[Region, Path]], batch_size: int) -> list[tuple[Region, tuple | None]]:
+    """Re-OCR every region, decoding each page image once and recognizing crops in batches"""
+    results = []
+    pending = []
+
+    def flush():
+        images = [image for _, image in pending]
+        for (region, _), tsv in zip(pending, engine.recognize_batch(images)):
+            results.append((region, first_word(tsv)))
+        pending.clear()
+
+    current_path, gray = None, None
+    for region, image_path in jobs:
+        if image_path != current_path:
+            current_path, gray = image_path, load_gray(image_path)
+        crop = preprocess_region(gray, region)
+        if crop is None:
+            results.append((region, None))
+            continue
+        pending.append((region, crop))
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+    return results
+
+
+def reprocess_chapter(chapter_dir: Path, engine, lexicon, threshold: float,
+                      dry_run: bool = False, batch_size: int = DEFAULT_BATCH) -> tuple[int, int, int]:
+    """Re-OCR one chapter's low-confidence words; returns (regions, reprocessed, auto-approved)"""
+    temp_dir = chapter_dir / '.temp'
+    if not temp_dir.is_dir():
+        print(f"Warning: No .temp directory for {chapter_dir.name}", file=sys.stderr)
+        return 0, 0, 0
+
+    print(f"Processing {chapter_dir.name}...", file=sys.stderr)
+
+    jobs = []
+    for tsv_path in sorted(temp_dir.glob('*.tsv')):
+        page_image = source_image(temp_dir, tsv_path.stem)
+        if page_image is None:
+            continue
+        regions = lowconf_regions(tsv_path, threshold)
+        if not regions:
+            continue
+        print(f"  {tsv_path.stem}: {len(regions)} low-conf regions", file=sys.stderr)
+        jobs.extend((region, page_image) for region in regions)
+
+    if dry_run:
+        for region, _ in jobs:
+            print(f'  Would re-OCR: "{region.word}" (conf: {region.conf}%) at {region.left},{region.top}')
+        print(f"  Would process {len(jobs)} regions", file=sys.stderr)
+        return len(jobs), 0, 0
+
+    reocr_dir = temp_dir / 'reocr'
+    reocr_dir.mkdir(exist_ok=True)
+
+    changed = [(region, result) for region, result in recognize_regions(engine, jobs, batch_size)
+               if result and result[0] != region.word]
+    better = [is_better_than_original(region.word, text, float(region.conf), float(conf))
+              for region, (text, conf) in changed]
+    known = lexicon.known({term.lower() for (_, (text, _)), ok in zip(changed, better) if ok
+                           for term in spelling_terms(text)})
+
+    auto, manual, rejected = [], [], []
+    for (region, (text, conf)), ok in zip(changed, better):
+        scores = f"(was: {region.conf}%, now: {conf}%)"
+        details = f"{region.word}:{text}|old_conf={region.conf}|new_conf={conf}"
+        if not ok:
+            print(f"  ✗ {region.word} → {text} {scores} [not better]")
+            rejected.append(f"{details}|reason=quality\n")
+        elif is_spelled(text.lower(), known):
+            print(f"  ✓ {region.word} → {text} {scores}")
+            auto.append(f"{region.word}:{text}\n")
+        else:
+            print(f"  ? {region.word} → {text} {scores} [spelling]")
+            manual.append(f"{details}|reason=spelling\n")
+
+    for name, lines in (('corrections_auto.txt', auto), ('corrections_manual.txt', manual),
+                        ('rejected.txt', rejected)):
+        path = reocr_dir / name
+        if lines:
+            path.write_text(''.join(lines), encoding='utf-8')
+        else:
+            path.unlink(missing_ok=True)
+
+    print(f"  Processed {len(jobs)} regions, {len(auto)} auto-approved", file=sys.stderr)
+    if auto:
+        print(f"  → {len(auto)} auto-approved: {reocr_dir / 'corrections_auto.txt'}", file=sys.stderr)
+    if manual:
+        print(f"  → {len(manual)} need review: {reocr_dir / 'corrections_manual.txt'}", file=sys.stderr)
+    if rejected:
+        print(f"  → {len(rejected)} rejected: {reocr_dir / 'rejected.txt'}", file=sys.stderr)
+    return len(jobs), len(jobs), len(auto)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Re-OCR very low confidence word regions in memory')
+    parser.add_argument('chapters', nargs='+', help='Chapter directories with a .temp directory')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Re-OCR words below this confidence (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Show what would be re-processed without doing it')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH,
+                        help=f'Crops per OCR batch (default: {DEFAULT_BATCH})')
+    parser.add_argument('--config', default=None,
+                        help='Pipeline config whose ocr.cache and ocr.cache_max_mb set the OCR cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always run tesseract, without reading or filling the cache')
+    args = parser.parse_args()
+
+    engine = lexicon = None
+    if not args.dry_run:
+        try:
+            import numpy  # noqa: F401
+            from PIL import Image  # noqa: F401
+        except ImportError:
+            print("Error: numpy and Pillow are required for re-OCR: pip install numpy pillow", file=sys.stderr)
+            sys.exit(1)
+
+        config = {}
+        if args.config:
+            try:
+                with open(args.config, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read {args.config}: {e}", file=sys.stderr)
+        ocr = load_ocr_settings(config)
+
+        from lexicon import Lexicon
+        engine = make_engine('eng', REOCR_PSM, REOCR_OEM, None, REOCR_VARIABLES,
+                             cache_dir=None if args.no_cache else ocr['cache_dir'],
+                             cache_max_mb=ocr['cache_max_mb'])
+        lexicon = Lexicon()
+
+    failed = 0
+    for chapter in args.chapters:
+        try:
+            reprocess_chapter(Path(chapter), engine, lexicon, args.threshold, args.dry_run, max(1, args.batch))
+        except RuntimeError as e:
+            print(f"Error: Re-OCR of {Path(chapter).name} failed: {e}", file=sys.stderr)
+            failed += 1
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
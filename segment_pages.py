@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+segment_pages.py - Automatic column, sidebar and box segmentation
+Finds the reading regions of a page without the interactive preprocessing
+tool. The grayscale page is reduced to a grid of small cells with NumPy
+pooling. Ruled boxes (stat blocks) and shaded sidebars are the connected
+components of long rules and tinted background. The text around them is split
+by a recursive X-Y cut on the projection profiles: vertical cuts at gutters,
+horizontal cuts at wide blank bands.
+
+The regions are written to page-N-metadata.json in the schema the interactive
+server uses ({columns: [{id, x, y, width, height, order}]}), with
+"source": "auto" and a confidence score. ocr_pool.py crops and recognizes each
+auto region in reading order, so no -column-N.png files are written. Pages
+whose score is below the review threshold are flagged. Only flagged pages are
+listed for the interactive tool, and saving a page there replaces its auto
+columns.
+
+Usage: python3 segment_pages.py [converted_dir | chapter_dir ...] [--config FILE]
+                                [--min-confidence 0.6] [--jobs N] [--force]
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from pipeline_trace import span
+
+# Try to import tqdm for progress bars, fall back gracefully
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    def tqdm(iterable, **kwargs):
+        """Fallback tqdm that just returns the iterable with occasional progress prints"""
+        total = kwargs.get('total', None)
+        desc = kwargs.get('desc', 'Processing')
+        items = list(iterable)
+        if total is None:
+            total = len(items)
+        for i, item in enumerate(items):
+            if i == 0 or (i + 1) % max(1, total // 10) == 0 or i == total - 1:
+                print(f"\r{desc}: {i + 1}/{total}", end='', file=sys.stderr, flush=True)
+            yield item
+        print(file=sys.stderr)  # New line after completion
+
+# Configuration defaults (fractions are of the page width or height)
+FINE_WIDTH = 1600           # Most pixels across the fine grid used for rules and tint
+CELL_FACTOR = 4             # Fine pixels per analysis cell edge
+CELL_INK = 0.05             # Inked fraction of a cell's fine pixels that makes it text
+GUTTER_INK = 0.02           # Fraction of a gutter's rows allowed to cross it
+MIN_GUTTER = 0.012          # Narrowest gutter between columns
+MIN_BAND_GAP = 0.01         # Narrowest blank band between stacked regions
+MIN_CUT_HEIGHT = 0.04       # Shortest region a vertical cut may split (about three lines)
+MAX_DEPTH = 6
+RULE_LENGTH = 0.08          # Shortest horizontal or vertical rule
+TINT_MAX = 235              # Uninked fine pixels darker than this are shaded background
+TINT_CELL = 0.6             # Shaded fraction that makes a cell part of a sidebar
+MIN_BOX = (0.12, 0.04)      # Smallest box or sidebar (width, height)
+PAGE_FRAME = 0.85           # Boxes this large in both directions are page borders
+PADDING = 0.004             # Margin added around each region
+FIGURE_INK = 0.45           # Blocks this dark are illustration rather than text
+FIGURE_BLOCK = 8            # Cells per illustration block edge (a line or two of type)
+FIGURE_AREA = 0.02          # Illustration share of the page that needs review
+NARROW_REGION = 0.1         # Text regions narrower than this need review
+MAX_REGIONS = 8
+MIN_CONFIDENCE = 0.6
+METADATA_SUFFIX = "-metadata.json"
+SKIP_DIRS = ("final", "statblocks", "diagnostics")
+
+# Confidence lost per problem found on a page
+PENALTIES = {
+    'text crosses a gutter': 0.45,
+    'too many regions': 0.45,
+    'illustration': 0.45,
+    'narrow region': 0.25,
+}
+
+
+class Region(NamedTuple):
+    """A reading region in cell coordinates: rows top:bottom, columns left:right"""
+    top: int
+    left: int
+    bottom: int
+    right: int
+    kind: str = 'text'  # text, box (ruled) or sidebar (shaded)
+
+
+class Segmentation(NamedTuple):
+    columns: list[dict]     # The interactive server's column schema, in page pixels
+    confidence: float
+    reasons: list[str]
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Gray level that best separates ink from paper"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mass = np.cumsum(hist * levels)
+    total = weight[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mass[-1] * weight - mass * total) ** 2 / (weight * (total - weight))
+    return int(np.nanargmax(between[:-1])) + 1
+
+
+def pool(values: np.ndarray, factor: int, reduce) -> np.ndarray:
+    """Reduce factor×factor blocks, dropping the ragged edge"""
+    h = values.shape[0] // factor * factor
+    w = values.shape[1] // factor * factor
+    return reduce(values[:h, :w].reshape(h // factor, factor, w // factor, factor), axis=(1, 3))
+
+
+def long_runs(mask: np.ndarray, min_length: int) -> np.ndarray:
+    """Keep only horizontal runs of at least min_length set pixels"""
+    h, w = mask.shape
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)   # Row-major order pairs every end with its start
+    keep = ends - starts >= min_length
+    marks = np.zeros((h, w + 1), dtype=np.int32)
+    marks[start_rows[keep], starts[keep]] = 1
+    marks[start_rows[keep], ends[keep]] = -1
+    return np.cumsum(marks, axis=1)[:, :w] > 0
+
+
+def label_components(mask: np.ndarray) -> np.ndarray:
+    """8-connected component labels (smallest flat index in each component, -1 elsewhere)
+
+    Every pixel repeatedly takes the smallest label among its neighbours, and
+    labels then jump to their own label's label, so long components converge
+    in a few dozen vectorized passes.
+    """
+    h, w = mask.shape
+    background = h * w
+    labels = np.where(mask, np.arange(h * w).reshape(h, w), background)
+    while True:
+        padded = np.pad(labels, 1, constant_values=background)
+        smallest = labels.copy()
+        for dy in (0, 1, 2):
+            for dx in (0, 1, 2):
+                np.minimum(smallest, padded[dy:dy + h, dx:dx + w], out=smallest)
+        smallest[~mask] = background
+        flat = np.append(smallest.ravel(), background)
+        for _ in range(4):
+            flat[:-1] = flat[flat[:-1]]
+        smallest = flat[:-1].reshape(h, w)
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+    return np.where(mask, labels, -1)
+
+
+def component_boxes(mask: np.ndarray, min_size: tuple[int, int]) -> list[Region]:
+    """Bounding boxes of the components at least min_size (width, height) cells"""
+    labels = label_components(mask)
+    ys, xs = np.nonzero(labels >= 0)
+    if not len(ys):
+        return []
+    ids, index = np.unique(labels[ys, xs], return_inverse=True)
+    tops = np.full(len(ids), mask.shape[0])
+    lefts = np.full(len(ids), mask.shape[1])
+    bottoms = np.zeros(len(ids), dtype=int)
+    rights = np.zeros(len(ids), dtype=int)
+    np.minimum.at(tops, index, ys)
+    np.minimum.at(lefts, index, xs)
+    np.maximum.at(bottoms, index, ys + 1)
+    np.maximum.at(rights, index, xs + 1)
+    return [Region(*box) for box in zip(tops, lefts, bottoms, rights)
+            if box[3] - box[1] >= min_size[0] and box[2] - box[0] >= min_size[1]]
+
+
+def merge_boxes(boxes: list[Region]) -> list[Region]:
+    """Union overlapping boxes (a ruled box is often shaded too); ruled wins the kind"""
+    merged = []
+    for box in sorted(boxes):
+        for i, other in enumerate(merged):
+            if box.top < other.bottom and other.top < box.bottom and box.left < other.right and other.left < box.right:
+                merged[i] = Region(min(box.top, other.top), min(box.left, other.left),
+                                   max(box.bottom, other.bottom), max(box.right, other.right),
+                                   'box' if 'box' in (box.kind, other.kind) else box.kind)
+                break
+        else:
+            merged.append(box)
+    return merged if len(merged) == len(boxes) else merge_boxes(merged)
+
+
+def blank_runs(blank: np.ndarray, min_length: int) -> list[tuple[int, int]]:
+    """Interior runs of blank entries at least min_length long"""
+    edges = np.diff(np.concatenate(([0], blank.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [(s, e) for s, e in zip(starts, ends) if e - s >= min_length and s > 0 and e < len(blank)]
+
+
+def trim(occupied: np.ndarray, region: Region) -> Region | None:
+    """Shrink a region to its occupied cells"""
+    cells = occupied[region.top:region.bottom, region.left:region.right]
+    rows = np.flatnonzero(cells.any(axis=1))
+    cols = np.flatnonzero(cells.any(axis=0))
+    if not len(rows):
+        return None
+    return region._replace(top=region.top + rows[0], bottom=region.top + rows[-1] + 1,
+                           left=region.left + cols[0], right=region.left + cols[-1] + 1)
+
+
+class Segmenter:
+    """Recursive X-Y cut over a page's occupied cells"""
+
+    def __init__(self, occupied: np.ndarray):
+        self.occupied = occupied
+        h, w = occupied.shape
+        self.min_gutter = max(2, round(MIN_GUTTER * w))
+        self.min_gap = max(2, round(MIN_BAND_GAP * h))
+        self.min_cut_height = max(3, round(MIN_CUT_HEIGHT * h))
+        self.crossed = False    # A vertical cut went through some ink
+
+    def cut(self, region: Region, depth: int = 0) -> list[Region]:
+        """Leaf regions in reading order"""
+        region = trim(self.occupied, region)
+        if region is None:
+            return []
+        if depth >= MAX_DEPTH:
+            return [region]
+        cells = self.occupied[region.top:region.bottom, region.left:region.right]
+
+        # Columns: gutters that every row leaves blank
+        tall = cells.shape[0] >= self.min_cut_height
+        coverage = cells.mean(axis=0)
+        if tall and (gutters := blank_runs(coverage == 0, self.min_gutter)):
+            return self.cut_columns(region, gutters, depth)
+
+        # Bands: blank rows between stacked blocks, so the columns below a headline can split
+        gaps = blank_runs(~cells.any(axis=1), self.min_gap)
+        if not gaps:
+            # Last resort: gutters that a few rows cross (a headline set tight above the columns)
+            if tall and (gutters := blank_runs(coverage <= GUTTER_INK, self.min_gutter)):
+                self.crossed = True
+                return self.cut_columns(region, gutters, depth)
+            return [region]
+        bounds = [0] + [y for gap in gaps for y in gap] + [cells.shape[0]]
+        leaves = []
+        run = None  # Consecutive unsplit bands read as one region
+        for top, bottom in zip(bounds[::2], bounds[1::2]):
+            band = self.cut(region._replace(top=region.top + top, bottom=region.top + bottom), depth + 1)
+            if len(band) == 1:
+                run = band[0] if run is None else Region(
+                    run.top, min(run.left, band[0].left), band[0].bottom, max(run.right, band[0].right))
+                continue
+            if run is not None:
+                leaves.append(run)
+                run = None
+            leaves.extend(band)
+        if run is not None:
+            leaves.append(run)
+        return leaves
+
+    def cut_columns(self, region: Region, gutters: list[tuple[int, int]], depth: int) -> list[Region]:
+        bounds = [0] + [x for gutter in gutters for x in gutter] + [region.right - region.left]
+        return [leaf for left, right in zip(bounds[::2], bounds[1::2])
+                for leaf in self.cut(region._replace(left=region.left + left, right=region.left + right),
+                                     depth + 1)]
+
+
+def split_around(leaf: Region, boxes: list[Region], text: np.ndarray) -> list[Region]:
+    """Cut a leaf into the text above, between and below the boxes inside it"""
+    inside = sorted((b for b in boxes if leaf.top <= (b.top + b.bottom) // 2 < leaf.bottom
+                     and leaf.left <= (b.left + b.right) // 2 < leaf.right), key=lambda b: b.top)
+    if not inside:
+        return [leaf]
+    pieces = []
+    top = leaf.top
+    for box in inside:
+        pieces.append(trim(text, leaf._replace(top=top, bottom=max(top, box.top))))
+        pieces.append(box)
+        top = max(top, box.bottom)
+    pieces.append(trim(text, leaf._replace(top=top)))
+    return [piece for piece in pieces if piece is not None and piece.bottom > piece.top]
+
+
+def segment(gray: np.ndarray) -> Segmentation:
+    """Reading regions of a grayscale page, in page pixels, with a confidence score"""
+    height, width = gray.shape
+    fine = max(1, -(-width // FINE_WIDTH))
+    cell = fine * CELL_FACTOR
+    threshold = otsu_threshold(gray)
+
+    fine_ink = pool(gray, fine, np.min) < threshold
+    fine_mean = pool(gray, fine, np.mean)
+    fine_tint = ~fine_ink & (fine_mean <= TINT_MAX)
+    rule_length = max(2, round(RULE_LENGTH * fine_ink.shape[1]))
+    fine_rules = long_runs(fine_ink, rule_length) | long_runs(fine_ink.T, rule_length).T
+
+    ink = pool(fine_ink, CELL_FACTOR, np.mean)
+    rules = pool(fine_rules, CELL_FACTOR, np.max)
+    tint = pool(fine_tint, CELL_FACTOR, np.mean) >= TINT_CELL
+    rows, cols = ink.shape
+
+    min_box = (max(1, round(MIN_BOX[0] * cols)), max(1, round(MIN_BOX[1] * rows)))
+    boxes = [b._replace(kind='box') for b in component_boxes(rules, min_box)]
+    boxes += [b._replace(kind='sidebar') for b in component_boxes(tint, min_box)]
+    boxes = [b for b in merge_boxes(boxes)
+             if b.right - b.left < PAGE_FRAME * cols or b.bottom - b.top < PAGE_FRAME * rows]
+
+    # Rules never block a cut; boxes are solid so cuts go around them
+    text = (ink >= CELL_INK) & ~rules
+    occupied = text.copy()
+    for box in boxes:
+        occupied[box.top:box.bottom, box.left:box.right] = True
+
+    segmenter = Segmenter(occupied)
+    leaves = segmenter.cut(Region(0, 0, rows, cols))
+    regions = [piece for leaf in leaves for piece in split_around(leaf, boxes, text)]
+
+    reasons = []
+    if segmenter.crossed:
+        reasons.append('text crosses a gutter')
+    if len(regions) > MAX_REGIONS:
+        reasons.append('too many regions')
+    # Measured on mean darkness over larger blocks, so bold type doesn't count
+    if (pool(fine_mean < threshold, CELL_FACTOR * FIGURE_BLOCK, np.mean) >= FIGURE_INK).mean() >= FIGURE_AREA:
+        reasons.append('illustration')
+    if any(r.kind == 'text' and r.right - r.left < NARROW_REGION * cols and r.bottom - r.top > NARROW_REGION * rows
+           for r in regions):
+        reasons.append('narrow region')
+    confidence = max(0.0, 1.0 - sum(PENALTIES[reason] for reason in reasons))
+
+    pad = round(PADDING * width)
+    columns = []
+    for order, r in enumerate(regions, 1):
+        x, y = max(0, r.left * cell - pad), max(0, r.top * cell - pad)
+        right, bottom = min(width, r.right * cell + pad), min(height, r.bottom * cell + pad)
+        columns.append({'id': f"auto-{order}", 'x': int(x), 'y': int(y), 'width': int(right - x),
+                        'height': int(bottom - y), 'order': order, 'kind': r.kind})
+    return Segmentation(columns, round(confidence, 2), reasons)
+
+
+def metadata_path(temp_dir: Path, basename: str) -> Path:
+    return temp_dir / f"{basename}{METADATA_SUFFIX}"
+
+
+def read_metadata(temp_dir: Path, basename: str) -> dict | None:
+    try:
+        with open(metadata_path(temp_dir, basename), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def auto_columns(temp_dir: Path, basename: str) -> list[dict] | None:
+    """A page's auto-detected regions, or None if it was never segmented or was reviewed by hand"""
+    metadata = read_metadata(temp_dir, basename)
+    if metadata is None or metadata.get('source') != 'auto':
+        return None
+    return sorted(metadata.get('columns', []), key=lambda c: c.get('order', 0))
+
+
+def write_metadata(temp_dir: Path, basename: str, result: Segmentation,
+                   min_confidence: float = MIN_CONFIDENCE) -> bool:
+    """Write the regions in the interactive server's metadata schema; returns whether the page is flagged"""
+    flagged = result.confidence < min_confidence
+    metadata = {
+        'columns': result.columns,
+        'processed': False,
+        'source': 'auto',
+        'segmentation': {
+            'confidence': result.confidence,
+            'flagged': flagged,
+            'reasons': result.reasons,
+        },
+        'timestamp': datetime.now().isoformat(),
+    }
+    path = metadata_path(temp_dir, basename)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, path)
+    return flagged
+
+
+def segment_and_save(temp_dir: Path, basename: str, gray: np.ndarray,
+                     min_confidence: float | None = None) -> list[dict]:
+    """Segment a page that is already in memory and record its regions (None: MIN_CONFIDENCE)"""
+    with span('segment', 'page', chapter=temp_dir.parent.name, page=basename):
+        result = segment(gray)
+    write_metadata(temp_dir, basename, result, MIN_CONFIDENCE if min_confidence is None else float(min_confidence))
+    return result.columns
+
+
+def find_temp_dirs(target: Path) -> list[Path]:
+    if target.name == '.temp':
+        return [target]
+    if (target / '.temp').is_dir():
+        return [target / '.temp']
+    return sorted(d / '.temp' for d in target.iterdir()
+                  if d.is_dir() and d.name not in SKIP_DIRS and (d / '.temp').is_dir())
+
+
+def _segment_worker(temp_dir: str, basename: str, settings,
+                    min_confidence: float) -> tuple[str, str, Segmentation, bool]:
+    """Segment the page image OCR will read; returns (temp_dir, basename, result, flagged)"""
+    from preprocess_pages import load_gray, preprocess_page
+
+    temp_dir = Path(temp_dir)
+    image = next((p for p in (temp_dir / f"{basename}-cleaned.png", temp_dir / f"{basename}-processed.png")
+                  if p.exists()), None)
+    with span('segment', 'page', chapter=temp_dir.parent.name, page=basename):
+        if image is not None:
+            gray = load_gray(image)
+        elif settings is not None:
+            # As the OCR worker will, recording the rotation for re-OCR
+            gray = preprocess_page(temp_dir / f"{basename}.png", settings, record_deskew=True)
+        else:
+            gray = load_gray(temp_dir / f"{basename}.png")
+        result = segment(gray)
+    flagged = write_metadata(temp_dir, basename, result, min_confidence)
+    return str(temp_dir), basename, result, flagged
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Detect columns, sidebars and boxes on page images')
+    parser.add_argument('targets', nargs='*', default=['converted_harbinger_house'],
+                        help='Converted directories, chapter directories or their .temp directories')
+    parser.add_argument('--config', default=None,
+                        help='Pipeline config; pages without a -processed.png are preprocessed with it')
+    parser.add_argument('--min-confidence', type=float, default=None,
+                        help=f'Pages scoring below this are flagged for review (default: {MIN_CONFIDENCE})')
+    parser.add_argument('--jobs', type=int, default=None, help='Parallel workers (default: CPU count)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-segment pages that already have auto regions (hand-drawn columns are kept)')
+    args = parser.parse_args()
+
+    from ocr_pool import page_basenames, column_images
+    from preprocess_pages import load_settings
+
+    settings = None
+    config = {}
+    if args.config:
+        settings = load_settings(Path(args.config))
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            pass  # load_settings has already warned
+    min_confidence = args.min_confidence
+    if min_confidence is None:
+        min_confidence = float(config.get('segmentation', {}).get('min_confidence', MIN_CONFIDENCE))
+
+    todo = []
+    kept = 0
+    for target in map(Path, args.targets):
+        if not target.is_dir():
+            print(f"Error: Directory not found: {target}", file=sys.stderr)
+            sys.exit(1)
+        for temp_dir in find_temp_dirs(target):
+            for basename in page_basenames(temp_dir):
+                metadata = read_metadata(temp_dir, basename)
+                if column_images(temp_dir, basename) or (metadata and metadata.get('source') != 'auto'):
+                    kept += 1   # Reviewed by hand
+                elif metadata is None or args.force:
+                    todo.append((temp_dir, basename))
+
+    flagged = []
+    failed = 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(_segment_worker, str(t), b, settings, min_confidence) for t, b in todo]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Segmenting", unit="page"):
+                try:
+                    temp_dir, basename, result, is_flagged = future.result()
+                except Exception as e:
+                    print(f"Warning: Segmentation failed: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                if is_flagged:
+                    flagged.append((Path(temp_dir).parent.name, basename, result))
+
+    for chapter, basename, result in sorted(flagged, key=lambda f: f[:2]):
+        print(f"  {chapter}/{basename}: {result.confidence:.2f} ({', '.join(result.reasons)})", file=sys.stderr)
+    print(f"✨ Regions saved to page-N{METADATA_SUFFIX}", file=sys.stderr)
+    print(f"   {len(todo) - failed} pages segmented, {len(flagged)} flagged for review, "
+          f"{kept} reviewed by hand, {failed} failed", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Batch-mode tests for extract_statblocks.py
+Inputs from one chapter directory must get their own output subdirectory and
+extraction cache, so an unchanged re-run writes nothing.
+"""
+
+import sys
+import subprocess
+import unittest
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract_statblocks import CACHE_FILE, output_subdirs
+
+SCRIPT = Path(__file__).resolve().parent.parent / "extract_statblocks.py"
+
+CHAPTER_A = """# Encounters
+
+**Trolan the Strong** (Male human Fighter 9): AC 2; MV 12; hp 68; THAC0 12;
+#AT 3/2; Dmg 1d8+3 (long sword); ML Elite (14); XP 2,000.
+"""
+
+CHAPTER_B = """# The Tower
+
+**Mirela** (Female elf Mage 5): AC 8; MV 12; hp 14; THAC0 19;
+#AT 1; Dmg 1d4 (dagger); ML Steady (12); XP 650.
+
+**Gorvash** (Male half-orc Thief 4): AC 6; MV 12; hp 19; THAC0 19;
+#AT 1; Dmg 1d6 (short sword); ML Average (10); XP 270.
+"""
+
+
+class OutputSubdirsTest(unittest.TestCase):
+
+    def test_inputs_from_one_directory_get_their_own_subdir(self):
+        inputs = [Path("ch/a.md"), Path("ch/b.md")]
+        self.assertEqual(output_subdirs(inputs), {inputs[0]: "ch/a", inputs[1]: "ch/b"})
+
+    def test_chapter_dirs_keep_their_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            inputs = [Path(tmp) / "ch1" / "converted.md", Path(tmp) / "ch2" / "converted.md"]
+            self.assertEqual(output_subdirs(inputs), {inputs[0]: "ch1", inputs[1]: "ch2"})
+
+
+class BatchRerunTest(unittest.TestCase):
+
+    def batch(self, cwd: Path) -> str:
+        result = subprocess.run(
+            [sys.executable, str(SCRIPT), "--batch", "ch/a.md", "ch/b.md",
+             "--output-dir", "out", "--jsonl", "blocks.jsonl", "--jobs", "1"],
+            cwd=cwd, capture_output=True, text=True, check=True)
+        return result.stderr
+
+    def test_unchanged_rerun_updates_nothing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "ch").mkdir()
+            (root / "ch" / "a.md").write_text(CHAPTER_A, encoding='utf-8')
+            (root / "ch" / "b.md").write_text(CHAPTER_B, encoding='utf-8')
+
+            # a: one NPC file plus _all_statblocks.md; b: two plus _all_statblocks.md
+            self.assertIn("5 markdown files updated", self.batch(root))
+            for stem in ("a", "b"):
+                with self.subTest(input=stem):
+                    self.assertTrue((root / "out" / "ch" / stem / "_all_statblocks.md").is_file())
+                    self.assertTrue((root / "out" / "ch" / stem / CACHE_FILE).is_file())
+
+            self.assertIn("0 markdown files updated", self.batch(root))
+
+
+if __name__ == '__main__':
+    unittest.main()
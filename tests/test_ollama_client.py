@@ -0,0 +1,177 @@
+"""
+Tests for ollama_client.py against a stub Ollama server
+The stub answers /api/generate with the chunk upper-cased (or HTTP 500 for
+chunks containing FAIL) on a free local port, counting requests and the
+number in flight.
+"""
+
+import sys
+import json
+import time
+import threading
+import subprocess
+import unittest
+import tempfile
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ollama_client import OllamaClient, split_chunks, clean_document
+
+SCRIPT = Path(__file__).resolve().parent.parent / "ollama_client.py"
+
+CHAPTER = """# The Tale of Harbinger House
+
+Trolan waits in the hall.
+<!-- PAGE BREAK -->
+<!-- COLUMN 1 -->
+The dabus repair the stairs.
+
+<!-- COLUMN 2 -->
+A factol arrives at dawn.
+<!-- PAGE BREAK -->
+Sigil sleeps.
+"""
+
+MARKERS = ["<!-- PAGE BREAK -->\n", "<!-- COLUMN 1 -->\n", "<!-- COLUMN 2 -->\n", "<!-- PAGE BREAK -->\n"]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive, like Ollama
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.reply(200, {'version': 'stub'})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        chunk = body['prompt'].split('\n\n', 1)[1]
+        server = self.server
+        with server.lock:
+            server.chunks.append(chunk)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        if 'FAIL' in chunk:
+            self.reply(500, {'error': 'model crashed'})
+        else:
+            self.reply(200, {'response': chunk.upper()})
+
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def run_client(host: str, workdir: Path, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(SCRIPT), "input.md", "output.md", "--host", host,
+         "--cache-dir", str(workdir / "cache"), *args],
+        cwd=workdir, capture_output=True, text=True)
+
+
+class SplitTest(unittest.TestCase):
+
+    def test_markers_are_pieces_of_their_own(self):
+        pieces = split_chunks(CHAPTER)
+        self.assertEqual([text for is_marker, text in pieces if is_marker], MARKERS)
+        self.assertEqual(''.join(text for _, text in pieces), CHAPTER)
+        self.assertFalse(any('<!--' in text for is_marker, text in pieces if not is_marker))
+
+    def test_markers_survive_cleaning(self):
+        with StubOllama() as server:
+            client = OllamaClient(server.host, pool_size=2)
+            try:
+                cleaned, counts = clean_document(CHAPTER, client, jobs=2)
+            finally:
+                client.close()
+
+        expected = ''.join(text if is_marker else text.upper() for is_marker, text in split_chunks(CHAPTER))
+        self.assertEqual(cleaned, expected)
+        self.assertEqual(counts['sent'], 4)
+        self.assertEqual(len(server.chunks), 4)
+        self.assertFalse(any('<!--' in chunk for chunk in server.chunks))
+
+
+class ConcurrencyTest(unittest.TestCase):
+
+    def test_in_flight_requests_stay_within_jobs(self):
+        text = ''.join(f"Chunk {i} text.\n<!-- PAGE BREAK -->\n" for i in range(12))
+        for jobs in (1, 3):
+            with self.subTest(jobs=jobs), StubOllama(delay=0.05) as server:
+                client = OllamaClient(server.host, pool_size=jobs)
+                try:
+                    _, counts = clean_document(text, client, jobs=jobs)
+                finally:
+                    client.close()
+                self.assertEqual(counts['sent'], 12)
+                self.assertEqual(server.max_in_flight, jobs)
+
+
+class CommandLineTest(unittest.TestCase):
+
+    def test_second_run_is_served_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp, StubOllama() as server:
+            workdir = Path(tmp)
+            (workdir / "input.md").write_text(CHAPTER, encoding='utf-8')
+
+            first = run_client(server.host, workdir)
+            self.assertEqual(first.returncode, 0, first.stderr)
+            self.assertEqual(len(server.chunks), 4)
+            output = (workdir / "output.md").read_text(encoding='utf-8')
+
+            (workdir / "output.md").unlink()
+            second = run_client(server.host, workdir)
+            self.assertEqual(second.returncode, 0, second.stderr)
+            self.assertEqual(len(server.chunks), 4)
+            self.assertIn("0 sent, 4 cached", second.stderr)
+            self.assertEqual((workdir / "output.md").read_text(encoding='utf-8'), output)
+
+    def test_failed_chunk_keeps_original_text(self):
+        text = CHAPTER.replace("Sigil sleeps.", "FAIL: Sigil sleeps.")
+        with tempfile.TemporaryDirectory() as tmp, StubOllama() as server:
+            workdir = Path(tmp)
+            (workdir / "input.md").write_text(text, encoding='utf-8')
+
+            result = run_client(server.host, workdir, "--no-cache")
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("1 failed", result.stderr)
+            output = (workdir / "output.md").read_text(encoding='utf-8')
+            self.assertTrue(output.endswith("<!-- PAGE BREAK -->\nFAIL: Sigil sleeps.\n"))
+            self.assertIn("A FACTOL ARRIVES AT DAWN.", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
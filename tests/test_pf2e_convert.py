@@ -0,0 +1,78 @@
+"""
+Golden-output tests for pf2e_convert.py
+fixtures/statblocks.jsonl holds stat blocks as extract_statblocks.py writes them;
+fixtures/statblocks.pf2e.json is the reviewed Foundry output for them. After an
+intended conversion change, regenerate it and review the diff:
+
+    python3 pf2e_convert.py tests/fixtures/statblocks.jsonl -o tests/fixtures/statblocks.pf2e.json
+"""
+
+import sys
+import json
+import unittest
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract_statblocks import StatBlock, load_blocks, write_binary
+from pf2e_convert import (
+    convert_blocks, STRIKE_DAMAGE, STRIKE_BONUS, ATTACK_TIER, EXTREME, HIGH, MODERATE, MIN_LEVEL,
+)
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+BLOCKS = FIXTURES / "statblocks.jsonl"
+EXPECTED = FIXTURES / "statblocks.pf2e.json"
+
+
+class GoldenOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.blocks = load_blocks(str(BLOCKS))
+        with open(EXPECTED, 'r', encoding='utf-8') as f:
+            self.expected = json.load(f)
+
+    def assertActorsEqual(self, actors: list, expected: list):
+        self.assertEqual(len(actors), len(expected))
+        for actor, want in zip(actors, expected):
+            with self.subTest(creature=want['name']):
+                self.assertEqual(actor, want)
+
+    def test_jsonl_matches_golden(self):
+        self.assertActorsEqual(convert_blocks(self.blocks), self.expected)
+
+    def test_binary_matches_golden(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "statblocks.stb")
+            write_binary(self.blocks, path)
+            self.assertActorsEqual(convert_blocks(load_blocks(path)), self.expected)
+
+    def test_batch_matches_single(self):
+        """Column-wise conversion must not let creatures affect each other"""
+        singles = [actor for block in self.blocks for actor in convert_blocks([block])]
+        self.assertActorsEqual(singles, self.expected)
+
+
+class StrikeTierTest(unittest.TestCase):
+
+    def strike(self, attacks: str, level_xp: str = "2,000") -> dict:
+        block = StatBlock(name="Probe", thac0="12", xp=level_xp, attacks=attacks)
+        return convert_blocks([block])[0]
+
+    def test_each_tier_uses_its_own_damage_column(self):
+        for attacks, tier in (("1", MODERATE), ("2", HIGH), ("3", EXTREME)):
+            with self.subTest(attacks=attacks):
+                actor = self.strike(attacks)
+                row = actor['system']['details']['level']['value'] - MIN_LEVEL
+                item = actor['items'][0]['system']
+                self.assertEqual(ATTACK_TIER[int(attacks)], tier)
+                self.assertEqual(item['bonus']['value'], STRIKE_BONUS[row][tier])
+                self.assertEqual(item['damageRolls']['strike']['damage'], STRIKE_DAMAGE[row][tier])
+
+    def test_damage_table_has_four_columns(self):
+        self.assertTrue(all(len(row) == 4 for row in STRIKE_DAMAGE))
+        self.assertEqual(STRIKE_DAMAGE[1 - MIN_LEVEL], ("1d8+4", "1d6+3", "1d6+2", "1d4+2"))
+
+
+if __name__ == '__main__':
+    unittest.main()